@@ -1,8 +1,7 @@
 from fastapi import APIRouter, HTTPException, status, Depends
 from datetime import timedelta
 from app.core.security import (
-    UserLogin, Token, User, get_password_hash, verify_password, 
-    create_access_token, get_current_user
+    UserLogin, Token, User, create_access_token, get_current_user
 )
 from app.core.config import settings
 
@@ -1,8 +1,9 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 from pydantic import BaseModel
 from typing import List, Optional
 from app.core.security import User, get_current_user
 from app.db.supabase import SupabaseManager
+from app.db.pagination import PageParams, page_params, paginate, finish_page
 import uuid
 
 router = APIRouter()
@@ -28,26 +29,26 @@ class SharedProject(BaseModel):
 @router.get("/stats")
 async def get_collaboration_stats(current_user: User = Depends(get_current_user)):
     """Get collaboration statistics for the current user."""
-    supabase = SupabaseManager.get_client()
+    supabase = SupabaseManager.get_async_client()
     try:
         # 1. Total Collaborators (distinct users who collaborate on projects owned by current user)
         # First, get all projects owned by the user
-        projects_response = supabase.table('projects').select("id").eq('owner_id', current_user.user_id).execute()
+        projects_response = await supabase.table('projects').select("id").eq('owner_id', current_user.user_id).execute()
         project_ids = [p['id'] for p in projects_response.data]
         
         total_collaborators = 0
         if project_ids:
-            collab_response = supabase.table('collaborators').select("user_id", count='exact').in_('project_id', project_ids).execute()
+            collab_response = await supabase.table('collaborators').select("user_id", count='exact').in_('project_id', project_ids).execute()
             # Count distinct user_ids
             distinct_users = set(c['user_id'] for c in collab_response.data)
             total_collaborators = len(distinct_users)
         
         # 2. Shared With You (count from list_shared_projects logic)
-        shared_response = supabase.table('collaborators').select("id", count='exact').eq('user_id', current_user.user_id).execute()
+        shared_response = await supabase.table('collaborators').select("id", count='exact').eq('user_id', current_user.user_id).execute()
         shared_with_you = shared_response.count if shared_response.count is not None else 0
         
         # 3. Pending Invitations (from notifications table)
-        notif_response = supabase.table('notifications')\
+        notif_response = await supabase.table('notifications')\
             .select("id", count='exact')\
             .eq('user_id', current_user.user_id)\
             .eq('type', 'share')\
@@ -66,10 +67,10 @@ async def get_collaboration_stats(current_user: User = Depends(get_current_user)
 @router.get("/shared", response_model=List[SharedProject])
 async def list_shared_projects(current_user: User = Depends(get_current_user)):
     """List projects shared with the current user."""
-    supabase = SupabaseManager.get_client()
+    supabase = SupabaseManager.get_async_client()
     try:
         # Get collaborations for the current user
-        collab_response = supabase.table('collaborators').select("*, projects(name, owner_id, profiles!projects_owner_id_fkey(full_name))").eq('user_id', current_user.user_id).execute()
+        collab_response = await supabase.table('collaborators').select("*, projects(name, owner_id, profiles!projects_owner_id_fkey(full_name))").eq('user_id', current_user.user_id).execute()
         
         shared_projects = []
         for collab in collab_response.data:
@@ -92,15 +93,15 @@ async def list_shared_projects(current_user: User = Depends(get_current_user)):
 @router.post("/invite", status_code=status.HTTP_201_CREATED)
 async def invite_collaborator(invite: CollaboratorCreate, current_user: User = Depends(get_current_user)):
     """Invite a collaborator to a project by email."""
-    supabase = SupabaseManager.get_client()
+    supabase = SupabaseManager.get_async_client()
     try:
         # 1. Verify current user is the owner of the project
-        project_response = supabase.table('projects').select("owner_id").eq('id', invite.project_id).single().execute()
+        project_response = await supabase.table('projects').select("owner_id").eq('id', invite.project_id).single().execute()
         if not project_response.data or project_response.data['owner_id'] != current_user.user_id:
             raise HTTPException(status_code=403, detail="Only project owners can invite collaborators")
         
         # 2. Find user by email
-        user_response = supabase.table('profiles').select("id").eq('email', invite.email).single().execute()
+        user_response = await supabase.table('profiles').select("id").eq('email', invite.email).single().execute()
         if not user_response.data:
             raise HTTPException(status_code=404, detail="User not found with this email")
         
@@ -112,7 +113,7 @@ async def invite_collaborator(invite: CollaboratorCreate, current_user: User = D
             "user_id": target_user_id,
             "role": invite.role
         }
-        supabase.table('collaborators').insert(collab_data).execute()
+        await supabase.table('collaborators').insert(collab_data).execute()
         
         # 4. Create notification for the target user
         notification_data = {
@@ -122,7 +123,7 @@ async def invite_collaborator(invite: CollaboratorCreate, current_user: User = D
             "type": "share",
             "link": f"/studio/{invite.project_id}/workflow"
         }
-        supabase.table('notifications').insert(notification_data).execute()
+        await supabase.table('notifications').insert(notification_data).execute()
         
         # 5. Log history
         history_data = {
@@ -133,7 +134,7 @@ async def invite_collaborator(invite: CollaboratorCreate, current_user: User = D
             "entity_id": invite.project_id,
             "metadata": {"collaborator_email": invite.email, "role": invite.role}
         }
-        supabase.table('project_history').insert(history_data).execute()
+        await supabase.table('project_history').insert(history_data).execute()
         
         return {"status": "success", "message": "Collaborator invited successfully"}
     except Exception as e:
@@ -144,22 +145,22 @@ async def invite_collaborator(invite: CollaboratorCreate, current_user: User = D
 @router.delete("/{collab_id}")
 async def remove_collaborator(collab_id: str, current_user: User = Depends(get_current_user)):
     """Remove a collaborator from a project."""
-    supabase = SupabaseManager.get_client()
+    supabase = SupabaseManager.get_async_client()
     try:
         # Get collaboration details to check ownership
-        collab_response = supabase.table('collaborators').select("project_id").eq('id', collab_id).single().execute()
+        collab_response = await supabase.table('collaborators').select("project_id").eq('id', collab_id).single().execute()
         if not collab_response.data:
             raise HTTPException(status_code=404, detail="Collaboration record not found")
         
         project_id = collab_response.data['project_id']
         
         # Verify current user is the owner of the project
-        project_response = supabase.table('projects').select("owner_id").eq('id', project_id).single().execute()
+        project_response = await supabase.table('projects').select("owner_id").eq('id', project_id).single().execute()
         if not project_response.data or project_response.data['owner_id'] != current_user.user_id:
             raise HTTPException(status_code=403, detail="Only project owners can remove collaborators")
         
         # Delete the record
-        supabase.table('collaborators').delete().eq('id', collab_id).execute()
+        await supabase.table('collaborators').delete().eq('id', collab_id).execute()
         
         return {"status": "success", "message": "Collaborator removed"}
     except Exception as e:
@@ -168,12 +169,13 @@ async def remove_collaborator(collab_id: str, current_user: User = Depends(get_c
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/{project_id}/history")
-async def get_project_history(project_id: str, current_user: User = Depends(get_current_user)):
-    """Get history of actions for a specific project."""
-    supabase = SupabaseManager.get_client()
+async def get_project_history(project_id: str, response: Response, page: PageParams = Depends(page_params), current_user: User = Depends(get_current_user)):
+    """Get history of actions for a specific project, newest first (cursor-paginated)."""
+    supabase = SupabaseManager.get_async_client()
     try:
         # RLS will handle permission check
-        response = supabase.table('project_history').select("*, profiles(full_name)").eq('project_id', project_id).order('created_at', desc=True).execute()
-        return response.data
+        query = supabase.table('project_history').select("*, profiles(full_name)").eq('project_id', project_id)
+        result = await paginate(query, page).execute()
+        return finish_page(result.data, page, response)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
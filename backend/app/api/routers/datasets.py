@@ -1,9 +1,46 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
+import asyncio
+import hashlib
+import json
+import os
+import re
+import tempfile
+import uuid
+import zipfile
+from datetime import datetime, timezone
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request, Response, status
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import Any, List, Optional
+from urllib.parse import urlsplit
+from postgrest import ReturnMethod
+from postgrest.exceptions import APIError
+from starlette.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPAuthorizationCredentials
+from app.core.config import settings
+from app.core.logging import logger
 from app.core.security import User, get_current_user, security
 from app.db.supabase import SupabaseManager
+from app.db.pagination import PageParams, decode_keyset, page_params, paginate, finish_page
+from app.services.bulk_import import ImportJob, UrlSource, ZipSource, bulk_importer
+from app.services.conversion import ParquetConverter, parquet_converter
+from app.services.dataset_query import QueryError, QueryTimeout, run_query
+from app.services.dataset_reader import (
+    ARROW_STREAM_MEDIA_TYPE, NDJSON_MEDIA_TYPE, PreviewError, arrow_stream, ndjson_stream, preview_dataset,
+)
+from app.services.dataset_values import (
+    VALUE_SELECT, ValueEncodingError, binary_stream, chunks, decode_row, encode_bytea, order_by_ids, value_row,
+)
+from app.services.dataset_versions import (
+    ChunkStore, VersionError, VersionWriter, chunking_params, negotiated_manifest, reconstruct,
+)
+from app.services.ingest import inspect_stored, inspection_result, inspector_for
+from app.services.profiling import DatasetProfiler, current_profile, dataset_profiler
+from app.services.search_index import publish_change
+from app.services.storage import StorageError, get_storage_backend
+from app.services.uploads import (
+    ALLOWED_EXTENSIONS, CONTENT_TYPES, StreamingUpload, UploadError, composite_checksum, dataset_row,
+    expected_part_size, file_extension, iter_multipart, object_key, part_count,
+)
 
 router = APIRouter()
 
@@ -16,38 +53,50 @@ class Dataset(BaseModel):
     created_at: str
     status: str = "ready"
     created_by: Optional[str] = None
+    # Inferred at upload: [{"name", "type", "nullable"}]
+    columns: Optional[List[dict]] = None
+
+def _format_size(size_bytes: int) -> str:
+    size = float(size_bytes)
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f}{unit}" if unit == "B" else f"{size:.1f}{unit}"
+        size /= 1024
 
 @router.get("/", response_model=List[Dataset])
 async def list_datasets(
+    response: Response,
+    page: PageParams = Depends(page_params),
     current_user: User = Depends(get_current_user),
     credentials: HTTPAuthorizationCredentials = Depends(security)
 ):
-    """List all datasets for current user. Requires authentication."""
+    """List datasets for current user, newest first (cursor-paginated). Requires authentication."""
     token = credentials.credentials
-    user_supabase = SupabaseManager.get_authenticated_client(token)
+    user_supabase = SupabaseManager.get_async_authenticated_client(token)
     
     if not user_supabase:
         raise HTTPException(status_code=500, detail="Supabase client not available")
     
     try:
-        response = user_supabase.table('datasets')\
+        query = user_supabase.table('datasets')\
             .select("*")\
             .eq('created_by', current_user.user_id)\
-            .order('created_at', desc=True)\
-            .execute()
+            .eq('storage_mode', 'file')
+        result = await paginate(query, page).execute()
         
         # Transform response to match Pydantic model
         datasets = []
-        for item in response.data:
+        for item in finish_page(result.data, page, response):
             datasets.append({
                 "id": item['id'],
                 "name": item['name'],
                 "type": item.get('file_type', 'unknown'),
                 "rows": item.get('row_count', 0),
-                "size": f"{item.get('size_bytes', 0) / 1024 / 1024:.1f}MB",
+                "size": _format_size(item.get('size_bytes') or 0),
                 "created_at": item['created_at'],
                 "status": "ready", # Default for now
-                "created_by": item['created_by']
+                "created_by": item['created_by'],
+                "columns": (item.get('schema') or {}).get('columns')
             })
         return datasets
     except Exception as e:
@@ -55,53 +104,1088 @@ async def list_datasets(
         logger.error(f"Error listing datasets: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+async def _insert_dataset(user_supabase, current_user: User, filename: str, key: str,
+                          size: int, checksum: str, project_id: Optional[str],
+                          schema: Optional[dict] = None) -> dict:
+    data = dataset_row(current_user.user_id, filename, key, size, checksum, project_id, schema)
+    logger.debug(f"Inserting dataset record for user {current_user.user_id} using JWT")
+    response = await user_supabase.table('datasets').insert(data).execute()
+    publish_change('dataset', response.data[0])
+    return response.data[0]
+
+def _validate_filename(filename: Optional[str]) -> str:
+    if not filename:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Filename is required")
+    if file_extension(filename) not in ALLOWED_EXTENSIONS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"File type not allowed. Allowed: {', '.join(sorted(ALLOWED_EXTENSIONS))}"
+        )
+    return filename
+
 @router.post("/upload")
 async def upload_dataset(
-    file: UploadFile = File(...),
+    request: Request,
+    background_tasks: BackgroundTasks,
+    project_id: Optional[str] = Query(None, description="Project to attach the dataset to (or a project_id form field before the file)"),
     current_user: User = Depends(get_current_user),
     credentials: HTTPAuthorizationCredentials = Depends(security)
 ):
-    """Upload a dataset. Requires authentication. Validates file size and type."""
-    if not file.filename:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Filename is required")
-    
-    # Validate file extension
-    allowed_extensions = {'.csv', '.parquet', '.json', '.npy', '.xlsx'}
-    file_ext = '.' + file.filename.split('.')[-1].lower() if '.' in file.filename else ''
-    
-    if file_ext not in allowed_extensions:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST, 
-            detail=f"File type not allowed. Allowed: {', '.join(allowed_extensions)}"
-        )
-    
-    # Create a new client with the user's actual JWT to ensure RLS context is passed to Supabase
+    """
+    Upload a dataset (multipart/form-data, field 'file'). Requires authentication.
+
+    The body is parsed as it arrives and piped straight into a multipart upload
+    in the storage bucket, so memory use is bounded by one part whatever the
+    file size. Size, checksum, row count and column schema are computed on the
+    way through (see app.services.ingest), so the file is never read twice.
+    For very large files prefer the resumable /uploads endpoints.
+    """
     token = credentials.credentials
-    user_supabase = SupabaseManager.get_authenticated_client(token)
-    
+    user_supabase = SupabaseManager.get_async_authenticated_client(token)
+
     if not user_supabase:
         raise HTTPException(status_code=500, detail="Supabase client not available")
-    
+
+    declared = request.headers.get('content-length')
+    if declared and declared.isdigit() and int(declared) > settings.DATASET_UPLOAD_MAX_BYTES:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="File too large")
+
+    backend = get_storage_backend()
+    upload: Optional[StreamingUpload] = None
+    inspector = None
+    filename = None
+    result = None
     try:
-        data = {
-            "name": file.filename,
-            "file_path": f"uploads/{current_user.user_id}/{file.filename}",
-            "file_type": file_ext.replace('.', ''),
-            "created_by": current_user.user_id,
-            "size_bytes": 0, # We'd get this from file.size if available or seek
-            "row_count": 0
-        }
-        
-        from app.core.logging import logger
-        logger.debug(f"Inserting dataset record for user {current_user.user_id} using JWT")
-        response = user_supabase.table('datasets').insert(data).execute()
-        
-        return {
-            "status": "uploaded", 
-            "id": response.data[0]['id'],
-            "filename": file.filename,
-            "owner_id": current_user.user_id
-        }
+        async for event in iter_multipart(request.headers.get('content-type', ''), request.stream()):
+            kind = event[0]
+            if kind == "field":
+                if event[1] == "project_id" and not project_id:
+                    project_id = event[2] or None
+            elif kind == "file":
+                if event[1] != "file" or upload is not None:
+                    raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Send exactly one 'file' field")
+                filename = _validate_filename(event[2])
+                inspector = inspector_for(filename)
+                upload = StreamingUpload(
+                    backend, object_key(current_user.user_id, filename),
+                    CONTENT_TYPES[file_extension(filename)], token,
+                    observers=[inspector] if inspector else None,
+                )
+                await upload.start()
+            elif kind == "data":
+                await upload.write(event[1])
+                if upload.size > settings.DATASET_UPLOAD_MAX_BYTES:
+                    raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="File too large")
+            elif kind == "end":
+                result = await upload.finish()
+        if result is None:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No file uploaded")
+    except UploadError as e:
+        if upload is not None:
+            await upload.abort()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except HTTPException:
+        if upload is not None and result is None:
+            await upload.abort()
+        raise
+    except Exception as e:
+        if upload is not None:
+            await upload.abort()
+        logger.error(f"Error uploading dataset: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    # An inspector that failed mid-stream was dropped from the observers
+    schema = inspection_result(inspector) if inspector in upload.observers else None
+    try:
+        dataset = await _insert_dataset(
+            user_supabase, current_user, filename, upload.key, result["size"], result["checksum"],
+            project_id, schema
+        )
     except Exception as e:
         logger.error(f"Error uploading dataset: {e}")
+        try:
+            await backend.delete(upload.key, token)
+        except Exception as cleanup_error:
+            logger.warning(f"Could not remove orphaned object {upload.key}: {cleanup_error}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    _schedule_conversion(background_tasks, dataset, token)
+    return {
+        "status": "uploaded",
+        "id": dataset['id'],
+        "filename": filename,
+        "owner_id": current_user.user_id,
+        "size_bytes": result["size"],
+        "checksum": result["checksum"],
+        "row_count": dataset.get('row_count'),
+        "schema": schema,
+    }
+
+# -----------------------------------------------------------------------------
+# Resumable uploads
+#
+# POST /uploads creates a session, the client PUTs fixed-size parts (retrying or
+# resuming any that failed, GET /uploads/{id} lists what arrived) and POST
+# /uploads/{id}/complete turns the object into a dataset. Sessions live in the
+# dataset_uploads table (database/scripts/dataset_uploads.sql), so any worker
+# can serve any part.
+# -----------------------------------------------------------------------------
+
+class UploadSessionCreate(BaseModel):
+    filename: str
+    size: int = Field(..., ge=0, description="Total file size in bytes")
+    project_id: Optional[str] = None
+
+async def _get_session(user_supabase, upload_id: str, current_user: User) -> dict:
+    response = await user_supabase.table('dataset_uploads')\
+        .select("*")\
+        .eq('id', upload_id)\
+        .eq('user_id', current_user.user_id)\
+        .execute()
+    if not response.data:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return response.data[0]
+
+async def _get_parts(user_supabase, upload_id: str) -> List[dict]:
+    response = await user_supabase.table('dataset_upload_parts')\
+        .select("part_number, size, etag, sha256")\
+        .eq('upload_id', upload_id)\
+        .order('part_number')\
+        .execute()
+    return response.data or []
+
+def _session_status(session: dict, parts: List[dict]) -> dict:
+    total = part_count(session['total_size'], session['part_size'])
+    received = [p['part_number'] for p in parts]
+    missing = sorted(set(range(1, total + 1)) - set(received))
+    return {
+        "id": session['id'],
+        "status": session['status'],
+        "filename": session['filename'],
+        "size": session['total_size'],
+        "part_size": session['part_size'],
+        "part_count": total,
+        "received_parts": received,
+        "next_part": missing[0] if missing else None,
+        "dataset_id": session.get('dataset_id'),
+    }
+
+def _authenticated_client(credentials: HTTPAuthorizationCredentials):
+    user_supabase = SupabaseManager.get_async_authenticated_client(credentials.credentials)
+    if not user_supabase:
+        raise HTTPException(status_code=500, detail="Supabase client not available")
+    return user_supabase
+
+def _schedule_conversion(background_tasks: BackgroundTasks, dataset: dict, token: str) -> None:
+    if settings.DATASET_PARQUET_CONVERSION and ParquetConverter.supports(dataset['name']):
+        background_tasks.add_task(parquet_converter.convert, dataset, token)
+
+async def _inspect_dataset(token: str, dataset: dict, size: int) -> None:
+    """
+    Infer schema and row count of a stored dataset file and write them back,
+    then start the Parquet conversion (which needs the inferred layout).
+    """
+    schema = await inspect_stored(get_storage_backend(), dataset['file_path'], dataset['name'], size, token)
+    if schema is not None:
+        try:
+            await SupabaseManager.get_async_authenticated_client(token).table('datasets')\
+                .update({"schema": schema, "row_count": schema.get('row_count') or 0})\
+                .eq('id', dataset['id'])\
+                .execute()
+        except Exception as e:
+            logger.warning(f"Could not store schema of dataset {dataset['id']}: {e}")
+    if settings.DATASET_PARQUET_CONVERSION and ParquetConverter.supports(dataset['name']):
+        await parquet_converter.convert({**dataset, "schema": schema}, token)
+
+@router.post("/uploads", status_code=status.HTTP_201_CREATED)
+async def create_upload_session(
+    body: UploadSessionCreate,
+    current_user: User = Depends(get_current_user),
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """Start a resumable upload. The response tells the client how to split the file."""
+    filename = _validate_filename(body.filename)
+    if body.size > settings.DATASET_UPLOAD_MAX_BYTES:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="File too large")
+    user_supabase = _authenticated_client(credentials)
+    backend = get_storage_backend()
+    key = object_key(current_user.user_id, filename)
+    try:
+        storage_upload_id = await backend.create_upload(
+            key, CONTENT_TYPES[file_extension(filename)], body.size, credentials.credentials
+        )
+        response = await user_supabase.table('dataset_uploads').insert({
+            "user_id": current_user.user_id,
+            "project_id": body.project_id,
+            "filename": filename,
+            "storage_key": key,
+            "storage_upload_id": storage_upload_id,
+            "total_size": body.size,
+            "part_size": backend.part_size,
+        }).execute()
+    except Exception as e:
+        logger.error(f"Error creating upload session: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    return _session_status(response.data[0], [])
+
+@router.get("/uploads/{upload_id}")
+async def get_upload_session(
+    upload_id: str,
+    current_user: User = Depends(get_current_user),
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """Progress of a resumable upload: which parts arrived and which one to send next."""
+    user_supabase = _authenticated_client(credentials)
+    session = await _get_session(user_supabase, upload_id, current_user)
+    return _session_status(session, await _get_parts(user_supabase, upload_id))
+
+@router.put("/uploads/{upload_id}/parts/{part_number}")
+async def upload_part(
+    upload_id: str,
+    part_number: int,
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """
+    Upload one part (raw request body). Every part is `part_size` bytes except
+    the last. Re-sending a part replaces it, so failed parts can simply be retried.
+    """
+    user_supabase = _authenticated_client(credentials)
+    session = await _get_session(user_supabase, upload_id, current_user)
+    if session['status'] != 'uploading':
+        raise HTTPException(status_code=409, detail=f"Upload is {session['status']}")
+
+    total, part_size = session['total_size'], session['part_size']
+    if not 1 <= part_number <= part_count(total, part_size):
+        raise HTTPException(status_code=400, detail="Part number out of range")
+
+    backend = get_storage_backend()
+    if backend.sequential:
+        # Resumable (TUS) uploads are append-only: parts must arrive in order
+        parts = await _get_parts(user_supabase, upload_id)
+        expected = len(parts) + 1
+        if part_number != expected:
+            raise HTTPException(status_code=409, detail=f"Expected part {expected}")
+
+    size = expected_part_size(part_number, total, part_size)
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > size:
+            break
+    if len(body) != size:
+        raise HTTPException(status_code=400, detail=f"Part {part_number} must be {size} bytes")
+
+    data = bytes(body)
+    try:
+        part = await backend.upload_part(
+            session['storage_key'], session['storage_upload_id'], part_number, data,
+            (part_number - 1) * part_size, credentials.credentials,
+        )
+        await user_supabase.table('dataset_upload_parts').upsert({
+            "upload_id": upload_id,
+            "part_number": part_number,
+            "size": size,
+            "etag": part.get('etag'),
+            "sha256": hashlib.sha256(data).hexdigest(),
+        }, on_conflict='upload_id,part_number').execute()
+    except Exception as e:
+        logger.error(f"Error uploading part {part_number} of {upload_id}: {e}")
+        raise HTTPException(status_code=502, detail=str(e))
+    return {"part_number": part_number, "size": size}
+
+@router.post("/uploads/{upload_id}/complete")
+async def complete_upload_session(
+    upload_id: str,
+    background_tasks: BackgroundTasks,
+    current_user: User = Depends(get_current_user),
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """
+    Assemble the uploaded parts and register the dataset. Parts of a session
+    arrive over many requests (possibly out of order), so the schema and row
+    count are inferred afterwards from the stored object, in the background.
+    """
+    user_supabase = _authenticated_client(credentials)
+    session = await _get_session(user_supabase, upload_id, current_user)
+    if session['status'] == 'completed':
+        return {"status": "uploaded", "id": session['dataset_id'], "filename": session['filename'],
+                "owner_id": current_user.user_id}
+    if session['status'] != 'uploading':
+        raise HTTPException(status_code=409, detail=f"Upload is {session['status']}")
+
+    parts = await _get_parts(user_supabase, upload_id)
+    progress = _session_status(session, parts)
+    if progress['next_part'] is not None:
+        raise HTTPException(status_code=409, detail=f"Missing part {progress['next_part']}")
+
+    backend = get_storage_backend()
+    checksum = composite_checksum([bytes.fromhex(p['sha256']) for p in parts])
+    try:
+        await backend.complete_upload(
+            session['storage_key'], session['storage_upload_id'], parts, credentials.credentials
+        )
+        dataset = await _insert_dataset(
+            user_supabase, current_user, session['filename'], session['storage_key'],
+            session['total_size'], checksum, session.get('project_id')
+        )
+        await user_supabase.table('dataset_uploads')\
+            .update({"status": "completed", "dataset_id": dataset['id'], "updated_at": datetime.now(timezone.utc).isoformat()})\
+            .eq('id', upload_id)\
+            .execute()
+    except Exception as e:
+        logger.error(f"Error completing upload {upload_id}: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+    background_tasks.add_task(_inspect_dataset, credentials.credentials, dataset, session['total_size'])
+    return {
+        "status": "uploaded",
+        "id": dataset['id'],
+        "filename": session['filename'],
+        "owner_id": current_user.user_id,
+        "size_bytes": session['total_size'],
+        "checksum": checksum,
+    }
+
+@router.delete("/uploads/{upload_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def abort_upload_session(
+    upload_id: str,
+    current_user: User = Depends(get_current_user),
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """Abandon a resumable upload and discard the parts stored so far."""
+    user_supabase = _authenticated_client(credentials)
+    session = await _get_session(user_supabase, upload_id, current_user)
+    if session['status'] != 'uploading':
+        raise HTTPException(status_code=409, detail=f"Upload is {session['status']}")
+    try:
+        await get_storage_backend().abort_upload(
+            session['storage_key'], session['storage_upload_id'], credentials.credentials
+        )
+    except Exception as e:
+        logger.warning(f"Could not abort storage upload for {upload_id}: {e}")
+    await user_supabase.table('dataset_uploads')\
+        .update({"status": "aborted", "updated_at": datetime.now(timezone.utc).isoformat()})\
+        .eq('id', upload_id)\
+        .execute()
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+@router.post("/{dataset_id}/parquet", status_code=status.HTTP_202_ACCEPTED)
+async def convert_dataset_to_parquet(
+    dataset_id: str,
+    background_tasks: BackgroundTasks,
+    current_user: User = Depends(get_current_user),
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """
+    (Re)build the Parquet copy of a CSV / JSON dataset in the background.
+    Progress is reported in the dataset's metadata.parquet.status.
+    """
+    user_supabase = _authenticated_client(credentials)
+    response = await user_supabase.table('datasets')\
+        .select("id, name, file_path, schema, checksum, metadata")\
+        .eq('id', dataset_id)\
+        .eq('created_by', current_user.user_id)\
+        .execute()
+    if not response.data:
+        raise HTTPException(status_code=404, detail="Dataset not found")
+    dataset = response.data[0]
+    if not dataset.get('file_path') or not ParquetConverter.supports(dataset['name']):
+        raise HTTPException(status_code=400, detail="Only CSV and JSON datasets can be converted")
+    if ((dataset.get('metadata') or {}).get('parquet') or {}).get('status') == 'converting':
+        raise HTTPException(status_code=409, detail="Conversion already in progress")
+    background_tasks.add_task(parquet_converter.convert, dataset, credentials.credentials)
+    return {"id": dataset_id, "status": "converting"}
+
+async def _get_dataset(user_supabase, dataset_id: str, current_user: User, columns: str) -> dict:
+    response = await user_supabase.table('datasets')\
+        .select(columns)\
+        .eq('id', dataset_id)\
+        .eq('created_by', current_user.user_id)\
+        .execute()
+    if not response.data:
+        raise HTTPException(status_code=404, detail="Dataset not found")
+    return response.data[0]
+
+_PROFILE_COLUMNS = "id, name, file_path, schema, checksum, size_bytes, metadata"
+
+@router.post("/{dataset_id}/profile", status_code=status.HTTP_202_ACCEPTED)
+async def profile_dataset(
+    dataset_id: str,
+    response: Response,
+    background_tasks: BackgroundTasks,
+    refresh: bool = Query(False, description="Recompute even if the stored profile is current"),
+    current_user: User = Depends(get_current_user),
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """
+    Compute per-column statistics (null counts, distinct estimates, min/max,
+    quantiles, histograms) in the background. A profile of the current file is
+    returned directly (200) instead of being recomputed.
+    """
+    dataset = await _get_dataset(_authenticated_client(credentials), dataset_id, current_user, _PROFILE_COLUMNS)
+    if not dataset.get('file_path') or not DatasetProfiler.supports(dataset):
+        raise HTTPException(status_code=400, detail="Only CSV, JSON, Parquet and NumPy datasets can be profiled")
+    profile = current_profile(dataset)
+    if profile and not refresh:
+        response.status_code = status.HTTP_200_OK
+        return profile
+    if ((dataset.get('schema') or {}).get('profile') or {}).get('status') == 'running':
+        raise HTTPException(status_code=409, detail="Profiling already in progress")
+    background_tasks.add_task(dataset_profiler.profile, dataset, credentials.credentials)
+    return {"id": dataset_id, "status": "running"}
+
+@router.get("/{dataset_id}/profile")
+async def get_dataset_profile(
+    dataset_id: str,
+    current_user: User = Depends(get_current_user),
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """The dataset's column profile, or its status while it is computed (`stale` once the file changed)."""
+    dataset = await _get_dataset(_authenticated_client(credentials), dataset_id, current_user, _PROFILE_COLUMNS)
+    profile = current_profile(dataset)
+    if profile:
+        return profile
+    stored = (dataset.get('schema') or {}).get('profile')
+    if not stored:
+        raise HTTPException(status_code=404, detail="Dataset has not been profiled")
+    if stored.get('status') == 'ready':
+        return {**stored, "stale": True}
+    return stored
+
+@router.get("/{dataset_id}/preview")
+async def preview_dataset_rows(
+    dataset_id: str,
+    request: Request,
+    columns: Optional[str] = Query(None, description="Comma-separated columns to return (default: all)"),
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=settings.DATASET_PREVIEW_MAX_ROWS),
+    filter: List[str] = Query([], description="Repeatable column.op.value predicate (eq, neq, gt, gte, lt, lte, in, is, like)"),
+    format: Optional[str] = Query(None, pattern="^(ndjson|arrow)$", description="Default: from Accept, else ndjson"),
+    current_user: User = Depends(get_current_user),
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """
+    Stream one page of a dataset's rows as NDJSON or an Arrow IPC stream.
+
+    Columns and filters are pushed down into the file reader: Parquet files
+    (or a dataset's Parquet copy) are read by row group with only the needed
+    columns fetched through ranged reads, so memory follows the page size,
+    not the dataset size.
+    """
+    user_supabase = _authenticated_client(credentials)
+    response = await user_supabase.table('datasets')\
+        .select("id, name, file_path, schema, checksum, metadata, row_count")\
+        .eq('id', dataset_id)\
+        .eq('created_by', current_user.user_id)\
+        .execute()
+    if not response.data:
+        raise HTTPException(status_code=404, detail="Dataset not found")
+    dataset = response.data[0]
+    if not dataset.get('file_path'):
+        raise HTTPException(status_code=400, detail="Dataset has no stored file")
+
+    selected = [c.strip() for c in columns.split(',') if c.strip()] if columns else None
+    try:
+        preview = await run_in_threadpool(
+            preview_dataset, get_storage_backend(), dataset, credentials.credentials,
+            selected, filter, offset, limit,
+        )
+    except PreviewError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except StorageError as e:
+        logger.error(f"Error reading dataset {dataset_id}: {e}")
+        raise HTTPException(status_code=502, detail=str(e))
+
+    if format is None:
+        format = "arrow" if ARROW_STREAM_MEDIA_TYPE in request.headers.get('accept', '') else "ndjson"
+    headers = {"X-Preview-Source": preview.source}
+    if dataset.get('row_count') is not None and not filter:
+        headers["X-Total-Rows"] = str(dataset['row_count'])
+    # Sync generators are consumed in the threadpool, one batch at a time
+    if format == "arrow":
+        return StreamingResponse(arrow_stream(preview), media_type=ARROW_STREAM_MEDIA_TYPE, headers=headers)
+    return StreamingResponse(ndjson_stream(preview), media_type=NDJSON_MEDIA_TYPE, headers=headers)
+
+class DatasetQuery(BaseModel):
+    project_id: str
+    sql: str = Field(..., min_length=1, max_length=100_000)
+    # Optional lower limits for this query (capped by the server's settings)
+    memory_limit_mb: Optional[int] = Field(None, ge=64)
+    timeout_seconds: Optional[float] = Field(None, gt=0)
+    threads: Optional[int] = Field(None, ge=1)
+
+@router.post("/query")
+async def query_datasets(
+    body: DatasetQuery,
+    request: Request,
+    format: Optional[str] = Query(None, pattern="^(ndjson|arrow)$", description="Default: from Accept, else arrow"),
+    current_user: User = Depends(get_current_user),
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """
+    Run a read-only SQL SELECT over a project's datasets with DuckDB and stream
+    the result as Arrow record batches (or NDJSON).
+
+    Each dataset is a view named after its file (`Sales 2024.csv` ->
+    `sales_2024`, `_2`, `_3`... for repeated names) reading the stored file, or
+    its Parquet copy, directly. Memory, threads and run time are limited per
+    query.
+    """
+    user_supabase = _authenticated_client(credentials)
+    # Project access is enforced by the datasets RLS policies
+    response = await user_supabase.table('datasets')\
+        .select("id, name, file_path, schema, checksum, metadata, created_at")\
+        .eq('project_id', body.project_id)\
+        .execute()
+    datasets = [d for d in response.data or [] if d.get('file_path')]
+    if not datasets:
+        raise HTTPException(status_code=404, detail="Project has no datasets")
+
+    # Datasets may have been uploaded by other collaborators, so storage is
+    # read with the service key when one is configured
+    token = settings.SUPABASE_SERVICE_ROLE_KEY or credentials.credentials
+    try:
+        result = await run_in_threadpool(
+            run_query, get_storage_backend(), datasets, token, body.sql,
+            min(body.memory_limit_mb or settings.DATASET_QUERY_MEMORY_LIMIT_MB, settings.DATASET_QUERY_MEMORY_LIMIT_MB),
+            min(body.timeout_seconds or settings.DATASET_QUERY_TIMEOUT_SECONDS, settings.DATASET_QUERY_TIMEOUT_SECONDS),
+            min(body.threads or settings.DATASET_QUERY_THREADS, settings.DATASET_QUERY_THREADS),
+        )
+    except QueryTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except QueryError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except StorageError as e:
+        logger.error(f"Error reading datasets of project {body.project_id}: {e}")
+        raise HTTPException(status_code=502, detail=str(e))
+
+    if format is None:
+        format = "ndjson" if NDJSON_MEDIA_TYPE in request.headers.get('accept', '') else "arrow"
+    headers = {"X-Query-Views": ",".join(result.views)}
+    if format == "ndjson":
+        return StreamingResponse(ndjson_stream(result), media_type=NDJSON_MEDIA_TYPE, headers=headers)
+    return StreamingResponse(arrow_stream(result), media_type=ARROW_STREAM_MEDIA_TYPE, headers=headers)
+
+# -----------------------------------------------------------------------------
+# Value-mode datasets
+#
+# Small values (storage_mode = 'value') are stored in the datasets row itself,
+# in the value_* column of their value_type. They are created and read in bulk;
+# binary values travel as raw bodies, never as base64 / hex inside JSON.
+# Access follows the project (datasets RLS policies).
+# -----------------------------------------------------------------------------
+
+class ValueItem(BaseModel):
+    name: str = Field(..., min_length=1)
+    description: Optional[str] = None
+    value_type: str = Field(..., pattern="^(text|numeric|boolean|date|json|binary)$")
+    # binary: base64 (or create it empty and PUT /values/{id}/binary)
+    value: Any = None
+
+class ValueBatchCreate(BaseModel):
+    project_id: str
+    items: List[ValueItem] = Field(..., min_length=1, max_length=settings.DATASET_VALUES_MAX_BATCH)
+
+class ValueBatchRead(BaseModel):
+    ids: List[str] = Field(..., min_length=1, max_length=settings.DATASET_VALUES_MAX_BATCH)
+
+# ids per PostgREST request of a batch read (they travel in the query string)
+_VALUE_IDS_PER_REQUEST = 200
+
+def value_page_params(
+    limit: int = Query(settings.LIST_PAGE_DEFAULT_LIMIT, ge=1, le=settings.DATASET_VALUES_MAX_BATCH,
+                       description="Maximum number of values to return"),
+    cursor: Optional[str] = Query(None, description="Value of the X-Next-Cursor header of the previous page"),
+) -> PageParams:
+    if cursor is not None:
+        decode_keyset(cursor)
+    return PageParams(limit=limit, cursor=cursor)
+
+def _value_payload(request: Request, row: dict) -> dict:
+    value = decode_row(row)
+    if value['value_type'] == 'binary':
+        value['binary_url'] = str(request.url_for('get_value_binary', value_id=value['id']))
+    return value
+
+async def _get_value(user_supabase, value_id: str) -> dict:
+    response = await user_supabase.table('datasets')\
+        .select(VALUE_SELECT)\
+        .eq('id', value_id)\
+        .eq('storage_mode', 'value')\
+        .execute()
+    if not response.data:
+        raise HTTPException(status_code=404, detail="Value not found")
+    return response.data[0]
+
+@router.post("/values", status_code=status.HTTP_201_CREATED)
+async def create_values(
+    body: ValueBatchCreate,
+    current_user: User = Depends(get_current_user),
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """
+    Create many value-mode datasets in one request. Every item is validated
+    first; rows are then sent in multi-row INSERTs of DATASET_VALUES_INSERT_CHUNK
+    without reading them back. Returns the new ids in item order. If an INSERT
+    fails, the rows already written by this request are removed again.
+    """
+    try:
+        rows = [value_row(body.project_id, current_user.user_id, item.model_dump()) for item in body.items]
+    except ValueEncodingError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    sizes = [row['size_bytes'] for row in rows if row['value_type'] == 'binary']
+    if sizes and max(sizes) > settings.DATASET_VALUE_BINARY_MAX_BYTES:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="Binary value too large")
+
+    user_supabase = _authenticated_client(credentials)
+    written: List[str] = []
+    try:
+        for chunk in chunks(rows, settings.DATASET_VALUES_INSERT_CHUNK):
+            await user_supabase.table('datasets')\
+                .insert(list(chunk), returning=ReturnMethod.minimal)\
+                .execute()
+            written.extend(row['id'] for row in chunk)
+    except Exception as e:
+        logger.error(f"Error creating values in project {body.project_id}: {e}")
+        for ids in chunks(written, _VALUE_IDS_PER_REQUEST):
+            try:
+                await user_supabase.table('datasets').delete(returning=ReturnMethod.minimal).in_('id', list(ids)).execute()
+            except Exception as cleanup_error:
+                logger.warning(f"Could not remove partially created values: {cleanup_error}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return {"project_id": body.project_id, "created": len(rows), "ids": [row['id'] for row in rows]}
+
+@router.get("/values")
+async def list_values(
+    request: Request,
+    response: Response,
+    project_id: str = Query(...),
+    value_type: Optional[str] = Query(None, pattern="^(text|numeric|boolean|date|json|binary)$"),
+    name: Optional[str] = Query(None, description="Exact name"),
+    contains: Optional[str] = Query(None, description='JSON object or array the json value must contain, e.g. {"tag":"a"}'),
+    page: PageParams = Depends(value_page_params),
+    current_user: User = Depends(get_current_user),
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """
+    Read a project's values, newest first (cursor-paginated, up to
+    DATASET_VALUES_MAX_BATCH per page). `contains` is a JSONB containment
+    (`value_json @> contains`) served by the GIN index on value_json.
+    Binary values are listed with a `binary_url` instead of their bytes.
+    """
+    query = _authenticated_client(credentials).table('datasets')\
+        .select(VALUE_SELECT)\
+        .eq('project_id', project_id)\
+        .eq('storage_mode', 'value')
+    if contains is not None:
+        try:
+            document = json.loads(contains)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="contains must be JSON")
+        if not isinstance(document, (dict, list)):
+            raise HTTPException(status_code=400, detail="contains must be a JSON object or array")
+        if value_type not in (None, 'json'):
+            raise HTTPException(status_code=400, detail="contains only applies to json values")
+        value_type = 'json'
+        query = query.contains('value_json', json.dumps(document, separators=(',', ':')))
+    if value_type:
+        query = query.eq('value_type', value_type)
+    if name is not None:
+        query = query.eq('name', name)
+    result = await paginate(query, page).execute()
+    return [_value_payload(request, row) for row in finish_page(result.data, page, response)]
+
+@router.post("/values/read")
+async def read_values(
+    body: ValueBatchRead,
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """Read up to DATASET_VALUES_MAX_BATCH values by id, in the requested order (unknown ids are skipped)."""
+    user_supabase = _authenticated_client(credentials)
+    ids = list(dict.fromkeys(body.ids))
+    results = await asyncio.gather(*(
+        user_supabase.table('datasets')
+        .select(VALUE_SELECT)
+        .in_('id', list(part))
+        .eq('storage_mode', 'value')
+        .execute()
+        for part in chunks(ids, _VALUE_IDS_PER_REQUEST)
+    ))
+    rows = [row for result in results for row in result.data or []]
+    return [_value_payload(request, row) for row in order_by_ids(rows, ids)]
+
+@router.get("/values/{value_id}/binary")
+async def get_value_binary(
+    value_id: str,
+    current_user: User = Depends(get_current_user),
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """The bytes of a binary value, streamed as the response body."""
+    token = credentials.credentials
+    value = await _get_value(_authenticated_client(credentials), value_id)
+    if value['value_type'] != 'binary':
+        raise HTTPException(status_code=400, detail="Not a binary value")
+    try:
+        body = await binary_stream(value_id, token)
+    except StorageError as e:
+        logger.error(f"Error reading value {value_id}: {e}")
+        raise HTTPException(status_code=502, detail=str(e))
+    return StreamingResponse(body, media_type="application/octet-stream")
+
+@router.put("/values/{value_id}/binary", status_code=status.HTTP_204_NO_CONTENT)
+async def put_value_binary(
+    value_id: str,
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """Replace a binary value with the raw request body (application/octet-stream)."""
+    user_supabase = _authenticated_client(credentials)
+    value = await _get_value(user_supabase, value_id)
+    if value['value_type'] != 'binary':
+        raise HTTPException(status_code=400, detail="Not a binary value")
+    raw = bytearray()
+    async for chunk in request.stream():
+        raw.extend(chunk)
+        if len(raw) > settings.DATASET_VALUE_BINARY_MAX_BYTES:
+            raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="Binary value too large")
+    await user_supabase.table('datasets')\
+        .update({"value_binary": encode_bytea(bytes(raw)), "size_bytes": len(raw)}, returning=ReturnMethod.minimal)\
+        .eq('id', value_id)\
+        .execute()
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+# -----------------------------------------------------------------------------
+# Dataset versions
+#
+# A version is a manifest of content-defined chunks (database/scripts/
+# dataset_versions.sql); chunks are stored once per owner, so a new version of
+# a slightly changed file only adds the chunks that changed. Either stream the
+# whole file to POST /{id}/versions (chunked here), or cut the chunks on the
+# client with the parameters from /versions/negotiate, PUT the missing ones and
+# POST /versions/commit. Any version streams back from /versions/{n}/content.
+# -----------------------------------------------------------------------------
+
+_VERSION_COLUMNS = "id, dataset_id, version, chunk_count, size_bytes, checksum, new_chunks, new_bytes, created_by, created_at"
+
+_SHA256_PATTERN = "^[0-9a-f]{64}$"
+
+class VersionManifest(BaseModel):
+    # sha256 of every chunk, in file order
+    chunks: List[str] = Field(..., max_length=1_000_000)
+
+def _check_digests(digests: List[str]) -> None:
+    bad = next((d for d in digests if not re.fullmatch(_SHA256_PATTERN, d)), None)
+    if bad is not None:
+        raise HTTPException(status_code=400, detail=f"Not a lowercase hex sha256: {bad[:80]}")
+
+async def _previous_version(user_supabase, dataset_id: str) -> Optional[dict]:
+    response = await user_supabase.table('dataset_versions')\
+        .select("version, chunks, created_by")\
+        .eq('dataset_id', dataset_id)\
+        .order('version', desc=True)\
+        .limit(1)\
+        .execute()
+    return response.data[0] if response.data else None
+
+def _previous_digests(previous: Optional[dict], current_user: User) -> set:
+    # Chunks of another owner's store cannot be referenced
+    if not previous or previous.get('created_by') != current_user.user_id:
+        return set()
+    return {digest for digest, _ in previous['chunks']}
+
+async def _insert_version(user_supabase, dataset_id: str, previous: Optional[dict],
+                          manifest: dict, current_user: User) -> dict:
+    row = {
+        "id": str(uuid.uuid4()),
+        "dataset_id": dataset_id,
+        "version": (previous['version'] if previous else 0) + 1,
+        "created_by": current_user.user_id,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        **manifest,
+    }
+    try:
+        # The manifest can be large: not read back
+        await user_supabase.table('dataset_versions')\
+            .insert(row, returning=ReturnMethod.minimal)\
+            .execute()
+    except APIError as e:
+        if e.code == '23505':
+            raise HTTPException(status_code=409, detail="Another version was created meanwhile, retry")
+        raise
+    del row['chunks']
+    return row
+
+@router.get("/{dataset_id}/versions")
+async def list_dataset_versions(
+    dataset_id: str,
+    current_user: User = Depends(get_current_user),
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """Versions of a dataset, newest first (without their manifests)."""
+    user_supabase = _authenticated_client(credentials)
+    await _get_dataset(user_supabase, dataset_id, current_user, "id")
+    response = await user_supabase.table('dataset_versions')\
+        .select(_VERSION_COLUMNS)\
+        .eq('dataset_id', dataset_id)\
+        .order('version', desc=True)\
+        .execute()
+    return response.data or []
+
+@router.post("/{dataset_id}/versions", status_code=status.HTTP_201_CREATED)
+async def create_dataset_version(
+    dataset_id: str,
+    request: Request,
+    from_file: bool = Query(False, description="Version the dataset's stored file instead of the request body"),
+    current_user: User = Depends(get_current_user),
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """
+    Add a version from the raw request body (or, with `from_file`, from the
+    dataset's current file). The bytes are chunked as they stream in and only
+    chunks not stored yet are uploaded; `new_bytes` is what changed since the
+    previous version.
+    """
+    token = credentials.credentials
+    user_supabase = _authenticated_client(credentials)
+    dataset = await _get_dataset(user_supabase, dataset_id, current_user, "id, file_path")
+    backend = get_storage_backend()
+    if from_file and not dataset.get('file_path'):
+        raise HTTPException(status_code=400, detail="Dataset has no stored file")
+
+    previous = await _previous_version(user_supabase, dataset_id)
+    writer = VersionWriter(
+        ChunkStore(backend, user_supabase, current_user.user_id, token),
+        _previous_digests(previous, current_user),
+    )
+    source = backend.download(dataset['file_path'], token) if from_file else request.stream()
+    size = 0
+    try:
+        async for data in source:
+            size += len(data)
+            if size > settings.DATASET_UPLOAD_MAX_BYTES:
+                raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="File too large")
+            await writer.write(data)
+        manifest = await writer.finish()
+    except StorageError as e:
+        logger.error(f"Error storing chunks of dataset {dataset_id}: {e}")
+        raise HTTPException(status_code=502, detail=str(e))
+    if not manifest['chunks']:
+        raise HTTPException(status_code=400, detail="Empty file")
+
+    version = await _insert_version(user_supabase, dataset_id, previous, manifest, current_user)
+    logger.info(f"Dataset {dataset_id} v{version['version']}: {manifest['size_bytes']} bytes, "
+                f"{writer.uploaded_bytes} uploaded")
+    return {**version, "uploaded_bytes": writer.uploaded_bytes}
+
+@router.post("/{dataset_id}/versions/negotiate")
+async def negotiate_dataset_version(
+    dataset_id: str,
+    body: VersionManifest,
+    current_user: User = Depends(get_current_user),
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """
+    Which chunks of a client-chunked file still have to be uploaded. Send an
+    empty list first to get the chunking parameters.
+    """
+    _check_digests(body.chunks)
+    user_supabase = _authenticated_client(credentials)
+    await _get_dataset(user_supabase, dataset_id, current_user, "id")
+    store = ChunkStore(get_storage_backend(), user_supabase, current_user.user_id, credentials.credentials)
+    stored = await store.existing(body.chunks) if body.chunks else {}
+    return {
+        "chunking": chunking_params(),
+        "missing": [d for d in dict.fromkeys(body.chunks) if d not in stored],
+    }
+
+@router.put("/{dataset_id}/versions/chunks/{digest}")
+async def upload_dataset_chunk(
+    dataset_id: str,
+    digest: str,
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """Store one chunk (raw body). It must hash to `digest` and be at most the maximum chunk size."""
+    _check_digests([digest])
+    user_supabase = _authenticated_client(credentials)
+    await _get_dataset(user_supabase, dataset_id, current_user, "id")
+    data = bytearray()
+    async for part in request.stream():
+        data.extend(part)
+        if len(data) > settings.DATASET_CHUNK_MAX_BYTES:
+            raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="Chunk too large")
+    if not data or hashlib.sha256(data).hexdigest() != digest:
+        raise HTTPException(status_code=400, detail="Chunk does not match its digest")
+    store = ChunkStore(get_storage_backend(), user_supabase, current_user.user_id, credentials.credentials)
+    if digest in await store.existing([digest]):
+        return {"sha256": digest, "size": len(data), "stored": False}
+    try:
+        await store.store([(digest, bytes(data))])
+    except StorageError as e:
+        raise HTTPException(status_code=502, detail=str(e))
+    return {"sha256": digest, "size": len(data), "stored": True}
+
+@router.post("/{dataset_id}/versions/commit", status_code=status.HTTP_201_CREATED)
+async def commit_dataset_version(
+    dataset_id: str,
+    body: VersionManifest,
+    current_user: User = Depends(get_current_user),
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """Add a version from a client-side manifest whose chunks are all uploaded."""
+    if not body.chunks:
+        raise HTTPException(status_code=400, detail="Empty manifest")
+    _check_digests(body.chunks)
+    user_supabase = _authenticated_client(credentials)
+    await _get_dataset(user_supabase, dataset_id, current_user, "id")
+    previous = await _previous_version(user_supabase, dataset_id)
+    store = ChunkStore(get_storage_backend(), user_supabase, current_user.user_id, credentials.credentials)
+    try:
+        manifest = await negotiated_manifest(store, body.chunks, _previous_digests(previous, current_user))
+    except VersionError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return await _insert_version(user_supabase, dataset_id, previous, manifest, current_user)
+
+@router.get("/{dataset_id}/versions/{version}/content")
+async def get_dataset_version_content(
+    dataset_id: str,
+    version: int,
+    current_user: User = Depends(get_current_user),
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """Stream the file of one version, reassembled from its chunks."""
+    user_supabase = _authenticated_client(credentials)
+    dataset = await _get_dataset(user_supabase, dataset_id, current_user, "id, name")
+    response = await user_supabase.table('dataset_versions')\
+        .select("chunks, size_bytes, checksum, created_by")\
+        .eq('dataset_id', dataset_id)\
+        .eq('version', version)\
+        .execute()
+    if not response.data:
+        raise HTTPException(status_code=404, detail="Version not found")
+    row = response.data[0]
+    body = reconstruct(get_storage_backend(), row['created_by'], row['chunks'], credentials.credentials)
+    headers = {"Content-Length": str(row['size_bytes']), "X-Checksum": row['checksum']}
+    media_type = CONTENT_TYPES.get(file_extension(dataset['name']), "application/octet-stream")
+    return StreamingResponse(body, media_type=media_type, headers=headers)
+
+# -----------------------------------------------------------------------------
+# Bulk imports
+#
+# Many files in one request: a manifest of URLs or a zip archive. Files are
+# imported in the background by a bounded worker pool (app.services.
+# bulk_import); GET /imports/{id} reports per-file progress.
+# -----------------------------------------------------------------------------
+
+class ImportFile(BaseModel):
+    url: str
+    # Dataset name (default: last segment of the URL path)
+    name: Optional[str] = None
+
+class BulkImportRequest(BaseModel):
+    project_id: str
+    files: List[ImportFile] = Field(..., min_length=1, max_length=settings.DATASET_IMPORT_MAX_FILES)
+
+async def _check_project_write(user_supabase, project_id: str, current_user: User) -> None:
+    """Imports write with the service key, so the editor check of the RLS policies is repeated here."""
+    project = await user_supabase.table('projects')\
+        .select("owner_id")\
+        .eq('id', project_id)\
+        .execute()
+    if not project.data:
+        raise HTTPException(status_code=404, detail="Project not found")
+    if project.data[0]['owner_id'] == current_user.user_id:
+        return
+    role = await user_supabase.table('collaborators')\
+        .select("role")\
+        .eq('project_id', project_id)\
+        .eq('user_id', current_user.user_id)\
+        .in_('role', ['editor', 'admin'])\
+        .execute()
+    if not role.data:
+        raise HTTPException(status_code=403, detail="Editor access to the project is required")
+
+@router.post("/imports", status_code=status.HTTP_202_ACCEPTED)
+async def import_datasets(
+    body: BulkImportRequest,
+    current_user: User = Depends(get_current_user),
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """
+    Import many files from http(s) URLs into a project. Files stream into
+    storage DATASET_IMPORT_CONCURRENCY at a time and their dataset rows are
+    inserted in batches. Returns the import id to poll.
+    """
+    await _check_project_write(_authenticated_client(credentials), body.project_id, current_user)
+    bad = next((f.url for f in body.files if urlsplit(f.url).scheme not in ("http", "https")), None)
+    if bad is not None:
+        raise HTTPException(status_code=400, detail=f"Not an http(s) URL: {bad[:200]}")
+    source = UrlSource([f.model_dump() for f in body.files])
+    job = ImportJob(current_user.user_id, body.project_id, source.entries)
+    bulk_importer.start(job, source, credentials.credentials)
+    return job.summary(include_files=False)
+
+@router.post("/imports/archive", status_code=status.HTTP_202_ACCEPTED)
+async def import_dataset_archive(
+    request: Request,
+    project_id: str = Query(...),
+    current_user: User = Depends(get_current_user),
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """Import every dataset file of a zip archive (raw request body) into a project."""
+    await _check_project_write(_authenticated_client(credentials), project_id, current_user)
+    fd, path = tempfile.mkstemp(suffix=".zip")
+    try:
+        size = 0
+        with os.fdopen(fd, 'wb') as f:
+            async for data in request.stream():
+                size += len(data)
+                if size > settings.DATASET_UPLOAD_MAX_BYTES:
+                    raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="Archive too large")
+                await run_in_threadpool(f.write, data)
+        try:
+            source = await run_in_threadpool(ZipSource, path)
+        except zipfile.BadZipFile:
+            raise HTTPException(status_code=400, detail="Not a zip archive")
+        if not source.entries:
+            raise HTTPException(status_code=400, detail="Archive has no files")
+        if len(source.entries) > settings.DATASET_IMPORT_MAX_FILES:
+            raise HTTPException(status_code=400, detail=f"At most {settings.DATASET_IMPORT_MAX_FILES} files per import")
+    except BaseException:
+        os.unlink(path)
+        raise
+    # The source deletes the spooled archive once the import is over
+    job = ImportJob(current_user.user_id, project_id, source.entries)
+    bulk_importer.start(job, source, credentials.credentials)
+    return job.summary(include_files=False)
+
+@router.get("/imports/{import_id}")
+async def get_import(
+    import_id: str,
+    status_filter: Optional[str] = Query(None, alias="status", pattern="^(pending|importing|stored|done|failed|skipped)$",
+                                         description="Only list files in this state"),
+    current_user: User = Depends(get_current_user),
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """Progress of an import: counts per state, bytes so far and per-file status."""
+    job = bulk_importer.get(import_id)
+    if job is not None and job.user_id == current_user.user_id:
+        return job.summary(status=status_filter)
+    # Running on another worker, or finished a while ago
+    response = await _authenticated_client(credentials).table('dataset_imports')\
+        .select("*")\
+        .eq('id', import_id)\
+        .eq('user_id', current_user.user_id)\
+        .execute()
+    if not response.data:
+        raise HTTPException(status_code=404, detail="Import not found")
+    record = response.data[0]
+    if record.get('files') is not None and status_filter:
+        record['files'] = [f for f in record['files'] if f['status'] == status_filter]
+    return record
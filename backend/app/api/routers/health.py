@@ -6,6 +6,13 @@ import httpx
 import time
 from app.db.supabase import SupabaseManager
 from app.core.config import settings
+from app.core.security import require_role
+from app.core.token_cache import token_cache
+from app.core.password_pool import password_pool
+from app.services.search_index import search_index
+from app.services.jupyter_manager import kernel_service
+from app.services.kernel_telemetry import kernel_telemetry
+from app.tools.notebook.workers import cell_workers
 
 router = APIRouter()
 
@@ -74,11 +81,11 @@ async def check_supabase_health():
 
     # Check Database Connection via Supabase Client
     try:
-        supabase = SupabaseManager.get_client()
+        supabase = SupabaseManager.get_async_client()
         if supabase:
             # Try a simple query
             # Note: This might fail if RLS is on and no auth header, but 401/403 still means DB is alive
-            db_resp = supabase.table('projects').select("id").limit(1).execute()
+            db_resp = await supabase.table('projects').select("id").limit(1).execute()
             services_status["database"] = {"status": "healthy"}
         else:
             services_status["database"] = {"status": "uninitialized"}
@@ -97,3 +104,33 @@ async def check_supabase_health():
         services=services_status,
         environment_audit=audit
     )
+
+@router.get("/health/auth-cache")
+async def auth_cache_stats():
+    """Occupancy and hit rate of the verified-token cache used by get_current_user."""
+    return token_cache.stats()
+
+@router.get("/health/password-pool")
+async def password_pool_stats():
+    """Load on the bcrypt worker pool (outstanding jobs and 503 rejections)."""
+    return password_pool.stats()
+
+@router.get("/health/search-index")
+async def search_index_stats():
+    """Size and freshness of the in-process search index (SEARCH_BACKEND=memory)."""
+    return search_index.stats()
+
+@router.get("/health/kernel-pool", dependencies=[Depends(require_role("admin"))])
+async def kernel_pool_stats():
+    """Occupancy of the notebook kernel pool (warm, assigned and busy kernels, evictions). Admins only."""
+    return kernel_service.stats()
+
+@router.get("/health/kernel-telemetry", dependencies=[Depends(require_role("admin"))])
+async def kernel_telemetry_snapshot():
+    """Latest resource sample of every running kernel, largest RSS first. Admins only: it spans all projects."""
+    return kernel_telemetry.snapshot()
+
+@router.get("/health/notebook-workers", dependencies=[Depends(require_role("admin"))])
+async def notebook_worker_stats():
+    """Load on the notebook tool's run_cell worker processes (killed and recycled workers included). Admins only."""
+    return cell_workers.stats()
@@ -24,13 +24,13 @@ async def list_tasks(
 ):
     """List all labeling tasks for current user. Requires authentication."""
     token = credentials.credentials
-    user_supabase = SupabaseManager.get_authenticated_client(token)
+    user_supabase = SupabaseManager.get_async_authenticated_client(token)
     
     if not user_supabase:
         raise HTTPException(status_code=500, detail="Supabase client not available")
     
     try:
-        response = user_supabase.table('labeling_projects')\
+        response = await user_supabase.table('labeling_projects')\
             .select("*")\
             .execute()
         
@@ -69,7 +69,7 @@ async def create_task(
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid task type. Must be: image, text, or audio")
     
     token = credentials.credentials
-    user_supabase = SupabaseManager.get_authenticated_client(token)
+    user_supabase = SupabaseManager.get_async_authenticated_client(token)
     
     if not user_supabase:
         raise HTTPException(status_code=500, detail="Supabase client not available")
@@ -85,7 +85,7 @@ async def create_task(
     }
     
     try:
-        response = user_supabase.table('labeling_projects').insert(new_project).execute()
+        response = await user_supabase.table('labeling_projects').insert(new_project).execute()
         if not response.data:
             raise HTTPException(status_code=500, detail="Failed to create labeling project")
             
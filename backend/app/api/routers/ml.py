@@ -1,10 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import asyncio
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Response, status
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import Dict, List, Optional
+from starlette.concurrency import run_in_threadpool
 from fastapi.security import HTTPAuthorizationCredentials
+from app.core.config import settings
 from app.core.security import User, get_current_user, security
 from app.db.supabase import SupabaseManager
+from app.services.dataset_cache import dataset_cache
+from app.services.storage import get_storage_backend
+from app.db.pagination import PageParams, page_params, paginate, finish_page
 from app.services.model_key_service import model_key_service, APIKeyCreate, APIKeyResponse
+from app.services.search_index import publish_change
 
 router = APIRouter()
 
@@ -13,6 +20,7 @@ class ModelTrainConfig(BaseModel):
     algorithm: str = Field(..., description="ML algorithm to use")
     hyperparameters: Optional[dict] = Field(default={})
     project_id: str
+    dataset_id: Optional[str] = Field(None, description="Training data (staged in the local dataset cache)")
 
 class Model(BaseModel):
     id: str
@@ -24,9 +32,37 @@ class Model(BaseModel):
     owner_id: Optional[str] = None
     created_at: str
 
+# Dataset cache pins of the staged training data, by training job (model) id
+_training_pins: Dict[str, str] = {}
+
+async def _stage_training_data(job_id: str, dataset: dict, token: str) -> None:
+    """
+    Fill the node-local dataset cache so the training job maps the data instead
+    of downloading it, and pin the entry until `release_training_data(job_id)`.
+    Nothing reports the end of a job yet, so the pin is also released after
+    TRAINING_DATA_PIN_SECONDS.
+    """
+    from app.core.logging import logger
+    try:
+        entry, pin_id = await run_in_threadpool(dataset_cache.get_pinned, get_storage_backend(), dataset, token)
+    except Exception as e:
+        logger.error(f"Error staging training data {dataset['id']}: {e}")
+        return
+    release_training_data(job_id)
+    _training_pins[job_id] = pin_id
+    asyncio.get_running_loop().call_later(settings.TRAINING_DATA_PIN_SECONDS, release_training_data, job_id)
+    logger.debug(f"Training data {dataset['id']} staged at {entry.path}")
+
+def release_training_data(job_id: str) -> None:
+    """Let the dataset cache evict a training job's data again."""
+    pin_id = _training_pins.pop(job_id, None)
+    if pin_id is not None:
+        dataset_cache.unpin(pin_id)
+
 @router.post("/train")
 async def train_model(
     config: ModelTrainConfig, 
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user),
     credentials: HTTPAuthorizationCredentials = Depends(security)
 ):
@@ -35,7 +71,7 @@ async def train_model(
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Model name is required")
     
     token = credentials.credentials
-    user_supabase = SupabaseManager.get_authenticated_client(token)
+    user_supabase = SupabaseManager.get_async_authenticated_client(token)
     
     if not user_supabase:
         raise HTTPException(status_code=500, detail="Supabase client not available")
@@ -43,6 +79,16 @@ async def train_model(
     try:
         from app.core.logging import logger
         logger.debug(f"Starting model training for user {current_user.user_id} using JWT context")
+        dataset = None
+        if config.dataset_id:
+            ds_response = await user_supabase.table('datasets')\
+                .select("id, name, file_path, schema, checksum, size_bytes, metadata")\
+                .eq('id', config.dataset_id)\
+                .eq('project_id', config.project_id)\
+                .execute()
+            if not ds_response.data or not ds_response.data[0].get('file_path'):
+                raise HTTPException(status_code=404, detail="Dataset not found in project")
+            dataset = ds_response.data[0]
         # Create a new model entry in 'staging' status
         data = {
             "name": config.model_name,
@@ -53,25 +99,35 @@ async def train_model(
             "created_by": current_user.user_id,
             "metrics": {"accuracy": 0.0} # Placeholder
         }
-        response = user_supabase.table('models').insert(data).execute()
+        response = await user_supabase.table('models').insert(data).execute()
+        publish_change('model', response.data[0])
+        if dataset:
+            background_tasks.add_task(
+                _stage_training_data, response.data[0]['id'], dataset, settings.SUPABASE_SERVICE_ROLE_KEY or token
+            )
         
         return {
             "job_id": response.data[0]['id'], 
             "status": "started",
-            "owner_id": current_user.user_id
+            "owner_id": current_user.user_id,
+            "dataset_id": config.dataset_id
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error starting model training: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/models", response_model=List[Model])
 async def list_models(
+    response: Response,
+    page: PageParams = Depends(page_params),
     current_user: User = Depends(get_current_user),
     credentials: HTTPAuthorizationCredentials = Depends(security)
 ):
-    """List all models for current user. Requires authentication."""
+    """List models for current user, newest first (cursor-paginated). Requires authentication."""
     token = credentials.credentials
-    user_supabase = SupabaseManager.get_authenticated_client(token)
+    user_supabase = SupabaseManager.get_async_authenticated_client(token)
     
     if not user_supabase:
         raise HTTPException(status_code=500, detail="Supabase client not available")
@@ -79,14 +135,13 @@ async def list_models(
     try:
         from app.core.logging import logger
         logger.debug(f"Listing models for user {current_user.user_id} using JWT context")
-        response = user_supabase.table('models')\
+        query = user_supabase.table('models')\
             .select("*")\
-            .eq('created_by', current_user.user_id)\
-            .order('created_at', desc=True)\
-            .execute()
+            .eq('created_by', current_user.user_id)
+        result = await paginate(query, page).execute()
         
         models = []
-        for item in response.data:
+        for item in finish_page(result.data, page, response):
             models.append({
                 "id": item['id'],
                 "name": item['name'],
@@ -107,8 +162,8 @@ async def create_model_api_key(config: APIKeyCreate, current_user: User = Depend
     """Generate a new secure API key for an Insighter model."""
     try:
         # Verify ownership of the model
-        supabase = SupabaseManager.get_client()
-        model = supabase.table('models').select('id').eq('id', config.model_id).eq('created_by', current_user.user_id).execute()
+        supabase = SupabaseManager.get_async_client()
+        model = await supabase.table('models').select('id').eq('id', config.model_id).eq('created_by', current_user.user_id).execute()
         
         if not model.data:
             raise HTTPException(status_code=404, detail="Model not found or access denied")
@@ -123,9 +178,9 @@ async def create_model_api_key(config: APIKeyCreate, current_user: User = Depend
 @router.get("/keys/{model_id}")
 async def list_model_keys(model_id: str, current_user: User = Depends(get_current_user)):
     """List all API keys for a specific model."""
-    supabase = SupabaseManager.get_client()
+    supabase = SupabaseManager.get_async_client()
     try:
-        response = supabase.table('model_api_keys')\
+        response = await supabase.table('model_api_keys')\
             .select("id, name, scopes, created_at, expires_at, last_used_at, is_active")\
             .eq('model_id', model_id)\
             .eq('user_id', current_user.user_id)\
@@ -133,3 +188,15 @@ async def list_model_keys(model_id: str, current_user: User = Depends(get_curren
         return response.data
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.delete("/keys/{key_id}")
+async def revoke_model_api_key(key_id: str, current_user: User = Depends(get_current_user)):
+    """Revoke an API key. Takes effect immediately on this worker and within
+    MODEL_KEY_CACHE_TTL_SECONDS on the others."""
+    try:
+        revoked = await model_key_service.revoke_key(key_id, current_user.user_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if not revoked:
+        raise HTTPException(status_code=404, detail="API key not found or access denied")
+    return {"id": key_id, "is_active": False}
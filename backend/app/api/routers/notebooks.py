@@ -1,11 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 from typing import List, Optional, Any
+from starlette.concurrency import run_in_threadpool
 from fastapi.security import HTTPAuthorizationCredentials
+from app.core.config import settings
 from app.core.security import User, get_current_user, security
 from app.db.supabase import SupabaseManager
-from app.services.jupyter_manager import kernel_service
+from app.services.dataset_cache import dataset_cache
+from app.services.dataset_query import dataset_views
+from app.services.jupyter_manager import KernelPoolExhausted, KernelQueueFull, kernel_service
+from app.services.kernel_io import Execution, output_text, sse_events
+from app.services.kernel_telemetry import kernel_telemetry
+from app.services.storage import StorageError, get_storage_backend
 from app.services.settings_service import settings_service
+from app.services.search_index import publish_change
+from app.db.pagination import PageParams, page_params, paginate, finish_page
 
 router = APIRouter()
 
@@ -31,15 +41,21 @@ class CodeRequest(BaseModel):
     code: str = Field(..., min_length=1, max_length=10000, description="Python code to execute")
     project_id: str
 
+class DatasetAttachRequest(BaseModel):
+    project_id: str
+    dataset_ids: List[str] = Field(..., min_length=1, max_length=20)
+
 @router.get("/", response_model=List[Notebook])
 async def list_notebooks(
+    response: Response,
     project_id: Optional[str] = None, 
+    page: PageParams = Depends(page_params),
     current_user: User = Depends(get_current_user),
     credentials: HTTPAuthorizationCredentials = Depends(security)
 ):
-    """List notebooks. Optionally filter by project_id."""
+    """List notebooks, most recently edited first (cursor-paginated). Optionally filter by project_id."""
     token = credentials.credentials
-    user_supabase = SupabaseManager.get_authenticated_client(token)
+    user_supabase = SupabaseManager.get_async_authenticated_client(token)
     
     if not user_supabase:
         raise HTTPException(status_code=500, detail="Supabase client not available")
@@ -49,8 +65,9 @@ async def list_notebooks(
         if project_id:
             query = query.eq('project_id', project_id)
         
-        response = query.order('updated_at', desc=True).execute()
-        return response.data
+        # Most recently edited first, as the studio sidebar expects
+        result = await paginate(query, page, column='updated_at').execute()
+        return finish_page(result.data, page, response, column='updated_at')
     except Exception as e:
         from app.core.logging import logger
         logger.error(f"Error listing notebooks: {e}")
@@ -64,14 +81,14 @@ async def create_notebook(
 ):
     """Create a new notebook."""
     token = credentials.credentials
-    user_supabase = SupabaseManager.get_authenticated_client(token)
+    user_supabase = SupabaseManager.get_async_authenticated_client(token)
     
     if not user_supabase:
         raise HTTPException(status_code=500, detail="Supabase client not available")
     
     try:
         # Verify project ownership first
-        proj = user_supabase.table('projects').select('id').eq('id', notebook.project_id).eq('owner_id', current_user.user_id).execute()
+        proj = await user_supabase.table('projects').select('id').eq('id', notebook.project_id).eq('owner_id', current_user.user_id).execute()
         if not proj.data:
              raise HTTPException(status_code=404, detail="Project not found or access denied")
 
@@ -83,7 +100,8 @@ async def create_notebook(
             "created_by": current_user.user_id,
             "status": "idle"
         }
-        response = user_supabase.table('notebooks').insert(data).execute()
+        response = await user_supabase.table('notebooks').insert(data).execute()
+        publish_change('notebook', response.data[0])
         return response.data[0]
     except Exception as e:
         from app.core.logging import logger
@@ -93,9 +111,9 @@ async def create_notebook(
 @router.get("/{notebook_id}", response_model=Notebook)
 async def get_notebook(notebook_id: str, current_user: User = Depends(get_current_user)):
     """Get notebook details."""
-    supabase = SupabaseManager.get_client()
+    supabase = SupabaseManager.get_async_client()
     try:
-        response = supabase.table('notebooks').select("*").eq('id', notebook_id).single().execute()
+        response = await supabase.table('notebooks').select("*").eq('id', notebook_id).single().execute()
         if not response.data:
             raise HTTPException(status_code=404, detail="Notebook not found")
         if response.data['created_by'] != current_user.user_id:
@@ -104,14 +122,10 @@ async def get_notebook(notebook_id: str, current_user: User = Depends(get_curren
     except Exception as e:
          raise HTTPException(status_code=500, detail=str(e))
 
-@router.post("/execute")
-async def execute_code(code_request: CodeRequest, current_user: User = Depends(get_current_user)):
-    """
-    Execute code in a Jupyter environment. Requires authentication and injects user secrets.
-    """
+def _check_code(code: str) -> None:
     # Security checks
     dangerous_ops = ['__import__', 'exec', 'eval', 'compile', 'open', 'file', 'input', 'raw_input']
-    code_lower = code_request.code.lower()
+    code_lower = code.lower()
     
     for op in dangerous_ops:
         if op in code_lower:
@@ -119,22 +133,213 @@ async def execute_code(code_request: CodeRequest, current_user: User = Depends(g
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"Operation '{op}' is not allowed for security reasons"
             )
-    
+
+async def _check_project_access(credentials: HTTPAuthorizationCredentials, project_id: str, current_user: User) -> None:
+    """Owner or collaborator of the project; 404 otherwise, as for a project that does not exist."""
+    user_supabase = SupabaseManager.get_async_authenticated_client(credentials.credentials)
+    if not user_supabase:
+        raise HTTPException(status_code=500, detail="Supabase client not available")
+    project = await user_supabase.table('projects').select('owner_id').eq('id', project_id).execute()
+    if project.data:
+        if project.data[0]['owner_id'] == current_user.user_id:
+            return
+        member = await user_supabase.table('collaborators')\
+            .select('id')\
+            .eq('project_id', project_id)\
+            .eq('user_id', current_user.user_id)\
+            .execute()
+        if member.data:
+            return
+    raise HTTPException(status_code=404, detail="Project not found or access denied")
+
+async def _start_execution(code_request: CodeRequest, current_user: User,
+                           credentials: HTTPAuthorizationCredentials) -> Execution:
+    # Before anything is queued: the kernel carries its assigning user's secrets
+    await _check_project_access(credentials, code_request.project_id, current_user)
+    _check_code(code_request.code)
     try:
         # Fetch user secrets to inject as environment variables
-        secrets = settings_service.get_user_secrets(current_user.user_id)
+        secrets = await settings_service.get_user_secrets(current_user.user_id)
         
-        # Execute code via Jupyter service
-        output = kernel_service.execute(
+        # Assigning a kernel may have to start one, which takes seconds
+        return await run_in_threadpool(
+            kernel_service.run,
             project_id=code_request.project_id,
             code=code_request.code,
-            env=secrets
+            env=secrets,
+            user_id=current_user.user_id
         )
-        
-        return {
-            "output": output,
-            "status": "success",
-            "executed_by": current_user.user_id
-        }
+    except KernelPoolExhausted as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    except KernelQueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "5"})
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Execution failed: {str(e)}")
+
+def _summary(execution: Execution) -> dict:
+    return {**execution.summary(), "queue_position": kernel_service.queue_position(execution)}
+
+def _stream(execution: Execution) -> StreamingResponse:
+    return StreamingResponse(
+        sse_events(execution),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", "X-Execution-Id": execution.id},
+    )
+
+def _own_execution(execution_id: str, current_user: User) -> Execution:
+    execution = kernel_service.get_execution(execution_id)
+    if execution is None or execution.user_id != current_user.user_id:
+        raise HTTPException(status_code=404, detail="Execution not found")
+    return execution
+
+@router.post("/execute")
+async def execute_code(
+    code_request: CodeRequest,
+    current_user: User = Depends(get_current_user),
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """
+    Execute code in a Jupyter environment. Requires membership of the project and injects user secrets.
+
+    Cells of a project run one at a time, in order. Returns the cell's
+    outputs (nbformat) once the kernel is done, or after
+    KERNEL_EXECUTE_WAIT_SECONDS with status "queued" / "running" and its
+    queue_position: the remaining outputs then stream from
+    /executions/{execution_id}/events.
+    """
+    execution = await _start_execution(code_request, current_user, credentials)
+    await execution.wait_async(settings.KERNEL_EXECUTE_WAIT_SECONDS)
+    result = _summary(execution)
+    return {
+        **result,
+        "output": output_text(result['outputs']),
+        "executed_by": current_user.user_id
+    }
+
+@router.post("/execute/stream")
+async def execute_code_stream(
+    code_request: CodeRequest,
+    current_user: User = Depends(get_current_user),
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """Execute code and stream its outputs as server-sent events while the cell runs."""
+    return _stream(await _start_execution(code_request, current_user, credentials))
+
+@router.get("/executions/{execution_id}")
+async def get_execution(execution_id: str, current_user: User = Depends(get_current_user)):
+    """Status, queue position and outputs so far of one of your recent executions."""
+    return _summary(_own_execution(execution_id, current_user))
+
+@router.post("/executions/{execution_id}/cancel")
+async def cancel_execution(execution_id: str, current_user: User = Depends(get_current_user)):
+    """
+    Cancel one of your executions: a queued one is dropped, a running one is
+    interrupted (it ends with KeyboardInterrupt and status "interrupted").
+    """
+    execution = _own_execution(execution_id, current_user)
+    try:
+        cancelled = await run_in_threadpool(kernel_service.cancel, execution)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Could not interrupt the kernel: {str(e)}")
+    if not cancelled:
+        raise HTTPException(status_code=409, detail=f"Execution already {execution.status}")
+    return {"execution_id": execution.id, "status": "interrupting" if execution.interrupted else execution.status}
+
+@router.get("/kernels/{project_id}/queue")
+async def kernel_queue(
+    project_id: str,
+    current_user: User = Depends(get_current_user),
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """The running and waiting executions of a project's kernel, in order (code shown for your own only)."""
+    await _check_project_access(credentials, project_id, current_user)
+    jobs = []
+    for position, execution in enumerate(kernel_service.queue(project_id)):
+        job = {"execution_id": execution.id, "status": execution.status, "queue_position": position,
+               "mine": execution.user_id == current_user.user_id}
+        if job["mine"]:
+            job["code"] = execution.code
+        jobs.append(job)
+    return {"project_id": project_id, "executions": jobs}
+
+@router.get("/kernels/{project_id}/telemetry")
+async def kernel_telemetry_series(
+    project_id: str,
+    since: Optional[float] = None,
+    current_user: User = Depends(get_current_user),
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """
+    CPU (percent of one core), RSS, open files and threads of the project's
+    kernel over time, oldest first; `since` (unix time) returns only newer
+    samples. One sample per KERNEL_TELEMETRY_INTERVAL_SECONDS, the last
+    KERNEL_TELEMETRY_HISTORY kept.
+    """
+    await _check_project_access(credentials, project_id, current_user)
+    state = kernel_service.kernel_state(project_id)
+    return {
+        "project_id": project_id,
+        "pid": state["pid"],
+        "interval_seconds": kernel_telemetry.interval,
+        "samples": kernel_telemetry.series(project_id, since),
+    }
+
+@router.get("/executions/{execution_id}/events")
+async def execution_events(execution_id: str, current_user: User = Depends(get_current_user)):
+    """Outputs of an execution as server-sent events, from the first one until it is done."""
+    return _stream(_own_execution(execution_id, current_user))
+
+@router.post("/datasets")
+async def attach_datasets(
+    body: DatasetAttachRequest,
+    current_user: User = Depends(get_current_user),
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """
+    Make datasets available in the project's kernel as `load_dataset("<name>")`
+    (names as in dataset SQL queries: `Sales 2024.csv` -> `sales_2024`).
+
+    Files go through the node-local dataset cache: each is downloaded and
+    parsed once, then memory-mapped by every kernel that loads it. The entries
+    stay pinned until the kernel shuts down.
+    """
+    user_supabase = SupabaseManager.get_async_authenticated_client(credentials.credentials)
+    if not user_supabase:
+        raise HTTPException(status_code=500, detail="Supabase client not available")
+    response = await user_supabase.table('datasets')\
+        .select("id, name, file_path, schema, checksum, size_bytes, metadata, created_at")\
+        .eq('project_id', body.project_id)\
+        .in_('id', body.dataset_ids)\
+        .execute()
+    found = [d for d in response.data or [] if d.get('file_path')]
+    missing = set(body.dataset_ids) - {d['id'] for d in found}
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Dataset(s) not found in project: {', '.join(sorted(missing))}")
+
+    # Collaborators' uploads are read with the service key when configured
+    token = settings.SUPABASE_SERVICE_ROLE_KEY or credentials.credentials
+    backend = get_storage_backend()
+    entries = {}
+    try:
+        for name, dataset in dataset_views(found).items():
+            entries[name] = await run_in_threadpool(dataset_cache.get_pinned, backend, dataset, token)
+    except (StorageError, ValueError) as e:
+        for _, pin_id in entries.values():
+            dataset_cache.unpin(pin_id)
+        raise HTTPException(status_code=502 if isinstance(e, StorageError) else 400, detail=str(e))
+
+    try:
+        secrets = await settings_service.get_user_secrets(current_user.user_id)
+        names = await run_in_threadpool(
+            kernel_service.attach_datasets, body.project_id, entries, secrets, current_user.user_id
+        )
+    except Exception as e:
+        for _, pin_id in entries.values():
+            dataset_cache.unpin(pin_id)
+        if isinstance(e, KernelPoolExhausted):
+            raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+        raise HTTPException(status_code=500, detail=f"Could not attach datasets: {str(e)}")
+    return {
+        "datasets": {name: {"format": entry.format, "size_bytes": entry.size} for name, (entry, _) in entries.items()},
+        "attached": names,
+    }
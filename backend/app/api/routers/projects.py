@@ -1,9 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 from pydantic import BaseModel, Field
 from typing import List, Optional
 from fastapi.security import HTTPAuthorizationCredentials
 from app.core.security import User, get_current_user, security
 from app.db.supabase import SupabaseManager
+from app.db.pagination import PageParams, page_params, paginate, finish_page
+from app.services.search_index import publish_change
 from app.core.logging import logger
 
 router = APIRouter()
@@ -27,30 +29,31 @@ class Project(BaseModel):
 
 @router.get("/", response_model=List[Project])
 async def list_projects(
+    response: Response,
+    page: PageParams = Depends(page_params),
     current_user: User = Depends(get_current_user),
     credentials: HTTPAuthorizationCredentials = Depends(security)
 ):
-    """List all projects for the current user. Requires authentication."""
+    """List projects for the current user, newest first (cursor-paginated). Requires authentication."""
     # Create an authenticated client to respect RLS
     token = credentials.credentials
-    user_supabase = SupabaseManager.get_authenticated_client(token)
+    user_supabase = SupabaseManager.get_async_authenticated_client(token)
     
     if not user_supabase:
         raise HTTPException(status_code=500, detail="Supabase client not available")
     
     try:
-        response = user_supabase.table('projects')\
+        query = user_supabase.table('projects')\
             .select("*")\
-            .eq('owner_id', current_user.user_id)\
-            .order('created_at', desc=True)\
-            .execute()
+            .eq('owner_id', current_user.user_id)
+        result = await paginate(query, page).execute()
         
-        if not hasattr(response, 'data') or response.data is None:
-            logger.debug(f"Empty or invalid response from Supabase in list_projects: {response}")
+        if not hasattr(result, 'data') or result.data is None:
+            logger.debug(f"Empty or invalid response from Supabase in list_projects: {result}")
             return []
             
         projects = []
-        for p in response.data:
+        for p in finish_page(result.data, page, response):
             # Derive type from tags if available, otherwise default to 'General'
             project_type = 'General'
             if p.get('tags') and len(p['tags']) > 0:
@@ -83,8 +86,8 @@ async def create_project(
     
     # Create a new client with the user's actual JWT to ensure RLS context is passed to Supabase
     token = credentials.credentials
-    user_supabase = SupabaseManager.get_authenticated_client(token)
-    service_supabase = SupabaseManager.get_service_client()
+    user_supabase = SupabaseManager.get_async_authenticated_client(token)
+    service_supabase = SupabaseManager.get_async_service_client()
     
     if not user_supabase:
         logger.error("Supabase client not available during project creation")
@@ -97,7 +100,7 @@ async def create_project(
         if service_supabase:
             try:
                 logger.debug(f"Checking profile for user {current_user.user_id} using service role")
-                profile_check = service_supabase.table('profiles').select('id').eq('id', current_user.user_id).execute()
+                profile_check = await service_supabase.table('profiles').select('id').eq('id', current_user.user_id).execute()
                 profile_exists = bool(profile_check.data and len(profile_check.data) > 0)
             except Exception as e:
                 logger.warning(f"Service role profile check failed: {e}")
@@ -106,7 +109,7 @@ async def create_project(
         if not profile_exists:
             try:
                 logger.debug(f"Checking profile for user {current_user.user_id} using user client")
-                profile_check = user_supabase.table('profiles').select('id').eq('id', current_user.user_id).execute()
+                profile_check = await user_supabase.table('profiles').select('id').eq('id', current_user.user_id).execute()
                 profile_exists = bool(profile_check.data and len(profile_check.data) > 0)
             except Exception as e:
                 logger.debug(f"User client profile check failed: {e}")
@@ -139,7 +142,7 @@ async def create_project(
             # Try creating with service role first (bypasses RLS)
             if service_supabase:
                 try:
-                    service_supabase.table('profiles').insert(profile_data).execute()
+                    await service_supabase.table('profiles').insert(profile_data).execute()
                     logger.info(f"Profile created successfully using service role with role: {initial_role}")
                     profile_exists = True
                 except Exception as e:
@@ -148,7 +151,7 @@ async def create_project(
             # If service role failed or unavailable, try user-authenticated client (respects RLS)
             if not profile_exists:
                 try:
-                    user_supabase.table('profiles').insert(profile_data).execute()
+                    await user_supabase.table('profiles').insert(profile_data).execute()
                     logger.info(f"Profile created successfully using user client with role: {initial_role}")
                     profile_exists = True
                 except Exception as e:
@@ -179,11 +182,12 @@ async def create_project(
         
         # 1. Primary Attempt: User client (Respects RLS)
         try:
-            response = user_supabase.table('projects').insert(data).select().execute()
+            response = await user_supabase.table('projects').insert(data).select().execute()
             if response and hasattr(response, 'data') and response.data:
                 logger.info(f"Project created successfully via user client: {project.name}")
                 created_project = response.data[0]
                 created_project['type'] = project.type
+                publish_change('project', created_project)
                 return created_project
             logger.warning("User client insert returned no data (likely RLS policy restriction)")
         except Exception as user_err:
@@ -195,11 +199,12 @@ async def create_project(
         if service_supabase:
             logger.info("Attempting project creation with service role fallback...")
             try:
-                response = service_supabase.table('projects').insert(data).select().execute()
+                response = await service_supabase.table('projects').insert(data).select().execute()
                 if response and hasattr(response, 'data') and response.data:
                     logger.info(f"Project created successfully via service role fallback: {project.name}")
                     created_project = response.data[0]
                     created_project['type'] = project.type
+                    publish_change('project', created_project)
                     return created_project
             except Exception as service_err:
                 logger.error(f"Service role project creation also failed: {service_err}")
@@ -209,7 +214,7 @@ async def create_project(
         if service_supabase:
             logger.info("Checking if project was created but not returned...")
             try:
-                response = service_supabase.table('projects')\
+                response = await service_supabase.table('projects')\
                     .select("*")\
                     .eq('name', project.name)\
                     .eq('owner_id', current_user.user_id)\
@@ -220,6 +225,7 @@ async def create_project(
                     logger.info(f"Existing project found for user {current_user.user_id}")
                     created_project = response.data[0]
                     created_project['type'] = project.type
+                    publish_change('project', created_project)
                     return created_project
             except Exception as fetch_err:
                 logger.error(f"Final project fetch failed: {fetch_err}")
@@ -240,13 +246,13 @@ async def get_project(
     """Get project details."""
     # Create an authenticated client to respect RLS
     token = credentials.credentials
-    user_supabase = SupabaseManager.get_authenticated_client(token)
+    user_supabase = SupabaseManager.get_async_authenticated_client(token)
     
     if not user_supabase:
         raise HTTPException(status_code=500, detail="Supabase client not available")
     
     try:
-        response = user_supabase.table('projects')\
+        response = await user_supabase.table('projects')\
             .select("*")\
             .eq('id', project_id)\
             .execute()
@@ -283,10 +289,10 @@ async def get_project(
 async def create_project_backup(project_id: str, current_user: User = Depends(get_current_user)):
     """Create a backup of the project state."""
     import uuid
-    supabase = SupabaseManager.get_client()
+    supabase = SupabaseManager.get_async_client()
     try:
         # Verify ownership
-        project = supabase.table('projects').select("*").eq('id', project_id).eq('owner_id', current_user.user_id).single().execute()
+        project = await supabase.table('projects').select("*").eq('id', project_id).eq('owner_id', current_user.user_id).single().execute()
         if not project.data:
             raise HTTPException(status_code=404, detail="Project not found")
         
@@ -301,7 +307,7 @@ async def create_project_backup(project_id: str, current_user: User = Depends(ge
             "entity_id": project_id,
             "metadata": {"backup_id": str(uuid.uuid4()), "name": project.data['name']}
         }
-        supabase.table('project_history').insert(history_data).execute()
+        await supabase.table('project_history').insert(history_data).execute()
         
         return {"status": "success", "message": "Backup created successfully"}
     except Exception as e:
@@ -310,10 +316,10 @@ async def create_project_backup(project_id: str, current_user: User = Depends(ge
 @router.post("/{project_id}/restore")
 async def restore_project_backup(project_id: str, backup_id: str, current_user: User = Depends(get_current_user)):
     """Restore a project from a backup."""
-    supabase = SupabaseManager.get_client()
+    supabase = SupabaseManager.get_async_client()
     try:
         # Verify ownership
-        project = supabase.table('projects').select("*").eq('id', project_id).eq('owner_id', current_user.user_id).single().execute()
+        project = await supabase.table('projects').select("*").eq('id', project_id).eq('owner_id', current_user.user_id).single().execute()
         if not project.data:
             raise HTTPException(status_code=404, detail="Project not found")
         
@@ -326,7 +332,7 @@ async def restore_project_backup(project_id: str, backup_id: str, current_user:
             "entity_id": project_id,
             "metadata": {"backup_id": backup_id}
         }
-        supabase.table('project_history').insert(history_data).execute()
+        await supabase.table('project_history').insert(history_data).execute()
         
         return {"status": "success", "message": "Project restored successfully"}
     except Exception as e:
@@ -338,18 +344,17 @@ async def get_dashboard_telemetry(
     credentials: HTTPAuthorizationCredentials = Depends(security)
 ):
     """Get telemetry stats for the dashboard."""
-    from supabase import create_client
-    from app.core.config import settings
-    
     # Use authenticated client for RLS
     token = credentials.credentials
-    user_supabase = create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
-    user_supabase.postgrest.auth(token)
+    user_supabase = SupabaseManager.get_async_authenticated_client(token)
+    
+    if not user_supabase:
+        raise HTTPException(status_code=500, detail="Supabase client not available")
     
     try:
         # Aggregate stats across all user's projects
         # 1. Model Accuracy (Average across all models)
-        models_response = user_supabase.table('models').select('metrics, status').execute()
+        models_response = await user_supabase.table('models').select('metrics, status').execute()
         accuracy_sum = 0
         model_count = 0
         production_models_count = 0
@@ -365,7 +370,7 @@ async def get_dashboard_telemetry(
         avg_accuracy = (accuracy_sum / model_count * 100) if model_count > 0 else 94.0
         
         # 2. Data Pipeline Health (Success rate of workflows)
-        workflows_response = user_supabase.table('workflows').select('status').execute()
+        workflows_response = await user_supabase.table('workflows').select('status').execute()
         success_count = 0
         workflow_count = 0
         for w in workflows_response.data:
@@ -397,17 +402,16 @@ async def get_dashboard_achievements(
     credentials: HTTPAuthorizationCredentials = Depends(security)
 ):
     """Get recent achievements for the dashboard."""
-    from supabase import create_client
-    from app.core.config import settings
-    
     # Use authenticated client for RLS
     token = credentials.credentials
-    user_supabase = create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
-    user_supabase.postgrest.auth(token)
+    user_supabase = SupabaseManager.get_async_authenticated_client(token)
+    
+    if not user_supabase:
+        raise HTTPException(status_code=500, detail="Supabase client not available")
     
     try:
         # Fetch recent history for dynamic achievements
-        history_response = user_supabase.table('project_history')\
+        history_response = await user_supabase.table('project_history')\
             .select("*")\
             .order('created_at', desc=True)\
             .limit(5)\
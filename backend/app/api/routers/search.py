@@ -1,8 +1,16 @@
-from fastapi import APIRouter, Depends, Query
+import asyncio
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.security import HTTPAuthorizationCredentials
+from postgrest.exceptions import APIError
 from pydantic import BaseModel
-from typing import List, Optional, Any
-from app.core.security import User, get_current_user
+from typing import Dict, List, Optional, Any, Tuple
+from app.core.config import settings
+from app.core.logging import logger
+from app.core.security import User, get_current_user, security
+from app.db.pagination import encode_cursor, decode_cursor as decode_page_cursor
 from app.db.supabase import SupabaseManager
+from app.services.search_index import search_index
 
 router = APIRouter()
 
@@ -13,76 +21,290 @@ class SearchResult(BaseModel):
     description: Optional[str] = None
     url: str
     metadata: Optional[dict] = None
+    # HTML-escaped text with matched terms wrapped in <mark>, keyed by field (index backend only)
+    highlights: Optional[dict] = None
 
 class SearchResponse(BaseModel):
     results: List[SearchResult]
     total: int
+    # Opaque token for the next page; None when every source is exhausted
+    next_cursor: Optional[str] = None
+    # Sources that did not answer within SEARCH_SOURCE_TIMEOUT_SECONDS
+    timed_out: List[str] = []
+
+# (table, searchable columns, entity type, owner column)
+SEARCH_SOURCES = [
+    ('projects', ('name', 'description'), 'project', 'owner_id'),
+    ('datasets', ('name', 'description'), 'dataset', 'created_by'),
+    ('notebooks', ('name', 'description'), 'notebook', 'created_by'),
+    ('models', ('name', 'version'), 'model', 'created_by'),
+]
+
+def _quote(value: str) -> str:
+    """Quote a value for a PostgREST logic-tree filter (commas, parens, etc.)."""
+    return '"' + value.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    state = decode_page_cursor(cursor)
+    if not isinstance(state, dict) or not (isinstance(state.get('pos'), dict) or isinstance(state.get('after'), list)
+                                            or isinstance(state.get('mem'), int)):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return state
+
+def _sort_key(item: dict) -> Tuple[datetime, str]:
+    return datetime.fromisoformat(item['updated_at'].replace('Z', '+00:00')), item['id']
+
+def _result_url(entity_type: str, entity_id: str, project_id: Optional[str]) -> str:
+    if entity_type == 'notebook':
+        return f"/studio/{project_id}/notebook/{entity_id}"
+    return f"/dashboard/{entity_type}s/{entity_id}"
+
+def _to_result(entity_type: str, item: dict) -> SearchResult:
+    return SearchResult(
+        id=item['id'],
+        type=entity_type,
+        title=item['name'],
+        description=item.get('description') or item.get('version'),
+        url=_result_url(entity_type, item['id'], item.get('project_id')),
+        metadata={"updated_at": item.get('updated_at') or item.get('created_at')}
+    )
+
+async def _query_source(supabase, table: str, columns, owner_column: str, q: str, user_id: str,
+                        position: Optional[list], fetch: int, count: bool):
+    """
+    One page of matches from a single table, newest first.
+    `position` is the (updated_at, id) of the last row already returned from
+    this table, so every page is an index-ordered range scan from that point.
+    """
+    pattern = _quote(f"%{q}%")
+    match = ",".join(f"{column}.ilike.{pattern}" for column in columns)
+    filter_str = match
+    if position:
+        updated_at, last_id = _quote(position[0]), _quote(position[1])
+        after = f"updated_at.lt.{updated_at},and(updated_at.eq.{updated_at},id.lt.{last_id})"
+        filter_str = f"and(or({match}),or({after}))"
+
+    query = supabase.table(table)\
+        .select("*", count='exact' if count else None)\
+        .or_(filter_str)\
+        .eq(owner_column, user_id)\
+        .order('updated_at', desc=True)\
+        .order('id', desc=True)\
+        .limit(fetch)
+    if table == 'datasets':
+        # Value-mode rows are data points, not datasets to search for
+        query = query.eq('storage_mode', 'file')
+    return await query.execute()
+
+# Flipped off the first time PostgREST reports that search_workspace() does not
+# exist, so installs without database/scripts/search_documents.sql pay for the
+# probe once per worker rather than once per request.
+_search_index_available = True
+
+async def _search_index(token: str, q: str, type: Optional[str], limit: int,
+                        state: Optional[Dict[str, Any]]) -> Optional[SearchResponse]:
+    """
+    Serve a page from the search_documents index with one RPC call.
+    Returns None when the index cannot be used, so the caller can fall back.
+    """
+    global _search_index_available
+    supabase = SupabaseManager.get_async_authenticated_client(token)
+    if supabase is None:
+        return None
+
+    after = state.get('after') if state else None
+    params = {
+        "search_query": q,
+        "entity_types": [type] if type else None,
+        # One extra row tells us whether another page exists
+        "result_limit": limit + 1,
+        "after_rank": after[0] if after else None,
+        "after_type": after[1] if after else None,
+        "after_id": after[2] if after else None,
+    }
+    try:
+        response = await supabase.rpc('search_workspace', params).execute()
+    except APIError as e:
+        if e.code == 'PGRST202':
+            _search_index_available = False
+            logger.warning("search_workspace() is not installed; using per-table search")
+        else:
+            logger.error(f"Search index query failed: {e}")
+        return None
+
+    rows = response.data or []
+    page = rows[:limit]
+    if state:
+        total = state.get('total', 0)
+    else:
+        total = rows[0]['total_count'] if rows else 0
+
+    results = [
+        SearchResult(
+            id=row['entity_id'],
+            type=row['entity_type'],
+            title=row['title'],
+            description=row.get('body'),
+            url=_result_url(row['entity_type'], row['entity_id'], row.get('project_id')),
+            metadata={"updated_at": row.get('updated_at'), "rank": row.get('rank')},
+            highlights={"title": row.get('title_highlight'), "description": row.get('snippet')},
+        )
+        for row in page
+    ]
+    next_cursor = None
+    if len(rows) > limit:
+        last = page[-1]
+        next_cursor = encode_cursor({
+            "after": [last['rank'], last['entity_type'], last['entity_id']],
+            "total": total,
+        })
+    return SearchResponse(results=results, total=total, next_cursor=next_cursor)
+
+def _search_memory(q: str, type: Optional[str], limit: int, offset: int,
+                   state: Optional[Dict[str, Any]], current_user: User) -> SearchResponse:
+    """Serve a page from the in-process inverted index (SEARCH_BACKEND=memory)."""
+    start = state['mem'] if state else offset
+    docs, total = search_index.search(q, current_user.user_id, type, limit, start)
+    results = [
+        SearchResult(
+            id=doc['id'],
+            type=doc['type'],
+            title=doc['title'],
+            description=doc['body'],
+            url=_result_url(doc['type'], doc['id'], doc['project_id']),
+            metadata={"updated_at": doc['updated_at']},
+            highlights={
+                "title": search_index.highlight(doc['title'], q),
+                "description": search_index.highlight(doc['body'], q),
+            },
+        )
+        for doc in docs
+    ]
+    end = start + len(docs)
+    next_cursor = encode_cursor({"mem": end}) if end < total else None
+    return SearchResponse(results=results, total=total, next_cursor=next_cursor)
 
 @router.get("/", response_model=SearchResponse)
 async def search(
     q: str = Query(..., min_length=1, description="Search query"),
     type: Optional[str] = Query(None, description="Filter by type: project, dataset, notebook, model"),
-    limit: int = 10,
-    offset: int = 0,
-    current_user: User = Depends(get_current_user)
+    limit: int = Query(10, ge=1, le=100),
+    offset: int = Query(0, ge=0, description="Deprecated, use cursor"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    current_user: User = Depends(get_current_user),
+    credentials: HTTPAuthorizationCredentials = Depends(security)
 ):
     """
     Unified search across Projects, Datasets, Notebooks, and Models.
+
+    Served from the ranked full-text index (search_documents) when it is
+    installed, otherwise by querying each table directly. SEARCH_BACKEND=memory
+    serves from the in-process index instead.
     """
-    supabase = SupabaseManager.get_client()
-    results = []
-    
-    # Define search queries for each entity type
-    queries = []
-    
-    if not type or type == 'project':
-        queries.append(('projects', 'name, description', 'project'))
-    if not type or type == 'dataset':
-        queries.append(('datasets', 'name, description', 'dataset'))
-    if not type or type == 'notebook':
-        queries.append(('notebooks', 'name, description', 'notebook'))
-    if not type or type == 'model':
-        queries.append(('models', 'name, version', 'model'))
-
-    # Execute queries (naive implementation: sequential queries)
-    # In a real production scenario, you might use a dedicated search index or Supabase text search
-    
-    for table, columns, entity_type in queries:
-        try:
-            # Using 'ilike' for simple case-insensitive search on name
-            # Supabase-py syntax: table(table).select("*").ilike('name', f'%{q}%').execute()
-            
-            # Note: Complex OR logic (name OR description) requires Supabase 'or' filter syntax
-            # filter=f"name.ilike.%{q}%,description.ilike.%{q}%"
-            
-            filter_str = f"name.ilike.%{q}%"
-            if 'description' in columns:
-                filter_str += f",description.ilike.%{q}%"
-            
-            response = supabase.table(table)\
-                .select("*")\
-                .or_(filter_str)\
-                .eq('owner_id' if table == 'projects' else 'created_by' if table != 'projects' else 'owner_id', current_user.user_id)\
-                .range(0, limit)\
-                .execute()
-                
-            for item in response.data:
-                results.append(SearchResult(
-                    id=item['id'],
-                    type=entity_type,
-                    title=item['name'],
-                    description=item.get('description') or item.get('version'),
-                    url=f"/dashboard/{entity_type}s/{item['id']}" if entity_type != 'notebook' else f"/studio/{item.get('project_id')}/notebook/{item['id']}",
-                    metadata={"updated_at": item.get('updated_at') or item.get('created_at')}
-                ))
-        except Exception as e:
-            from app.core.logging import logger
-            logger.error(f"Error searching {table}: {e}")
+    state = decode_cursor(cursor) if cursor else None
+    backend = settings.SEARCH_BACKEND
+    if backend == 'memory' or (state and 'mem' in state):
+        return _search_memory(q, type, limit, offset, state, current_user)
+    # Pages of one search stay on the backend that produced the cursor
+    use_index = 'after' in state if state else (
+        backend == 'postgres' or (backend == 'auto' and _search_index_available and not offset)
+    )
+    # Model API keys are not JWTs, so PostgREST cannot resolve auth.uid() for them
+    if use_index and credentials is not None and not credentials.credentials.startswith("ins_model_"):
+        response = await _search_index(credentials.credentials, q, type, limit, state)
+        if response is not None:
+            return response
+        if state:
+            raise HTTPException(status_code=503, detail="Search index unavailable, restart the search")
+    return await _search_tables(q, type, limit, offset, state, current_user)
+
+async def _search_tables(q: str, type: Optional[str], limit: int, offset: int,
+                         state: Optional[Dict[str, Any]], current_user: User) -> SearchResponse:
+    """
+    Per-table search.
+
+    The per-table queries run concurrently, so latency is that of the slowest
+    source (bounded by SEARCH_SOURCE_TIMEOUT_SECONDS) rather than the sum.
+    Results are merged newest first; `next_cursor` records how far each source
+    has been consumed so the next page resumes every table where it left off.
+    """
+    supabase = SupabaseManager.get_async_client()
+
+    sources = [s for s in SEARCH_SOURCES if not type or type == s[2]]
+
+    positions: Dict[str, Any] = state['pos'] if state else {}
+    # Legacy offset paging: fetch enough of each source to cover the offset
+    skip = 0 if state else offset
+    fetch = limit + skip
+
+    # Cursor positions: [] = from the start, [updated_at, id] = after that row,
+    # None = exhausted on an earlier page (not queried again)
+    active = [s for s in sources if positions.get(s[0], True) is not None]
+
+    async def run(table, columns, entity_type, owner_column):
+        return await asyncio.wait_for(
+            _query_source(
+                supabase, table, columns, owner_column, q, current_user.user_id,
+                positions.get(table), fetch, count=state is None
+            ),
+            timeout=settings.SEARCH_SOURCE_TIMEOUT_SECONDS,
+        )
+
+    responses = await asyncio.gather(*(run(*s) for s in active), return_exceptions=True)
+
+    candidates = []
+    total = state.get('total', 0) if state else 0
+    timed_out = []
+    fetched: Dict[str, list] = {}
+    for (table, _, entity_type, _), response in zip(active, responses):
+        if isinstance(response, BaseException):
+            if isinstance(response, asyncio.TimeoutError):
+                timed_out.append(entity_type)
+                logger.warning(f"Search of {table} timed out")
+            else:
+                logger.error(f"Error searching {table}: {response}")
+            continue
+        fetched[table] = response.data
+        if state is None:
+            total += response.count or 0
+        for item in response.data:
+            candidates.append((_sort_key(item), table, entity_type, item))
+
+    # k-way merge of the per-source pages, newest first
+    candidates.sort(key=lambda c: c[0], reverse=True)
+    page = candidates[skip:skip + limit]
+
+    consumed: Dict[str, list] = {}
+    for _, table, _, item in candidates[:skip + limit]:
+        consumed.setdefault(table, []).append(item)
+
+    next_positions: Dict[str, Any] = {}
+    has_more = False
+    for table, _, _, _ in sources:
+        if positions.get(table, True) is None:
+            next_positions[table] = None
+            continue
+        if table not in fetched:
+            # Failed or timed out: retry from the same position next page
+            next_positions[table] = positions.get(table, [])
+            has_more = True
             continue
+        used = consumed.get(table, [])
+        # Rows remain if some fetched rows were not used, or the fetch was full
+        rows_left = len(used) < len(fetched[table]) or len(fetched[table]) == fetch
+        if not rows_left:
+            next_positions[table] = None
+        elif used:
+            next_positions[table] = [used[-1]['updated_at'], used[-1]['id']]
+        else:
+            next_positions[table] = positions.get(table, [])
+        has_more = has_more or next_positions[table] is not None
 
-    # Manual pagination/limiting since we aggregate multiple queries
-    # In a robust solution, we'd use a SQL UNION view or full-text search engine
-    total = len(results)
-    paginated_results = results[offset : offset + limit]
+    next_cursor = encode_cursor({"pos": next_positions, "total": total}) if has_more and page else None
 
-    return SearchResponse(results=paginated_results, total=total)
+    return SearchResponse(
+        results=[_to_result(entity_type, item) for _, _, entity_type, item in page],
+        total=total,
+        next_cursor=next_cursor,
+        timed_out=timed_out,
+    )
@@ -22,9 +22,9 @@ class SettingResponse(BaseModel):
 
 @router.get("/secrets", response_model=List[SettingResponse])
 async def get_secrets(current_user: User = Depends(get_current_user)):
-    supabase = SupabaseManager.get_client()
+    supabase = SupabaseManager.get_async_client()
     try:
-        response = supabase.table('tool_settings')\
+        response = await supabase.table('tool_settings')\
             .select("*")\
             .eq('user_id', current_user.user_id)\
             .execute()
@@ -48,7 +48,7 @@ async def get_secrets(current_user: User = Depends(get_current_user)):
 
 @router.post("/secrets")
 async def update_secret(setting: SettingUpdate, current_user: User = Depends(get_current_user)):
-    supabase = SupabaseManager.get_client()
+    supabase = SupabaseManager.get_async_client()
     try:
         # Upsert logic
         data = {
@@ -61,7 +61,7 @@ async def update_secret(setting: SettingUpdate, current_user: User = Depends(get
         }
         
         # Check if exists
-        existing = supabase.table('tool_settings')\
+        existing = await supabase.table('tool_settings')\
             .select("id")\
             .eq('user_id', current_user.user_id)\
             .eq('tool_id', setting.tool_id)\
@@ -69,12 +69,12 @@ async def update_secret(setting: SettingUpdate, current_user: User = Depends(get
             .execute()
             
         if existing.data:
-            response = supabase.table('tool_settings')\
+            response = await supabase.table('tool_settings')\
                 .update(data)\
                 .eq('id', existing.data[0]['id'])\
                 .execute()
         else:
-            response = supabase.table('tool_settings')\
+            response = await supabase.table('tool_settings')\
                 .insert(data)\
                 .execute()
                 
@@ -84,9 +84,9 @@ async def update_secret(setting: SettingUpdate, current_user: User = Depends(get
 
 @router.delete("/secrets/{tool_id}/{key}")
 async def delete_secret(tool_id: str, key: str, current_user: User = Depends(get_current_user)):
-    supabase = SupabaseManager.get_client()
+    supabase = SupabaseManager.get_async_client()
     try:
-        supabase.table('tool_settings')\
+        await supabase.table('tool_settings')\
             .delete()\
             .eq('user_id', current_user.user_id)\
             .eq('tool_id', tool_id)\
@@ -1,8 +1,9 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 from pydantic import BaseModel, Field
 from typing import List, Optional
 from app.core.security import User, get_current_user
 from app.db.supabase import SupabaseManager
+from app.db.pagination import PageParams, page_params, paginate, finish_page
 
 router = APIRouter()
 
@@ -37,9 +38,9 @@ class Task(BaseModel):
     created_at: str
 
 @router.get("/", response_model=List[Task])
-async def list_tasks(workflow_id: Optional[str] = None, assigned_to: Optional[str] = None, current_user: User = Depends(get_current_user)):
-    """List tasks, optionally filtered by workflow_id or assigned_to."""
-    supabase = SupabaseManager.get_client()
+async def list_tasks(response: Response, workflow_id: Optional[str] = None, assigned_to: Optional[str] = None, page: PageParams = Depends(page_params), current_user: User = Depends(get_current_user)):
+    """List tasks, newest first (cursor-paginated), optionally filtered by workflow_id or assigned_to."""
+    supabase = SupabaseManager.get_async_client()
     try:
         query = supabase.table('tasks').select("*")
         if workflow_id:
@@ -47,19 +48,19 @@ async def list_tasks(workflow_id: Optional[str] = None, assigned_to: Optional[st
         if assigned_to:
             query = query.eq('assigned_to', assigned_to)
         
-        response = query.execute()
-        return response.data
+        result = await paginate(query, page).execute()
+        return finish_page(result.data, page, response)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/", response_model=Task)
 async def create_task(task: TaskCreate, current_user: User = Depends(get_current_user)):
     """Create a new task."""
-    supabase = SupabaseManager.get_client()
+    supabase = SupabaseManager.get_async_client()
     try:
         data = task.dict()
         data["status"] = "pending"
-        response = supabase.table('tasks').insert(data).execute()
+        response = await supabase.table('tasks').insert(data).execute()
         if not response.data:
             raise HTTPException(status_code=500, detail="Failed to create task")
         return response.data[0]
@@ -69,10 +70,10 @@ async def create_task(task: TaskCreate, current_user: User = Depends(get_current
 @router.patch("/{task_id}", response_model=Task)
 async def update_task(task_id: str, task: TaskUpdate, current_user: User = Depends(get_current_user)):
     """Update task."""
-    supabase = SupabaseManager.get_client()
+    supabase = SupabaseManager.get_async_client()
     try:
         data = task.dict(exclude_unset=True)
-        response = supabase.table('tasks').update(data).eq('id', task_id).execute()
+        response = await supabase.table('tasks').update(data).eq('id', task_id).execute()
         if not response.data:
             raise HTTPException(status_code=404, detail="Task not found or update failed")
         return response.data[0]
@@ -82,9 +83,9 @@ async def update_task(task_id: str, task: TaskUpdate, current_user: User = Depen
 @router.delete("/{task_id}")
 async def delete_task(task_id: str, current_user: User = Depends(get_current_user)):
     """Delete task."""
-    supabase = SupabaseManager.get_client()
+    supabase = SupabaseManager.get_async_client()
     try:
-        response = supabase.table('tasks').delete().eq('id', task_id).execute()
+        response = await supabase.table('tasks').delete().eq('id', task_id).execute()
         return {"status": "deleted"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
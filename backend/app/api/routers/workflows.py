@@ -1,8 +1,9 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 from pydantic import BaseModel, Field
 from typing import List, Optional, Any
 from app.core.security import User, get_current_user
 from app.db.supabase import SupabaseManager
+from app.db.pagination import PageParams, page_params, paginate, finish_page
 
 router = APIRouter()
 
@@ -29,23 +30,23 @@ class Workflow(BaseModel):
     created_at: str
 
 @router.get("/", response_model=List[Workflow])
-async def list_workflows(project_id: Optional[str] = None, current_user: User = Depends(get_current_user)):
-    """List workflows, optionally filtered by project_id."""
-    supabase = SupabaseManager.get_client()
+async def list_workflows(response: Response, project_id: Optional[str] = None, page: PageParams = Depends(page_params), current_user: User = Depends(get_current_user)):
+    """List workflows, newest first (cursor-paginated), optionally filtered by project_id."""
+    supabase = SupabaseManager.get_async_client()
     try:
         query = supabase.table('workflows').select("*")
         if project_id:
             query = query.eq('project_id', project_id)
         
-        response = query.execute()
-        return response.data
+        result = await paginate(query, page).execute()
+        return finish_page(result.data, page, response)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/", response_model=Workflow)
 async def create_workflow(workflow: WorkflowCreate, current_user: User = Depends(get_current_user)):
     """Create a new workflow."""
-    supabase = SupabaseManager.get_client()
+    supabase = SupabaseManager.get_async_client()
     try:
         data = {
             "project_id": workflow.project_id,
@@ -55,7 +56,7 @@ async def create_workflow(workflow: WorkflowCreate, current_user: User = Depends
             "created_by": current_user.user_id,
             "status": "draft"
         }
-        response = supabase.table('workflows').insert(data).execute()
+        response = await supabase.table('workflows').insert(data).execute()
         if not response.data:
             raise HTTPException(status_code=500, detail="Failed to create workflow")
         return response.data[0]
@@ -65,9 +66,9 @@ async def create_workflow(workflow: WorkflowCreate, current_user: User = Depends
 @router.get("/{workflow_id}", response_model=Workflow)
 async def get_workflow(workflow_id: str, current_user: User = Depends(get_current_user)):
     """Get workflow details."""
-    supabase = SupabaseManager.get_client()
+    supabase = SupabaseManager.get_async_client()
     try:
-        response = supabase.table('workflows').select("*").eq('id', workflow_id).single().execute()
+        response = await supabase.table('workflows').select("*").eq('id', workflow_id).single().execute()
         if not response.data:
             raise HTTPException(status_code=404, detail="Workflow not found")
         return response.data
@@ -77,10 +78,10 @@ async def get_workflow(workflow_id: str, current_user: User = Depends(get_curren
 @router.patch("/{workflow_id}", response_model=Workflow)
 async def update_workflow(workflow_id: str, workflow: WorkflowUpdate, current_user: User = Depends(get_current_user)):
     """Update workflow."""
-    supabase = SupabaseManager.get_client()
+    supabase = SupabaseManager.get_async_client()
     try:
         data = workflow.dict(exclude_unset=True)
-        response = supabase.table('workflows').update(data).eq('id', workflow_id).execute()
+        response = await supabase.table('workflows').update(data).eq('id', workflow_id).execute()
         if not response.data:
             raise HTTPException(status_code=404, detail="Workflow not found or update failed")
         return response.data[0]
@@ -90,9 +91,9 @@ async def update_workflow(workflow_id: str, workflow: WorkflowUpdate, current_us
 @router.delete("/{workflow_id}")
 async def delete_workflow(workflow_id: str, current_user: User = Depends(get_current_user)):
     """Delete workflow."""
-    supabase = SupabaseManager.get_client()
+    supabase = SupabaseManager.get_async_client()
     try:
-        response = supabase.table('workflows').delete().eq('id', workflow_id).execute()
+        response = await supabase.table('workflows').delete().eq('id', workflow_id).execute()
         return {"status": "deleted"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -24,11 +24,66 @@ class Settings(BaseSettings):
     SUPABASE_KEY: str = ""
     SUPABASE_SERVICE_ROLE_KEY: str = ""
     SUPABASE_JWT_SECRET: str = ""
+
+    # Directory for state kept across restarts (JWKS mirror, search index
+    # snapshot, dataset cache), created with mode 0700. Default: ~/.cache/insighter
+    APP_STATE_DIR: str = ""
+
+    # Asymmetric (RS256/ES256) token verification. The JWKS URL defaults to
+    # <SUPABASE_URL>/auth/v1/.well-known/jwks.json and the on-disk mirror to
+    # <APP_STATE_DIR>/jwks.json.
+    SUPABASE_JWKS_URL: str = ""
+    JWKS_CACHE_PATH: str = ""
+    JWKS_REFRESH_INTERVAL_SECONDS: int = 600
+
+    # Supabase HTTP connection pool (one per worker process, shared by all
+    # per-request authenticated clients)
+    SUPABASE_POOL_MAX_CONNECTIONS: int = 100
+    SUPABASE_POOL_MAX_KEEPALIVE: int = 20
+    SUPABASE_POOL_KEEPALIVE_EXPIRY: float = 30.0
+    SUPABASE_HTTP2: bool = True
+    SUPABASE_HTTP_TIMEOUT: float = 30.0
+
+    # List endpoints are keyset-paginated (?limit=&cursor=, next page cursor in
+    # the X-Next-Cursor response header). Without either they return the whole
+    # list; the default limit applies to a cursor sent without a limit.
+    LIST_PAGE_DEFAULT_LIMIT: int = 100
+    LIST_PAGE_MAX_LIMIT: int = 500
+
+    # Unified search queries every table concurrently; a table that has not
+    # answered within this budget is skipped for the page (and reported).
+    SEARCH_SOURCE_TIMEOUT_SECONDS: float = 2.0
+    # "auto": use the search_workspace() RPC (database/scripts/search_documents.sql)
+    # when installed, else per-table search; "postgres" / "tables" force one.
+    # "memory" serves from the in-process index (local / air-gapped installs).
+    SEARCH_BACKEND: str = "auto"
+    SEARCH_INDEX_MAX_BYTES: int = 64 * 1024 * 1024
+    SEARCH_INDEX_SNAPSHOT_PATH: str = ""  # Default: <APP_STATE_DIR>/search_index.json
+    SEARCH_INDEX_SYNC_SECONDS: int = 30
+    # How often indexed rows are checked for deletes (the sync feed cannot see them)
+    SEARCH_INDEX_PRUNE_SECONDS: int = 300
     
     # Security
     SECRET_KEY: str = ""
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+
+    # Verified-token cache used by get_current_user. Entries live until the
+    # token's exp, capped by AUTH_CACHE_MAX_TTL_SECONDS (0 disables the cap).
+    AUTH_CACHE_MAX_ENTRIES: int = 10000
+    AUTH_CACHE_MAX_TTL_SECONDS: int = 3600
+
+    # bcrypt runs on a bounded thread pool off the event loop. Once
+    # workers + queue jobs are outstanding, new requests get a 503.
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_QUEUE: int = 64
+
+    # Model API keys: validated keys are cached per worker (the TTL bounds how long
+    # a revocation made on another worker can go unnoticed) and last_used_at is
+    # written at most once per key per flush interval.
+    MODEL_KEY_CACHE_MAX_ENTRIES: int = 10000
+    MODEL_KEY_CACHE_TTL_SECONDS: int = 60
+    MODEL_KEY_LAST_USED_FLUSH_SECONDS: int = 60
     
     # CORS
     BACKEND_CORS_ORIGINS: Union[List[str], str] = ["http://localhost:3000", "http://127.0.0.1:3000"]
@@ -44,6 +99,97 @@ class Settings(BaseSettings):
     AWS_REGION: str = "ap-southeast-1"
     AWS_ENDPOINT_URL: str = ""
 
+    # Dataset uploads stream into the bucket as multipart uploads ("s3": S3
+    # multipart via boto3, part size >= 5 MiB; "supabase": resumable TUS uploads
+    # in fixed 6 MiB chunks). At most one part per upload is held in memory.
+    UPLOAD_PART_SIZE: int = 8 * 1024 * 1024
+    DATASET_UPLOAD_MAX_BYTES: int = 10 * 1024 * 1024 * 1024
+
+    # Uploaded CSV / JSON datasets get a compressed Parquet copy (next to the
+    # original, recorded in datasets.metadata) built in the background, so
+    # readers can fetch only the columns and row groups they need.
+    DATASET_PARQUET_CONVERSION: bool = False
+    DATASET_PARQUET_ROW_GROUP_ROWS: int = 256 * 1024
+    DATASET_PARQUET_COMPRESSION: str = "zstd"
+    DATASET_CONVERSION_WORKERS: int = 2
+
+    # GET /api/datasets/{id}/preview page size cap
+    DATASET_PREVIEW_MAX_ROWS: int = 10000
+
+    # POST /api/datasets/query (DuckDB): per-query limits. Requests may ask
+    # for less, never more.
+    DATASET_QUERY_MEMORY_LIMIT_MB: int = 1024
+    DATASET_QUERY_TIMEOUT_SECONDS: float = 30.0
+    DATASET_QUERY_THREADS: int = 2
+
+    # Column profiles (POST /api/datasets/{id}/profile) run in a process pool
+    DATASET_PROFILE_WORKERS: int = 2
+
+    # Node-local cache of parsed datasets (Arrow IPC / .npy, memory-mapped)
+    # shared by notebook kernels and training jobs. Default directory:
+    # <APP_STATE_DIR>/dataset-cache (mode 0700, must belong to this user)
+    DATASET_CACHE_DIR: str = ""
+    DATASET_CACHE_MAX_BYTES: int = 20 * 1024 * 1024 * 1024
+    # Longest a training job keeps its staged data pinned in that cache
+    TRAINING_DATA_PIN_SECONDS: int = 6 * 3600
+
+    # Value-mode datasets (/api/datasets/values): items per bulk create / read
+    # request, rows per INSERT statement, and the size cap of one binary value
+    DATASET_VALUES_MAX_BATCH: int = 5000
+    DATASET_VALUES_INSERT_CHUNK: int = 1000
+    DATASET_VALUE_BINARY_MAX_BYTES: int = 16 * 1024 * 1024
+
+    # Dataset versions are split into content-defined chunks (stored once per
+    # owner) and described by a manifest per version. CONCURRENCY bounds chunk
+    # uploads and read-ahead; BATCH_BYTES is how much new data is buffered
+    # before its chunks are looked up and uploaded.
+    DATASET_CHUNK_MIN_BYTES: int = 256 * 1024
+    DATASET_CHUNK_AVG_BYTES: int = 1024 * 1024
+    DATASET_CHUNK_MAX_BYTES: int = 4 * 1024 * 1024
+    DATASET_VERSION_CONCURRENCY: int = 4
+    DATASET_VERSION_BATCH_BYTES: int = 32 * 1024 * 1024
+
+    # Bulk imports (/api/datasets/imports): files streamed concurrently, dataset
+    # rows per INSERT, files per import, and how often progress is saved.
+    # Private / loopback URLs are refused unless explicitly allowed.
+    DATASET_IMPORT_CONCURRENCY: int = 8
+    DATASET_IMPORT_INSERT_BATCH: int = 200
+    DATASET_IMPORT_MAX_FILES: int = 5000
+    DATASET_IMPORT_PROGRESS_SECONDS: float = 2.0
+    DATASET_IMPORT_ALLOW_PRIVATE_URLS: bool = False
+
+    # Notebook kernels (one per project) come from a pool: WARM kernels are
+    # started ahead of time, at most MAX_KERNELS run on this worker (warm ones
+    # included, MAX_PER_USER assigned to one user) and kernels idle for
+    # KERNEL_IDLE_TTL_SECONDS are shut down (0 keeps them until evicted).
+    KERNEL_POOL_WARM: int = 2
+    KERNEL_POOL_MAX_KERNELS: int = 32
+    KERNEL_POOL_MAX_PER_USER: int = 4
+    KERNEL_IDLE_TTL_SECONDS: float = 1800
+    # Executions waiting behind the running one, per kernel (more get a 429)
+    KERNEL_QUEUE_MAX: int = 16
+    # Kernel CPU / RSS / open files / threads are sampled from /proc every
+    # INTERVAL seconds; the last HISTORY samples are kept per project.
+    KERNEL_TELEMETRY_INTERVAL_SECONDS: float = 5
+    KERNEL_TELEMETRY_HISTORY: int = 720
+
+    # POST /api/notebooks/execute waits this long for a cell before answering
+    # with its execution id (outputs then stream from .../events); outputs of
+    # one execution are kept up to OUTPUT_MAX_BYTES.
+    KERNEL_EXECUTE_WAIT_SECONDS: float = 30
+    KERNEL_OUTPUT_MAX_BYTES: int = 1024 * 1024
+
+    # NotebookTool run_cell runs in pre-started worker processes, one cell at
+    # a time each, with per-cell CPU time and memory limits (rlimits) and a
+    # wall-clock timeout after which the worker is killed. Workers are
+    # replaced after MAX_RUNS cells.
+    NOTEBOOK_WORKERS: int = 2
+    NOTEBOOK_WORKER_MAX_RUNS: int = 100
+    NOTEBOOK_WORKER_MAX_QUEUE: int = 32
+    NOTEBOOK_CELL_CPU_SECONDS: float = 10
+    NOTEBOOK_CELL_MEMORY_BYTES: int = 512 * 1024 * 1024
+    NOTEBOOK_CELL_TIMEOUT_SECONDS: float = 30
+
     # Third-Party
     MLFLOW_TRACKING_URI: str = "http://localhost:5000"
 
@@ -0,0 +1,130 @@
+import json
+import threading
+import time
+from typing import Dict, Optional
+import httpx
+from starlette.concurrency import run_in_threadpool
+from app.core.config import settings
+from app.core.private_files import read_private, state_path, write_private
+import logging
+
+logger = logging.getLogger("insighter")
+
+
+class JWKSCache:
+    """
+    In-process copy of the Supabase Auth JWKS document for verifying asymmetric
+    (RS256/ES256) access tokens without a network hop.
+
+    The document is fetched once, mirrored to disk so restarts do not need the
+    network, and refreshed by a background thread. A token signed with an
+    unknown `kid` (key rotation) triggers an immediate refresh, at most once
+    per `min_refresh_interval`. The disk mirror decides which signing keys are
+    trusted, so it is only loaded when this user owns it and nobody else can
+    write to it.
+    """
+
+    algorithms = ("RS256", "ES256")
+
+    def __init__(self, url: str, cache_path: str, refresh_interval: float, min_refresh_interval: float = 30):
+        self.url = url
+        self.cache_path = cache_path
+        self.refresh_interval = refresh_interval
+        self.min_refresh_interval = min_refresh_interval
+        self._keys: Dict[str, dict] = {}
+        self._loaded = False
+        self._last_refresh = 0.0
+        self._lock = threading.Lock()
+        self._refresher: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def _set_keys(self, document: dict) -> None:
+        keys = {
+            k["kid"]: k for k in document.get("keys", [])
+            if k.get("kid") and k.get("use", "sig") == "sig"
+        }
+        self._keys = keys
+
+    def _load_from_disk(self) -> None:
+        try:
+            self._set_keys(json.loads(read_private(self.cache_path)))
+            logger.debug(f"Loaded {len(self._keys)} JWKS keys from {self.cache_path}")
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable JWKS cache {self.cache_path}: {e}")
+
+    def _save_to_disk(self, document: dict) -> None:
+        try:
+            write_private(self.cache_path, json.dumps(document).encode())
+        except OSError as e:
+            logger.warning(f"Could not persist JWKS cache to {self.cache_path}: {e}")
+
+    def refresh(self, force: bool = False) -> bool:
+        """Fetch the JWKS document. Returns False when skipped or failed."""
+        if not self.url:
+            return False
+        with self._lock:
+            if not force and time.time() - self._last_refresh < self.min_refresh_interval:
+                return False
+            self._last_refresh = time.time()
+        try:
+            headers = {"apikey": settings.SUPABASE_KEY} if settings.SUPABASE_KEY else {}
+            response = httpx.get(self.url, headers=headers, timeout=10)
+            response.raise_for_status()
+            document = response.json()
+        except (httpx.HTTPError, ValueError) as e:
+            logger.warning(f"JWKS refresh from {self.url} failed: {e}")
+            return False
+        self._set_keys(document)
+        self._save_to_disk(document)
+        logger.debug(f"Refreshed JWKS: {len(self._keys)} signing keys")
+        return True
+
+    def _refresh_loop(self) -> None:
+        while not self._stop.wait(self.refresh_interval):
+            self.refresh(force=True)
+
+    def _ensure_loaded(self) -> None:
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            self._load_from_disk()
+            self._loaded = True
+            if self.url and self.refresh_interval > 0:
+                self._refresher = threading.Thread(target=self._refresh_loop, name="jwks-refresh", daemon=True)
+                self._refresher.start()
+
+    async def get_key(self, kid: Optional[str]) -> Optional[dict]:
+        """
+        Return the JWK for `kid`, fetching the document on first use or rotation.
+        Fetches are rate-limited even while no keys are loaded, so an unreachable
+        JWKS endpoint costs one timeout per interval, not one per request.
+        """
+        if not kid:
+            return None
+        self._ensure_loaded()
+        key = self._keys.get(kid)
+        if key is None and await run_in_threadpool(self.refresh):
+            key = self._keys.get(kid)
+        return key
+
+    def stop(self) -> None:
+        self._stop.set()
+
+
+def _default_jwks_url() -> str:
+    if settings.SUPABASE_JWKS_URL:
+        return settings.SUPABASE_JWKS_URL
+    if settings.SUPABASE_URL:
+        return f"{settings.SUPABASE_URL.rstrip('/')}/auth/v1/.well-known/jwks.json"
+    return ""
+
+
+jwks_cache = JWKSCache(
+    url=_default_jwks_url(),
+    cache_path=settings.JWKS_CACHE_PATH or state_path("jwks.json"),
+    refresh_interval=settings.JWKS_REFRESH_INTERVAL_SECONDS,
+)
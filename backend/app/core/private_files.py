@@ -0,0 +1,78 @@
+import os
+import stat
+import tempfile
+from typing import Optional
+from app.core.config import settings
+
+
+def state_dir() -> str:
+    """
+    Directory for files the API keeps across restarts (JWKS mirror, search index
+    snapshot, dataset cache). Defaults to ~/.cache/insighter rather than the shared temp dir,
+    where any local user could plant files for us to load.
+    """
+    if settings.APP_STATE_DIR:
+        return settings.APP_STATE_DIR
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache_home, "insighter")
+
+
+def state_path(name: str) -> str:
+    return os.path.join(state_dir(), name)
+
+
+def private_dir(path: str) -> str:
+    """
+    Create directory `path` with mode 0700 if it is missing. An existing one is
+    refused (PermissionError) if it is a symlink, not a directory or owned by
+    another user, and tightened to 0700 otherwise.
+    """
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    info = os.lstat(path)
+    if not stat.S_ISDIR(info.st_mode):
+        raise PermissionError(f"{path} is not a directory")
+    if hasattr(os, "geteuid") and info.st_uid != os.geteuid():
+        raise PermissionError(f"{path} is owned by another user")
+    if info.st_mode & 0o077:
+        os.chmod(path, 0o700)
+    return path
+
+
+def read_private(path: str, max_bytes: Optional[int] = None) -> bytes:
+    """
+    Read a file only if it is a regular file owned by this user and not
+    writable by anyone else, and (when given) no larger than `max_bytes`.
+    Raises FileNotFoundError if it is missing, PermissionError if it is not
+    trusted and ValueError if it is too large.
+    """
+    flags = os.O_RDONLY | getattr(os, "O_NOFOLLOW", 0)
+    fd = os.open(path, flags)
+    with os.fdopen(fd, "rb") as f:
+        info = os.fstat(f.fileno())
+        if not stat.S_ISREG(info.st_mode):
+            raise PermissionError(f"{path} is not a regular file")
+        if hasattr(os, "geteuid") and info.st_uid != os.geteuid():
+            raise PermissionError(f"{path} is owned by another user")
+        if info.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+            raise PermissionError(f"{path} is writable by other users")
+        if max_bytes is not None and info.st_size > max_bytes:
+            raise ValueError(f"{path} is {info.st_size} bytes, over the {max_bytes} byte limit")
+        return f.read()
+
+
+def write_private(path: str, data: bytes) -> None:
+    """Atomically replace `path` with `data`, readable by this user only (0600, in a 0700 directory)."""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    # mkstemp creates the file with mode 0600
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
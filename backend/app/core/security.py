@@ -1,149 +1,3 @@
-<<<<<<< HEAD
-from datetime import datetime, timedelta
-from typing import Optional
-from jose import JWTError, jwt
-from passlib.context import CryptContext
-from pydantic import BaseModel
-from fastapi import Depends, HTTPException, status
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from app.core.config import settings
-from app.services.model_key_service import model_key_service
-
-# Password hashing context
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-# HTTP Bearer scheme
-security = HTTPBearer()
-
-class Token(BaseModel):
-    access_token: str
-    token_type: str
-
-class TokenData(BaseModel):
-    user_id: Optional[str] = None
-    role: Optional[str] = "user"
-
-class UserLogin(BaseModel):
-    username: str
-    password: str
-
-class User(BaseModel):
-    user_id: str
-    username: str
-    role: str
-    email: Optional[str] = None
-
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verify a password against its hash."""
-    return pwd_context.verify(plain_password, hashed_password)
-
-def get_password_hash(password: str) -> str:
-    """Generate a password hash."""
-    return pwd_context.hash(password)
-
-def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
-    """Create a JWT access token."""
-    to_encode = data.copy()
-    if expires_delta:
-        expire = datetime.utcnow() + expires_delta
-    else:
-        expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
-    return encoded_jwt
-
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> User:
-    """Dependency to extract and verify JWT token or Model API Key from request."""
-    token = credentials.credentials
-    
-    # 1. Check if it's an Insighter Model API Key
-    if token.startswith("ins_model_"):
-        is_valid, key_data = await model_key_service.validate_key(token)
-        if is_valid and key_data:
-            # Return a special service user for API key access
-            return User(
-                user_id=key_data['user_id'],
-                username=f"api_key_{key_data['key_prefix']}",
-                role="api_client",
-                email=None
-            )
-
-    credential_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-    
-    # Try local validation if SECRET_KEY matches Supabase JWT Secret
-    if settings.SUPABASE_JWT_SECRET:
-        try:
-            payload = jwt.decode(
-                token, 
-                settings.SUPABASE_JWT_SECRET, 
-                algorithms=[settings.ALGORITHM],
-                audience="authenticated"
-            )
-            user_id = payload.get("sub")
-            email = payload.get("email")
-            role = payload.get("role", "authenticated")
-            
-            if user_id:
-                return User(
-                    user_id=user_id,
-                    username=email.split('@')[0] if email else user_id,
-                    role=role,
-                    email=email
-                )
-        except JWTError as jwt_err:
-            print(f"Local JWT validation failed: {jwt_err}")
-            # Fall through to Supabase API check
-    
-    from app.db.supabase import SupabaseManager
-    supabase = SupabaseManager.get_client()
-    
-    if not supabase:
-        print("Error: Supabase client not initialized")
-        raise credential_exception
-
-    try:
-        # Verify token with Supabase Auth
-        # Note: supabase-py 2.x get_user(token) works
-        user_response = supabase.auth.get_user(token)
-        if not user_response or not user_response.user:
-             raise credential_exception
-        
-        user = user_response.user
-        
-        # Extract user info
-        user_id = user.id
-        email = user.email
-        # Role is often in user.role or app_metadata
-        role = user.role if hasattr(user, 'role') else 'user'
-        
-        # Map to our User model
-        return User(
-            user_id=user_id, 
-            username=email.split('@')[0] if email else user_id, # Fallback username
-            role=role,
-            email=email
-        )
-            
-    except Exception as e:
-        print(f"Auth error: {e}")
-        raise credential_exception
-
-def require_role(required_role: str):
-    """Dependency to check user role."""
-    async def role_checker(current_user: User = Depends(get_current_user)) -> User:
-        if current_user.role != required_role and current_user.role != "admin":
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail=f"Insufficient permissions. Required role: {required_role}"
-            )
-        return current_user
-    return role_checker
-=======
 from datetime import datetime, timedelta, timezone
 from typing import Optional
 from jose import JWTError, jwt
@@ -151,7 +5,11 @@ from passlib.context import CryptContext
 from pydantic import BaseModel
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from starlette.concurrency import run_in_threadpool
 from app.core.config import settings
+from app.core.token_cache import token_cache
+from app.core.jwks import jwks_cache
+from app.core.password_pool import password_pool, PoolSaturated
 from app.services.model_key_service import model_key_service
 import logging
 
@@ -189,6 +47,29 @@ def get_password_hash(password: str) -> str:
     """Generate a password hash."""
     return pwd_context.hash(password)
 
+# bcrypt takes 100-300 ms of CPU per call; async code must use these variants so
+# the event loop keeps serving other requests while hashes are computed.
+def _password_pool_busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Authentication is busy, please retry shortly",
+        headers={"Retry-After": "1"},
+    )
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password on the hashing pool (503 when the pool is saturated)."""
+    try:
+        return await password_pool.run(pwd_context.verify, plain_password, hashed_password)
+    except PoolSaturated:
+        raise _password_pool_busy()
+
+async def get_password_hash_async(password: str) -> str:
+    """Generate a password hash on the hashing pool (503 when the pool is saturated)."""
+    try:
+        return await password_pool.run(pwd_context.hash, password)
+    except PoolSaturated:
+        raise _password_pool_busy()
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create a JWT access token."""
     to_encode = data.copy()
@@ -201,6 +82,36 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
+async def verify_token_locally(token: str) -> Optional[dict]:
+    """
+    Verify a Supabase access token in-process and return its claims.
+    Asymmetric tokens are checked against the cached JWKS, symmetric ones against
+    SUPABASE_JWT_SECRET. Returns None when the token cannot be verified locally.
+    """
+    try:
+        header = jwt.get_unverified_header(token)
+    except JWTError:
+        return None
+
+    algorithm = header.get("alg")
+    try:
+        if algorithm in jwks_cache.algorithms:
+            key = await jwks_cache.get_key(header.get("kid"))
+            if key is None:
+                return None
+            return jwt.decode(token, key, algorithms=[algorithm], audience="authenticated")
+        if settings.SUPABASE_JWT_SECRET:
+            return jwt.decode(
+                token, 
+                settings.SUPABASE_JWT_SECRET, 
+                algorithms=[settings.ALGORITHM],
+                audience="authenticated"
+            )
+    except JWTError as jwt_err:
+        logger.debug(f"Local JWT validation failed: {jwt_err}")
+        # Fall through to Supabase API check
+    return None
+
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> User:
     """Dependency to extract and verify JWT token or Model API Key from request."""
     token = credentials.credentials
@@ -222,30 +133,24 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+    # 2. Tokens verified earlier are served from memory until their exp
+    cached_user = token_cache.get(token)
+    if cached_user is not None:
+        return cached_user
     
-    # Try local validation if SECRET_KEY matches Supabase JWT Secret
-    if settings.SUPABASE_JWT_SECRET:
-        try:
-            payload = jwt.decode(
-                token, 
-                settings.SUPABASE_JWT_SECRET, 
-                algorithms=[settings.ALGORITHM],
-                audience="authenticated"
-            )
-            user_id = payload.get("sub")
-            email = payload.get("email")
-            role = payload.get("role", "authenticated")
-            
-            if user_id:
-                return User(
-                    user_id=user_id,
-                    username=email.split('@')[0] if email else user_id,
-                    role=role,
-                    email=email
-                )
-        except JWTError as jwt_err:
-            logger.debug(f"Local JWT validation failed: {jwt_err}")
-            # Fall through to Supabase API check
+    # Verify locally (HS256 project secret or RS256/ES256 JWKS) before asking Supabase
+    payload = await verify_token_locally(token)
+    if payload and payload.get("sub"):
+        email = payload.get("email")
+        current_user = User(
+            user_id=payload["sub"],
+            username=email.split('@')[0] if email else payload["sub"],
+            role=payload.get("role", "authenticated"),
+            email=email
+        )
+        token_cache.set(token, current_user, payload.get("exp"))
+        return current_user
     
     from app.db.supabase import SupabaseManager
     supabase = SupabaseManager.get_client()
@@ -256,8 +161,9 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
 
     try:
         # Verify token with Supabase Auth
-        # Note: supabase-py 2.x get_user(token) works
-        user_response = supabase.auth.get_user(token)
+        # Note: supabase-py 2.x get_user(token) works. It is a blocking network
+        # call, so keep it off the event loop.
+        user_response = await run_in_threadpool(supabase.auth.get_user, token)
         if not user_response or not user_response.user:
              raise credential_exception
         
@@ -270,12 +176,21 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
         role = user.role if hasattr(user, 'role') else 'user'
         
         # Map to our User model
-        return User(
+        current_user = User(
             user_id=user_id, 
             username=email.split('@')[0] if email else user_id, # Fallback username
             role=role,
             email=email
         )
+        # Supabase Auth has vouched for the token, so its own exp is trustworthy.
+        # Tokens that are not JWTs have no exp to read and are not cached.
+        try:
+            claims = jwt.get_unverified_claims(token)
+        except JWTError:
+            claims = None
+        if claims is not None:
+            token_cache.set(token, current_user, claims.get("exp"))
+        return current_user
             
     except Exception as e:
         logger.error(f"Auth error: {e}")
@@ -291,4 +206,3 @@ def require_role(required_role: str):
             )
         return current_user
     return role_checker
->>>>>>> 6ed0e1967af29b666b40c0ee002df73ca8b9888f
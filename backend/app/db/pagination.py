@@ -0,0 +1,97 @@
+import base64
+import binascii
+import json
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+from fastapi import HTTPException, Query, Response
+from app.core.config import settings
+
+# List endpoints keep returning a plain JSON array (the shape every client
+# already consumes); the cursor for the following page travels in this header.
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(state: Any) -> str:
+    """Opaque, URL-safe encoding of a JSON-serialisable cursor state."""
+    raw = json.dumps(state, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Any:
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        return json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, binascii.Error):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def decode_keyset(cursor: str) -> List[str]:
+    """The (column value, id) of the last row of the previous page; 400 if the cursor is not one of ours."""
+    state = decode_cursor(cursor)
+    if not (isinstance(state, list) and len(state) == 2 and all(isinstance(v, str) for v in state)):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return state
+
+
+def _quote(value: str) -> str:
+    return '"' + str(value).replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+@dataclass
+class PageParams:
+    # None: the whole list in one response
+    limit: Optional[int]
+    cursor: Optional[str] = None
+
+
+def page_params(
+    limit: Optional[int] = Query(None, ge=1, le=settings.LIST_PAGE_MAX_LIMIT,
+                                 description="Maximum number of rows to return"),
+    cursor: Optional[str] = Query(None, description=f"Value of the {NEXT_CURSOR_HEADER} header of the previous page"),
+) -> PageParams:
+    """
+    Dependency for paginated list endpoints: `?limit=&cursor=`. Requests with
+    neither get the whole list, as before pagination existed; a cursor without
+    a limit pages by LIST_PAGE_DEFAULT_LIMIT.
+
+    The cursor is validated here, before the handler runs, so a bad one is a
+    400 rather than an error inside the handler's own exception handling.
+    """
+    if cursor is not None:
+        decode_keyset(cursor)
+    if limit is None and cursor is not None:
+        limit = settings.LIST_PAGE_DEFAULT_LIMIT
+    return PageParams(limit=limit, cursor=cursor)
+
+
+def paginate(query, page: PageParams, column: str = 'created_at'):
+    """
+    Apply keyset pagination over (`column`, id), newest first, to a PostgREST
+    select builder. Every page is a bounded index range scan that starts right
+    after the last row of the previous page, so deep pages cost the same as the
+    first one (unlike OFFSET).
+
+    Fetches one extra row so `finish_page` can tell whether another page exists.
+    Unpaged requests (no limit) get the same ordering without a bound.
+    """
+    if page.cursor:
+        state = decode_keyset(page.cursor)
+        value, last_id = _quote(state[0]), _quote(state[1])
+        query = query.or_(f"{column}.lt.{value},and({column}.eq.{value},id.lt.{last_id})")
+    query = query\
+        .order(column, desc=True)\
+        .order('id', desc=True)
+    if page.limit is None:
+        return query
+    return query.limit(page.limit + 1)
+
+
+def finish_page(rows: Optional[List[Dict[str, Any]]], page: PageParams, response: Response,
+                column: str = 'created_at') -> List[Dict[str, Any]]:
+    """Trim the look-ahead row and publish the next cursor (if any) as a header."""
+    rows = rows or []
+    if page.limit is not None and len(rows) > page.limit:
+        rows = rows[:page.limit]
+        last = rows[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor([last[column], last['id']])
+    return rows
@@ -1,4 +1,11 @@
+import os
+import asyncio
+import threading
+import weakref
+import httpx
 from supabase import create_client, Client
+from postgrest import AsyncPostgrestClient
+from postgrest.constants import DEFAULT_POSTGREST_CLIENT_HEADERS
 from app.core.config import settings
 import logging
 
@@ -7,6 +14,10 @@ logger = logging.getLogger("insighter")
 class SupabaseManager:
     _client: Client = None
     _service_client: Client = None
+    _http_client: httpx.Client = None
+    _http_client_pid: int = None
+    _async_http_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+    _lock = threading.Lock()
 
     @classmethod
     def get_client(cls) -> Client:
@@ -30,20 +41,117 @@ class SupabaseManager:
         return cls._service_client
 
     @classmethod
-    def get_authenticated_client(cls, token: str) -> Client:
-        """Get a client authenticated with a user's JWT."""
-        # We create a new client instance because the auth state is attached to the client
-        # and we don't want to share auth state between requests in a multi-threaded environment.
-        # However, we use the service role key as the base so that we have full power
-        # if needed, but the JWT will restrict it according to RLS.
+    def get_http_client(cls) -> httpx.Client:
+        """
+        Get the keep-alive HTTP connection pool shared by this worker process.
+        The pool is rebuilt after a fork so workers never share sockets.
+        """
+        pid = os.getpid()
+        if cls._http_client is None or cls._http_client_pid != pid:
+            with cls._lock:
+                if cls._http_client is None or cls._http_client_pid != pid:
+                    cls._http_client = httpx.Client(
+                        http2=settings.SUPABASE_HTTP2,
+                        timeout=settings.SUPABASE_HTTP_TIMEOUT,
+                        limits=cls._pool_limits(),
+                        follow_redirects=True,
+                    )
+                    cls._http_client_pid = pid
+        return cls._http_client
+
+    @classmethod
+    def _pool_limits(cls) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=settings.SUPABASE_POOL_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.SUPABASE_POOL_MAX_KEEPALIVE,
+            keepalive_expiry=settings.SUPABASE_POOL_KEEPALIVE_EXPIRY,
+        )
+
+    @classmethod
+    def close(cls) -> None:
+        """Release pooled connections (called on application shutdown)."""
+        with cls._lock:
+            if cls._http_client is not None and cls._http_client_pid == os.getpid():
+                cls._http_client.close()
+            cls._http_client = None
+            cls._http_client_pid = None
+
+    # ------------------------------------------------------------------
+    # Async data-access layer
+    #
+    # Route handlers are `async def`, so they must never call the blocking
+    # `.execute()` of the sync clients above: a single slow PostgREST query
+    # would stall every other request on the worker. The async clients below
+    # expose the same query-builder API (`.table(...).select(...)`) but
+    # `execute()` is awaited on a non-blocking connection pool.
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def get_async_http_client(cls) -> httpx.AsyncClient:
+        """
+        Get the non-blocking connection pool for the running event loop.
+        httpx async pools are bound to the loop they were created on, so we keep
+        one per loop (in practice exactly one per worker).
+        """
+        loop = asyncio.get_running_loop()
+        client = cls._async_http_clients.get(loop)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                http2=settings.SUPABASE_HTTP2,
+                timeout=settings.SUPABASE_HTTP_TIMEOUT,
+                limits=cls._pool_limits(),
+                follow_redirects=True,
+            )
+            cls._async_http_clients[loop] = client
+        return client
+
+    @classmethod
+    def _async_postgrest(cls, key: str, token: str = None) -> AsyncPostgrestClient:
         url = settings.SUPABASE_URL
-        key = settings.SUPABASE_SERVICE_ROLE_KEY or settings.SUPABASE_KEY
-        
         if not url or not key:
             return None
-            
-        client = create_client(url, key)
-        client.postgrest.auth(token)
-        return client
+        return AsyncPostgrestClient(
+            f"{url.rstrip('/')}/rest/v1",
+            headers={
+                **DEFAULT_POSTGREST_CLIENT_HEADERS,
+                "apikey": key,
+                "Authorization": f"Bearer {token or key}",
+            },
+            http_client=cls.get_async_http_client(),
+        )
+
+    @classmethod
+    def get_async_client(cls) -> AsyncPostgrestClient:
+        """Async counterpart of get_client() (anon key, RLS applies)."""
+        if not settings.SUPABASE_URL or not settings.SUPABASE_KEY:
+            logger.warning("Supabase credentials missing. Some features may not work.")
+            return None
+        return cls._async_postgrest(settings.SUPABASE_KEY)
+
+    @classmethod
+    def get_async_service_client(cls) -> AsyncPostgrestClient:
+        """Async counterpart of get_service_client() (bypasses RLS when a service key is set)."""
+        key = settings.SUPABASE_SERVICE_ROLE_KEY or settings.SUPABASE_KEY
+        if not settings.SUPABASE_URL or not key:
+            logger.warning("Supabase service credentials missing.")
+            return None
+        return cls._async_postgrest(key)
+
+    @classmethod
+    def get_async_authenticated_client(cls, token: str) -> AsyncPostgrestClient:
+        """
+        Get a PostgREST client authenticated with a user's JWT. Only the headers
+        are per-request: the client wraps the worker's shared connection pool,
+        so no auth state leaks between requests and no handshake is paid per
+        call. The service role key is the apikey; the JWT restricts it via RLS.
+        """
+        return cls._async_postgrest(settings.SUPABASE_SERVICE_ROLE_KEY or settings.SUPABASE_KEY, token)
+
+    @classmethod
+    async def aclose(cls) -> None:
+        """Release the async pool of the running event loop."""
+        client = cls._async_http_clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
 
 supabase = SupabaseManager.get_client()
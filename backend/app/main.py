@@ -9,6 +9,15 @@ from app.tools.experiments import router as experiments_tool_router
 from app.tools.labeling import router as labeling_tool_router
 from app.tools.deployment import router as deployment_tool_router
 from app.core.config import settings
+from app.db.supabase import SupabaseManager
+from app.db.pagination import NEXT_CURSOR_HEADER
+from app.services.model_key_service import model_key_service
+from app.core.password_pool import password_pool
+from app.services.search_index import search_index
+from app.services.profiling import dataset_profiler
+from app.services.jupyter_manager import kernel_service
+from app.services.kernel_telemetry import kernel_telemetry
+from app.tools.notebook.workers import cell_workers
 
 app = FastAPI(
     title="The Insighter Enterprise API",
@@ -27,7 +36,9 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
-    expose_headers=["*"]
+    # Only the API's own response headers (credentials are allowed, so no wildcard)
+    expose_headers=[NEXT_CURSOR_HEADER, "X-Total-Rows", "X-Preview-Source", "X-Query-Views",
+                    "X-Checksum", "X-Execution-Id"]
 )
 
 app.include_router(health.router, prefix="/api", tags=["Health"])
@@ -51,6 +62,26 @@ app.include_router(experiments_tool_router.router, prefix="/api/tools/experiment
 app.include_router(labeling_tool_router.router, prefix="/api/tools/labeling", tags=["Tools: Labeling"])
 app.include_router(deployment_tool_router.router, prefix="/api/tools/deployment", tags=["Tools: Deployment"])
 
+@app.on_event("startup")
+async def startup_event():
+    if settings.SEARCH_BACKEND == "memory":
+        search_index.start()
+    kernel_service.start()
+    kernel_telemetry.start()
+    cell_workers.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await search_index.stop()
+    await model_key_service.shutdown()
+    password_pool.shutdown()
+    dataset_profiler.shutdown()
+    kernel_telemetry.stop()
+    kernel_service.shutdown_all()
+    cell_workers.shutdown()
+    SupabaseManager.close()
+    await SupabaseManager.aclose()
+
 @app.get("/")
 async def root():
     return {"status": "online", "system": "The Insighter Enterprise Core"}
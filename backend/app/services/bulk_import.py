@@ -0,0 +1,379 @@
+import asyncio
+import ipaddress
+import os
+import posixpath
+import socket
+import uuid
+import zipfile
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, List, Optional
+from urllib.parse import unquote, urlsplit
+import httpcore
+import httpx
+from postgrest import ReturnMethod
+from starlette.concurrency import run_in_threadpool
+from app.core.config import settings
+from app.db.supabase import SupabaseManager
+from app.services.conversion import ParquetConverter, parquet_converter
+from app.services.ingest import inspection_result, inspector_for
+from app.services.search_index import publish_change
+from app.services.storage import StorageBackend, get_storage_backend
+from app.services.uploads import (
+    ALLOWED_EXTENSIONS, CONTENT_TYPES, StreamingUpload, dataset_row, file_extension, object_key,
+)
+import logging
+
+logger = logging.getLogger("insighter")
+
+# Read size for archive members and the progress granularity of every file
+_READ_CHUNK = 1024 * 1024
+
+# Finished jobs kept in memory for GET /imports/{id}; older ones are served
+# from the dataset_imports table
+_KEEP_FINISHED = 100
+
+
+class BulkImportError(ValueError):
+    """An import source or one of its files cannot be used."""
+
+
+def _client(token: str):
+    # Imports outlive the request (see ParquetConverter.convert)
+    if settings.SUPABASE_SERVICE_ROLE_KEY:
+        return SupabaseManager.get_async_service_client()
+    return SupabaseManager.get_async_authenticated_client(token)
+
+
+async def _resolve(host: str, port: int) -> List[str]:
+    try:
+        infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    except socket.gaierror:
+        raise BulkImportError(f"Cannot resolve {host}")
+    return list(dict.fromkeys(info[4][0] for info in infos))
+
+
+async def public_addresses(host: str, port: int) -> List[str]:
+    """Resolve `host` once; refuse it if any of its addresses is not public."""
+    addresses = await _resolve(host, port)
+    for address in addresses:
+        if not ipaddress.ip_address(address.split('%', 1)[0]).is_global:
+            raise BulkImportError(f"{host} is not a public address")
+    return addresses
+
+
+async def check_public_url(url: str) -> None:
+    """Only http(s) URLs of public hosts can be imported, unless DATASET_IMPORT_ALLOW_PRIVATE_URLS."""
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise BulkImportError(f"Not an http(s) URL: {url}")
+    if settings.DATASET_IMPORT_ALLOW_PRIVATE_URLS:
+        return
+    await public_addresses(parts.hostname, parts.port or (443 if parts.scheme == "https" else 80))
+
+
+class _PublicNetworkBackend(httpcore.AsyncNetworkBackend):
+    """
+    Opens connections only to the addresses it has just vetted. Checking a host
+    and then letting the client resolve it again would let a DNS-rebinding host
+    answer the check with a public address and the connection with a private
+    one. The Host header and TLS server name still come from the URL.
+    """
+
+    def __init__(self):
+        self._backend = httpcore.AnyIOBackend()
+
+    async def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+        if settings.DATASET_IMPORT_ALLOW_PRIVATE_URLS:
+            return await self._backend.connect_tcp(host, port, timeout, local_address, socket_options)
+        error: Optional[Exception] = None
+        for address in await public_addresses(host, port):
+            try:
+                return await self._backend.connect_tcp(address, port, timeout, local_address, socket_options)
+            except (httpcore.ConnectError, httpcore.ConnectTimeout) as e:
+                error = e
+        raise error
+
+    async def connect_unix_socket(self, path, timeout=None, socket_options=None):
+        raise BulkImportError("Unix sockets cannot be imported from")
+
+    async def sleep(self, seconds: float) -> None:
+        await self._backend.sleep(seconds)
+
+
+class _PublicTransport(httpx.AsyncHTTPTransport):
+    def __init__(self):
+        super().__init__()
+        # httpx has no option for the network backend of its connection pool
+        self._pool = httpcore.AsyncConnectionPool(
+            ssl_context=httpx.create_ssl_context(), network_backend=_PublicNetworkBackend(),
+        )
+
+
+class UrlSource:
+    """Files fetched over HTTP(S), streamed straight into storage."""
+
+    def __init__(self, files: List[Dict[str, Optional[str]]]):
+        self.entries = [
+            {"name": f.get('name') or posixpath.basename(unquote(urlsplit(f['url']).path)) or "download",
+             "source": f['url']}
+            for f in files
+        ]
+        self._http: Optional[httpx.AsyncClient] = None
+
+    async def open(self, entry: Dict[str, Any]) -> AsyncIterator[bytes]:
+        if self._http is None:
+            # Every connection, redirects included, goes through the address check
+            self._http = httpx.AsyncClient(
+                transport=_PublicTransport(), follow_redirects=True, timeout=settings.SUPABASE_HTTP_TIMEOUT,
+            )
+        async with self._http.stream("GET", entry['source']) as response:
+            if response.status_code != 200:
+                raise BulkImportError(f"GET {entry['source']} returned {response.status_code}")
+            async for chunk in response.aiter_bytes(_READ_CHUNK):
+                yield chunk
+
+    async def close(self) -> None:
+        if self._http is not None:
+            await self._http.aclose()
+
+
+class ZipSource:
+    """
+    Members of a zip archive spooled to a local file. Zip members can be read
+    independently, so every worker reads its own member through its own handle.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with zipfile.ZipFile(path) as archive:
+            self.entries = [
+                {"name": posixpath.basename(info.filename), "source": info.filename, "size": info.file_size}
+                for info in archive.infolist()
+                if not info.is_dir() and not posixpath.basename(info.filename).startswith('.')
+                and '__MACOSX/' not in info.filename
+            ]
+
+    async def open(self, entry: Dict[str, Any]) -> AsyncIterator[bytes]:
+        archive = await run_in_threadpool(zipfile.ZipFile, self.path)
+        try:
+            member = await run_in_threadpool(archive.open, entry['source'])
+            with member:
+                while True:
+                    chunk = await run_in_threadpool(member.read, _READ_CHUNK)
+                    if not chunk:
+                        break
+                    yield chunk
+        finally:
+            archive.close()
+
+    async def close(self) -> None:
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class ImportJob:
+    """
+    One bulk import and the state of each of its files:
+
+        pending -> importing -> stored -> done
+                             -> failed | skipped
+
+    `stored` files are in the bucket and wait for the batched insert of their
+    dataset rows.
+    """
+
+    def __init__(self, user_id: str, project_id: str, entries: List[Dict[str, Any]]):
+        self.id = str(uuid.uuid4())
+        self.user_id = user_id
+        self.project_id = project_id
+        self.status = "running"
+        self.created_at = datetime.now(timezone.utc).isoformat()
+        self.finished_at: Optional[str] = None
+        self.files: List[Dict[str, Any]] = [
+            {"index": i, "name": e['name'], "source": e['source'], "status": "pending",
+             "bytes": 0, "size": e.get('size'), "dataset_id": None, "error": None}
+            for i, e in enumerate(entries)
+        ]
+
+    def counts(self) -> Dict[str, int]:
+        counts = {state: 0 for state in ("pending", "importing", "stored", "done", "failed", "skipped")}
+        for f in self.files:
+            counts[f['status']] += 1
+        return counts
+
+    def summary(self, include_files: bool = True, status: Optional[str] = None) -> Dict[str, Any]:
+        result = {
+            "id": self.id,
+            "project_id": self.project_id,
+            "status": self.status,
+            "total": len(self.files),
+            "counts": self.counts(),
+            "bytes": sum(f['bytes'] for f in self.files),
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+        if include_files:
+            result["files"] = [f for f in self.files if status is None or f['status'] == status]
+        return result
+
+
+class BulkImporter:
+    """
+    Runs imports in the background: a bounded pool of workers streams files
+    into storage (computing size, checksum and schema on the way, as
+    /upload does) and their dataset rows are inserted in batches of
+    DATASET_IMPORT_INSERT_BATCH. Progress lives in memory and is saved to
+    dataset_imports every few seconds, so any worker can report it.
+    """
+
+    def __init__(self, concurrency: int, insert_batch: int):
+        self.concurrency = max(1, concurrency)
+        self.insert_batch = max(1, insert_batch)
+        self.jobs: "OrderedDict[str, ImportJob]" = OrderedDict()
+        self._tasks: set = set()
+
+    def get(self, job_id: str) -> Optional[ImportJob]:
+        return self.jobs.get(job_id)
+
+    def start(self, job: ImportJob, source, token: str) -> None:
+        self.jobs[job.id] = job
+        finished = [j for j in self.jobs.values() if j.status != "running"]
+        for old in finished[:max(0, len(finished) - _KEEP_FINISHED)]:
+            del self.jobs[old.id]
+        task = asyncio.create_task(self.run(job, source, token))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def run(self, job: ImportJob, source, token: str,
+                  backend: Optional[StorageBackend] = None) -> ImportJob:
+        backend = backend or get_storage_backend()
+        token = settings.SUPABASE_SERVICE_ROLE_KEY or token
+        queue: asyncio.Queue = asyncio.Queue()
+        for entry in job.files:
+            queue.put_nowait(entry)
+        ready: List[Dict[str, Any]] = []
+        insert_lock = asyncio.Lock()
+
+        async def worker() -> None:
+            while True:
+                try:
+                    entry = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                row = await self._import_file(job, entry, source, backend, token)
+                if row is not None:
+                    ready.append(row)
+                    if len(ready) >= self.insert_batch:
+                        async with insert_lock:
+                            await self._insert(job, ready, backend, token)
+
+        await self._save(job, token)
+        progress = asyncio.create_task(self._report(job, token))
+        try:
+            await asyncio.gather(*(worker() for _ in range(min(self.concurrency, len(job.files)) or 1)))
+            async with insert_lock:
+                await self._insert(job, ready, backend, token)
+            counts = job.counts()
+            job.status = "failed" if counts['failed'] and not counts['done'] else "completed"
+        except Exception as e:
+            logger.error(f"Import {job.id} failed: {e}")
+            job.status = "failed"
+        finally:
+            progress.cancel()
+            job.finished_at = datetime.now(timezone.utc).isoformat()
+            await source.close()
+            await self._save(job, token, final=True)
+        logger.info(f"Import {job.id}: {job.counts()}")
+        return job
+
+    async def _import_file(self, job: ImportJob, entry: Dict[str, Any], source, backend: StorageBackend,
+                           token: str) -> Optional[Dict[str, Any]]:
+        """Stream one file into storage. Returns its dataset row, or None if it failed or was skipped."""
+        name = entry['name']
+        if file_extension(name) not in ALLOWED_EXTENSIONS:
+            entry.update(status="skipped", error="File type not allowed")
+            return None
+        entry['status'] = "importing"
+        inspector = inspector_for(name)
+        upload = StreamingUpload(backend, object_key(job.user_id, name), CONTENT_TYPES[file_extension(name)],
+                                 token, observers=[inspector] if inspector else None)
+        try:
+            await upload.start()
+            async for chunk in source.open(entry):
+                await upload.write(chunk)
+                entry['bytes'] = upload.size
+                if upload.size > settings.DATASET_UPLOAD_MAX_BYTES:
+                    raise BulkImportError("File too large")
+            result = await upload.finish()
+        except Exception as e:
+            await upload.abort()
+            entry.update(status="failed", error=str(e))
+            return None
+        schema = inspection_result(inspector) if inspector in upload.observers else None
+        entry.update(status="stored", size=result['size'])
+        row = dataset_row(job.user_id, name, upload.key, result['size'], result['checksum'], job.project_id, schema)
+        row['id'] = str(uuid.uuid4())
+        entry['dataset_id'] = row['id']
+        return row
+
+    async def _insert(self, job: ImportJob, ready: List[Dict[str, Any]], backend: StorageBackend,
+                      token: str) -> None:
+        """Insert the dataset rows of stored files in one statement (rows are not read back)."""
+        batch = ready[:]
+        del ready[:]
+        if not batch:
+            return
+        by_id = {f['dataset_id']: f for f in job.files if f['dataset_id']}
+        try:
+            await _client(token).table('datasets')\
+                .insert(batch, returning=ReturnMethod.minimal)\
+                .execute()
+        except Exception as e:
+            logger.error(f"Import {job.id}: inserting {len(batch)} datasets failed: {e}")
+            for row in batch:
+                by_id[row['id']].update(status="failed", error=f"Could not record dataset: {e}", dataset_id=None)
+                try:
+                    await backend.delete(row['file_path'], token)
+                except Exception as cleanup_error:
+                    logger.warning(f"Could not remove orphaned object {row['file_path']}: {cleanup_error}")
+            return
+        for row in batch:
+            by_id[row['id']]['status'] = "done"
+            publish_change('dataset', row)
+            if settings.DATASET_PARQUET_CONVERSION and ParquetConverter.supports(row['name']):
+                task = asyncio.create_task(parquet_converter.convert(row, token))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+
+    async def _report(self, job: ImportJob, token: str) -> None:
+        while True:
+            await asyncio.sleep(settings.DATASET_IMPORT_PROGRESS_SECONDS)
+            await self._save(job, token)
+
+    async def _save(self, job: ImportJob, token: str, final: bool = False) -> None:
+        summary = job.summary(include_files=final)
+        record = {
+            "id": job.id,
+            "user_id": job.user_id,
+            "project_id": job.project_id,
+            "status": job.status,
+            "total": summary['total'],
+            "counts": summary['counts'],
+            "bytes": summary['bytes'],
+            "updated_at": datetime.now(timezone.utc).isoformat(),
+        }
+        if final:
+            record["files"] = summary['files']
+            record["finished_at"] = job.finished_at
+        try:
+            await _client(token).table('dataset_imports')\
+                .upsert(record, returning=ReturnMethod.minimal)\
+                .execute()
+        except Exception as e:
+            logger.warning(f"Could not save progress of import {job.id}: {e}")
+
+
+bulk_importer = BulkImporter(settings.DATASET_IMPORT_CONCURRENCY, settings.DATASET_IMPORT_INSERT_BATCH)
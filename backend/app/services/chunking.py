@@ -0,0 +1,107 @@
+import hashlib
+from typing import List
+import numpy as np
+
+# Gear table of the rolling hash. Derived from sha256 rather than a seeded RNG
+# so chunk boundaries (and therefore deduplication) never change with the numpy
+# version. Clients that chunk on their side must use the same table.
+GEAR = np.array(
+    [int.from_bytes(hashlib.sha256(b"insighter-gear-%d" % i).digest()[:4], 'big') for i in range(256)],
+    dtype=np.uint32,
+)
+
+# Bytes covered by the rolling hash (one bit of shift per byte)
+WINDOW = 32
+
+ALGORITHM = "gear32-normalized"
+
+
+def gear_hashes(data: np.ndarray) -> np.ndarray:
+    """
+    Gear rolling hash at every byte: h[i] = sum(GEAR[data[i - k]] << k, k < 32)
+    (mod 2**32), i.e. the hash of the 32-byte window ending at i.
+
+    Computed by doubling the window (1, 2, 4 ... 32 bytes) in five vectorized
+    passes instead of one Python step per byte. The first 31 positions hash a
+    shorter window.
+    """
+    h = GEAR[data]
+    step = 1
+    while step < WINDOW:
+        # The shifted operand is a temporary, so the in-place add reads old values
+        h[step:] += h[:-step] << np.uint32(step)
+        step *= 2
+    return h
+
+
+class Chunker:
+    """
+    Content-defined chunking (FastCDC-style normalized chunking over a 32-bit
+    gear hash). A boundary falls after byte i when the top bits of the window
+    hash ending at i are zero: more bits are required before `avg_size` and
+    fewer after it, which keeps chunk sizes close to the average. Boundaries
+    depend only on the preceding WINDOW bytes, so an edit moves at most the
+    chunks around it and every other chunk (and its digest) is unchanged.
+
+    Feed bytes in any pieces; complete chunks come back as soon as they are
+    decided. Memory is bounded by a few `max_size` windows.
+    """
+
+    def __init__(self, min_size: int, avg_size: int, max_size: int):
+        if not 0 < min_size <= avg_size <= max_size:
+            raise ValueError("Chunk sizes must satisfy 0 < min <= avg <= max")
+        self.min_size = min_size
+        self.avg_size = avg_size
+        self.max_size = max_size
+        bits = max(1, int(avg_size).bit_length() - 1)
+        self._strict = np.uint32(1 << (32 - min(31, bits + 2)))
+        self._loose = np.uint32(1 << (32 - min(31, max(1, bits - 2))))
+        self._buffer = bytearray()
+        # Bytes before the buffer that are still inside the hash window
+        self._context = b""
+
+    def feed(self, data: bytes) -> List[bytes]:
+        chunks: List[bytes] = []
+        view = memoryview(data)
+        # Bounded slices keep the hash arrays (4 bytes per input byte) small
+        step = self.max_size
+        for start in range(0, len(view), step):
+            self._buffer += view[start:start + step]
+            if len(self._buffer) >= 2 * self.max_size:
+                chunks.extend(self._cut(final=False))
+        return chunks
+
+    def finish(self) -> List[bytes]:
+        return self._cut(final=True)
+
+    def _cut(self, final: bool) -> List[bytes]:
+        buffer = self._buffer
+        if not buffer:
+            return []
+        context = len(self._context)
+        window = np.frombuffer(self._context + bytes(buffer), dtype=np.uint8)
+        hashes = gear_hashes(window)[context:]
+        # End offsets (exclusive) at which each threshold allows a boundary
+        strict = np.flatnonzero(hashes < self._strict) + 1
+        loose = np.flatnonzero(hashes < self._loose) + 1
+
+        chunks: List[bytes] = []
+        start, length = 0, len(buffer)
+        # A chunk is decided once max_size bytes after its start are known
+        while start < length and (final or start + self.max_size <= length):
+            end = self._boundary(strict, loose, start, length)
+            chunks.append(bytes(buffer[start:end]))
+            start = end
+        self._context = (self._context + bytes(buffer[:start]))[-(WINDOW - 1):]
+        del buffer[:start]
+        return chunks
+
+    def _boundary(self, strict: np.ndarray, loose: np.ndarray, start: int, length: int) -> int:
+        low, mid, high = start + self.min_size, start + self.avg_size, start + self.max_size
+        i = np.searchsorted(strict, low)
+        if i < len(strict) and strict[i] < mid:
+            return int(strict[i])
+        i = np.searchsorted(loose, mid)
+        if i < len(loose) and loose[i] < high:
+            return int(loose[i])
+        return min(high, length)
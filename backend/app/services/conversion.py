@@ -0,0 +1,314 @@
+import asyncio
+import io
+import json
+import os
+import posixpath
+import queue
+import tempfile
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.json as pajson
+import pyarrow.parquet as pq
+from starlette.concurrency import run_in_threadpool
+from app.core.config import settings
+from app.db.supabase import SupabaseManager
+from app.services.storage import StorageBackend, get_storage_backend
+from app.services.uploads import StreamingUpload, file_extension
+import logging
+
+logger = logging.getLogger("insighter")
+
+PARQUET_SOURCE_FORMATS = {'.csv', '.json'}
+
+# Read size of the streaming CSV/JSON readers (one block is parsed at a time)
+_BLOCK_SIZE = 4 * 1024 * 1024
+
+
+def parquet_key(key: str) -> str:
+    """The Parquet copy lives next to the original: a/b/sales.csv -> a/b/sales.parquet."""
+    root, _ = posixpath.splitext(key)
+    return f"{root}.parquet"
+
+
+def parquet_copy(dataset: Dict[str, Any]) -> Optional[str]:
+    """
+    Storage key of a dataset's Parquet copy, if one is ready and was made from
+    the bytes currently stored (checksums match).
+    """
+    copy = (dataset.get('metadata') or {}).get('parquet') or {}
+    if copy.get('status') != 'ready':
+        return None
+    if dataset.get('checksum') and copy.get('source_checksum') != dataset.get('checksum'):
+        return None
+    return copy.get('path')
+
+
+class _ChunkPipe(io.RawIOBase):
+    """
+    Blocking file-like reader fed from the event loop, so pyarrow's streaming
+    readers can consume a download as it arrives. At most `maxsize` chunks are
+    buffered; the producer waits when the reader falls behind.
+    """
+
+    def __init__(self, maxsize: int = 8):
+        self._queue: "queue.Queue" = queue.Queue(maxsize)
+        self._pending = memoryview(b"")
+        self._eof = False
+        self.abandoned = threading.Event()
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while not self._pending and not self._eof:
+            item = self._queue.get()
+            if item is None:
+                self._eof = True
+            elif isinstance(item, BaseException):
+                raise item
+            else:
+                self._pending = memoryview(item)
+        count = min(len(buffer), len(self._pending))
+        buffer[:count] = self._pending[:count]
+        self._pending = self._pending[count:]
+        return count
+
+    def put(self, item) -> bool:
+        """Called from a worker thread; False once the reader has given up."""
+        while not self.abandoned.is_set():
+            try:
+                self._queue.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+
+def _iter_json_array(source) -> Iterator[Any]:
+    """Elements of a top-level JSON array, decoded one at a time."""
+    decoder = json.JSONDecoder()
+    reader = io.TextIOWrapper(source, encoding='utf-8-sig')
+    buffer, started = "", False
+    while True:
+        chunk = reader.read(_BLOCK_SIZE)
+        buffer += chunk
+        pos = 0
+        if not started:
+            stripped = buffer.lstrip()
+            if not stripped:
+                if not chunk:
+                    return
+                continue
+            if stripped[0] != '[':
+                raise ValueError("Expected a JSON array of records")
+            buffer, started = stripped[1:], True
+        while True:
+            while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+                pos += 1
+            if pos < len(buffer) and buffer[pos] == ']':
+                return
+            try:
+                value, pos = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if not chunk:
+                    raise
+                break
+            yield value
+        buffer = buffer[pos:]
+
+
+def iter_record_batches(source, fmt: str, schema: Optional[Dict[str, Any]]) -> Iterator[pa.RecordBatch]:
+    """Record batches of a CSV / JSON byte stream (layout and delimiter from the inferred schema)."""
+    if fmt == '.csv':
+        reader = pacsv.open_csv(
+            source,
+            read_options=pacsv.ReadOptions(block_size=_BLOCK_SIZE),
+            parse_options=pacsv.ParseOptions(
+                delimiter=(schema or {}).get('delimiter') or ',',
+                newlines_in_values=True,
+            ),
+        )
+        yield from reader
+    elif (schema or {}).get('layout') == 'lines':
+        yield from pajson.open_json(source, read_options=pajson.ReadOptions(block_size=_BLOCK_SIZE))
+    else:
+        # pyarrow only reads line-delimited JSON; arrays are batched here and
+        # every batch is cast to the schema of the first one
+        arrow_schema = None
+        records: List[Any] = []
+        for value in _iter_json_array(source):
+            records.append(value if isinstance(value, dict) else {"value": value})
+            if len(records) == 65536:
+                batch = pa.RecordBatch.from_pylist(records, schema=arrow_schema)
+                arrow_schema = batch.schema
+                records = []
+                yield batch
+        if records or arrow_schema is None:
+            yield pa.RecordBatch.from_pylist(records, schema=arrow_schema)
+
+
+def write_batches(batches: Iterator[pa.RecordBatch], path: str,
+                  row_group_rows: int, compression: str) -> Dict[str, Any]:
+    """
+    Write record batches to a Parquet file with row groups of `row_group_rows`
+    rows. Only one row group is held in memory at a time.
+    """
+    writer = None
+    pending: List[pa.RecordBatch] = []
+    pending_rows = 0
+    rows = 0
+
+    def write(table: pa.Table) -> None:
+        nonlocal writer
+        if writer is None:
+            writer = pq.ParquetWriter(path, table.schema, compression=compression)
+        writer.write_table(table, row_group_size=row_group_rows)
+
+    try:
+        for batch in batches:
+            pending.append(batch)
+            pending_rows += batch.num_rows
+            rows += batch.num_rows
+            if pending_rows >= row_group_rows:
+                # Write the full row groups; the remainder starts the next one
+                table = pa.Table.from_batches(pending)
+                full = pending_rows - pending_rows % row_group_rows
+                write(table.slice(0, full))
+                rest = table.slice(full)
+                pending, pending_rows = rest.to_batches(), rest.num_rows
+        if pending_rows:
+            write(pa.Table.from_batches(pending))
+        if writer is None:
+            raise ValueError("Dataset has no rows to convert")
+    finally:
+        if writer is not None:
+            writer.close()
+    metadata = pq.read_metadata(path)
+    return {"rows": rows, "row_groups": metadata.num_row_groups}
+
+
+def write_parquet(source, fmt: str, schema: Optional[Dict[str, Any]], path: str,
+                  row_group_rows: int, compression: str) -> Dict[str, Any]:
+    """
+    Convert a CSV / JSON byte stream to a Parquet file with row groups of
+    `row_group_rows` rows. Runs in a worker thread.
+    """
+    return write_batches(iter_record_batches(source, fmt, schema), path, row_group_rows, compression)
+
+
+class ParquetConverter:
+    """
+    Background conversion of uploaded CSV / JSON datasets to a compressed,
+    row-grouped Parquet copy stored next to the original, recorded under
+    datasets.metadata.parquet:
+
+        {"status": "converting" | "ready" | "failed", "path", "size_bytes",
+         "rows", "row_groups", "compression", "source_checksum", "converted_at",
+         "error"}
+
+    The original is streamed from storage through the converter (no local copy);
+    the Parquet output is staged in a temporary file before upload. At most
+    DATASET_CONVERSION_WORKERS conversions run at a time per process.
+    """
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    @staticmethod
+    def supports(filename: str) -> bool:
+        return file_extension(filename) in PARQUET_SOURCE_FORMATS
+
+    async def _set_status(self, dataset_id: str, copy: Dict[str, Any]) -> None:
+        supabase = SupabaseManager.get_async_service_client()
+        current = await supabase.table('datasets')\
+            .select("metadata")\
+            .eq('id', dataset_id)\
+            .execute()
+        if not current.data:
+            return
+        metadata = dict(current.data[0].get('metadata') or {})
+        metadata['parquet'] = copy
+        await supabase.table('datasets')\
+            .update({"metadata": metadata})\
+            .eq('id', dataset_id)\
+            .execute()
+
+    async def convert(self, dataset: Dict[str, Any], token: str,
+                      backend: Optional[StorageBackend] = None) -> Optional[Dict[str, Any]]:
+        """Convert one dataset row (needs id, name, file_path, schema, checksum)."""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.workers)
+        backend = backend or get_storage_backend()
+        # Conversions outlive the request, so storage is accessed with the
+        # service key when one is configured rather than the user's session
+        token = settings.SUPABASE_SERVICE_ROLE_KEY or token
+        source_key, fmt = dataset['file_path'], file_extension(dataset['name'])
+        copy = {
+            "status": "converting",
+            "path": parquet_key(source_key),
+            "compression": settings.DATASET_PARQUET_COMPRESSION,
+            "source_checksum": dataset.get('checksum'),
+        }
+        async with self._semaphore:
+            await self._set_status(dataset['id'], copy)
+            fd, path = tempfile.mkstemp(suffix=".parquet")
+            os.close(fd)
+            try:
+                stats = await self._convert_to_file(backend, source_key, token, fmt, dataset.get('schema'), path)
+                upload = StreamingUpload(backend, copy['path'], "application/vnd.apache.parquet", token)
+                await upload.start()
+                try:
+                    with open(path, 'rb') as f:
+                        while True:
+                            chunk = await run_in_threadpool(f.read, backend.part_size)
+                            if not chunk:
+                                break
+                            await upload.write(chunk)
+                    result = await upload.finish()
+                except BaseException:
+                    await upload.abort()
+                    raise
+                copy.update(stats, status="ready", size_bytes=result['size'],
+                            converted_at=datetime.now(timezone.utc).isoformat())
+            except Exception as e:
+                logger.error(f"Parquet conversion of dataset {dataset['id']} failed: {e}")
+                copy.update(status="failed", error=str(e))
+            finally:
+                os.unlink(path)
+            await self._set_status(dataset['id'], copy)
+        return copy
+
+    async def _convert_to_file(self, backend: StorageBackend, key: str, token: str, fmt: str,
+                               schema: Optional[Dict[str, Any]], path: str) -> Dict[str, Any]:
+        pipe = _ChunkPipe()
+
+        async def produce():
+            try:
+                async for chunk in backend.download(key, token):
+                    if not await run_in_threadpool(pipe.put, chunk):
+                        return
+                await run_in_threadpool(pipe.put, None)
+            except Exception as e:
+                await run_in_threadpool(pipe.put, e)
+
+        def consume():
+            try:
+                return write_parquet(
+                    io.BufferedReader(pipe, buffer_size=_BLOCK_SIZE), fmt, schema, path,
+                    settings.DATASET_PARQUET_ROW_GROUP_ROWS, settings.DATASET_PARQUET_COMPRESSION,
+                )
+            finally:
+                pipe.abandoned.set()
+
+        producer = asyncio.ensure_future(produce())
+        try:
+            return await run_in_threadpool(consume)
+        finally:
+            await producer
+
+
+parquet_converter = ParquetConverter(settings.DATASET_CONVERSION_WORKERS)
@@ -0,0 +1,297 @@
+import hashlib
+import os
+import tempfile
+import threading
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Set, Tuple
+import numpy as np
+import pyarrow as pa
+import pyarrow.dataset as ds
+from app.core.config import settings
+from app.core.private_files import private_dir, state_path
+from app.services.dataset_reader import arrow_source
+from app.services.profiling import fingerprint
+from app.services.storage import StorageBackend
+from app.services.uploads import file_extension
+import logging
+
+try:
+    import fcntl
+except ImportError:  # Windows: locking is per process only
+    fcntl = None
+
+logger = logging.getLogger("insighter")
+
+# Sequential read size when copying a .npy file into the cache
+_COPY_CHUNK = 8 * 1024 * 1024
+
+
+class CachedDataset:
+    """
+    A dataset materialized on local disk: an uncompressed Arrow IPC file
+    (tabular formats) or the original .npy. Both are read memory-mapped, so
+    every process reading the same entry shares its pages.
+    """
+
+    def __init__(self, digest: str, path: str, format: str, size: int):
+        self.digest = digest
+        self.path = path
+        self.format = format
+        self.size = size
+
+    def table(self) -> pa.Table:
+        """Zero-copy Arrow table over the mapped file."""
+        return pa.ipc.open_file(pa.memory_map(self.path)).read_all()
+
+    def array(self) -> np.ndarray:
+        return np.load(self.path, mmap_mode='r')
+
+
+class DatasetCache:
+    """
+    Node-local, content-addressed cache of dataset files, shared by every
+    process on the machine (API workers, notebook kernels, training jobs).
+
+    Entries are keyed by storage path plus checksum, so a re-uploaded file is
+    a new entry and a stale one is never served. The directory is capped at
+    `max_bytes`: after each fill the least recently used entries (by mtime,
+    refreshed on every hit) are removed, except pinned ones. Pins are marker
+    files tagged with the owning pid, so a crashed process does not keep its
+    entries forever. Removing an entry never breaks existing mappings of it.
+    `root` must belong to this user (it is created with mode 0700), since
+    every process maps whatever it finds there as dataset contents.
+
+    All methods block (downloads, parsing, disk I/O): call from a worker thread.
+    """
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._objects = os.path.join(root, "objects")
+        self._pins = os.path.join(root, "pins")
+        self._locks = os.path.join(root, "locks")
+        self._thread_locks: Dict[str, threading.Lock] = {}
+        self._guard = threading.Lock()
+        self._root_checked = False
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def digest(dataset: Dict[str, Any]) -> str:
+        return hashlib.sha256(f"{dataset['file_path']}\0{fingerprint(dataset)}".encode()).hexdigest()
+
+    @staticmethod
+    def _format(dataset: Dict[str, Any]) -> str:
+        return 'npy' if file_extension(dataset['name']) == '.npy' else 'arrow'
+
+    def _dir(self, path: str) -> str:
+        if not self._root_checked:
+            private_dir(self.root)
+            self._root_checked = True
+        os.makedirs(path, mode=0o700, exist_ok=True)
+        return path
+
+    def _path(self, digest: str, format: str) -> str:
+        return os.path.join(self._objects, f"{digest}.{format}")
+
+    @contextmanager
+    def _locked(self, name: str) -> Iterator[None]:
+        """Exclusive across threads of this process and, where fcntl exists, across processes."""
+        with self._guard:
+            lock = self._thread_locks.setdefault(name, threading.Lock())
+        with lock:
+            if fcntl is None:
+                yield
+                return
+            with open(os.path.join(self._dir(self._locks), f"{name}.lock"), 'a') as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def lookup(self, dataset: Dict[str, Any]) -> Optional[CachedDataset]:
+        digest, format = self.digest(dataset), self._format(dataset)
+        path = self._path(digest, format)
+        # Not in the middle of an eviction, which could remove it right after
+        with self._locked("evict"):
+            try:
+                os.utime(path)
+                return CachedDataset(digest, path, format, os.path.getsize(path))
+            except FileNotFoundError:
+                return None
+
+    def get(self, backend: StorageBackend, dataset: Dict[str, Any], token: str) -> CachedDataset:
+        """
+        The cached entry of a dataset row (needs name, file_path, checksum /
+        size_bytes), filling it if missing. The entry is not pinned and may be
+        evicted as soon as this returns: callers that read it later use
+        `get_pinned`.
+        """
+        entry, pin_id = self.get_pinned(backend, dataset, token)
+        self.unpin(pin_id)
+        return entry
+
+    def get_pinned(self, backend: StorageBackend, dataset: Dict[str, Any], token: str) -> Tuple[CachedDataset, str]:
+        """
+        Like `get`, and the entry stays pinned until `unpin(pin_id)`. The pin is
+        taken before the entry is looked up or filled, so no eviction (of this
+        or another process) can remove it in between.
+        """
+        digest = self.digest(dataset)
+        pin_id = self._pin(digest)
+        try:
+            entry = self.lookup(dataset)
+            if entry is not None:
+                self.hits += 1
+                return entry, pin_id
+            with self._locked(digest):
+                # Another thread or process may have filled it meanwhile
+                entry = self.lookup(dataset)
+                if entry is not None:
+                    self.hits += 1
+                    return entry, pin_id
+                self.misses += 1
+                entry = self._fill(backend, dataset, token, digest)
+            self.evict()
+            return entry, pin_id
+        except BaseException:
+            self.unpin(pin_id)
+            raise
+
+    def _fill(self, backend: StorageBackend, dataset: Dict[str, Any], token: str, digest: str) -> CachedDataset:
+        format = self._format(dataset)
+        fd, tmp = tempfile.mkstemp(dir=self._dir(self._objects), prefix=".fill-")
+        os.close(fd)
+        try:
+            if format == 'npy':
+                key = dataset['file_path']
+                size = backend.object_size(key, token)
+                with open(tmp, 'wb') as f:
+                    for start in range(0, size, _COPY_CHUNK):
+                        f.write(backend.read_range(key, token, start, min(start + _COPY_CHUNK, size) - 1))
+            else:
+                # Parsed once here (from the Parquet copy when there is one);
+                # readers then map the Arrow buffers directly
+                source = arrow_source(backend, dataset, token)
+                if isinstance(source, ds.Dataset):
+                    schema, batches = source.schema, source.to_batches()
+                else:
+                    schema, batches = source.schema, source
+                with pa.OSFile(tmp, 'wb') as sink, pa.ipc.new_file(sink, schema) as writer:
+                    for batch in batches:
+                        writer.write_batch(batch)
+            path = self._path(digest, format)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        logger.info(f"Cached dataset {dataset.get('id', dataset['file_path'])} ({os.path.getsize(path)} bytes)")
+        return CachedDataset(digest, path, format, os.path.getsize(path))
+
+    def pin(self, entry: CachedDataset) -> str:
+        """Protect an entry from eviction until `unpin(pin_id)` (or this process exits)."""
+        return self._pin(entry.digest)
+
+    def _pin(self, digest: str) -> str:
+        pin_id = f"{digest}.{os.getpid()}.{uuid.uuid4().hex}"
+        open(os.path.join(self._dir(self._pins), pin_id), 'w').close()
+        return pin_id
+
+    def unpin(self, pin_id: str) -> None:
+        try:
+            os.unlink(os.path.join(self._pins, pin_id))
+        except FileNotFoundError:
+            pass
+
+    @contextmanager
+    def pinned(self, backend: StorageBackend, dataset: Dict[str, Any], token: str) -> Iterator[CachedDataset]:
+        entry, pin_id = self.get_pinned(backend, dataset, token)
+        try:
+            yield entry
+        finally:
+            self.unpin(pin_id)
+
+    def _pinned_digests(self) -> Set[str]:
+        pinned = set()
+        try:
+            names = os.listdir(self._pins)
+        except FileNotFoundError:
+            return pinned
+        for name in names:
+            digest, pid, _ = name.split('.', 2)
+            if _process_alive(int(pid)):
+                pinned.add(digest)
+            else:
+                self.unpin(name)
+        return pinned
+
+    def _entries(self) -> Iterator[Tuple[str, os.stat_result]]:
+        try:
+            names = os.listdir(self._objects)
+        except FileNotFoundError:
+            return
+        for name in names:
+            if name.startswith('.'):
+                continue
+            try:
+                yield name, os.stat(os.path.join(self._objects, name))
+            except FileNotFoundError:
+                continue
+
+    def evict(self) -> int:
+        """Remove least recently used, unpinned entries until the cache fits `max_bytes`. Returns bytes freed."""
+        with self._locked("evict"):
+            entries = sorted(self._entries(), key=lambda e: e[1].st_mtime)
+            total = sum(stat.st_size for _, stat in entries)
+            if total <= self.max_bytes:
+                return 0
+            pinned = self._pinned_digests()
+            freed = 0
+            for name, stat in entries:
+                if total - freed <= self.max_bytes:
+                    break
+                if name.split('.', 1)[0] in pinned:
+                    continue
+                try:
+                    os.unlink(os.path.join(self._objects, name))
+                except FileNotFoundError:
+                    continue
+                freed += stat.st_size
+                self.evictions += 1
+            if total - freed > self.max_bytes:
+                logger.warning(f"Dataset cache over its {self.max_bytes} byte cap: remaining entries are pinned")
+            return freed
+
+    def stats(self) -> Dict[str, int]:
+        entries = list(self._entries())
+        return {
+            "entries": len(entries),
+            "bytes": sum(stat.st_size for _, stat in entries),
+            "max_bytes": self.max_bytes,
+            "pinned": len(self._pinned_digests()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+def _process_alive(pid: int) -> bool:
+    if os.name == 'nt':
+        # os.kill would terminate the process on Windows
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+dataset_cache = DatasetCache(
+    settings.DATASET_CACHE_DIR or state_path("dataset-cache"),
+    settings.DATASET_CACHE_MAX_BYTES,
+)
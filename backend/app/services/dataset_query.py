@@ -0,0 +1,138 @@
+import re
+import threading
+from typing import Any, Dict, Iterator, List
+import pyarrow as pa
+from app.services.dataset_reader import arrow_source
+from app.services.storage import StorageBackend
+from app.services.uploads import file_extension
+import logging
+
+logger = logging.getLogger("insighter")
+
+# Rows per Arrow batch streamed back to the client
+_BATCH_ROWS = 64 * 1024
+
+_IDENTIFIER_RE = re.compile(r'[a-z_][a-z0-9_]*')
+
+
+class QueryError(ValueError):
+    """The query was rejected or failed (not read-only, unknown table, out of memory, ...)."""
+
+
+class QueryTimeout(QueryError):
+    """The query ran longer than its timeout and was interrupted."""
+
+
+def view_name(filename: str) -> str:
+    """SQL name of a dataset's view: `Sales 2024.csv` -> `sales_2024`."""
+    stem = filename[:-len(file_extension(filename))] if file_extension(filename) else filename
+    name = re.sub(r'[^a-z0-9_]+', '_', stem.lower()).strip('_') or 'dataset'
+    return f"_{name}" if name[0].isdigit() else name
+
+
+def dataset_views(datasets: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """View name -> dataset row. Names are unique within a project (`sales`, `sales_2`, ...)."""
+    views: Dict[str, Dict[str, Any]] = {}
+    for dataset in sorted(datasets, key=lambda d: d.get('created_at') or ''):
+        base = name = view_name(dataset['name'])
+        suffix = 2
+        while name in views:
+            name = f"{base}_{suffix}"
+            suffix += 1
+        views[name] = dataset
+    return views
+
+
+class QueryResult:
+    """
+    A running query: the result `schema` and `batches`, a lazy iterator of
+    Arrow record batches. The DuckDB connection is closed once the batches are
+    exhausted (or the iterator is closed).
+    """
+
+    def __init__(self, schema: pa.Schema, batches: Iterator[pa.RecordBatch], views: List[str]):
+        self.schema = schema
+        self.batches = batches
+        self.views = views
+
+
+def run_query(backend: StorageBackend, datasets: List[Dict[str, Any]], token: str, sql: str,
+              memory_limit_mb: int, timeout_seconds: float, threads: int) -> QueryResult:
+    """
+    Run one read-only SELECT with DuckDB over a project's datasets. Blocking:
+    call from a worker thread.
+
+    Each dataset the query names is registered as a view on its stored file
+    (see `dataset_reader.arrow_source`), so DuckDB pushes column projection and
+    filters into the file reader and only fetches what the query needs. Every
+    query gets its own in-memory connection with `memory_limit_mb` and
+    `threads`; file, network and extension access is disabled and the
+    configuration locked before the user's SQL runs. The query is interrupted
+    after `timeout_seconds`, including while its result is being streamed.
+    """
+    try:
+        import duckdb
+    except ImportError:
+        raise QueryError("SQL queries require duckdb (pip install duckdb)")
+
+    connection = duckdb.connect(":memory:", config={
+        "memory_limit": f"{memory_limit_mb}MB",
+        "threads": threads,
+        "autoinstall_known_extensions": False,
+        "autoload_known_extensions": False,
+    })
+    timer = None
+    try:
+        try:
+            statements = connection.extract_statements(sql)
+        except duckdb.Error as e:
+            raise QueryError(str(e))
+        if len(statements) != 1 or statements[0].type != duckdb.StatementType.SELECT:
+            raise QueryError("Only a single SELECT statement is allowed")
+
+        # Only the datasets the query mentions are opened (opening reads a
+        # Parquet footer, or the first batch of a JSON array)
+        referenced = set(_IDENTIFIER_RE.findall(sql.lower()))
+        registered = []
+        for name, dataset in dataset_views(datasets).items():
+            if name in referenced:
+                try:
+                    connection.register(name, arrow_source(backend, dataset, token))
+                except ValueError as e:
+                    raise QueryError(f"Dataset {dataset['name']!r}: {e}")
+                registered.append(name)
+
+        connection.execute("SET enable_external_access = false")
+        connection.execute("SET lock_configuration = true")
+
+        timer = threading.Timer(timeout_seconds, connection.interrupt)
+        timer.daemon = True
+        timer.start()
+        try:
+            result = connection.execute(statements[0].query)
+            to_reader = getattr(result, 'to_arrow_reader', None) or result.fetch_record_batch
+            reader = to_reader(_BATCH_ROWS)
+        except duckdb.InterruptException:
+            raise QueryTimeout(f"Query exceeded the {timeout_seconds:g}s timeout")
+        except duckdb.Error as e:
+            raise QueryError(str(e))
+    except BaseException:
+        if timer is not None:
+            timer.cancel()
+        connection.close()
+        raise
+
+    def batches() -> Iterator[pa.RecordBatch]:
+        try:
+            for batch in reader:
+                yield batch
+        except duckdb.InterruptException:
+            # Headers are already sent: end the stream without its
+            # end-of-stream marker so the client sees it was cut short
+            logger.warning(f"Dataset query interrupted after {timeout_seconds:g}s while streaming")
+            raise QueryTimeout(f"Query exceeded the {timeout_seconds:g}s timeout")
+        finally:
+            timer.cancel()
+            connection.close()
+
+    return QueryResult(reader.schema, batches(), registered)
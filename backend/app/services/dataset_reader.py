@@ -0,0 +1,493 @@
+import io
+import json
+import math
+import re
+import sys
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.dataset as ds
+import pyarrow.fs as pafs
+import pyarrow.json as pajson
+import pyarrow.parquet as pq
+from app.services.conversion import iter_record_batches, parquet_copy
+from app.services.ingest import NpyInspector
+from app.services.storage import StorageBackend
+from app.services.uploads import file_extension
+
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# Smallest read issued against storage (pyarrow already asks for whole column
+# chunks; this absorbs its small footer and page-header reads)
+_READ_AHEAD = 64 * 1024
+# Sequential read and parse block size for CSV / JSON. pyarrow's streaming
+# readers prefetch about 8 blocks, which bounds how far a scan reads past the page.
+_TEXT_BLOCK = 256 * 1024
+# Rows decoded at a time (bounds memory independently of the row group size)
+_BATCH_ROWS = 8192
+
+
+class PreviewError(ValueError):
+    """The preview request cannot be served (bad column, filter or format)."""
+
+
+class RangeFile(io.RawIOBase):
+    """
+    Seekable, read-only view of a stored object built on ranged GETs, so
+    pyarrow can read a Parquet footer and selected column chunks without
+    downloading the file. Keeps the most recent block to absorb small reads.
+    """
+
+    def __init__(self, backend: StorageBackend, key: str, token: str, size: Optional[int] = None):
+        self.backend = backend
+        self.key = key
+        self.token = token
+        self.size = size if size is not None else backend.object_size(key, token)
+        self._pos = 0
+        self._block_start = 0
+        self._block = b""
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            self._pos = offset
+        elif whence == io.SEEK_CUR:
+            self._pos += offset
+        else:
+            self._pos = self.size + offset
+        return self._pos
+
+    def readinto(self, buffer) -> int:
+        count = min(len(buffer), self.size - self._pos)
+        if count <= 0:
+            return 0
+        start, end = self._pos, self._pos + count
+        block_end = self._block_start + len(self._block)
+        if not (self._block_start <= start and end <= block_end):
+            fetch_end = min(max(end, start + _READ_AHEAD), self.size) - 1
+            self._block = self.backend.read_range(self.key, self.token, start, fetch_end)
+            self._block_start = start
+        offset = start - self._block_start
+        buffer[:count] = self._block[offset:offset + count]
+        self._pos = end
+        return count
+
+
+class _SequentialFile(io.RawIOBase):
+    """Forward-only reader over consecutive ranged GETs, for text formats."""
+
+    def __init__(self, backend: StorageBackend, key: str, token: str, chunk_size: int = _TEXT_BLOCK):
+        self._file = RangeFile(backend, key, token)
+        self._chunk_size = chunk_size
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        view = memoryview(buffer)[:self._chunk_size]
+        return self._file.readinto(view)
+
+
+class StorageFileSystem(pafs.FileSystemHandler):
+    """
+    Read-only pyarrow filesystem over a storage backend (paths are object keys),
+    for use as `pyarrow.fs.PyFileSystem(StorageFileSystem(backend, token))`.
+    Every open is a fresh RangeFile, so a dataset can be scanned repeatedly.
+    """
+
+    def __init__(self, backend: StorageBackend, token: str):
+        self.backend = backend
+        self.token = token
+        self._sizes: Dict[str, int] = {}
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, StorageFileSystem) and other.backend is self.backend and other.token == self.token
+
+    def __ne__(self, other) -> bool:
+        return not self == other
+
+    def _size(self, path: str) -> int:
+        if path not in self._sizes:
+            self._sizes[path] = self.backend.object_size(path, self.token)
+        return self._sizes[path]
+
+    def get_type_name(self) -> str:
+        return "insighter-storage"
+
+    def normalize_path(self, path: str) -> str:
+        return path
+
+    def get_file_info(self, paths):
+        return [pafs.FileInfo(path, pafs.FileType.File, size=self._size(path)) for path in paths]
+
+    def get_file_info_selector(self, selector):
+        raise NotImplementedError("Listing is not supported")
+
+    def open_input_file(self, path: str):
+        return pa.PythonFile(RangeFile(self.backend, path, self.token, self._size(path)), mode="r")
+
+    def open_input_stream(self, path: str):
+        return self.open_input_file(path)
+
+    def _read_only(self, *args, **kwargs):
+        raise NotImplementedError("Storage is read-only here")
+
+    create_dir = delete_dir = delete_dir_contents = delete_root_dir_contents = _read_only
+    delete_file = move = copy_file = open_output_stream = open_append_stream = _read_only
+
+
+_FILTER_RE = re.compile(r'^(?P<column>.+?)\.(?P<op>eq|neq|gt|gte|lt|lte|in|is|like)\.(?P<value>.*)$', re.S)
+
+
+@dataclass
+class Predicate:
+    column: str
+    op: str
+    value: Any
+
+
+def parse_filters(filters: List[str]) -> List[Predicate]:
+    """
+    PostgREST-style predicates, ANDed: `age.gte.30`, `country.eq.US`,
+    `id.in.(1,2,3)`, `note.is.null`, `name.like.*smith*`.
+    """
+    predicates = []
+    for raw in filters:
+        match = _FILTER_RE.match(raw)
+        if not match:
+            raise PreviewError(f"Invalid filter {raw!r}, expected column.op.value")
+        column, op, value = match.group('column'), match.group('op'), match.group('value')
+        if op == 'in':
+            if not (value.startswith('(') and value.endswith(')')):
+                raise PreviewError(f"Invalid filter {raw!r}, expected column.in.(a,b)")
+            value = [v.strip() for v in value[1:-1].split(',') if v.strip()]
+        elif op == 'is':
+            if value.lower() not in ('null', 'not.null', 'true', 'false'):
+                raise PreviewError(f"Invalid filter {raw!r}, expected null, not.null, true or false")
+            value = value.lower()
+        predicates.append(Predicate(column, op, value))
+    return predicates
+
+
+def _cast(value: Any, type_: pa.DataType) -> Any:
+    if pa.types.is_string(type_) or pa.types.is_large_string(type_):
+        return value
+    try:
+        return pc.cast(pa.array([value]), type_)[0].as_py()
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+        raise PreviewError(f"Cannot compare {value!r} with a {type_} column")
+
+
+def _expression(predicates: List[Predicate], schema: pa.Schema) -> Optional[pc.Expression]:
+    expression = None
+    for p in predicates:
+        if schema.get_field_index(p.column) < 0:
+            raise PreviewError(f"Unknown filter column {p.column!r}")
+        field = pc.field(p.column)
+        type_ = schema.field(p.column).type
+        if p.op == 'is':
+            term = {
+                'null': field.is_null(), 'not.null': ~field.is_null(),
+                'true': field == True, 'false': field == False,  # noqa: E712
+            }[p.value]
+        elif p.op == 'in':
+            term = field.isin(pa.array([_cast(v, type_) for v in p.value], type=type_))
+        elif p.op == 'like':
+            pattern = re.escape(p.value).replace(r'\*', '.*').replace('%', '.*')
+            term = pc.match_substring_regex(field, f"^{pattern}$", ignore_case=True)
+        else:
+            value = _cast(p.value, type_)
+            term = {
+                'eq': field == value, 'neq': field != value, 'gt': field > value,
+                'gte': field >= value, 'lt': field < value, 'lte': field <= value,
+            }[p.op]
+        expression = term if expression is None else expression & term
+    return expression
+
+
+def _row_group_may_match(row_group, schema: pa.Schema, predicates: List[Predicate]) -> bool:
+    """Skip a row group whose min/max statistics rule out a comparison predicate."""
+    names = [row_group.column(i).path_in_schema for i in range(row_group.num_columns)]
+    for p in predicates:
+        if p.op not in ('eq', 'gt', 'gte', 'lt', 'lte') or p.column not in names:
+            continue
+        stats = row_group.column(names.index(p.column)).statistics
+        if stats is None or not stats.has_min_max:
+            continue
+        value = _cast(p.value, schema.field(p.column).type)
+        try:
+            low, high = stats.min, stats.max
+            if (p.op == 'eq' and not low <= value <= high) or \
+               (p.op == 'gt' and not high > value) or \
+               (p.op == 'gte' and not high >= value) or \
+               (p.op == 'lt' and not low < value) or \
+               (p.op == 'lte' and not low <= value):
+                return False
+        except TypeError:
+            continue
+    return True
+
+
+def _select(schema: pa.Schema, columns: Optional[List[str]]) -> List[str]:
+    if not columns:
+        return schema.names
+    unknown = [c for c in columns if schema.get_field_index(c) < 0]
+    if unknown:
+        raise PreviewError(f"Unknown column(s): {', '.join(unknown)}")
+    return columns
+
+
+def _page(batches: Iterator[pa.RecordBatch], expression, columns: List[str],
+          offset: int, limit: int) -> Iterator[pa.RecordBatch]:
+    """Filter, skip `offset` matching rows and stop after `limit`; stops reading early."""
+    remaining = limit
+    for batch in batches:
+        if expression is not None:
+            batch = pa.Table.from_batches([batch]).filter(expression).combine_chunks()
+            batch = batch.to_batches()[0] if batch.num_rows else None
+            if batch is None:
+                continue
+        if offset >= batch.num_rows:
+            offset -= batch.num_rows
+            continue
+        batch = batch.slice(offset, remaining).select(columns)
+        offset = 0
+        remaining -= batch.num_rows
+        yield batch
+        if remaining <= 0:
+            return
+
+
+class DatasetPreview:
+    """
+    One page of a stored dataset: `schema` (of the returned columns) and
+    `batches`, a lazy iterator that performs the reads as it is consumed.
+    """
+
+    def __init__(self, schema: pa.Schema, batches: Iterator[pa.RecordBatch], source: str):
+        self.schema = schema
+        self.batches = batches
+        self.source = source
+
+
+def _parquet_preview(file: RangeFile, columns, predicates, offset, limit) -> DatasetPreview:
+    parquet = pq.ParquetFile(file)
+    schema = parquet.schema_arrow
+    selected = _select(schema, columns)
+    expression = _expression(predicates, schema)
+    needed = list(dict.fromkeys(selected + [p.column for p in predicates]))
+    metadata = parquet.metadata
+
+    groups = []
+    skip = offset
+    for i in range(metadata.num_row_groups):
+        row_group = metadata.row_group(i)
+        if predicates:
+            if _row_group_may_match(row_group, schema, predicates):
+                groups.append(i)
+        elif skip >= row_group.num_rows:
+            # Whole row groups before the offset are never read
+            skip -= row_group.num_rows
+        else:
+            groups.append(i)
+    if not predicates:
+        offset = skip
+
+    def batches():
+        if not groups:
+            return
+        yield from parquet.iter_batches(batch_size=min(_BATCH_ROWS, max(limit, 1)),
+                                        row_groups=groups, columns=needed)
+
+    return DatasetPreview(schema=pa.schema([schema.field(c) for c in selected]),
+                          batches=_page(batches(), expression, selected, offset, limit),
+                          source="parquet")
+
+
+def _text_preview(backend, key, token, fmt, dataset_schema, columns, predicates, offset, limit) -> DatasetPreview:
+    source = io.BufferedReader(_SequentialFile(backend, key, token), buffer_size=_TEXT_BLOCK)
+    if fmt == '.csv':
+        # Column projection happens in the CSV parser
+        wanted = list(dict.fromkeys(columns + [p.column for p in predicates])) if columns else []
+        try:
+            reader = pacsv.open_csv(
+                source,
+                read_options=pacsv.ReadOptions(block_size=_TEXT_BLOCK, use_threads=False),
+                parse_options=pacsv.ParseOptions(
+                    delimiter=(dataset_schema or {}).get('delimiter') or ',', newlines_in_values=True
+                ),
+                convert_options=pacsv.ConvertOptions(include_columns=wanted),
+            )
+        except KeyError as e:
+            raise PreviewError(f"Unknown column: {e}")
+        first = None
+    elif (dataset_schema or {}).get('layout') == 'lines':
+        reader = pajson.open_json(source, read_options=pajson.ReadOptions(block_size=_TEXT_BLOCK, use_threads=False))
+        first = None
+    else:
+        reader = iter_record_batches(source, fmt, dataset_schema)
+        first = next(reader, None)
+    if first is not None:
+        schema = first.schema
+
+        def chained():
+            yield first
+            yield from reader
+        stream = chained()
+    else:
+        try:
+            schema = reader.schema
+        except AttributeError:
+            return DatasetPreview(pa.schema([]), iter(()), source=fmt.lstrip('.'))
+        stream = reader
+    selected = _select(schema, columns)
+    expression = _expression(predicates, schema)
+    return DatasetPreview(schema=pa.schema([schema.field(c) for c in selected]),
+                          batches=_page(stream, expression, selected, offset, limit),
+                          source=fmt.lstrip('.'))
+
+
+def _npy_preview(file: RangeFile, columns, predicates, offset, limit) -> DatasetPreview:
+    inspector = NpyInspector()
+    inspector.feed(file.backend.read_range(file.key, file.token, 0, min(NpyInspector.head_bytes, file.size) - 1))
+    header = inspector._header
+    if header is None:
+        raise PreviewError("Not a valid .npy file")
+    if header['fortran_order']:
+        raise PreviewError("Fortran-ordered arrays cannot be previewed")
+    dtype = np.dtype(header['descr'])
+    shape = tuple(header['shape'])
+    rows = shape[0] if shape else 1
+    row_shape = shape[1:]
+    row_bytes = dtype.itemsize * int(math.prod(row_shape))
+    data_start = file.size - rows * row_bytes
+
+    def to_batch(array: np.ndarray) -> pa.RecordBatch:
+        if dtype.names:
+            return pa.RecordBatch.from_arrays([pa.array(array[n]) for n in dtype.names], names=list(dtype.names))
+        if len(row_shape) == 1:
+            return pa.RecordBatch.from_arrays([pa.array(array[:, i]) for i in range(row_shape[0])],
+                                              names=[str(i) for i in range(row_shape[0])])
+        if not row_shape:
+            return pa.RecordBatch.from_arrays([pa.array(array)], names=["value"])
+        return pa.RecordBatch.from_arrays([pa.array(list(array.reshape(len(array), -1)))], names=["value"])
+
+    def read(start_row: int, count: int) -> pa.RecordBatch:
+        count = max(0, min(count, rows - start_row))
+        if count == 0:
+            return to_batch(np.empty((0,) + row_shape, dtype=dtype))
+        start = data_start + start_row * row_bytes
+        raw = file.backend.read_range(file.key, file.token, start, start + count * row_bytes - 1)
+        return to_batch(np.frombuffer(raw, dtype=dtype).reshape((count,) + row_shape))
+
+    schema = read(0, 0).schema
+    selected = _select(schema, columns)
+    expression = _expression(predicates, schema)
+
+    if expression is None:
+        # Row offsets map straight to byte offsets: read exactly the page
+        end = min(rows, offset + limit)
+        batches = (read(start, min(_BATCH_ROWS, end - start)) for start in range(offset, end, _BATCH_ROWS))
+        return DatasetPreview(pa.schema([schema.field(c) for c in selected]),
+                              _page(batches, None, selected, 0, limit), source="numpy")
+
+    def scan():
+        for start_row in range(0, rows, _BATCH_ROWS):
+            yield read(start_row, _BATCH_ROWS)
+    return DatasetPreview(pa.schema([schema.field(c) for c in selected]),
+                          _page(scan(), expression, selected, offset, limit), source="numpy")
+
+
+def preview_dataset(backend: StorageBackend, dataset: Dict[str, Any], token: str,
+                    columns: Optional[List[str]], filters: List[str],
+                    offset: int, limit: int) -> DatasetPreview:
+    """
+    Plan a page read of a stored dataset. Blocking (ranged reads against
+    storage): call from a worker thread.
+
+    Parquet (the original or its ready Parquet copy) is read by row group, with
+    only the requested columns fetched and row groups skipped using their row
+    counts (offset) or min/max statistics (filters). CSV / JSON are scanned from
+    the start with projection in the parser and stop as soon as the page is
+    full. .npy pages are a single ranged read.
+    """
+    predicates = parse_filters(filters)
+    key = dataset['file_path']
+    fmt = file_extension(dataset['name'])
+    copy = parquet_copy(dataset)
+    if copy or fmt == '.parquet':
+        return _parquet_preview(RangeFile(backend, copy or key, token), columns, predicates, offset, limit)
+    if fmt in ('.csv', '.json'):
+        return _text_preview(backend, key, token, fmt, dataset.get('schema'), columns, predicates, offset, limit)
+    if fmt == '.npy':
+        return _npy_preview(RangeFile(backend, key, token), columns, predicates, offset, limit)
+    raise PreviewError(f"Preview is not available for {fmt or 'this'} files")
+
+
+def arrow_source(backend: StorageBackend, dataset: Dict[str, Any], token: str):
+    """
+    A stored dataset as something DuckDB or pyarrow can scan. Blocking.
+
+    Parquet (or the ready Parquet copy) and CSV become a
+    pyarrow.dataset.Dataset: it can be scanned any number of times, with column
+    projection and filters pushed into the reader. JSON and .npy files are a
+    RecordBatchReader, which can be scanned once.
+    """
+    key = dataset['file_path']
+    fmt = file_extension(dataset['name'])
+    schema = dataset.get('schema') or {}
+    filesystem = pafs.PyFileSystem(StorageFileSystem(backend, token))
+    copy = parquet_copy(dataset)
+    if copy or fmt == '.parquet':
+        return ds.dataset(copy or key, format='parquet', filesystem=filesystem)
+    if fmt == '.csv':
+        # Empty fields are nulls, as in ingest's inspection and DuckDB's own CSV reader
+        csv_format = ds.CsvFileFormat(
+            parse_options=pacsv.ParseOptions(delimiter=schema.get('delimiter') or ',', newlines_in_values=True),
+            convert_options=pacsv.ConvertOptions(strings_can_be_null=True),
+        )
+        return ds.dataset(key, format=csv_format, filesystem=filesystem)
+    if fmt in ('.json', '.npy'):
+        # (pyarrow's JSON dataset format deadlocks under DuckDB when its reads
+        # call back into Python, so JSON lines is streamed like an array)
+        preview = preview_dataset(backend, dataset, token, None, [], 0, sys.maxsize)
+        return pa.RecordBatchReader.from_batches(preview.schema, preview.batches)
+    raise PreviewError(f"{fmt or 'This'} files cannot be queried")
+
+
+def ndjson_stream(preview: DatasetPreview) -> Iterator[bytes]:
+    """One JSON object per row. Also accepts a dataset_query.QueryResult (same shape)."""
+    for batch in preview.batches:
+        lines = [json.dumps(row, default=str) for row in batch.to_pylist()]
+        if lines:
+            yield ("\n".join(lines) + "\n").encode()
+
+
+def arrow_stream(preview: DatasetPreview) -> Iterator[bytes]:
+    """Arrow IPC stream: the schema message first, then one message per batch."""
+    sink = io.BytesIO()
+
+    def drain() -> bytes:
+        data = sink.getvalue()
+        sink.seek(0)
+        sink.truncate()
+        return data
+
+    with pa.ipc.new_stream(sink, preview.schema) as writer:
+        yield drain()
+        for batch in preview.batches:
+            writer.write_batch(batch)
+            yield drain()
+    yield drain()
@@ -0,0 +1,199 @@
+import base64
+import binascii
+import json
+import uuid
+from datetime import datetime, timezone
+from decimal import Decimal, InvalidOperation
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+from app.core.config import settings
+from app.db.supabase import SupabaseManager
+from app.services.storage import StorageError
+
+# Column holding the value of each value_type (datasets.storage_mode = 'value')
+VALUE_COLUMNS = {
+    'text': 'value_text',
+    'numeric': 'value_numeric',
+    'boolean': 'value_boolean',
+    'date': 'value_date',
+    'json': 'value_json',
+    'binary': 'value_binary',
+}
+
+# Every column a value read needs except value_binary: binary values are only
+# ever sent as a raw body (see binary_stream), never hex-encoded inside JSON
+VALUE_SELECT = ", ".join(
+    ["id", "project_id", "name", "description", "value_type"]
+    + [c for c in VALUE_COLUMNS.values() if c != 'value_binary']
+    + ["size_bytes", "created_by", "created_at"]
+)
+
+
+class ValueEncodingError(ValueError):
+    """A submitted value does not match its declared value_type."""
+
+
+def _encode(value_type: str, value: Any) -> Tuple[Any, int]:
+    if value_type == 'text':
+        if not isinstance(value, str):
+            raise ValueEncodingError("text values must be strings")
+        return value, len(value.encode())
+    if value_type == 'numeric':
+        if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+            raise ValueEncodingError("numeric values must be numbers or numeric strings")
+        try:
+            number = Decimal(str(value))
+        except InvalidOperation:
+            raise ValueEncodingError(f"not a number: {value!r}")
+        if not number.is_finite():
+            raise ValueEncodingError("numeric values must be finite")
+        # Sent as a string so PostgREST casts it without a float round trip
+        text = str(value) if isinstance(value, str) else format(number, 'f')
+        return text, len(text)
+    if value_type == 'boolean':
+        if not isinstance(value, bool):
+            raise ValueEncodingError("boolean values must be true or false")
+        return value, 1
+    if value_type == 'date':
+        if not isinstance(value, str):
+            raise ValueEncodingError("date values must be ISO 8601 strings")
+        try:
+            parsed = datetime.fromisoformat(value)
+        except ValueError:
+            raise ValueEncodingError(f"not an ISO 8601 date: {value!r}")
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        text = parsed.isoformat()
+        return text, len(text)
+    if value_type == 'json':
+        try:
+            text = json.dumps(value, separators=(',', ':'), allow_nan=False)
+        except ValueError:
+            raise ValueEncodingError("json values cannot contain NaN or Infinity")
+        return value, len(text.encode())
+    if value_type == 'binary':
+        if value is None:
+            # Placeholder, filled with PUT /values/{id}/binary
+            return encode_bytea(b""), 0
+        if not isinstance(value, str):
+            raise ValueEncodingError("binary values must be base64 strings")
+        try:
+            raw = base64.b64decode(value, validate=True)
+        except (binascii.Error, ValueError):
+            raise ValueEncodingError("binary values must be base64 strings")
+        return encode_bytea(raw), len(raw)
+    raise ValueEncodingError(f"unknown value_type {value_type!r}")
+
+
+def encode_bytea(raw: bytes) -> str:
+    """bytea literal in the hex format PostgREST accepts in JSON."""
+    return "\\x" + raw.hex()
+
+
+def value_row(project_id: str, user_id: str, item: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Insertable datasets row for one bulk-create item (name, description,
+    value_type, value). The id is generated here so a whole batch can be
+    inserted without asking PostgREST to send the rows back.
+    """
+    value_type = item['value_type']
+    if value_type not in VALUE_COLUMNS:
+        raise ValueEncodingError(f"unknown value_type {value_type!r}")
+    value, size = _encode(value_type, item.get('value'))
+    return {
+        "id": str(uuid.uuid4()),
+        "project_id": project_id,
+        "name": item['name'],
+        "description": item.get('description'),
+        "storage_mode": "value",
+        "value_type": value_type,
+        VALUE_COLUMNS[value_type]: value,
+        "size_bytes": size,
+        "created_by": user_id,
+    }
+
+
+def decode_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    """API shape of a value row read with VALUE_SELECT. Binary values are left out (`value` is None)."""
+    value_type = row.get('value_type')
+    column = VALUE_COLUMNS.get(value_type)
+    value = row.get(column) if column and value_type != 'binary' else None
+    return {
+        "id": row['id'],
+        "project_id": row.get('project_id'),
+        "name": row.get('name'),
+        "description": row.get('description'),
+        "value_type": value_type,
+        "value": value,
+        "size_bytes": row.get('size_bytes'),
+        "created_by": row.get('created_by'),
+        "created_at": row.get('created_at'),
+    }
+
+
+def decode_bytea(text: Optional[str]) -> bytes:
+    """Bytes of a bytea value as PostgREST renders it in JSON (`\\x` + hex)."""
+    if not text:
+        return b""
+    if text.startswith("\\x"):
+        return bytes.fromhex(text[2:])
+    return base64.b64decode(text)
+
+
+def chunks(items: Sequence[Any], size: int) -> Iterator[Sequence[Any]]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+async def binary_stream(dataset_id: str, token: str, chunk_size: int = 64 * 1024) -> AsyncIterator[bytes]:
+    """
+    Open a binary value as a byte stream.
+
+    PostgREST sends a single bytea column as the raw response body when asked
+    for application/octet-stream, so the value is relayed chunk by chunk
+    instead of being buffered, hex-encoded and decoded here. Servers that
+    cannot do that (406) get the JSON fallback.
+
+    Raises StorageError before returning if the value cannot be read.
+    """
+    client = SupabaseManager.get_async_http_client()
+    request = client.build_request(
+        "GET",
+        f"{settings.SUPABASE_URL.rstrip('/')}/rest/v1/datasets",
+        params={"select": "value_binary", "id": f"eq.{dataset_id}"},
+        headers={
+            "apikey": settings.SUPABASE_KEY,
+            "Authorization": f"Bearer {token}",
+            "Accept": "application/octet-stream",
+        },
+    )
+    response = await client.send(request, stream=True)
+    if response.status_code == 200:
+        async def relay() -> AsyncIterator[bytes]:
+            try:
+                async for chunk in response.aiter_bytes(chunk_size):
+                    yield chunk
+            finally:
+                await response.aclose()
+        return relay()
+
+    await response.aread()
+    await response.aclose()
+    if response.status_code != 406:
+        raise StorageError(f"Read of value {dataset_id} failed ({response.status_code}): {response.text}")
+
+    result = await SupabaseManager.get_async_authenticated_client(token).table('datasets')\
+        .select("value_binary")\
+        .eq('id', dataset_id)\
+        .execute()
+    raw = decode_bytea(result.data[0].get('value_binary')) if result.data else b""
+
+    async def replay() -> AsyncIterator[bytes]:
+        for start in range(0, len(raw), chunk_size):
+            yield raw[start:start + chunk_size]
+    return replay()
+
+
+def order_by_ids(rows: List[Dict[str, Any]], ids: Sequence[str]) -> List[Dict[str, Any]]:
+    """Rows in the order of the requested ids (missing or inaccessible ones dropped)."""
+    by_id = {str(row['id']): row for row in rows}
+    return [by_id[i] for i in dict.fromkeys(ids) if i in by_id]
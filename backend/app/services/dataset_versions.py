@@ -0,0 +1,206 @@
+import asyncio
+import hashlib
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, Iterable, List, Optional, Set, Tuple
+from postgrest import ReturnMethod
+from starlette.concurrency import run_in_threadpool
+from app.core.config import settings
+from app.services.chunking import ALGORITHM, WINDOW, Chunker
+from app.services.storage import StorageBackend
+from app.services.uploads import composite_checksum
+import logging
+
+logger = logging.getLogger("insighter")
+
+CHUNK_CONTENT_TYPE = "application/octet-stream"
+
+# Digests per PostgREST lookup (they travel in the query string)
+_DIGESTS_PER_REQUEST = 200
+
+
+class VersionError(ValueError):
+    """A version cannot be built from what the client sent."""
+
+
+def chunk_key(owner_id: str, digest: str) -> str:
+    """Storage key of a chunk. Under the owner's folder, like every other object they store."""
+    return f"{owner_id}/chunks/{digest[:2]}/{digest}"
+
+
+def new_chunker() -> Chunker:
+    return Chunker(settings.DATASET_CHUNK_MIN_BYTES, settings.DATASET_CHUNK_AVG_BYTES, settings.DATASET_CHUNK_MAX_BYTES)
+
+
+def chunking_params() -> Dict[str, Any]:
+    """What a client needs to cut the same chunks on its side."""
+    return {
+        "algorithm": ALGORITHM,
+        "window": WINDOW,
+        "min_size": settings.DATASET_CHUNK_MIN_BYTES,
+        "avg_size": settings.DATASET_CHUNK_AVG_BYTES,
+        "max_size": settings.DATASET_CHUNK_MAX_BYTES,
+        "digest": "sha256",
+    }
+
+
+def manifest_summary(chunks: List[List[Any]]) -> Dict[str, Any]:
+    """Size and checksum of the file a manifest ([[sha256, size], ...]) describes."""
+    return {
+        "chunk_count": len(chunks),
+        "size_bytes": sum(size for _, size in chunks),
+        "checksum": composite_checksum([bytes.fromhex(digest) for digest, _ in chunks]),
+    }
+
+
+def _delta(chunks: List[List[Any]], previous: Set[str]) -> Dict[str, int]:
+    """Chunks (and bytes) of a manifest that the previous version did not have."""
+    new = {digest: size for digest, size in chunks if digest not in previous}
+    return {"new_chunks": len(new), "new_bytes": sum(new.values())}
+
+
+def _digest_chunks(chunks: List[bytes]) -> List[Tuple[str, bytes]]:
+    return [(hashlib.sha256(chunk).hexdigest(), chunk) for chunk in chunks]
+
+
+class ChunkStore:
+    """
+    Content-addressed chunks of one owner: objects under <owner>/chunks/ in
+    the storage bucket, indexed by the dataset_chunks table so a whole
+    manifest is checked with a few queries instead of one HEAD per chunk.
+    """
+
+    def __init__(self, backend: StorageBackend, supabase, owner_id: str, token: str,
+                 concurrency: Optional[int] = None):
+        self.backend = backend
+        self.supabase = supabase
+        self.owner_id = owner_id
+        self.token = token
+        self.concurrency = max(1, concurrency or settings.DATASET_VERSION_CONCURRENCY)
+
+    async def existing(self, digests: Iterable[str]) -> Dict[str, int]:
+        """Sizes of the given chunks that are already stored."""
+        digests = list(dict.fromkeys(digests))
+        results = await asyncio.gather(*(
+            self.supabase.table('dataset_chunks')
+            .select("sha256, size")
+            .eq('owner_id', self.owner_id)
+            .in_('sha256', digests[start:start + _DIGESTS_PER_REQUEST])
+            .execute()
+            for start in range(0, len(digests), _DIGESTS_PER_REQUEST)
+        ))
+        return {row['sha256']: row['size'] for result in results for row in result.data or []}
+
+    async def store(self, chunks: List[Tuple[str, bytes]]) -> None:
+        """Upload chunks (digest, bytes) concurrently, then index them."""
+        if not chunks:
+            return
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def put(digest: str, data: bytes) -> None:
+            async with semaphore:
+                await self.backend.put(chunk_key(self.owner_id, digest), data, CHUNK_CONTENT_TYPE, self.token)
+
+        await asyncio.gather(*(put(digest, data) for digest, data in chunks))
+        # Objects first: an indexed chunk is always readable
+        await self._index({digest: len(data) for digest, data in chunks})
+
+    async def _index(self, sizes: Dict[str, int]) -> None:
+        await self.supabase.table('dataset_chunks')\
+            .upsert([{"owner_id": self.owner_id, "sha256": digest, "size": size} for digest, size in sizes.items()],
+                    on_conflict='owner_id,sha256', ignore_duplicates=True, returning=ReturnMethod.minimal)\
+            .execute()
+
+
+class VersionWriter:
+    """
+    Cuts a byte stream into content-defined chunks and uploads only the chunks
+    the owner's store does not have yet. Chunks of `previous` (the previous
+    version's manifest) are skipped without a lookup; other digests are
+    checked and uploaded in batches of about DATASET_VERSION_BATCH_BYTES, so
+    memory stays bounded whatever the file size.
+    """
+
+    def __init__(self, store: ChunkStore, previous: Optional[Set[str]] = None):
+        self.store = store
+        self.chunker = new_chunker()
+        self.chunks: List[List[Any]] = []
+        self.uploaded_bytes = 0
+        self._previous: Set[str] = set(previous or ())
+        self._known: Set[str] = set(self._previous)
+        self._pending: Dict[str, bytes] = {}
+        self._pending_bytes = 0
+
+    async def write(self, data: bytes) -> None:
+        if data:
+            await self._take(await run_in_threadpool(lambda: _digest_chunks(self.chunker.feed(data))))
+
+    async def finish(self) -> Dict[str, Any]:
+        await self._take(await run_in_threadpool(lambda: _digest_chunks(self.chunker.finish())))
+        await self._flush()
+        return {"chunks": self.chunks, **manifest_summary(self.chunks), **_delta(self.chunks, self._previous)}
+
+    async def _take(self, chunks: List[Tuple[str, bytes]]) -> None:
+        for digest, data in chunks:
+            self.chunks.append([digest, len(data)])
+            if digest in self._known or digest in self._pending:
+                continue
+            self._pending[digest] = data
+            self._pending_bytes += len(data)
+            if self._pending_bytes >= settings.DATASET_VERSION_BATCH_BYTES:
+                await self._flush()
+
+    async def _flush(self) -> None:
+        if not self._pending:
+            return
+        stored = await self.store.existing(self._pending)
+        missing = [(digest, data) for digest, data in self._pending.items() if digest not in stored]
+        await self.store.store(missing)
+        self.uploaded_bytes += sum(len(data) for _, data in missing)
+        self._known.update(self._pending)
+        self._pending = {}
+        self._pending_bytes = 0
+
+
+async def negotiated_manifest(store: ChunkStore, digests: List[str],
+                              previous: Optional[Set[str]] = None) -> Dict[str, Any]:
+    """
+    Manifest of a version whose chunks the client cut and uploaded itself.
+    Sizes come from the chunk index, not from the client; every chunk must
+    already be stored.
+    """
+    sizes = await store.existing(digests)
+    missing = [digest for digest in dict.fromkeys(digests) if digest not in sizes]
+    if missing:
+        raise VersionError(f"{len(missing)} chunks are not uploaded yet (e.g. {missing[0]})")
+    chunks = [[digest, sizes[digest]] for digest in digests]
+    return {"chunks": chunks, **manifest_summary(chunks), **_delta(chunks, set(previous or ()))}
+
+
+async def reconstruct(backend: StorageBackend, owner_id: str, chunks: List[List[Any]], token: str,
+                      prefetch: Optional[int] = None) -> AsyncIterator[bytes]:
+    """
+    Stream the file a manifest describes, chunk by chunk in order. The next
+    `prefetch` chunks are downloaded concurrently while the current one is
+    sent, so throughput is not bound to one storage round trip per chunk.
+    """
+    prefetch = max(1, prefetch or settings.DATASET_VERSION_CONCURRENCY)
+
+    async def fetch(digest: str) -> bytes:
+        parts = [part async for part in backend.download(chunk_key(owner_id, digest), token)]
+        return b"".join(parts)
+
+    pending: Deque[asyncio.Task] = deque()
+    upcoming = iter(chunks)
+    try:
+        while True:
+            while len(pending) < prefetch:
+                entry = next(upcoming, None)
+                if entry is None:
+                    break
+                pending.append(asyncio.ensure_future(fetch(entry[0])))
+            if not pending:
+                return
+            yield await pending.popleft()
+    finally:
+        for task in pending:
+            task.cancel()
@@ -0,0 +1,722 @@
+import ast
+import codecs
+import csv
+import io
+import json
+import re
+import struct
+import zlib
+import xml.etree.ElementTree as ET
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from app.services.storage import StorageBackend
+from app.services.uploads import file_extension
+import logging
+
+logger = logging.getLogger("insighter")
+
+# Column types are inferred from the first SAMPLE_ROWS rows; rows are counted
+# over the whole file.
+SAMPLE_ROWS = 1000
+# CSV type inference parses at most this much of the head of the file
+SAMPLE_BYTES = 1024 * 1024
+# A single JSON record larger than this stops row counting (never buffered whole)
+MAX_RECORD_BYTES = 16 * 1024 * 1024
+
+_INT_RE = re.compile(r'^[+-]?\d+$')
+
+
+def _merge_type(current: Optional[str], new: str) -> str:
+    if current is None or current == new:
+        return new
+    if {current, new} == {"integer", "float"}:
+        return "float"
+    return "string"
+
+
+def _text_type(value: str) -> Optional[str]:
+    """Type of a CSV cell; None for an empty (null) cell."""
+    value = value.strip()
+    if not value:
+        return None
+    if _INT_RE.match(value):
+        return "integer"
+    if value.lower() in ("true", "false"):
+        return "boolean"
+    try:
+        float(value)
+        return "float"
+    except ValueError:
+        pass
+    if len(value) >= 8 and ('-' in value or ':' in value):
+        try:
+            datetime.fromisoformat(value.replace('Z', '+00:00'))
+            return "datetime"
+        except ValueError:
+            pass
+    return "string"
+
+
+def _value_type(value: Any) -> Optional[str]:
+    """Type of a decoded JSON value; None for null."""
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return "boolean"
+    if isinstance(value, int):
+        return "integer"
+    if isinstance(value, float):
+        return "float"
+    if isinstance(value, dict):
+        return "object"
+    if isinstance(value, list):
+        return "array"
+    return _text_type(value) or "string"
+
+
+class _Columns:
+    """Ordered column names with merged types and null tracking."""
+
+    def __init__(self):
+        self.types: Dict[str, Optional[str]] = {}
+        self.nullable: Dict[str, bool] = {}
+        self.rows = 0
+
+    def add(self, name: str, type_: Optional[str]) -> None:
+        if name not in self.types:
+            # Columns missing from earlier rows were null there
+            self.types[name] = None
+            self.nullable[name] = self.rows > 0
+        if type_ is None:
+            self.nullable[name] = True
+        else:
+            self.types[name] = _merge_type(self.types[name], type_)
+
+    def add_record(self, record: Dict[str, Any]) -> None:
+        for name, value in record.items():
+            self.add(str(name), _value_type(value))
+        for name in self.types.keys() - record.keys():
+            self.nullable[name] = True
+        self.rows += 1
+
+    def to_list(self) -> List[Dict[str, Any]]:
+        return [
+            {"name": name, "type": type_ or "null", "nullable": self.nullable[name]}
+            for name, type_ in self.types.items()
+        ]
+
+
+class Inspector:
+    """
+    Upload observer (see StreamingUpload) that learns a file's shape while it
+    streams past: `feed(chunk)` for every chunk, `finish()` at the end, then
+    `result()` for the schema document stored in datasets.schema.
+
+    `head_bytes` / `tail_bytes` tell `inspect_stored` that only that much of the
+    start / end of a stored object is needed.
+    """
+
+    format: str = ""
+    head_bytes: Optional[int] = None
+    tail_bytes: Optional[int] = None
+
+    def feed(self, chunk: bytes) -> None:
+        raise NotImplementedError
+
+    def finish(self) -> None:
+        pass
+
+    def result(self) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+
+class CsvInspector(Inspector):
+    """
+    Counts records over the whole stream (newlines outside quoted fields, so
+    quoted multi-line values count once) and infers the header and column types
+    from the first SAMPLE_BYTES.
+    """
+
+    format = "csv"
+
+    def __init__(self):
+        self._head = bytearray()
+        self._head_complete = False
+        self._newlines = 0
+        self._in_quotes = False
+        self._last_byte = b""
+
+    def feed(self, chunk: bytes) -> None:
+        if not self._head_complete:
+            self._head += chunk[:SAMPLE_BYTES - len(self._head)]
+            self._head_complete = len(self._head) >= SAMPLE_BYTES
+        if not self._in_quotes and b'"' not in chunk:
+            self._newlines += chunk.count(b'\n')
+        else:
+            # Segments between quote characters alternate between outside and
+            # inside a quoted field ("" escapes toggle twice, so parity holds)
+            for segment in chunk.split(b'"'):
+                if not self._in_quotes:
+                    self._newlines += segment.count(b'\n')
+                self._in_quotes = not self._in_quotes
+            self._in_quotes = not self._in_quotes
+        self._last_byte = chunk[-1:]
+
+    def _records(self) -> int:
+        records = self._newlines + (1 if self._last_byte and self._last_byte != b'\n' else 0)
+        # The header line is not a data row
+        return max(records - 1, 0)
+
+    def result(self) -> Optional[Dict[str, Any]]:
+        text = codecs.decode(bytes(self._head), 'utf-8', 'replace').lstrip('﻿')
+        if not text.strip():
+            return {"format": self.format, "columns": [], "row_count": 0}
+        try:
+            dialect = csv.Sniffer().sniff(text[:64 * 1024], delimiters=',;\t|')
+            delimiter = dialect.delimiter
+        except csv.Error:
+            delimiter = ','
+        rows = list(csv.reader(io.StringIO(text), delimiter=delimiter))
+        if self._head_complete and len(rows) > 1:
+            # The sample was cut mid-file; its last record may be truncated
+            rows = rows[:-1]
+        header = rows[0] if rows else []
+        names = [name.strip() or f"column_{i + 1}" for i, name in enumerate(header)]
+        columns = _Columns()
+        for name in names:
+            columns.add(name, None)
+            columns.nullable[name] = False
+        sample = [row for row in rows[1:SAMPLE_ROWS + 1] if row]
+        for row in sample:
+            for name, value in zip(names, row):
+                columns.add(name, _text_type(value))
+            for name in names[len(row):]:
+                columns.nullable[name] = True
+        return {
+            "format": self.format,
+            "delimiter": delimiter,
+            "columns": columns.to_list(),
+            "row_count": self._records(),
+            "sampled_rows": len(sample),
+        }
+
+
+class JsonInspector(Inspector):
+    """
+    A JSON array of records, or newline-delimited JSON. Array elements are
+    decoded one at a time from a rolling buffer, so memory is bounded by the
+    largest record rather than the file.
+    """
+
+    format = "json"
+
+    def __init__(self):
+        self._decoder = codecs.getincrementaldecoder('utf-8')('replace')
+        self._json = json.JSONDecoder()
+        self._buffer = ""
+        self._mode: Optional[str] = None  # "array" | "lines"
+        self._done = False
+        self._failed = False
+        self._records = 0
+        self._columns = _Columns()
+
+    def feed(self, chunk: bytes) -> None:
+        if self._done or self._failed:
+            return
+        self._buffer += self._decoder.decode(chunk)
+        if self._mode is None:
+            stripped = self._buffer.lstrip('﻿ \t\r\n')
+            if not stripped:
+                return
+            self._mode = "array" if stripped[0] == '[' else "lines"
+            self._buffer = stripped[1:] if self._mode == "array" else stripped
+        if self._mode == "array":
+            self._consume_array()
+        else:
+            self._consume_lines(final=False)
+
+    def finish(self) -> None:
+        self._buffer += self._decoder.decode(b'', final=True)
+        if self._mode == "lines":
+            self._consume_lines(final=True)
+        elif self._mode == "array" and not self._done:
+            self._consume_array()
+            if not self._done:
+                self._failed = True
+
+    def _record(self, value: Any) -> None:
+        self._records += 1
+        if self._columns.rows < SAMPLE_ROWS:
+            self._columns.add_record(value if isinstance(value, dict) else {"value": value})
+
+    def _consume_array(self) -> None:
+        buffer, pos, size = self._buffer, 0, len(self._buffer)
+        while True:
+            while pos < size and buffer[pos] in ' \t\r\n,':
+                pos += 1
+            if pos >= size:
+                break
+            if buffer[pos] == ']':
+                self._done = True
+                break
+            try:
+                value, pos = self._json.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # Incomplete record: wait for more data
+                break
+            self._record(value)
+        self._buffer = buffer[pos:]
+        if len(self._buffer) > MAX_RECORD_BYTES:
+            logger.warning("JSON record too large to inspect; row count unavailable")
+            self._failed = True
+            self._buffer = ""
+
+    def _consume_lines(self, final: bool) -> None:
+        lines = self._buffer.split('\n')
+        self._buffer = "" if final else lines.pop()
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            if self._columns.rows < SAMPLE_ROWS:
+                try:
+                    value = json.loads(line)
+                except json.JSONDecodeError:
+                    # Not line-delimited (e.g. one pretty-printed document)
+                    self._failed = True
+                    return
+                self._record(value)
+            else:
+                self._records += 1
+        if len(self._buffer) > MAX_RECORD_BYTES:
+            self._failed = True
+            self._buffer = ""
+
+    def result(self) -> Optional[Dict[str, Any]]:
+        if self._failed:
+            return {"format": self.format, "columns": [], "row_count": None}
+        return {
+            "format": self.format,
+            "layout": self._mode or "array",
+            "columns": self._columns.to_list(),
+            "row_count": self._records,
+            "sampled_rows": self._columns.rows,
+        }
+
+
+def _arrow_type(arrow_type) -> str:
+    import pyarrow as pa
+    if pa.types.is_boolean(arrow_type):
+        return "boolean"
+    if pa.types.is_integer(arrow_type):
+        return "integer"
+    if pa.types.is_floating(arrow_type) or pa.types.is_decimal(arrow_type):
+        return "float"
+    if pa.types.is_timestamp(arrow_type) or pa.types.is_date(arrow_type):
+        return "datetime"
+    if pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type):
+        return "string"
+    return str(arrow_type)
+
+
+class ParquetInspector(Inspector):
+    """Reads schema and row count from the footer; only the tail of the stream is kept."""
+
+    format = "parquet"
+    # Footers are normally a few KB; this covers very wide files
+    tail_bytes = 8 * 1024 * 1024
+
+    def __init__(self):
+        self._tail: deque = deque()
+        self._tail_size = 0
+
+    def feed(self, chunk: bytes) -> None:
+        self._tail.append(chunk)
+        self._tail_size += len(chunk)
+        while self._tail_size - len(self._tail[0]) >= self.tail_bytes:
+            self._tail_size -= len(self._tail.popleft())
+
+    def result(self) -> Optional[Dict[str, Any]]:
+        tail = b"".join(self._tail)
+        if len(tail) < 12 or tail[-4:] != b"PAR1":
+            return None
+        footer_length = struct.unpack('<I', tail[-8:-4])[0]
+        if footer_length + 8 > len(tail):
+            logger.warning("Parquet footer larger than the inspected tail")
+            return None
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            return None
+        metadata = pq.read_metadata(pa.BufferReader(b"PAR1" + tail[-(footer_length + 8):]))
+        schema = metadata.schema.to_arrow_schema()
+        return {
+            "format": self.format,
+            "columns": [
+                {"name": field.name, "type": _arrow_type(field.type), "nullable": field.nullable}
+                for field in schema
+            ],
+            "row_count": metadata.num_rows,
+            "row_groups": metadata.num_row_groups,
+        }
+
+
+_NUMPY_KINDS = {'i': "integer", 'u': "integer", 'f': "float", 'b': "boolean", 'M': "datetime", 'c': "complex"}
+
+
+class NpyInspector(Inspector):
+    """Parses the .npy header (dtype, shape) and ignores the array data."""
+
+    format = "numpy"
+    head_bytes = 64 * 1024
+    # Wider 2-D arrays are described as a single array column
+    MAX_COLUMNS = 1024
+
+    def __init__(self):
+        self._head = bytearray()
+        self._header: Optional[Dict[str, Any]] = None
+
+    def feed(self, chunk: bytes) -> None:
+        if self._header is not None or len(self._head) >= self.head_bytes:
+            return
+        self._head += chunk
+        if len(self._head) < 10 or self._head[:6] != b"\x93NUMPY":
+            return
+        if self._head[6] == 1:
+            start, length = 10, struct.unpack('<H', self._head[8:10])[0]
+        else:
+            start, length = 12, struct.unpack('<I', self._head[8:12])[0] if len(self._head) >= 12 else 0
+        if length and len(self._head) >= start + length:
+            self._header = ast.literal_eval(self._head[start:start + length].decode('latin-1'))
+            self._head = bytearray()
+
+    def result(self) -> Optional[Dict[str, Any]]:
+        if self._header is None:
+            return None
+        import numpy as np
+        dtype = np.dtype(self._header['descr'])
+        shape = list(self._header['shape'])
+        if dtype.names:
+            columns = [
+                {"name": name, "type": _NUMPY_KINDS.get(dtype.fields[name][0].kind, "string"), "nullable": False}
+                for name in dtype.names
+            ]
+        elif len(shape) == 2 and shape[1] <= self.MAX_COLUMNS:
+            type_ = _NUMPY_KINDS.get(dtype.kind, "string")
+            columns = [{"name": str(i), "type": type_, "nullable": False} for i in range(shape[1])]
+        else:
+            columns = [{"name": "value", "type": _NUMPY_KINDS.get(dtype.kind, "string"), "nullable": False}]
+        return {
+            "format": self.format,
+            "columns": columns,
+            "row_count": shape[0] if shape else 1,
+            "shape": shape,
+            "dtype": dtype.str if not dtype.names else str(dtype.descr),
+        }
+
+
+_XLSX_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_CELL_REF = re.compile(r'^([A-Z]+)')
+
+
+def _column_index(ref: str) -> int:
+    index = 0
+    for char in _CELL_REF.match(ref).group(1):
+        index = index * 26 + ord(char) - 64
+    return index - 1
+
+
+class _ZipStream:
+    """
+    Sequential reader of a zip stream's local entries, without the central
+    directory (which sits at the end). Entries written with a data descriptor
+    (unknown sizes up front) are delimited by the end of their deflate stream.
+    Calls `on_data(name, bytes)` with decompressed data of the entries accepted
+    by `want(name)`.
+    """
+
+    def __init__(self, want, on_data):
+        self._want = want
+        self._on_data = on_data
+        self._buffer = b""
+        self._entry: Optional[Dict[str, Any]] = None
+        self.done = False
+
+    def feed(self, chunk: bytes) -> None:
+        if self.done:
+            return
+        self._buffer += chunk
+        while not self.done and self._step():
+            pass
+
+    def _step(self) -> bool:
+        if self._entry is None:
+            if len(self._buffer) < 30:
+                return False
+            signature = self._buffer[:4]
+            if signature != b"PK\x03\x04":
+                # Central directory (or anything else): no more entries
+                self.done = True
+                return False
+            flags, method = struct.unpack('<HH', self._buffer[6:10])
+            compressed, _, name_length, extra_length = struct.unpack('<IIHH', self._buffer[18:30])
+            header_end = 30 + name_length + extra_length
+            if len(self._buffer) < header_end:
+                return False
+            name = self._buffer[30:30 + name_length].decode('utf-8', 'replace')
+            extra = self._buffer[30 + name_length:header_end]
+            if compressed == 0xFFFFFFFF:
+                compressed = self._zip64_size(extra)
+            descriptor = bool(flags & 0x08)
+            if descriptor and method != 8:
+                # Stored entry of unknown length: cannot be delimited
+                self.done = True
+                return False
+            self._entry = {
+                "name": name,
+                "wanted": self._want(name),
+                "descriptor": descriptor,
+                "remaining": None if descriptor else compressed,
+                "inflater": zlib.decompressobj(-15) if method == 8 else None,
+            }
+            self._buffer = self._buffer[header_end:]
+            return True
+
+        entry = self._entry
+        if entry["descriptor"]:
+            inflater = entry["inflater"]
+            if not inflater.eof:
+                data = inflater.decompress(self._buffer)
+                if entry["wanted"] and data:
+                    self._on_data(entry["name"], data)
+                self._buffer = inflater.unused_data if inflater.eof else b""
+                if not inflater.eof:
+                    return False
+            # Data descriptor: optional signature, crc and sizes (4 or 8 bytes
+            # each); the next signature tells which layout was used
+            if len(self._buffer) < 28:
+                return False
+            for length in (12, 16, 20, 24):
+                if self._buffer[length:length + 4] in (b"PK\x03\x04", b"PK\x01\x02"):
+                    break
+            else:
+                self.done = True
+                return False
+            self._buffer = self._buffer[length:]
+            self._entry = None
+            return True
+
+        take = min(entry["remaining"], len(self._buffer))
+        data, self._buffer = self._buffer[:take], self._buffer[take:]
+        entry["remaining"] -= take
+        if entry["wanted"] and data:
+            if entry["inflater"] is not None:
+                data = entry["inflater"].decompress(data)
+            if data:
+                self._on_data(entry["name"], data)
+        if entry["remaining"] == 0:
+            self._entry = None
+            return True
+        return False
+
+    @staticmethod
+    def _zip64_size(extra: bytes) -> int:
+        pos = 0
+        while pos + 4 <= len(extra):
+            header_id, size = struct.unpack('<HH', extra[pos:pos + 4])
+            if header_id == 0x0001:
+                return struct.unpack('<Q', extra[pos + 12:pos + 20])[0]
+            pos += 4 + size
+        return 0
+
+
+class XlsxInspector(Inspector):
+    """
+    First worksheet of an .xlsx workbook, read from the zip stream as it
+    arrives: rows are counted by an incremental XML parse of the sheet, the
+    header row names the columns (resolved through the shared strings table)
+    and the following SAMPLE_ROWS rows give their types. Dates stored as serial
+    numbers are reported as float.
+    """
+
+    format = "xlsx"
+    SHEET = "xl/worksheets/sheet1.xml"
+    STRINGS = "xl/sharedStrings.xml"
+    WORKBOOK = "xl/workbook.xml"
+    # Shared strings kept for header resolution when the table precedes the sheet
+    MAX_SHARED_STRINGS = 4096
+
+    def __init__(self):
+        self._zip = _ZipStream(lambda name: name in (self.SHEET, self.STRINGS, self.WORKBOOK), self._on_data)
+        self._parsers = {
+            self.SHEET: ET.XMLPullParser(events=("start", "end")),
+            self.STRINGS: ET.XMLPullParser(events=("start", "end")),
+            self.WORKBOOK: ET.XMLPullParser(events=("start",)),
+        }
+        self._containers: Dict[str, Any] = {}
+        self._rows = 0
+        self._header: Dict[int, Any] = {}
+        self._columns: Dict[int, Optional[str]] = {}
+        self._nullable: Dict[int, bool] = {}
+        self._sampled = 0
+        self._strings: Dict[int, str] = {}
+        self._needed: set = set()
+        self._string_index = 0
+        self._sheet_name: Optional[str] = None
+        self._seen_sheet = False
+
+    def feed(self, chunk: bytes) -> None:
+        self._zip.feed(chunk)
+
+    def _on_data(self, name: str, data: bytes) -> None:
+        parser = self._parsers[name]
+        parser.feed(data)
+        if name == self.SHEET:
+            self._seen_sheet = True
+            self._read_sheet(parser)
+        elif name == self.STRINGS:
+            self._read_strings(parser)
+        elif self._sheet_name is None:
+            for _, element in parser.read_events():
+                if element.tag == f"{_XLSX_NS}sheet" and self._sheet_name is None:
+                    self._sheet_name = element.get("name")
+
+    def _read_sheet(self, parser) -> None:
+        for event, element in parser.read_events():
+            if event == "start":
+                if element.tag == f"{_XLSX_NS}sheetData":
+                    self._containers["rows"] = element
+                continue
+            if element.tag != f"{_XLSX_NS}row":
+                continue
+            if self._rows == 0:
+                for cell in element.iter(f"{_XLSX_NS}c"):
+                    self._header[_column_index(cell.get("r", "A"))] = self._cell_value(cell)
+                self._needed = {v[1] for v in self._header.values() if isinstance(v, tuple)}
+            elif self._sampled < SAMPLE_ROWS:
+                self._sample(element)
+            self._rows += 1
+            # Drop parsed rows so memory stays flat over millions of rows
+            self._containers["rows"].clear()
+
+    def _cell_value(self, cell) -> Any:
+        type_ = cell.get("t")
+        if type_ == "inlineStr":
+            return "".join(cell.itertext())
+        value = cell.findtext(f"{_XLSX_NS}v")
+        if type_ == "s" and value is not None:
+            # Resolved against the shared strings table in result()
+            return ("shared", int(value))
+        return value
+
+    def _sample(self, row) -> None:
+        seen = set()
+        for cell in row.iter(f"{_XLSX_NS}c"):
+            index = _column_index(cell.get("r", "A"))
+            seen.add(index)
+            type_ = cell.get("t")
+            value = cell.findtext(f"{_XLSX_NS}v")
+            if type_ in ("s", "str", "inlineStr", "e"):
+                kind = "string"
+            elif type_ == "b":
+                kind = "boolean"
+            elif type_ == "d":
+                kind = "datetime"
+            elif value is None or value == "":
+                kind = None
+            else:
+                kind = "integer" if _INT_RE.match(value) else "float"
+            if kind is None:
+                self._nullable[index] = True
+            else:
+                self._columns[index] = _merge_type(self._columns.get(index), kind)
+        for index in self._header.keys() - seen:
+            self._nullable[index] = True
+        self._sampled += 1
+
+    def _read_strings(self, parser) -> None:
+        for event, element in parser.read_events():
+            if event == "start":
+                if element.tag == f"{_XLSX_NS}sst":
+                    self._containers["strings"] = element
+                continue
+            if element.tag != f"{_XLSX_NS}si":
+                continue
+            index = self._string_index
+            self._string_index += 1
+            if index in self._needed or (not self._seen_sheet and index < self.MAX_SHARED_STRINGS):
+                self._strings[index] = "".join(t.text or "" for t in element.iter(f"{_XLSX_NS}t"))
+            self._containers["strings"].clear()
+
+    def result(self) -> Optional[Dict[str, Any]]:
+        if not self._seen_sheet:
+            return None
+        columns = []
+        for index in sorted(self._header.keys() | self._columns.keys()):
+            name = self._header.get(index)
+            if isinstance(name, tuple):
+                name = self._strings.get(name[1])
+            columns.append({
+                "name": str(name) if name not in (None, "") else f"column_{index + 1}",
+                "type": self._columns.get(index) or "null",
+                "nullable": self._nullable.get(index, False),
+            })
+        return {
+            "format": self.format,
+            "sheet": self._sheet_name,
+            "columns": columns,
+            "row_count": max(self._rows - 1, 0),
+            "sampled_rows": self._sampled,
+        }
+
+
+_INSPECTORS = {
+    '.csv': CsvInspector,
+    '.json': JsonInspector,
+    '.parquet': ParquetInspector,
+    '.npy': NpyInspector,
+    '.xlsx': XlsxInspector,
+}
+
+
+def inspector_for(filename: str) -> Optional[Inspector]:
+    inspector = _INSPECTORS.get(file_extension(filename))
+    return inspector() if inspector else None
+
+
+def inspection_result(inspector: Optional[Inspector]) -> Optional[Dict[str, Any]]:
+    """The inspector's schema document, or None if it failed or cannot tell."""
+    if inspector is None:
+        return None
+    try:
+        return inspector.result()
+    except Exception as e:
+        logger.warning(f"Could not infer schema with {type(inspector).__name__}: {e}")
+        return None
+
+
+async def inspect_stored(backend: StorageBackend, key: str, filename: str, size: int,
+                         token: str) -> Optional[Dict[str, Any]]:
+    """
+    Inspect an object already in storage (uploads whose parts did not stream
+    through this process). Formats that only need the head or the footer
+    fetch just that byte range.
+    """
+    inspector = inspector_for(filename)
+    if inspector is None:
+        return None
+    start, end = 0, None
+    if inspector.tail_bytes and size > inspector.tail_bytes:
+        start = size - inspector.tail_bytes
+    elif inspector.head_bytes and size > inspector.head_bytes:
+        end = inspector.head_bytes - 1
+    try:
+        async for chunk in backend.download(key, token, start, end):
+            inspector.feed(chunk)
+        inspector.finish()
+    except Exception as e:
+        logger.warning(f"Could not inspect {key}: {e}")
+        return None
+    return inspection_result(inspector)
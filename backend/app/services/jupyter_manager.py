@@ -1,21 +1,500 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
 import jupyter_client
-import queue
+from app.core.config import settings
+from app.services.dataset_cache import CachedDataset, dataset_cache
+from app.services.kernel_io import Execution, KernelIO
+import logging
+
+logger = logging.getLogger("insighter")
+
+# Defined in a kernel when datasets are attached: load_dataset(name) maps the
+# node-local cache entry (see app.services.dataset_cache), so kernels reading
+# the same dataset share its pages instead of each downloading and parsing it.
+_DATASET_LOADER = """
+def load_dataset(name):
+    import numpy, pyarrow
+    path, kind = _insighter_datasets[name]
+    if kind == 'npy':
+        return numpy.load(path, mmap_mode='r')
+    return pyarrow.ipc.open_file(pyarrow.memory_map(path)).read_all()
+"""
+
+# Warm kernels are started before anyone is assigned to them, so they only
+# inherit these variables from the server (never its credentials). The user's
+# secrets are set in the kernel when it is assigned to their project.
+_BASE_ENV = ("PATH", "HOME", "LANG", "LC_ALL", "TMPDIR")
+
+_SET_ENV = "import os as _os, json as _json\n_os.environ.update(_json.loads({}))\ndel _os, _json\n"
+
+# Seconds a new kernel gets to answer on its channels
+_START_TIMEOUT = 60
+
+# Finished executions kept for GET /api/notebooks/executions/{id}
+_KEEP_EXECUTIONS = 200
+
+
+class KernelPoolExhausted(Exception):
+    """No kernel can be assigned: the pool (or the user's share of it) is full of busy kernels."""
+
+
+class KernelQueueFull(Exception):
+    """The project's kernel already has KERNEL_QUEUE_MAX executions waiting."""
+
+
+class PooledKernel:
+    def __init__(self, km, kc):
+        self.km = km
+        self.kc = kc
+        self.project_id: Optional[str] = None
+        self.user_id: Optional[str] = None
+        self.last_used = time.monotonic()
+        # Callers currently using the kernel; busy kernels are never evicted
+        self.busy = 0
+        # One execution runs at a time, the others wait in FIFO order
+        self.running: Optional[Execution] = None
+        self.queue: Deque[Execution] = deque()
+        self.closed = False
+
+    @property
+    def pid(self) -> Optional[int]:
+        return getattr(getattr(self.km, 'provisioner', None), 'pid', None)
+
 
 class KernelManager:
-    def __init__(self):
-        self.kernels = {}
-
-    def execute(self, project_id, code, env=None):
-        if project_id not in self.kernels:
-            km = jupyter_client.KernelManager(kernel_name='python3')
-            km.start_kernel(env=env)
-            kc = km.client()
-            kc.start_channels()
-            self.kernels[project_id] = (km, kc)
-        
-        _, kc = self.kernels[project_id]
-        kc.execute(code)
-        # (Simplified retrieval logic)
-        return "Code executed on persistent kernel."
-
-kernel_service = KernelManager()
+    """
+    Pool of Jupyter kernels, one per project.
+
+    `warm` kernels are started ahead of time by a maintenance thread, so the
+    first cell of a project gets a running kernel instead of waiting seconds
+    for a cold start. At most `max_kernels` run on this worker (warm ones
+    included) and `max_per_user` are assigned to one user. When a cap is
+    reached the least recently used idle kernel in its scope is shut down to
+    make room; kernels idle for longer than `idle_ttl` seconds are shut down
+    by the maintenance thread.
+
+    Kernel sockets belong to KernelIO once a kernel is started: code is sent
+    and outputs are collected there (see run). Executions of a kernel run one
+    at a time in FIFO order; waiting ones can be cancelled and the running
+    one interrupted.
+    """
+
+    def __init__(self, warm: int = 0, max_kernels: int = 32, max_per_user: int = 4,
+                 idle_ttl: float = 1800, check_interval: float = 30, max_queue: int = 16):
+        self.warm_target = max(0, warm)
+        self.max_queue = max(0, max_queue)
+        self.max_kernels = max(1, max_kernels)
+        self.max_per_user = max(1, max_per_user)
+        self.idle_ttl = idle_ttl
+        self.check_interval = check_interval
+        # project_id -> kernel, least recently used first
+        self.kernels: "OrderedDict[str, PooledKernel]" = OrderedDict()
+        # project_id -> {dataset name: (cache entry, pin id)}; pinned entries
+        # are not evicted while the kernel is running
+        self.datasets: Dict[str, Dict[str, Tuple[CachedDataset, str]]] = {}
+        self.executions: "OrderedDict[str, Execution]" = OrderedDict()
+        self.io = KernelIO()
+        self._warm: Deque[PooledKernel] = deque()
+        self._starting = 0
+        self._lock = threading.RLock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.warm_hits = 0
+        self.cold_starts = 0
+        self.evicted_idle = 0
+        self.evicted_lru = 0
+        self.rejected = 0
+
+    def start(self) -> None:
+        """Start the maintenance thread (fills the warm pool, shuts down idle kernels)."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._maintain, name="kernel-pool", daemon=True)
+            self._thread.start()
+
+    def _start_kernel(self) -> PooledKernel:
+        env = {name: os.environ[name] for name in _BASE_ENV if name in os.environ}
+        km = jupyter_client.KernelManager(kernel_name='python3')
+        km.start_kernel(env=env)
+        kc = km.client()
+        kc.start_channels()
+        try:
+            kc.wait_for_ready(timeout=_START_TIMEOUT)
+        except Exception:
+            self._stop_kernel(PooledKernel(km, kc))
+            raise
+        kernel = PooledKernel(km, kc)
+        self.io.attach(kernel)
+        return kernel
+
+    def _stop_kernel(self, kernel: PooledKernel) -> None:
+        try:
+            self.io.detach(kernel)
+            kernel.kc.stop_channels()
+            kernel.km.shutdown_kernel(now=True)
+        except Exception as e:
+            logger.warning(f"Could not shut down kernel of project {kernel.project_id}: {e}")
+
+    def _total(self) -> int:
+        return len(self.kernels) + len(self._warm) + self._starting
+
+    def _lru_idle(self, project_ids) -> Optional[str]:
+        """Least recently used idle kernel among `project_ids`."""
+        for project_id in self.kernels:
+            if project_id in project_ids and not self.kernels[project_id].busy:
+                return project_id
+        return None
+
+    def _detach(self, project_id: str) -> Tuple[Optional[PooledKernel], List[str]]:
+        """Remove a project's kernel from the pool (caller holds the lock). Returns it and its dataset pins."""
+        kernel = self.kernels.pop(project_id, None)
+        pins = [pin_id for _, pin_id in self.datasets.pop(project_id, {}).values()]
+        return kernel, pins
+
+    def _release(self, detached: List[Tuple[Optional[PooledKernel], List[str]]]) -> None:
+        for kernel, pins in detached:
+            if kernel is not None:
+                with self._lock:
+                    kernel.closed = True
+                    waiting = list(kernel.queue)
+                    kernel.queue.clear()
+                # Aborts the running execution, if any
+                self._stop_kernel(kernel)
+                for execution in waiting:
+                    execution.finish("aborted")
+            for pin_id in pins:
+                dataset_cache.unpin(pin_id)
+
+    def _take_warm(self, dead: List[Tuple[Optional[PooledKernel], List[str]]]) -> Optional[PooledKernel]:
+        while self._warm:
+            kernel = self._warm.popleft()
+            if kernel.km.is_alive():
+                return kernel
+            dead.append((kernel, []))
+        return None
+
+    def _assign(self, project_id: str, user_id: Optional[str], env: Optional[Dict[str, str]]) -> PooledKernel:
+        """The project's kernel, marked busy. Assigns a warm kernel (or starts one) on first use."""
+        self.start()
+        evicted = []
+        try:
+            with self._lock:
+                kernel = self.kernels.get(project_id)
+                if kernel is not None:
+                    self.kernels.move_to_end(project_id)
+                    kernel.busy += 1
+                    return kernel
+                # Decide every eviction before removing anything
+                owned = {pid for pid, k in self.kernels.items() if user_id is not None and k.user_id == user_id}
+                own_victim = None
+                if len(owned) >= self.max_per_user:
+                    own_victim = self._lru_idle(owned)
+                    if own_victim is None:
+                        self.rejected += 1
+                        raise KernelPoolExhausted(f"All {len(owned)} of your kernels are busy")
+                kernel = self._take_warm(evicted)
+                victim = None
+                if kernel is None and self._total() - (own_victim is not None) >= self.max_kernels:
+                    victim = self._lru_idle(set(self.kernels) - {own_victim})
+                    if victim is None:
+                        self.rejected += 1
+                        raise KernelPoolExhausted("All kernels are busy")
+                for pid in filter(None, (own_victim, victim)):
+                    evicted.append(self._detach(pid))
+                    self.evicted_lru += 1
+                if kernel is not None:
+                    self.warm_hits += 1
+                    self._register(kernel, project_id, user_id)
+                else:
+                    self._starting += 1
+        finally:
+            self._release(evicted)
+        self._wake.set()
+
+        if kernel is None:
+            try:
+                kernel = self._start_kernel()
+            finally:
+                with self._lock:
+                    self._starting -= 1
+            with self._lock:
+                self.cold_starts += 1
+                existing = self.kernels.get(project_id)
+                if existing is None:
+                    self._register(kernel, project_id, user_id)
+                else:
+                    existing.busy += 1
+            if existing is not None:
+                # Another request assigned this project meanwhile
+                self._release([(kernel, [])])
+                return existing
+        if env:
+            self.io.submit(kernel, _SET_ENV.format(json.dumps(json.dumps(env))), silent=True)
+        return kernel
+
+    def _register(self, kernel: PooledKernel, project_id: str, user_id: Optional[str]) -> None:
+        kernel.project_id, kernel.user_id = project_id, user_id
+        kernel.busy += 1
+        self.kernels[project_id] = kernel
+
+    @contextmanager
+    def _checkout(self, project_id: str, env: Optional[Dict[str, str]] = None,
+                  user_id: Optional[str] = None) -> Iterator[PooledKernel]:
+        kernel = self._assign(project_id, user_id, env)
+        try:
+            yield kernel
+        finally:
+            self._done(kernel)
+
+    def _done(self, kernel: PooledKernel) -> None:
+        with self._lock:
+            kernel.busy -= 1
+            kernel.last_used = time.monotonic()
+
+    def run(self, project_id, code, env=None, user_id=None) -> Execution:
+        """
+        Queue code on the project's kernel and return at once. It is sent
+        when the executions queued before it are done; the Execution then
+        collects the outputs as the kernel publishes them. The kernel counts
+        as busy (and is not evicted) while anything is queued or running.
+        """
+        execution = Execution(project_id, user_id, code, settings.KERNEL_OUTPUT_MAX_BYTES)
+        kernel = self._assign(project_id, user_id, env)
+        with self._lock:
+            if kernel.running is not None and len(kernel.queue) >= self.max_queue:
+                kernel.busy -= 1
+                self.rejected += 1
+                raise KernelQueueFull(f"{len(kernel.queue)} executions are already waiting for this kernel")
+            execution.add_done_callback(lambda done: self._finished(kernel, done))
+            self.executions[execution.id] = execution
+            finished = [e for e in self.executions.values() if e.finished]
+            for old in finished[:max(0, len(finished) - _KEEP_EXECUTIONS)]:
+                del self.executions[old.id]
+            start = kernel.running is None
+            if start:
+                kernel.running = execution
+            else:
+                kernel.queue.append(execution)
+        if start:
+            self._send(kernel, execution)
+        return execution
+
+    def _send(self, kernel: PooledKernel, execution: Execution) -> None:
+        execution.mark_running()
+        try:
+            self.io.submit(kernel, execution.code, execution=execution)
+        except Exception as e:
+            logger.warning(f"Could not send execution {execution.id}: {e}")
+            execution.finish("aborted")
+
+    def _finished(self, kernel: PooledKernel, execution: Execution) -> None:
+        """An execution is done (or cancelled): start the next one in the kernel's queue."""
+        following = None
+        with self._lock:
+            kernel.busy -= 1
+            kernel.last_used = time.monotonic()
+            if kernel.running is execution:
+                kernel.running = None
+                if kernel.queue and not kernel.closed:
+                    following = kernel.running = kernel.queue.popleft()
+            elif execution in kernel.queue:
+                kernel.queue.remove(execution)
+        if following is not None:
+            self._send(kernel, following)
+
+    def _kernel_of(self, execution: Execution) -> Optional[PooledKernel]:
+        # Caller holds the lock
+        for kernel in self.kernels.values():
+            if kernel.running is execution or execution in kernel.queue:
+                return kernel
+        return None
+
+    def queue_position(self, execution: Execution) -> Optional[int]:
+        """0 while running, n when n - 1 executions wait before it, None once done."""
+        with self._lock:
+            kernel = self._kernel_of(execution)
+            if kernel is None:
+                return None
+            if kernel.running is execution:
+                return 0
+            return kernel.queue.index(execution) + 1
+
+    def queue(self, project_id: str) -> List[Execution]:
+        """The running execution of a project's kernel, then the waiting ones."""
+        with self._lock:
+            kernel = self.kernels.get(project_id)
+            if kernel is None:
+                return []
+            return ([kernel.running] if kernel.running else []) + list(kernel.queue)
+
+    def kernel_pids(self) -> Dict[str, int]:
+        """Process id of every assigned kernel, by project."""
+        with self._lock:
+            pids = {project_id: kernel.pid for project_id, kernel in self.kernels.items()}
+        return {project_id: pid for project_id, pid in pids.items() if pid is not None}
+
+    def kernel_state(self, project_id: str) -> Dict[str, Any]:
+        """Whether the project has a kernel and what it is doing."""
+        with self._lock:
+            kernel = self.kernels.get(project_id)
+            if kernel is None:
+                return {"status": "stopped", "pid": None, "queued": 0}
+            return {
+                "status": "busy" if kernel.running is not None else "idle",
+                "pid": kernel.pid,
+                "queued": len(kernel.queue),
+                "idle_seconds": round(time.monotonic() - kernel.last_used, 1),
+            }
+
+    def cancel(self, execution: Execution) -> bool:
+        """
+        Drop a waiting execution from its queue, or interrupt the kernel if it
+        is the running one (the cell stops with KeyboardInterrupt). Returns
+        False if the execution is already done.
+        """
+        with self._lock:
+            kernel = self._kernel_of(execution)
+            if kernel is None:
+                return False
+            running = kernel.running is execution
+            if running:
+                execution.interrupted = True
+            else:
+                kernel.queue.remove(execution)
+        if not running:
+            execution.finish("cancelled")
+            return True
+        try:
+            kernel.km.interrupt_kernel()
+        except Exception as e:
+            logger.warning(f"Could not interrupt the kernel of project {kernel.project_id}: {e}")
+            raise
+        return True
+
+    def execute(self, project_id, code, env=None, user_id=None, timeout=None) -> Execution:
+        """Run code and wait up to `timeout` seconds for the kernel to finish it."""
+        execution = self.run(project_id, code, env, user_id)
+        execution.wait(timeout)
+        return execution
+
+    def get_execution(self, execution_id: str) -> Optional[Execution]:
+        with self._lock:
+            return self.executions.get(execution_id)
+
+    def attach_datasets(self, project_id, entries: Dict[str, Tuple[CachedDataset, str]], env=None,
+                        user_id=None) -> List[str]:
+        """
+        Make cached datasets available in the project's kernel as
+        load_dataset(name). Takes ownership of the pins; a dataset attached
+        again under the same name releases its previous pin.
+        """
+        with self._checkout(project_id, env, user_id) as kernel:
+            with self._lock:
+                attached = self.datasets.setdefault(project_id, {})
+                for name, entry in entries.items():
+                    if name in attached:
+                        dataset_cache.unpin(attached[name][1])
+                    attached[name] = entry
+                paths = {name: [entry.path, entry.format] for name, (entry, _) in attached.items()}
+            setup = f"import json as _json\n_insighter_datasets = _json.loads({json.dumps(json.dumps(paths))})\n"
+            self.io.submit(kernel, setup + _DATASET_LOADER, silent=True)
+            return sorted(paths)
+
+    def _maintain(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                self._reap()
+                self._fill()
+            except Exception as e:
+                logger.error(f"Kernel pool maintenance failed: {e}")
+            self._wake.wait(self.check_interval)
+            self._wake.clear()
+
+    def _reap(self) -> None:
+        """Shut down kernels idle for longer than the TTL."""
+        if self.idle_ttl <= 0:
+            return
+        deadline = time.monotonic() - self.idle_ttl
+        with self._lock:
+            expired = [pid for pid, k in self.kernels.items() if not k.busy and k.last_used < deadline]
+            detached = [self._detach(pid) for pid in expired]
+            self.evicted_idle += len(expired)
+        if expired:
+            logger.info(f"Shut down {len(expired)} idle kernel(s)")
+        self._release(detached)
+
+    def _fill(self) -> None:
+        """Start kernels until the warm pool is full (within the global cap)."""
+        while not self._stopped.is_set():
+            with self._lock:
+                if len(self._warm) + self._starting >= self.warm_target or self._total() >= self.max_kernels:
+                    return
+                self._starting += 1
+            try:
+                kernel = self._start_kernel()
+            except Exception as e:
+                logger.error(f"Could not start a warm kernel: {e}")
+                return
+            finally:
+                with self._lock:
+                    self._starting -= 1
+            with self._lock:
+                if not self._stopped.is_set():
+                    self._warm.append(kernel)
+                    continue
+            self._release([(kernel, [])])
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "warm": len(self._warm),
+                "warm_target": self.warm_target,
+                "starting": self._starting,
+                "assigned": len(self.kernels),
+                "busy": sum(1 for k in self.kernels.values() if k.busy),
+                "users": len({k.user_id for k in self.kernels.values() if k.user_id is not None}),
+                "max_kernels": self.max_kernels,
+                "max_per_user": self.max_per_user,
+                "idle_ttl_seconds": self.idle_ttl,
+                "warm_hits": self.warm_hits,
+                "cold_starts": self.cold_starts,
+                "evicted_idle": self.evicted_idle,
+                "evicted_lru": self.evicted_lru,
+                "rejected": self.rejected,
+                "queued": sum(len(k.queue) for k in self.kernels.values()),
+                "max_queue": self.max_queue,
+            }
+
+    def shutdown(self, project_id):
+        with self._lock:
+            detached = self._detach(project_id)
+        self._release([detached])
+
+    def shutdown_all(self):
+        self._stopped.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        with self._lock:
+            detached = [self._detach(pid) for pid in list(self.kernels)]
+            detached += [(kernel, []) for kernel in self._warm]
+            self._warm.clear()
+        self._release(detached)
+        self.io.stop()
+
+kernel_service = KernelManager(
+    warm=settings.KERNEL_POOL_WARM,
+    max_kernels=settings.KERNEL_POOL_MAX_KERNELS,
+    max_per_user=settings.KERNEL_POOL_MAX_PER_USER,
+    idle_ttl=settings.KERNEL_IDLE_TTL_SECONDS,
+    max_queue=settings.KERNEL_QUEUE_MAX,
+)
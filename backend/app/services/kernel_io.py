@@ -0,0 +1,377 @@
+import asyncio
+import json
+import os
+import queue
+import threading
+import uuid
+from collections import deque
+from typing import Any, AsyncIterator, Callable, Deque, Dict, List, Optional, Tuple
+import zmq
+import logging
+
+logger = logging.getLogger("insighter")
+
+# IOPub messages kept as outputs, in the nbformat shape notebooks store
+OUTPUT_TYPES = ("stream", "display_data", "execute_result", "error")
+
+# Poll timeout of the I/O thread; it is woken up for new requests anyway
+_POLL_MS = 1000
+
+
+def output_from(msg: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """nbformat output of an IOPub message, or None for other message types."""
+    kind, content = msg['msg_type'], msg['content']
+    if kind == 'stream':
+        return {"output_type": kind, "name": content['name'], "text": content['text']}
+    if kind in ('display_data', 'execute_result'):
+        output = {"output_type": kind, "data": content.get('data', {}), "metadata": content.get('metadata', {})}
+        if kind == 'execute_result':
+            output["execution_count"] = content.get('execution_count')
+        return output
+    if kind == 'error':
+        return {"output_type": kind, "ename": content.get('ename'), "evalue": content.get('evalue'),
+                "traceback": content.get('traceback', [])}
+    return None
+
+
+def output_text(outputs: List[Dict[str, Any]]) -> str:
+    """Plain-text rendering of outputs (streams, text/plain results, error names)."""
+    parts = []
+    for output in outputs:
+        if output['output_type'] == 'stream':
+            parts.append(output['text'])
+        elif output['output_type'] == 'error':
+            parts.append(f"{output['ename']}: {output['evalue']}\n")
+        elif 'text/plain' in output['data']:
+            parts.append(output['data']['text/plain'] + "\n")
+    return "".join(parts)
+
+
+class Execution:
+    """
+    One execute_request and the outputs its kernel published for it. Written
+    by the I/O thread; read either blocking (wait) or from the event loop
+    (events), where new outputs are delivered as they arrive.
+
+    Outputs beyond `max_bytes` (serialized) are dropped and `truncated` is set.
+    """
+
+    def __init__(self, project_id: str, user_id: Optional[str], code: str, max_bytes: int = 1024 * 1024):
+        self.id = str(uuid.uuid4())
+        # msg_id of the execute_request, set when it is submitted
+        self.msg_id: Optional[str] = None
+        self.project_id = project_id
+        self.user_id = user_id
+        self.code = code
+        self.status = "queued"
+        # Set when the running execution is interrupted on request
+        self.interrupted = False
+        self.execution_count: Optional[int] = None
+        self.outputs: List[Dict[str, Any]] = []
+        self.truncated = False
+        self.max_bytes = max_bytes
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._listeners: List[Tuple[asyncio.AbstractEventLoop, asyncio.Event]] = []
+        self._callbacks: List[Callable[["Execution"], None]] = []
+
+    @property
+    def finished(self) -> bool:
+        return self._done.is_set()
+
+    def add_done_callback(self, callback: Callable[["Execution"], None]) -> None:
+        with self._lock:
+            if not self._done.is_set():
+                self._callbacks.append(callback)
+                return
+        callback(self)
+
+    def mark_running(self) -> None:
+        with self._lock:
+            if self.status == "queued":
+                self.status = "running"
+        self._notify()
+
+    def add_output(self, output: Dict[str, Any]) -> None:
+        size = len(json.dumps(output))
+        with self._lock:
+            if output['output_type'] == 'error':
+                self.status = "error"
+            if self._bytes + size > self.max_bytes:
+                self.truncated = True
+                return
+            self._bytes += size
+            self.outputs.append(output)
+        self._notify()
+
+    def finish(self, status: Optional[str] = None) -> None:
+        with self._lock:
+            if self._done.is_set():
+                return
+            if status is not None:
+                self.status = status
+            elif self.interrupted:
+                self.status = "interrupted"
+            elif self.status in ("queued", "running"):
+                self.status = "ok"
+            self._done.set()
+            callbacks, self._callbacks = self._callbacks, []
+        self._notify()
+        for callback in callbacks:
+            try:
+                callback(self)
+            except Exception as e:
+                logger.error(f"Execution {self.id} callback failed: {e}")
+
+    def _notify(self) -> None:
+        with self._lock:
+            listeners = list(self._listeners)
+        for loop, event in listeners:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                # Loop closed: the reader is gone
+                pass
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until the kernel is done with the request. Returns whether it is."""
+        return self._done.wait(timeout)
+
+    async def wait_async(self, timeout: Optional[float] = None) -> bool:
+        async def drain():
+            async for _ in self.events():
+                pass
+        try:
+            await asyncio.wait_for(drain(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self.finished
+
+    async def events(self, heartbeat: Optional[float] = None) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """
+        Outputs from the first one, as they arrive, until the request is done.
+        Yields None when the status changes (queued -> running) and every
+        `heartbeat` seconds without output (for keepalives).
+        """
+        event = asyncio.Event()
+        listener = (asyncio.get_running_loop(), event)
+        with self._lock:
+            self._listeners.append(listener)
+        index, status = 0, None
+        try:
+            while True:
+                # Cleared before reading, so an output added meanwhile sets it again
+                event.clear()
+                with self._lock:
+                    new, done = self.outputs[index:], self._done.is_set()
+                    changed, status = self.status != status, self.status
+                index += len(new)
+                for output in new:
+                    yield output
+                if done:
+                    return
+                if changed:
+                    yield None
+                if new or changed:
+                    continue
+                try:
+                    await asyncio.wait_for(event.wait(), heartbeat)
+                except asyncio.TimeoutError:
+                    yield None
+        finally:
+            with self._lock:
+                self._listeners.remove(listener)
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "execution_id": self.id,
+                "project_id": self.project_id,
+                "status": self.status,
+                "execution_count": self.execution_count,
+                "outputs": list(self.outputs),
+                "truncated": self.truncated,
+            }
+
+
+async def sse_events(execution: Execution, heartbeat: float = 15) -> AsyncIterator[bytes]:
+    """
+    Server-sent events of an execution: a `status` event when it is queued
+    or starts running, one `output` event per output as it arrives, then a
+    `done` event with the final status. Comments are sent while a long cell
+    is silent so proxies keep the connection open.
+    """
+    sent = None
+    async for output in execution.events(heartbeat=heartbeat):
+        if output is None:
+            if execution.status != sent and not execution.finished:
+                sent = execution.status
+                yield f"event: status\ndata: {json.dumps({'status': sent})}\n\n".encode()
+            else:
+                yield b": keepalive\n\n"
+        else:
+            yield f"event: output\ndata: {json.dumps(output)}\n\n".encode()
+    summary = execution.summary()
+    del summary['outputs']
+    yield f"event: done\ndata: {json.dumps(summary)}\n\n".encode()
+
+
+class KernelIO:
+    """
+    Socket I/O of every pooled kernel on one thread: execute requests are
+    sent from here and IOPub / shell messages of all kernels are read with a
+    single zmq poll, then routed to their Execution by parent msg_id. No
+    thread is parked on a kernel waiting for output, however long its cells
+    run, and kernel sockets are only ever used from this thread.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._kernels: Dict[int, Any] = {}
+        self._outbox: Deque[Tuple[Any, Dict[str, Any]]] = deque()
+        self._executions: Dict[str, Tuple[Any, Execution]] = {}
+        self._loops = 0
+        self._wake_r: Optional[int] = None
+        self._wake_w: Optional[int] = None
+        self._stopped = False
+        self._thread: Optional[threading.Thread] = None
+
+    def _start(self) -> None:
+        # Caller holds the condition
+        if self._thread is not None and self._thread.is_alive():
+            return
+        if self._wake_r is None:
+            self._wake_r, self._wake_w = os.pipe()
+            os.set_blocking(self._wake_r, False)
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="kernel-io", daemon=True)
+        self._thread.start()
+
+    def _wake(self) -> None:
+        if self._wake_w is not None:
+            try:
+                os.write(self._wake_w, b"x")
+            except OSError:
+                pass
+
+    def attach(self, kernel) -> None:
+        """Start reading a kernel's messages. Its sockets must not be used by other threads from now on."""
+        with self._cond:
+            self._kernels[id(kernel)] = kernel
+            self._start()
+        self._wake()
+
+    def detach(self, kernel) -> None:
+        """Stop reading a kernel (its sockets can be closed afterwards) and abort its executions."""
+        with self._cond:
+            if self._kernels.pop(id(kernel), None) is None:
+                return
+            self._outbox = deque(item for item in self._outbox if item[0] is not kernel)
+            aborted = [e for k, e in self._executions.values() if k is kernel]
+            for execution in aborted:
+                self._executions.pop(execution.msg_id, None)
+            if self._thread is not None and self._thread.is_alive() and threading.current_thread() is not self._thread:
+                # Wait for the poll that may still use the kernel's sockets to end
+                target = self._loops + 1
+                self._wake()
+                self._cond.wait_for(lambda: self._loops >= target or self._thread is None, timeout=5)
+        for execution in aborted:
+            execution.finish("aborted")
+
+    def submit(self, kernel, code: str, silent: bool = False, execution: Optional[Execution] = None) -> str:
+        """Queue an execute_request on the kernel. Returns its msg_id."""
+        content = {
+            "code": code,
+            "silent": silent,
+            "store_history": not silent,
+            "user_expressions": {},
+            "allow_stdin": False,
+            # A failing cell must not make the kernel drop our setup code
+            "stop_on_error": not silent,
+        }
+        msg = kernel.kc.session.msg("execute_request", content)
+        msg_id = msg['header']['msg_id']
+        with self._cond:
+            if id(kernel) not in self._kernels:
+                raise RuntimeError("Kernel is not running")
+            if execution is not None:
+                execution.msg_id = msg_id
+                self._executions[msg_id] = (kernel, execution)
+            self._outbox.append((kernel, msg))
+        self._wake()
+        return msg_id
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                if self._stopped:
+                    self._loops += 1
+                    self._cond.notify_all()
+                    return
+                kernels = list(self._kernels.values())
+                outbox, self._outbox = self._outbox, deque()
+            try:
+                for kernel, msg in outbox:
+                    kernel.kc.shell_channel.send(msg)
+                poller = zmq.Poller()
+                poller.register(self._wake_r, zmq.POLLIN)
+                channels = {}
+                for kernel in kernels:
+                    for channel in (kernel.kc.iopub_channel, kernel.kc.shell_channel):
+                        poller.register(channel.socket, zmq.POLLIN)
+                        channels[channel.socket] = channel
+                ready = dict(poller.poll(_POLL_MS))
+                if self._wake_r in ready:
+                    try:
+                        while os.read(self._wake_r, 4096):
+                            pass
+                    except BlockingIOError:
+                        pass
+                for socket, channel in channels.items():
+                    if socket in ready:
+                        self._drain(channel)
+            except Exception as e:
+                logger.error(f"Kernel I/O failed: {e}")
+            with self._cond:
+                self._loops += 1
+                self._cond.notify_all()
+
+    def _drain(self, channel) -> None:
+        while True:
+            try:
+                msg = channel.get_msg(timeout=0)
+            except queue.Empty:
+                return
+            self._route(msg)
+
+    def _route(self, msg: Dict[str, Any]) -> None:
+        parent = msg.get('parent_header', {}).get('msg_id')
+        with self._cond:
+            entry = self._executions.get(parent)
+        if entry is None:
+            return
+        execution = entry[1]
+        kind, content = msg['msg_type'], msg['content']
+        if kind == 'execute_input':
+            execution.execution_count = content.get('execution_count')
+        elif kind == 'status' and content.get('execution_state') == 'idle':
+            with self._cond:
+                self._executions.pop(parent, None)
+            execution.finish()
+        elif kind in OUTPUT_TYPES:
+            execution.add_output(output_from(msg))
+
+    def stop(self) -> None:
+        with self._cond:
+            self._stopped = True
+            thread = self._thread
+        self._wake()
+        if thread is not None:
+            thread.join(timeout=5)
+        with self._cond:
+            self._thread = None
+            aborted = [e for _, e in self._executions.values()]
+            self._executions.clear()
+        for execution in aborted:
+            execution.finish("aborted")
@@ -0,0 +1,155 @@
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+from app.core.config import settings
+from app.services.jupyter_manager import kernel_service
+import logging
+
+logger = logging.getLogger("insighter")
+
+_CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+# One sample: (unix time, cpu percent or None, rss bytes, open files or None, threads)
+Sample = Tuple[float, Optional[float], int, Optional[int], int]
+
+
+def read_process(pid: int) -> Optional[Tuple[int, int, Optional[int], int]]:
+    """
+    (cpu ticks, rss bytes, open files, threads) of a process, from
+    /proc/<pid>/stat and /proc/<pid>/fd. None if the process is gone.
+    """
+    try:
+        with open(f"/proc/{pid}/stat", "rb") as f:
+            stat = f.read()
+    except (FileNotFoundError, ProcessLookupError):
+        return None
+    # The command name (field 2) may contain spaces; fields after it are fixed
+    fields = stat[stat.rindex(b")") + 2:].split()
+    ticks = int(fields[11]) + int(fields[12])  # utime + stime
+    threads = int(fields[17])
+    rss = int(fields[21]) * _PAGE_SIZE
+    try:
+        open_files: Optional[int] = len(os.listdir(f"/proc/{pid}/fd"))
+    except (FileNotFoundError, ProcessLookupError, PermissionError):
+        open_files = None
+    return ticks, rss, open_files, threads
+
+
+def sample_dict(sample: Sample) -> Dict[str, Any]:
+    timestamp, cpu, rss, open_files, threads = sample
+    return {"timestamp": timestamp, "cpu_percent": cpu, "rss_bytes": rss, "open_files": open_files, "threads": threads}
+
+
+class KernelTelemetry:
+    """
+    CPU, RSS, open files and threads of every running kernel, read from /proc
+    by one sampler thread every `interval` seconds (a few small reads per
+    kernel, no subprocesses). The last `history` samples of each project's
+    kernel are kept in a ring buffer; a project's series restarts when its
+    kernel is replaced and is dropped when the kernel is shut down.
+
+    CPU is the percentage of one core used since the previous sample.
+    """
+
+    def __init__(self, pids: Callable[[], Dict[str, int]], interval: float = 5, history: int = 720):
+        self.pids = pids
+        self.interval = max(0.1, interval)
+        self.history = max(1, history)
+        # project_id -> (pid, samples)
+        self._series: Dict[str, Tuple[int, Deque[Sample]]] = {}
+        # pid -> (cpu ticks, monotonic time) of its previous sample
+        self._previous: Dict[int, Tuple[int, float]] = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name="kernel-telemetry", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                self.sample()
+            except Exception as e:
+                logger.error(f"Kernel telemetry sample failed: {e}")
+            self._stopped.wait(self.interval)
+
+    def sample(self) -> None:
+        """Take one sample of every running kernel."""
+        pids = self.pids()
+        now, clock = time.time(), time.monotonic()
+        readings = {project_id: (pid, read_process(pid)) for project_id, pid in pids.items()}
+        with self._lock:
+            for project_id in set(self._series) - set(pids):
+                del self._series[project_id]
+            previous, self._previous = self._previous, {}
+            for project_id, (pid, reading) in readings.items():
+                if reading is None:
+                    continue
+                ticks, rss, open_files, threads = reading
+                cpu = None
+                if pid in previous:
+                    last_ticks, last_clock = previous[pid]
+                    if clock > last_clock:
+                        cpu = round(100.0 * (ticks - last_ticks) / _CLOCK_TICKS / (clock - last_clock), 1)
+                self._previous[pid] = (ticks, clock)
+                series = self._series.get(project_id)
+                if series is None or series[0] != pid:
+                    series = self._series[project_id] = (pid, deque(maxlen=self.history))
+                series[1].append((now, cpu, rss, open_files, threads))
+
+    def latest(self, project_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            series = self._series.get(project_id)
+            if not series or not series[1]:
+                return None
+            return {"pid": series[0], **sample_dict(series[1][-1])}
+
+    def current(self, project_id: str, pid: int) -> Optional[Dict[str, Any]]:
+        """
+        Latest sample of the project's kernel process `pid`. If the sampler
+        has not seen that process yet it is read now, without a CPU figure
+        (which needs two readings).
+        """
+        latest = self.latest(project_id)
+        if latest is not None and latest['pid'] == pid:
+            return latest
+        reading = read_process(pid)
+        if reading is None:
+            return None
+        _, rss, open_files, threads = reading
+        return {"pid": pid, **sample_dict((time.time(), None, rss, open_files, threads))}
+
+    def series(self, project_id: str, since: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Samples of a project's kernel, oldest first (after `since`, a unix time, if given)."""
+        with self._lock:
+            samples = list(self._series.get(project_id, (None, ()))[1])
+        return [sample_dict(s) for s in samples if since is None or s[0] > since]
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """Latest sample of every kernel, largest RSS first (candidates for reclaiming memory)."""
+        with self._lock:
+            latest = [{"project_id": project_id, "pid": pid, **sample_dict(samples[-1])}
+                      for project_id, (pid, samples) in self._series.items() if samples]
+        return sorted(latest, key=lambda s: s["rss_bytes"], reverse=True)
+
+
+kernel_telemetry = KernelTelemetry(
+    kernel_service.kernel_pids,
+    interval=settings.KERNEL_TELEMETRY_INTERVAL_SECONDS,
+    history=settings.KERNEL_TELEMETRY_HISTORY,
+)
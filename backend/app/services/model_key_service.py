@@ -1,10 +1,17 @@
+import asyncio
 import secrets
 import hashlib
-from datetime import datetime, timedelta
-from typing import Optional, Tuple, List
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional, Set, Tuple, List
 from pydantic import BaseModel
 from app.db.supabase import SupabaseManager
 from app.core.config import settings
+import logging
+
+logger = logging.getLogger("insighter")
 
 class APIKeyCreate(BaseModel):
     model_id: str
@@ -21,6 +28,22 @@ class APIKeyResponse(BaseModel):
     expires_at: Optional[str]
 
 class ModelKeyService:
+    """
+    Issues and validates model API keys.
+
+    Validated keys are cached in memory (keyed by hash) until the earlier of
+    their `expires_at` and MODEL_KEY_CACHE_TTL_SECONDS, so the inference hot path
+    does not hit Postgres. `last_used_at` is written behind: uses are collected
+    per key and flushed by a background task in one bulk UPDATE per interval.
+    """
+
+    def __init__(self):
+        self._cache: "OrderedDict[str, Tuple[dict, float]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._pending_last_used: Set[str] = set()
+        self._last_flushed: Dict[str, float] = {}
+        self._flusher: Optional[asyncio.Task] = None
+
     @staticmethod
     def generate_key_pair() -> Tuple[str, str]:
         """
@@ -33,7 +56,7 @@ class ModelKeyService:
 
     @staticmethod
     async def create_key(user_id: str, config: APIKeyCreate) -> APIKeyResponse:
-        supabase = SupabaseManager.get_client()
+        supabase = SupabaseManager.get_async_client()
         raw_key, key_hash = ModelKeyService.generate_key_pair()
         
         expires_at = None
@@ -51,7 +74,7 @@ class ModelKeyService:
             "is_active": True
         }
 
-        response = supabase.table('model_api_keys').insert(data).execute()
+        response = await supabase.table('model_api_keys').insert(data).execute()
         if not response.data:
             raise Exception("Failed to create API key in database")
 
@@ -66,9 +89,49 @@ class ModelKeyService:
         )
 
     @staticmethod
-    async def validate_key(raw_key: str) -> Tuple[bool, Optional[dict]]:
+    def _expires_at(key_data: dict) -> Optional[datetime]:
+        if not key_data.get('expires_at'):
+            return None
+        return datetime.fromisoformat(key_data['expires_at'].replace('Z', '+00:00'))
+
+    def _cache_get(self, key_hash: str) -> Optional[dict]:
+        with self._cache_lock:
+            entry = self._cache.get(key_hash)
+            if entry is None:
+                return None
+            key_data, cached_until = entry
+            if cached_until <= time.time():
+                del self._cache[key_hash]
+                return None
+            self._cache.move_to_end(key_hash)
+            return key_data
+
+    def _cache_put(self, key_hash: str, key_data: dict) -> None:
+        if settings.MODEL_KEY_CACHE_MAX_ENTRIES <= 0:
+            return
+        cached_until = time.time() + settings.MODEL_KEY_CACHE_TTL_SECONDS
+        expires_at = self._expires_at(key_data)
+        if expires_at is not None:
+            cached_until = min(cached_until, expires_at.timestamp())
+        with self._cache_lock:
+            self._cache[key_hash] = (key_data, cached_until)
+            self._cache.move_to_end(key_hash)
+            while len(self._cache) > settings.MODEL_KEY_CACHE_MAX_ENTRIES:
+                self._cache.popitem(last=False)
+
+    def invalidate(self, key_id: Optional[str] = None, key_hash: Optional[str] = None) -> None:
+        """Drop a key from this worker's cache (by id, hash, or both)."""
+        with self._cache_lock:
+            if key_hash:
+                self._cache.pop(key_hash, None)
+            if key_id:
+                for cached_hash, (key_data, _) in list(self._cache.items()):
+                    if key_data.get('id') == key_id:
+                        del self._cache[cached_hash]
+
+    async def validate_key(self, raw_key: str) -> Tuple[bool, Optional[dict]]:
         """
-        Validates an API key against the database.
+        Validates an API key, from the in-memory cache when possible.
         Returns (is_valid, metadata)
         """
         if not raw_key.startswith("ins_model_"):
@@ -77,31 +140,105 @@ class ModelKeyService:
         key_hash = hashlib.sha256(raw_key.encode()).hexdigest()
         key_prefix = raw_key[:12]
 
-        supabase = SupabaseManager.get_client()
-        response = supabase.table('model_api_keys')\
-            .select("*, models(name)")\
-            .eq('key_prefix', key_prefix)\
-            .eq('key_hash', key_hash)\
-            .eq('is_active', True)\
-            .execute()
+        key_data = self._cache_get(key_hash)
+        if key_data is None:
+            supabase = SupabaseManager.get_async_client()
+            response = await supabase.table('model_api_keys')\
+                .select("*, models(name)")\
+                .eq('key_prefix', key_prefix)\
+                .eq('key_hash', key_hash)\
+                .eq('is_active', True)\
+                .execute()
 
-        if not response.data:
-            return False, None
+            if not response.data:
+                return False, None
 
-        key_data = response.data[0]
-        
-        # Check expiration
-        if key_data['expires_at']:
-            expires_at = datetime.fromisoformat(key_data['expires_at'].replace('Z', '+00:00'))
-            if expires_at < datetime.now(expires_at.timezone):
+            key_data = response.data[0]
+            
+            # Check expiration
+            expires_at = self._expires_at(key_data)
+            if expires_at is not None and expires_at < datetime.now(timezone.utc):
                 return False, None
 
-        # Update last used
-        supabase.table('model_api_keys')\
-            .update({"last_used_at": datetime.utcnow().isoformat()})\
-            .eq('id', key_data['id'])\
-            .execute()
+            self._cache_put(key_hash, key_data)
+
+        # Update last used (written behind, see flush_last_used)
+        self._record_use(key_data['id'])
 
         return True, key_data
 
+    async def revoke_key(self, key_id: str, user_id: str) -> bool:
+        """Deactivate a key owned by `user_id` and evict it from the cache."""
+        supabase = SupabaseManager.get_async_client()
+        response = await supabase.table('model_api_keys')\
+            .update({"is_active": False})\
+            .eq('id', key_id)\
+            .eq('user_id', user_id)\
+            .execute()
+        if not response.data:
+            return False
+        self.invalidate(key_id=key_id, key_hash=response.data[0].get('key_hash'))
+        self._pending_last_used.discard(key_id)
+        return True
+
+    def _record_use(self, key_id: str) -> None:
+        last_flushed = self._last_flushed.get(key_id, 0.0)
+        if time.time() - last_flushed < settings.MODEL_KEY_LAST_USED_FLUSH_SECONDS:
+            return
+        self._pending_last_used.add(key_id)
+        self._ensure_flusher()
+
+    def _ensure_flusher(self) -> None:
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.get_running_loop().create_task(self._flush_loop())
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(settings.MODEL_KEY_LAST_USED_FLUSH_SECONDS)
+            try:
+                await self.flush_last_used()
+            except Exception as e:
+                logger.warning(f"Flushing model key last_used_at failed: {e}")
+
+    async def flush_last_used(self) -> int:
+        """Write pending last_used_at values in one UPDATE per batch of keys."""
+        if not self._pending_last_used:
+            return 0
+        key_ids = list(self._pending_last_used)
+        self._pending_last_used.difference_update(key_ids)
+
+        supabase = SupabaseManager.get_async_client()
+        now = datetime.now(timezone.utc)
+        batch_size = 200  # keep the id=in.(...) filter well under URL length limits
+        for i in range(0, len(key_ids), batch_size):
+            batch = key_ids[i:i + batch_size]
+            try:
+                await supabase.table('model_api_keys')\
+                    .update({"last_used_at": now.isoformat()})\
+                    .in_('id', batch)\
+                    .execute()
+            except Exception:
+                # Retry on the next tick rather than dropping the usage
+                self._pending_last_used.update(batch)
+                raise
+        flushed_at = time.time()
+        for key_id in key_ids:
+            self._last_flushed[key_id] = flushed_at
+        # Forget keys that have been quiet for a while so the map stays bounded
+        horizon = flushed_at - 10 * settings.MODEL_KEY_LAST_USED_FLUSH_SECONDS
+        for key_id, ts in list(self._last_flushed.items()):
+            if ts < horizon:
+                del self._last_flushed[key_id]
+        return len(key_ids)
+
+    async def shutdown(self) -> None:
+        """Stop the background flusher and persist any pending usage."""
+        if self._flusher is not None:
+            self._flusher.cancel()
+            self._flusher = None
+        try:
+            await self.flush_last_used()
+        except Exception as e:
+            logger.warning(f"Final model key last_used_at flush failed: {e}")
+
 model_key_service = ModelKeyService()
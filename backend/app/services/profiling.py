@@ -0,0 +1,165 @@
+import asyncio
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+import numpy as np
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from starlette.concurrency import run_in_threadpool
+from app.core.config import settings
+from app.db.supabase import SupabaseManager
+from app.services.conversion import parquet_copy, write_batches
+from app.services.dataset_reader import arrow_source
+from app.services.sketches import histogram_edges, profile_row_groups
+from app.services.storage import StorageBackend, get_storage_backend
+from app.services.uploads import file_extension
+import logging
+
+logger = logging.getLogger("insighter")
+
+PROFILE_FORMATS = {'.csv', '.json', '.parquet', '.npy'}
+
+
+def fingerprint(dataset: Dict[str, Any]) -> str:
+    """Identifies the stored bytes a profile was computed from."""
+    return dataset.get('checksum') or f"{dataset.get('file_path')}:{dataset.get('size_bytes')}"
+
+
+def current_profile(dataset: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """The dataset's stored profile, if it is complete and the file has not changed since."""
+    profile = (dataset.get('schema') or {}).get('profile') or {}
+    if profile.get('status') == 'ready' and profile.get('fingerprint') == fingerprint(dataset):
+        return profile
+    return None
+
+
+class DatasetProfiler:
+    """
+    Column profiles of stored datasets, kept under datasets.schema.profile:
+
+        {"status": "running" | "ready" | "failed", "fingerprint", "rows",
+         "row_groups", "profiled_at", "columns": [{"name", "type", "count",
+         "null_count", "distinct_estimate", "min", "max", "mean", "std",
+         "quantiles", "histogram"}], "error"}
+
+    The dataset is staged as a local Parquet file (downloaded when it is
+    Parquet or has a Parquet copy, otherwise converted while it streams from
+    storage). Its row groups are then split over a process pool; each task
+    reads one column chunk at a time and builds mergeable sketches
+    (HyperLogLog, quantile sketch, fixed-edge histogram), which are merged
+    here. One profile runs at a time per process and uses the whole pool.
+    """
+
+    def __init__(self, workers: int):
+        self.workers = max(1, workers)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    @staticmethod
+    def supports(dataset: Dict[str, Any]) -> bool:
+        return bool(parquet_copy(dataset)) or file_extension(dataset['name']) in PROFILE_FORMATS
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    # Spawned, not forked: the server process has running threads
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                    )
+        return self._executor
+
+    async def _set_status(self, dataset_id: str, profile: Dict[str, Any]) -> None:
+        supabase = SupabaseManager.get_async_service_client()
+        current = await supabase.table('datasets')\
+            .select("schema")\
+            .eq('id', dataset_id)\
+            .execute()
+        if not current.data:
+            return
+        schema = dict(current.data[0].get('schema') or {})
+        schema['profile'] = profile
+        await supabase.table('datasets')\
+            .update({"schema": schema})\
+            .eq('id', dataset_id)\
+            .execute()
+
+    async def profile(self, dataset: Dict[str, Any], token: str,
+                      backend: Optional[StorageBackend] = None) -> Dict[str, Any]:
+        """Profile one dataset row (needs id, name, file_path, schema, checksum, size_bytes, metadata)."""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(1)
+        backend = backend or get_storage_backend()
+        # Profiles outlive the request (see ParquetConverter.convert)
+        token = settings.SUPABASE_SERVICE_ROLE_KEY or token
+        profile: Dict[str, Any] = {
+            "status": "running",
+            "fingerprint": fingerprint(dataset),
+            "started_at": datetime.now(timezone.utc).isoformat(),
+        }
+        async with self._semaphore:
+            await self._set_status(dataset['id'], profile)
+            fd, path = tempfile.mkstemp(suffix=".parquet")
+            os.close(fd)
+            try:
+                await self._stage(backend, dataset, token, path)
+                profile.update(await self._profile_file(path), status="ready",
+                               profiled_at=datetime.now(timezone.utc).isoformat())
+            except Exception as e:
+                logger.error(f"Profiling dataset {dataset['id']} failed: {e}")
+                profile.update(status="failed", error=str(e))
+            finally:
+                os.unlink(path)
+            await self._set_status(dataset['id'], profile)
+        return profile
+
+    async def _stage(self, backend: StorageBackend, dataset: Dict[str, Any], token: str, path: str) -> None:
+        """Local Parquet file with the dataset's rows."""
+        key = parquet_copy(dataset) or (dataset['file_path'] if file_extension(dataset['name']) == '.parquet' else None)
+        if key:
+            with open(path, 'wb') as f:
+                async for chunk in backend.download(key, token):
+                    await run_in_threadpool(f.write, chunk)
+            return
+
+        def convert():
+            source = arrow_source(backend, dataset, token)
+            batches = source.to_batches() if isinstance(source, ds.Dataset) else source
+            write_batches(batches, path, settings.DATASET_PARQUET_ROW_GROUP_ROWS, "snappy")
+        await run_in_threadpool(convert)
+
+    async def _profile_file(self, path: str) -> Dict[str, Any]:
+        parquet = await run_in_threadpool(pq.ParquetFile, path)
+        metadata, schema = parquet.metadata, parquet.schema_arrow
+        edges = histogram_edges(metadata, schema)
+        # A few tasks per worker so a slow row group does not idle the others
+        groups = [g.tolist() for g in np.array_split(np.arange(metadata.num_row_groups),
+                                                       min(metadata.num_row_groups, self.workers * 4)) if len(g)]
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        parts: List[Dict[str, Any]] = await asyncio.gather(*(
+            loop.run_in_executor(executor, profile_row_groups, path, g, edges) for g in groups
+        ))
+        merged = parts[0] if parts else {}
+        for part in parts[1:]:
+            for name, stats in part.items():
+                merged[name].merge(stats)
+        return {
+            "rows": metadata.num_rows,
+            "row_groups": metadata.num_row_groups,
+            "columns": [merged[field.name].to_dict(field.name) for field in schema if field.name in merged],
+        }
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+dataset_profiler = DatasetProfiler(settings.DATASET_PROFILE_WORKERS)
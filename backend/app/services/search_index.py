@@ -0,0 +1,458 @@
+import asyncio
+import bisect
+import heapq
+import html
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple
+from app.core.config import settings
+from app.core.private_files import read_private, state_path, write_private
+from app.db.supabase import SupabaseManager
+import logging
+
+logger = logging.getLogger("insighter")
+
+# (table, entity type, owner column, body columns) - mirrors search_documents.sql
+INDEXED_TABLES = [
+    ('projects', 'project', 'owner_id', ('description',)),
+    ('datasets', 'dataset', 'created_by', ('description',)),
+    ('notebooks', 'notebook', 'created_by', ('description',)),
+    ('models', 'model', 'created_by', ('version', 'framework')),
+]
+
+SNAPSHOT_VERSION = 3
+
+# Fields of a document kept in snapshots; tokens and sizes are derived on load
+SNAPSHOT_FIELDS = ('type', 'id', 'owner_id', 'project_id', 'title', 'body', 'updated_at')
+
+# Ids per request when checking which indexed rows still exist
+_PRUNE_BATCH = 200
+
+
+def _quote(value: str) -> str:
+    """Quote a value for a PostgREST logic-tree filter."""
+    return '"' + value.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """
+    Lowercased terms of `text`. Identifiers are indexed whole and by their
+    parts, so "churn_v2" is found by "churn", "v2" and "churn_v2".
+    """
+    if not text:
+        return []
+    tokens = []
+    for word in re.findall(r"\w+", text.lower()):
+        tokens.append(word)
+        if '_' in word:
+            tokens.extend(part for part in word.split('_') if part)
+    return tokens
+
+
+class SearchIndex:
+    """
+    In-process inverted index over projects, datasets, notebooks and models.
+
+    Serves /api/search when Postgres full-text search is not available
+    (air-gapped installs). Every term of a query is matched as a prefix
+    against a sorted vocabulary, so type-ahead lookups are a couple of bisects
+    plus set intersections.
+
+    The index is fed incrementally: routers publish the rows they write
+    through `upsert()`, and `sync()` pulls rows whose `updated_at` moved past
+    the last seen value. That feed cannot see deletes, so `prune()` drops
+    indexed rows that no longer exist. Memory is bounded by `max_bytes` (least
+    recently updated documents are evicted first) and the index is written as
+    JSON to `snapshot_path` so a restart only has to catch up on recent changes.
+    """
+
+    def __init__(self, max_bytes: int, snapshot_path: str):
+        self.max_bytes = max_bytes
+        self.snapshot_path = snapshot_path
+        self._docs: "OrderedDict[Tuple[str, str], dict]" = OrderedDict()
+        self._postings: Dict[str, Set[Tuple[str, str]]] = {}
+        self._vocab: List[str] = []
+        self._by_owner: Dict[Optional[str], Set[Tuple[str, str]]] = {}
+        # Per table: (updated_at, id) of the last row the change feed returned
+        self._high_water: Dict[str, List[str]] = {}
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self._dirty = False
+        self.evictions = 0
+        self._last_prune = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    # -- maintenance -----------------------------------------------------
+
+    @staticmethod
+    def _estimate_size(doc: dict) -> int:
+        # Rough CPython footprint: the record, its strings, and one posting-set
+        # entry per distinct token.
+        text = len(doc['title']) + len(doc['body'] or '')
+        return 400 + 2 * text + 90 * len(doc['tokens'])
+
+    def _add_postings(self, key, tokens) -> None:
+        for token in tokens:
+            posting = self._postings.get(token)
+            if posting is None:
+                posting = self._postings[token] = set()
+                bisect.insort(self._vocab, token)
+            posting.add(key)
+
+    def _remove_postings(self, key, tokens) -> None:
+        for token in tokens:
+            posting = self._postings.get(token)
+            if posting is None:
+                continue
+            posting.discard(key)
+            if not posting:
+                del self._postings[token]
+                i = bisect.bisect_left(self._vocab, token)
+                if i < len(self._vocab) and self._vocab[i] == token:
+                    del self._vocab[i]
+
+    def _link(self, key, doc) -> None:
+        self._docs[key] = doc
+        self._add_postings(key, doc['tokens'])
+        self._by_owner.setdefault(doc['owner_id'], set()).add(key)
+        self._bytes += doc['size']
+
+    def _drop(self, key) -> None:
+        doc = self._docs.pop(key, None)
+        if doc is not None:
+            self._remove_postings(key, doc['tokens'])
+            owned = self._by_owner.get(doc['owner_id'])
+            if owned is not None:
+                owned.discard(key)
+                if not owned:
+                    del self._by_owner[doc['owner_id']]
+            self._bytes -= doc['size']
+
+    @classmethod
+    def _document(cls, entity_type: str, entity_id: str, owner_id: Optional[str], project_id: Optional[str],
+                  title: str, body: Optional[str], updated_at: str) -> dict:
+        title_tokens = set(tokenize(title))
+        doc = {
+            'type': entity_type,
+            'id': entity_id,
+            'owner_id': owner_id,
+            'project_id': project_id,
+            'title': title,
+            'body': body,
+            'updated_at': updated_at,
+            'title_tokens': frozenset(title_tokens),
+            'tokens': frozenset(title_tokens | set(tokenize(body))),
+        }
+        doc['size'] = cls._estimate_size(doc)
+        return doc
+
+    def _evict(self) -> None:
+        while self._bytes > self.max_bytes and len(self._docs) > 1:
+            oldest = next(iter(self._docs))
+            self._drop(oldest)
+            self.evictions += 1
+
+    def upsert(self, entity_type: str, row: dict) -> None:
+        """Index (or re-index) one row of projects/datasets/notebooks/models."""
+        spec = next((t for t in INDEXED_TABLES if t[1] == entity_type), None)
+        if spec is None or not row.get('id') or not row.get('name'):
+            return
+        table, _, owner_column, body_columns = spec
+        body = ' '.join(str(row[c]) for c in body_columns if row.get(c)) or None
+        doc = self._document(
+            entity_type,
+            str(row['id']),
+            row.get(owner_column),
+            row.get('project_id') or (row['id'] if table == 'projects' else None),
+            row['name'],
+            body,
+            row.get('updated_at') or row.get('created_at') or '',
+        )
+        key = (entity_type, doc['id'])
+        with self._lock:
+            self._drop(key)
+            self._link(key, doc)
+            self._evict()
+            self._dirty = True
+
+    def remove(self, entity_type: str, entity_id: str) -> None:
+        with self._lock:
+            self._drop((entity_type, str(entity_id)))
+            self._dirty = True
+
+    def clear(self) -> None:
+        with self._lock:
+            self._docs.clear()
+            self._postings.clear()
+            self._vocab.clear()
+            self._by_owner.clear()
+            self._high_water.clear()
+            self._bytes = 0
+            self._dirty = True
+
+    # -- queries ---------------------------------------------------------
+
+    def _expand(self, lo: int, hi: int) -> Set[Tuple[str, str]]:
+        """Union of the postings of the vocabulary tokens in [lo, hi)."""
+        keys: Set[Tuple[str, str]] = set()
+        for token in self._vocab[lo:hi]:
+            keys |= self._postings[token]
+        return keys
+
+    def search(self, q: str, owner_id: str, entity_type: Optional[str] = None,
+               limit: int = 10, offset: int = 0) -> Tuple[List[dict], int]:
+        """
+        Documents matching every term of `q` (as a prefix), best first.
+        Returns (page, total). Title matches outrank body matches and exact
+        tokens outrank prefixes; ties go to the most recently updated.
+        """
+        terms = list(dict.fromkeys(tokenize(q)))
+        if not terms:
+            return [], 0
+        with self._lock:
+            candidates = self._by_owner.get(owner_id, set())
+            # Vocabulary tokens each term expands to (its prefix range)
+            expansions = {}
+            for term in terms:
+                lo = bisect.bisect_left(self._vocab, term)
+                expansions[term] = (lo, bisect.bisect_left(self._vocab, term + '\U0010ffff', lo))
+            # Longest (most selective) terms first. Each step either unions the
+            # postings of the prefix range or, when that would touch more keys
+            # than re-checking the (few) remaining candidates' tokens, filters.
+            for term in sorted(terms, key=len, reverse=True):
+                if not candidates:
+                    return [], 0
+                lo, hi = expansions[term]
+                filter_cost = len(candidates) * 8
+                expand_cost = 0
+                for token in self._vocab[lo:hi]:
+                    expand_cost += len(self._postings[token])
+                    if expand_cost > filter_cost:
+                        break
+                if filter_cost < expand_cost:
+                    candidates = {
+                        key for key in candidates
+                        if any(t.startswith(term) for t in self._docs[key]['tokens'])
+                    }
+                else:
+                    candidates = candidates & self._expand(lo, hi)
+            if not candidates:
+                return [], 0
+
+            # Score: 3 per term that is a title token, 2 per term that prefixes
+            # one, 1 per term matched in the body only.
+            scorers = []
+            for term in terms:
+                lo, hi = expansions[term]
+                prefixed = frozenset(self._vocab[lo:hi]) if hi - lo <= 1024 else None
+                scorers.append((term, prefixed))
+
+            def rank(key):
+                doc = self._docs[key]
+                title_tokens = doc['title_tokens']
+                score = 0
+                for term, prefixed in scorers:
+                    if term in title_tokens:
+                        score += 3
+                    elif (not title_tokens.isdisjoint(prefixed) if prefixed is not None
+                          else any(t.startswith(term) for t in title_tokens)):
+                        score += 2
+                    else:
+                        score += 1
+                return score, doc['updated_at'], doc['id']
+
+            if entity_type:
+                candidates = [key for key in candidates if key[0] == entity_type]
+            top = heapq.nlargest(offset + limit, candidates, key=rank)
+            return [self._docs[key] for key in top[offset:]], len(candidates)
+
+    @staticmethod
+    def highlight(text: Optional[str], q: str) -> Optional[str]:
+        """HTML of `text` (escaped) with the words that start with a query term wrapped in <mark>."""
+        if not text:
+            return text
+        terms = tokenize(q)
+        if not terms:
+            return html.escape(text)
+        pattern = re.compile(r"\b(" + "|".join(re.escape(t) for t in sorted(terms, key=len, reverse=True)) + r")[^\W_]*",
+                             re.IGNORECASE)
+        parts, end = [], 0
+        for match in pattern.finditer(text):
+            parts.append(html.escape(text[end:match.start()]))
+            parts.append(f"<mark>{html.escape(match.group(0))}</mark>")
+            end = match.end()
+        parts.append(html.escape(text[end:]))
+        return "".join(parts)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "documents": len(self._docs),
+                "tokens": len(self._postings),
+                "estimated_bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "evictions": self.evictions,
+                "high_water": dict(self._high_water),
+            }
+
+    # -- persistence -----------------------------------------------------
+
+    def save_snapshot(self) -> bool:
+        """Atomically write the index to `snapshot_path` (JSON, mode 0600) if it changed."""
+        with self._lock:
+            if not self._dirty:
+                return False
+            state = {
+                "version": SNAPSHOT_VERSION,
+                # Least recently updated first, so loading keeps the eviction order
+                "docs": [[doc[field] for field in SNAPSHOT_FIELDS] for doc in self._docs.values()],
+                "high_water": dict(self._high_water),
+            }
+            self._dirty = False
+        try:
+            write_private(self.snapshot_path, json.dumps(state, separators=(',', ':')).encode())
+            return True
+        except OSError as e:
+            logger.warning(f"Could not write search index snapshot to {self.snapshot_path}: {e}")
+            self._dirty = True
+            return False
+
+    def load_snapshot(self) -> bool:
+        """
+        Replace the index with the snapshot at `snapshot_path`. The file is
+        only read if this user owns it, nobody else can write to it and it is
+        at most `max_bytes`; documents beyond the memory cap are evicted.
+        """
+        try:
+            state = json.loads(read_private(self.snapshot_path, max_bytes=self.max_bytes))
+            if not isinstance(state, dict) or state.get("version") != SNAPSHOT_VERSION:
+                return False
+            docs = [self._document(*fields) for fields in state["docs"]]
+            high_water = {str(table): [str(value[0]), str(value[1])] for table, value in state["high_water"].items()}
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError, TypeError, KeyError, AttributeError) as e:
+            logger.warning(f"Ignoring unusable search index snapshot {self.snapshot_path}: {e}")
+            return False
+        with self._lock:
+            self.clear()
+            for doc in docs:
+                key = (doc['type'], doc['id'])
+                self._docs[key] = doc
+                self._by_owner.setdefault(doc['owner_id'], set()).add(key)
+                self._bytes += doc['size']
+                for token in doc['tokens']:
+                    self._postings.setdefault(token, set()).add(key)
+            self._vocab = sorted(self._postings)
+            self._evict()
+            self._high_water = high_water
+            self._dirty = False
+        logger.info(f"Loaded search index snapshot: {len(self._docs)} documents")
+        return True
+
+    # -- change feed -----------------------------------------------------
+
+    async def sync(self, batch_size: int = 1000) -> int:
+        """
+        Pull rows updated since the last row seen of each table. Pages are keyed
+        on (updated_at, id): rows written by one statement share `updated_at`,
+        so a page boundary can fall among them.
+        """
+        supabase = SupabaseManager.get_async_service_client()
+        if supabase is None:
+            return 0
+        changed = 0
+        for table, entity_type, owner_column, body_columns in INDEXED_TABLES:
+            columns = ["id", "name", owner_column, "updated_at", "created_at", *body_columns]
+            if table != 'projects':
+                columns.append("project_id")
+            while True:
+                query = supabase.table(table)\
+                    .select(", ".join(columns))\
+                    .order('updated_at')\
+                    .order('id')\
+                    .limit(batch_size)
+                if table == 'datasets':
+                    # Value-mode rows are data points, not datasets to search for
+                    query = query.eq('storage_mode', 'file')
+                if table in self._high_water:
+                    updated_at, last_id = (_quote(value) for value in self._high_water[table])
+                    query = query.or_(f"updated_at.gt.{updated_at},and(updated_at.eq.{updated_at},id.gt.{last_id})")
+                response = await query.execute()
+                for row in response.data:
+                    self.upsert(entity_type, row)
+                # Only the feed moves the high-water mark: rows published by
+                # this worker may be newer than writes other workers made.
+                if response.data:
+                    last = response.data[-1]
+                    with self._lock:
+                        self._high_water[table] = [str(last['updated_at']), str(last['id'])]
+                changed += len(response.data)
+                if len(response.data) < batch_size:
+                    break
+        return changed
+
+    async def prune(self) -> int:
+        """Drop indexed documents whose rows were deleted. Returns how many."""
+        supabase = SupabaseManager.get_async_service_client()
+        if supabase is None:
+            return 0
+        removed = 0
+        for table, entity_type, _, _ in INDEXED_TABLES:
+            with self._lock:
+                ids = [key[1] for key in self._docs if key[0] == entity_type]
+            for start in range(0, len(ids), _PRUNE_BATCH):
+                batch = ids[start:start + _PRUNE_BATCH]
+                response = await supabase.table(table).select("id").in_('id', batch).execute()
+                existing = {str(row['id']) for row in response.data}
+                for entity_id in batch:
+                    if entity_id not in existing:
+                        self.remove(entity_type, entity_id)
+                        removed += 1
+        return removed
+
+    async def run(self, interval: float, prune_interval: float) -> None:
+        """Load the snapshot, then keep catching up, pruning and snapshotting."""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.load_snapshot)
+        while True:
+            try:
+                changed = await self.sync()
+                if changed:
+                    logger.debug(f"Search index caught up on {changed} rows")
+                if time.monotonic() - self._last_prune >= prune_interval:
+                    self._last_prune = time.monotonic()
+                    removed = await self.prune()
+                    if removed:
+                        logger.debug(f"Search index dropped {removed} deleted rows")
+            except Exception as e:
+                logger.warning(f"Search index sync failed: {e}")
+            await loop.run_in_executor(None, self.save_snapshot)
+            await asyncio.sleep(interval)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(
+                self.run(settings.SEARCH_INDEX_SYNC_SECONDS, settings.SEARCH_INDEX_PRUNE_SECONDS)
+            )
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self.save_snapshot()
+
+
+search_index = SearchIndex(
+    max_bytes=settings.SEARCH_INDEX_MAX_BYTES,
+    snapshot_path=settings.SEARCH_INDEX_SNAPSHOT_PATH or state_path("search_index.json"),
+)
+
+
+def publish_change(entity_type: str, row: Optional[dict]) -> None:
+    """Feed a freshly written row to the in-process index when it is in use."""
+    if settings.SEARCH_BACKEND == 'memory' and row:
+        search_index.upsert(entity_type, row)
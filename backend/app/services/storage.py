@@ -0,0 +1,286 @@
+import base64
+from typing import Any, AsyncIterator, Dict, List, Optional
+from starlette.concurrency import run_in_threadpool
+from app.core.config import settings
+from app.db.supabase import SupabaseManager
+import logging
+
+logger = logging.getLogger("insighter")
+
+
+class StorageError(Exception):
+    """Raised when the object store rejects an operation."""
+
+
+class StorageBackend:
+    """
+    Multipart/resumable object upload, as used by the dataset upload pipeline.
+
+    An upload is created once, fed fixed-size parts (`part_size`, except the
+    last one) and completed. Backends with `sequential = True` only accept parts
+    in order (TUS offsets); the others accept them in any order (S3 parts).
+    `token` is the caller's JWT for stores that enforce per-user policies.
+    """
+
+    part_size: int
+    sequential: bool = False
+
+    async def create_upload(self, key: str, content_type: str, total_size: Optional[int], token: str) -> str:
+        raise NotImplementedError
+
+    async def upload_part(self, key: str, upload_id: str, part_number: int, data: bytes,
+                          offset: int, token: str, total_size: Optional[int] = None) -> Dict[str, Any]:
+        """Store one part. `total_size` is passed with the final part."""
+        raise NotImplementedError
+
+    async def complete_upload(self, key: str, upload_id: str, parts: List[Dict[str, Any]], token: str) -> None:
+        raise NotImplementedError
+
+    async def abort_upload(self, key: str, upload_id: str, token: str) -> None:
+        raise NotImplementedError
+
+    async def delete(self, key: str, token: str) -> None:
+        raise NotImplementedError
+
+    async def put(self, key: str, data: bytes, content_type: str, token: str) -> None:
+        """Store a small object in one go, replacing any object under the same key."""
+        upload_id = await self.create_upload(key, content_type, len(data), token)
+        try:
+            part = await self.upload_part(key, upload_id, 1, data, 0, token, total_size=len(data))
+            await self.complete_upload(key, upload_id, [part], token)
+        except Exception:
+            await self.abort_upload(key, upload_id, token)
+            raise
+
+    async def download(self, key: str, token: str, start: int = 0, end: Optional[int] = None) -> AsyncIterator[bytes]:
+        """Stream an object (or the inclusive byte range start..end)."""
+        raise NotImplementedError
+        yield b""
+
+    # Blocking random access, for readers running in a worker thread (e.g.
+    # pyarrow reading selected row groups of a Parquet file)
+
+    def read_range(self, key: str, token: str, start: int, end: int) -> bytes:
+        """Bytes start..end (inclusive) of an object."""
+        raise NotImplementedError
+
+    def object_size(self, key: str, token: str) -> int:
+        raise NotImplementedError
+
+
+class S3StorageBackend(StorageBackend):
+    """S3 multipart uploads (AWS, MinIO, or Supabase's S3 endpoint via AWS_ENDPOINT_URL)."""
+
+    # S3 requires every part but the last to be at least 5 MiB
+    MIN_PART_SIZE = 5 * 1024 * 1024
+
+    def __init__(self, bucket: str, part_size: int):
+        self.bucket = bucket
+        self.part_size = max(part_size, self.MIN_PART_SIZE)
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            try:
+                import boto3
+            except ImportError:
+                raise StorageError("STORAGE_TYPE=s3 requires boto3 (pip install boto3)")
+            self._client = boto3.client(
+                "s3",
+                endpoint_url=settings.AWS_ENDPOINT_URL or None,
+                region_name=settings.AWS_REGION or None,
+                aws_access_key_id=settings.AWS_ACCESS_KEY_ID or None,
+                aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY or None,
+            )
+        return self._client
+
+    async def create_upload(self, key, content_type, total_size, token):
+        response = await run_in_threadpool(
+            self.client.create_multipart_upload, Bucket=self.bucket, Key=key, ContentType=content_type
+        )
+        return response["UploadId"]
+
+    async def upload_part(self, key, upload_id, part_number, data, offset, token, total_size=None):
+        response = await run_in_threadpool(
+            self.client.upload_part,
+            Bucket=self.bucket, Key=key, UploadId=upload_id, PartNumber=part_number, Body=data,
+        )
+        return {"part_number": part_number, "etag": response["ETag"], "size": len(data)}
+
+    async def complete_upload(self, key, upload_id, parts, token):
+        await run_in_threadpool(
+            self.client.complete_multipart_upload,
+            Bucket=self.bucket, Key=key, UploadId=upload_id,
+            MultipartUpload={"Parts": [
+                {"ETag": p["etag"], "PartNumber": p["part_number"]}
+                for p in sorted(parts, key=lambda p: p["part_number"])
+            ]},
+        )
+
+    async def abort_upload(self, key, upload_id, token):
+        await run_in_threadpool(
+            self.client.abort_multipart_upload, Bucket=self.bucket, Key=key, UploadId=upload_id
+        )
+
+    async def delete(self, key, token):
+        await run_in_threadpool(self.client.delete_object, Bucket=self.bucket, Key=key)
+
+    async def put(self, key, data, content_type, token):
+        await run_in_threadpool(
+            self.client.put_object, Bucket=self.bucket, Key=key, Body=data, ContentType=content_type
+        )
+
+    def read_range(self, key, token, start, end):
+        response = self.client.get_object(Bucket=self.bucket, Key=key, Range=f"bytes={start}-{end}")
+        return response["Body"].read()
+
+    def object_size(self, key, token):
+        return self.client.head_object(Bucket=self.bucket, Key=key)["ContentLength"]
+
+    async def download(self, key, token, start=0, end=None):
+        kwargs = {"Bucket": self.bucket, "Key": key}
+        if start or end is not None:
+            kwargs["Range"] = f"bytes={start}-{'' if end is None else end}"
+        response = await run_in_threadpool(self.client.get_object, **kwargs)
+        body = response["Body"]
+        try:
+            while True:
+                chunk = await run_in_threadpool(body.read, 1024 * 1024)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            body.close()
+
+
+class SupabaseStorageBackend(StorageBackend):
+    """
+    Supabase Storage resumable uploads (TUS protocol), authenticated with the
+    user's JWT so the bucket's RLS policies apply.
+    """
+
+    # Supabase's TUS endpoint only accepts 6 MiB chunks (except the last one)
+    PART_SIZE = 6 * 1024 * 1024
+    sequential = True
+
+    def __init__(self, bucket: str):
+        self.bucket = bucket
+        self.part_size = self.PART_SIZE
+
+    @property
+    def base_url(self) -> str:
+        return f"{settings.SUPABASE_URL.rstrip('/')}/storage/v1"
+
+    def _headers(self, token: str) -> Dict[str, str]:
+        return {
+            "Authorization": f"Bearer {token}",
+            "apikey": settings.SUPABASE_KEY,
+            "Tus-Resumable": "1.0.0",
+        }
+
+    @staticmethod
+    def _metadata(**values: str) -> str:
+        return ",".join(f"{k} {base64.b64encode(v.encode()).decode()}" for k, v in values.items())
+
+    async def create_upload(self, key, content_type, total_size, token):
+        headers = self._headers(token)
+        headers["Upload-Metadata"] = self._metadata(
+            bucketName=self.bucket, objectName=key, contentType=content_type
+        )
+        if total_size is None:
+            # Streamed request bodies have no length until the last chunk
+            headers["Upload-Defer-Length"] = "1"
+        else:
+            headers["Upload-Length"] = str(total_size)
+        client = SupabaseManager.get_async_http_client()
+        response = await client.post(f"{self.base_url}/upload/resumable", headers=headers)
+        if response.status_code != 201 or "location" not in response.headers:
+            raise StorageError(f"Could not create upload ({response.status_code}): {response.text}")
+        return response.headers["location"]
+
+    async def upload_part(self, key, upload_id, part_number, data, offset, token, total_size=None):
+        headers = self._headers(token)
+        headers["Upload-Offset"] = str(offset)
+        headers["Content-Type"] = "application/offset+octet-stream"
+        if total_size is not None:
+            headers["Upload-Length"] = str(total_size)
+        client = SupabaseManager.get_async_http_client()
+        response = await client.patch(upload_id, headers=headers, content=data)
+        if response.status_code != 204:
+            raise StorageError(f"Upload of part {part_number} failed ({response.status_code}): {response.text}")
+        return {"part_number": part_number, "size": len(data)}
+
+    async def complete_upload(self, key, upload_id, parts, token):
+        # A TUS upload completes itself once the final offset is reached
+        return None
+
+    async def abort_upload(self, key, upload_id, token):
+        client = SupabaseManager.get_async_http_client()
+        await client.delete(upload_id, headers=self._headers(token))
+
+    async def delete(self, key, token):
+        headers = {"Authorization": f"Bearer {token}", "apikey": settings.SUPABASE_KEY}
+        client = SupabaseManager.get_async_http_client()
+        response = await client.delete(f"{self.base_url}/object/{self.bucket}/{key}", headers=headers)
+        if response.status_code not in (200, 404):
+            raise StorageError(f"Delete of {key} failed ({response.status_code}): {response.text}")
+
+    async def put(self, key, data, content_type, token):
+        headers = {"Authorization": f"Bearer {token}", "apikey": settings.SUPABASE_KEY,
+                   "Content-Type": content_type, "x-upsert": "true"}
+        client = SupabaseManager.get_async_http_client()
+        response = await client.post(f"{self.base_url}/object/{self.bucket}/{key}", headers=headers, content=data)
+        if response.status_code not in (200, 201):
+            raise StorageError(f"Upload of {key} failed ({response.status_code}): {response.text}")
+
+    def read_range(self, key, token, start, end):
+        headers = {"Authorization": f"Bearer {token}", "apikey": settings.SUPABASE_KEY,
+                   "Range": f"bytes={start}-{end}"}
+        response = SupabaseManager.get_http_client().get(
+            f"{self.base_url}/object/authenticated/{self.bucket}/{key}", headers=headers
+        )
+        if response.status_code not in (200, 206):
+            raise StorageError(f"Read of {key} failed ({response.status_code}): {response.text}")
+        if response.status_code == 200:
+            # Range ignored by the server: trim the full body
+            return response.content[start:end + 1]
+        return response.content
+
+    def object_size(self, key, token):
+        headers = {"Authorization": f"Bearer {token}", "apikey": settings.SUPABASE_KEY, "Range": "bytes=0-0"}
+        response = SupabaseManager.get_http_client().get(
+            f"{self.base_url}/object/authenticated/{self.bucket}/{key}", headers=headers
+        )
+        if response.status_code == 206 and "/" in response.headers.get("content-range", ""):
+            return int(response.headers["content-range"].rsplit("/", 1)[1])
+        if response.status_code == 200:
+            return len(response.content)
+        raise StorageError(f"Could not stat {key} ({response.status_code}): {response.text}")
+
+    async def download(self, key, token, start=0, end=None):
+        headers = {"Authorization": f"Bearer {token}", "apikey": settings.SUPABASE_KEY}
+        if start or end is not None:
+            headers["Range"] = f"bytes={start}-{'' if end is None else end}"
+        client = SupabaseManager.get_async_http_client()
+        url = f"{self.base_url}/object/authenticated/{self.bucket}/{key}"
+        async with client.stream("GET", url, headers=headers) as response:
+            if response.status_code not in (200, 206):
+                await response.aread()
+                raise StorageError(f"Download of {key} failed ({response.status_code}): {response.text}")
+            async for chunk in response.aiter_bytes():
+                yield chunk
+
+
+_backend: Optional[StorageBackend] = None
+
+
+def get_storage_backend() -> StorageBackend:
+    """The backend selected by STORAGE_TYPE ("supabase" or "s3")."""
+    global _backend
+    if _backend is None:
+        if settings.STORAGE_TYPE == "s3":
+            _backend = S3StorageBackend(settings.STORAGE_BUCKET, settings.UPLOAD_PART_SIZE)
+        else:
+            _backend = SupabaseStorageBackend(settings.STORAGE_BUCKET)
+    return _backend
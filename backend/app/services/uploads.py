@@ -0,0 +1,232 @@
+import hashlib
+import os
+import uuid
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from python_multipart.multipart import MultipartParser, parse_options_header
+from app.services.storage import StorageBackend
+import logging
+
+logger = logging.getLogger("insighter")
+
+ALLOWED_EXTENSIONS = {'.csv', '.parquet', '.json', '.npy', '.xlsx'}
+
+CONTENT_TYPES = {
+    '.csv': 'text/csv',
+    '.parquet': 'application/vnd.apache.parquet',
+    '.json': 'application/json',
+    '.npy': 'application/octet-stream',
+    '.xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+# Small form fields sent next to the file (e.g. project_id) are buffered; anything
+# larger than this is rejected rather than held in memory.
+MAX_FIELD_SIZE = 64 * 1024
+
+
+class UploadError(Exception):
+    """The request body is not a valid upload (bad form, filename or size)."""
+
+
+def file_extension(filename: str) -> str:
+    return '.' + filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+
+
+def object_key(user_id: str, filename: str) -> str:
+    """
+    Storage key for a new upload. The first folder is the owner's id (the bucket
+    policies check it against auth.uid()) and the random folder keeps
+    re-uploads of the same filename from overwriting each other.
+    """
+    return f"{user_id}/{uuid.uuid4()}/{os.path.basename(filename)}"
+
+
+def dataset_row(user_id: str, filename: str, key: str, size: int, checksum: str,
+                project_id: Optional[str], schema: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """The datasets row of an uploaded file."""
+    row = {
+        "name": filename,
+        "file_path": key,
+        "file_type": file_extension(filename).replace('.', ''),
+        "created_by": user_id,
+        "size_bytes": size,
+        "row_count": (schema or {}).get('row_count') or 0,
+        "schema": schema,
+        "checksum": checksum,
+    }
+    if project_id:
+        row["project_id"] = project_id
+    return row
+
+
+def part_count(total_size: int, part_size: int) -> int:
+    # An empty file is still uploaded as a single (empty) part
+    return max(1, -(-total_size // part_size))
+
+
+def expected_part_size(part_number: int, total_size: int, part_size: int) -> int:
+    if part_number < part_count(total_size, part_size):
+        return part_size
+    return total_size - (part_number - 1) * part_size
+
+
+def composite_checksum(part_digests: List[bytes]) -> str:
+    """
+    Checksum of an object uploaded in parts: sha256 over the concatenated part
+    digests, suffixed with the part count (the scheme S3 uses for multipart
+    ETags). It only needs each part once, in any order of arrival, so resumable
+    sessions spread over many requests compute the same value as a streamed upload.
+    """
+    return f"{hashlib.sha256(b''.join(part_digests)).hexdigest()}-{len(part_digests)}"
+
+
+class StreamingUpload:
+    """
+    Writes a stream of arbitrary-sized chunks to the object store as a multipart
+    upload, holding at most one part in memory. Size and checksum are computed
+    as the bytes go through.
+
+    `observers` get every chunk as well: objects with `feed(chunk)` and
+    `finish()`, used to derive metadata in the same pass over the data. A
+    failing observer is dropped; it never fails the upload.
+    """
+
+    def __init__(self, backend: StorageBackend, key: str, content_type: str, token: str,
+                 observers: Optional[List[Any]] = None):
+        self.backend = backend
+        self.key = key
+        self.content_type = content_type
+        self.token = token
+        self.observers = list(observers or [])
+        self.upload_id: Optional[str] = None
+        self.size = 0
+        self.parts: List[Dict[str, Any]] = []
+        self._digests: List[bytes] = []
+        self._buffer = bytearray()
+        self._uploaded = 0
+
+    async def start(self) -> None:
+        # The length of a streamed body is unknown up front
+        self.upload_id = await self.backend.create_upload(self.key, self.content_type, None, self.token)
+
+    async def write(self, chunk: bytes) -> None:
+        if not chunk:
+            return
+        self.size += len(chunk)
+        self._notify('feed', chunk)
+        self._buffer += chunk
+        part_size = self.backend.part_size
+        # Keep the tail buffered until more data arrives, so the final part is
+        # always sent by finish() (deferred-length stores need to know which
+        # part is the last one).
+        while len(self._buffer) > part_size:
+            data = bytes(self._buffer[:part_size])
+            del self._buffer[:part_size]
+            await self._send(data)
+
+    async def finish(self) -> Dict[str, Any]:
+        """Upload the remaining bytes and complete the object."""
+        await self._send(bytes(self._buffer), total_size=self.size)
+        self._buffer = bytearray()
+        await self.backend.complete_upload(self.key, self.upload_id, self.parts, self.token)
+        self._notify('finish')
+        return {"size": self.size, "checksum": composite_checksum(self._digests), "parts": len(self.parts)}
+
+    async def abort(self) -> None:
+        if self.upload_id is None:
+            return
+        try:
+            await self.backend.abort_upload(self.key, self.upload_id, self.token)
+        except Exception as e:
+            logger.warning(f"Could not abort upload of {self.key}: {e}")
+
+    async def _send(self, data: bytes, total_size: Optional[int] = None) -> None:
+        part_number = len(self.parts) + 1
+        part = await self.backend.upload_part(
+            self.key, self.upload_id, part_number, data, self._uploaded, self.token, total_size
+        )
+        self._uploaded += len(data)
+        self._digests.append(hashlib.sha256(data).digest())
+        self.parts.append(part)
+
+    def _notify(self, method: str, *args) -> None:
+        for observer in list(self.observers):
+            try:
+                getattr(observer, method)(*args)
+            except Exception as e:
+                logger.warning(f"Upload observer {type(observer).__name__} failed for {self.key}: {e}")
+                self.observers.remove(observer)
+
+
+async def iter_multipart(content_type: str, stream: AsyncIterator[bytes]) -> AsyncIterator[Tuple]:
+    """
+    Incrementally parse a multipart/form-data body without spooling files.
+
+    Yields ("field", name, value) for plain fields and, for each file,
+    ("file", name, filename, content_type), then ("data", bytes) per chunk,
+    then ("end",). Parts arrive in the order the client sent them.
+    """
+    mime, params = parse_options_header(content_type)
+    if mime != b"multipart/form-data" or b"boundary" not in params:
+        raise UploadError("Expected a multipart/form-data body")
+
+    events: List[Tuple] = []
+    part: Dict[str, Any] = {}
+    header = {"name": b"", "value": b""}
+
+    def on_part_begin():
+        part.clear()
+        part.update(headers={}, field=None, data=bytearray())
+
+    def on_header_field(data, start, end):
+        header["name"] += data[start:end]
+
+    def on_header_value(data, start, end):
+        header["value"] += data[start:end]
+
+    def on_header_end():
+        part["headers"][header["name"].lower()] = header["value"]
+        header["name"], header["value"] = b"", b""
+
+    def on_headers_finished():
+        _, options = parse_options_header(part["headers"].get(b"content-disposition", b""))
+        if b"name" not in options:
+            raise UploadError('The Content-Disposition header field "name" must be provided')
+        part["field"] = options[b"name"].decode("utf-8", "replace")
+        part["file"] = b"filename" in options
+        if part["file"]:
+            events.append((
+                "file", part["field"], options[b"filename"].decode("utf-8", "replace"),
+                part["headers"].get(b"content-type", b"application/octet-stream").decode("latin-1"),
+            ))
+
+    def on_part_data(data, start, end):
+        if part["file"]:
+            events.append(("data", data[start:end]))
+        else:
+            part["data"] += data[start:end]
+            if len(part["data"]) > MAX_FIELD_SIZE:
+                raise UploadError(f"Form field {part['field']!r} is too large")
+
+    def on_part_end():
+        if part["file"]:
+            events.append(("end",))
+        else:
+            events.append(("field", part["field"], part["data"].decode("utf-8", "replace")))
+
+    parser = MultipartParser(params[b"boundary"], callbacks={
+        "on_part_begin": on_part_begin,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+    })
+    async for chunk in stream:
+        parser.write(chunk)
+        # Only the events of one network chunk are ever held at a time
+        while events:
+            yield events.pop(0)
+    parser.finalize()
+    while events:
+        yield events.pop(0)
@@ -4,15 +4,16 @@ from app.db.supabase import SupabaseManager
 from app.core.logging import logger
 
 class LabelingTool(BaseTool):
-    def __init__(self, config):
-        super().__init__(config)
-        self.supabase = SupabaseManager.get_client()
+    @property
+    def supabase(self):
+        # Async clients are bound to the running event loop, so resolve per call
+        return SupabaseManager.get_async_client()
 
     async def initialize(self, project_id: str) -> Dict[str, Any]:
         try:
             # project_id here refers to labeling_project_id
             # Fetch project details for labels
-            project_res = self.supabase.table('labeling_projects')\
+            project_res = await self.supabase.table('labeling_projects')\
                 .select("labels")\
                 .eq('id', project_id)\
                 .execute()
@@ -21,7 +22,7 @@ class LabelingTool(BaseTool):
             if project_res.data and project_res.data[0].get('labels'):
                 labels = project_res.data[0]['labels']
 
-            response = self.supabase.table('labeling_items')\
+            response = await self.supabase.table('labeling_items')\
                 .select("id, status", count='exact')\
                 .eq('labeling_project_id', project_id)\
                 .execute()
@@ -46,7 +47,7 @@ class LabelingTool(BaseTool):
             if action == "get_task":
                 # project_id is labeling_project_id
                 lp_id = payload.get("project_id")
-                response = self.supabase.table('labeling_items')\
+                response = await self.supabase.table('labeling_items')\
                     .select("*")\
                     .eq('labeling_project_id', lp_id)\
                     .eq('status', 'pending')\
@@ -68,7 +69,7 @@ class LabelingTool(BaseTool):
                 task_id = payload.get("task_id")
                 label = payload.get("label")
                 
-                response = self.supabase.table('labeling_items')\
+                response = await self.supabase.table('labeling_items')\
                     .update({"manual_label": label, "status": "completed"})\
                     .eq('id', task_id)\
                     .execute()
@@ -81,7 +82,7 @@ class LabelingTool(BaseTool):
                 task_id = payload.get("task_id")
                 label = payload.get("label")
                 
-                response = self.supabase.table('labeling_items')\
+                response = await self.supabase.table('labeling_items')\
                     .update({"manual_label": label, "status": "in_progress"})\
                     .eq('id', task_id)\
                     .execute()
@@ -100,7 +101,7 @@ class LabelingTool(BaseTool):
 
     async def get_status(self, project_id: str) -> Dict[str, Any]:
         try:
-            response = self.supabase.table('labeling_items')\
+            response = await self.supabase.table('labeling_items')\
                 .select("id", count='exact')\
                 .eq('labeling_project_id', project_id)\
                 .eq('status', 'pending')\
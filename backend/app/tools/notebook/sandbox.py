@@ -0,0 +1,128 @@
+"""
+Child side of the run_cell worker pool (see workers.py). Runs in spawned
+processes, so it only imports the standard library.
+"""
+import contextlib
+import io
+import math
+import resource
+import signal
+import time
+from typing import Any, Dict
+
+
+class CpuTimeExceeded(Exception):
+    pass
+
+
+def _cpu_exceeded(signum, frame):
+    raise CpuTimeExceeded()
+
+
+def _cpu_used() -> float:
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _address_space() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[0]) * resource.getpagesize()
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+@contextlib.contextmanager
+def _limits(cpu_seconds: float, memory_bytes: int):
+    """
+    Soft rlimits for one cell. RLIMIT_CPU counts the worker's whole life, so
+    the cell gets `cpu_seconds` on top of what the worker has used so far.
+    Likewise RLIMIT_AS lets the cell map `memory_bytes` beyond what the
+    worker has mapped already. Hard limits stay untouched so the worker can
+    lift the soft ones again for the next cell.
+    """
+    previous = {limit: resource.getrlimit(limit) for limit in (resource.RLIMIT_CPU, resource.RLIMIT_AS)}
+    cpu_hard = previous[resource.RLIMIT_CPU][1]
+    cpu_soft = math.ceil(_cpu_used() + cpu_seconds)
+    if cpu_hard != resource.RLIM_INFINITY:
+        cpu_soft = min(cpu_soft, cpu_hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (cpu_soft, cpu_hard))
+    if memory_bytes:
+        as_hard = previous[resource.RLIMIT_AS][1]
+        as_soft = _address_space() + memory_bytes
+        if as_hard != resource.RLIM_INFINITY:
+            as_soft = min(as_soft, as_hard)
+        resource.setrlimit(resource.RLIMIT_AS, (as_soft, as_hard))
+    try:
+        yield
+    finally:
+        for limit, values in previous.items():
+            resource.setrlimit(limit, values)
+
+
+# Builtins available to cells
+SAFE_BUILTINS = {
+    "print": print,
+    "len": len,
+    "range": range,
+    "sum": sum,
+    "max": max,
+    "min": min,
+    "str": str,
+    "int": int,
+    "float": float,
+    "list": list,
+    "dict": dict,
+    "tuple": tuple,
+    "set": set,
+}
+
+
+def _clip(text: str, limit: int) -> str:
+    if len(text) <= limit:
+        return text
+    return text[:limit] + f"\n... output truncated ({len(text) - limit} more characters)"
+
+
+def run_cell(code: str, cpu_seconds: float, memory_bytes: int, max_output: int) -> Dict[str, Any]:
+    stdout_capture = io.StringIO()
+    stderr_capture = io.StringIO()
+    error = ""
+    started, cpu_start = time.monotonic(), _cpu_used()
+    try:
+        with _limits(cpu_seconds, memory_bytes), \
+                contextlib.redirect_stdout(stdout_capture), contextlib.redirect_stderr(stderr_capture):
+            # Restricted execution scope - prevents direct access to dangerous builtins
+            # WARNING: Still vulnerable to sophisticated attacks; the worker's rlimits
+            # bound the damage, a sandboxed container is still needed in production.
+            exec(code, {"__builtins__": dict(SAFE_BUILTINS)}, {})
+    except SyntaxError as e:
+        error = f"Syntax Error: {e.msg} (line {e.lineno})"
+    except CpuTimeExceeded:
+        error = f"CPU time limit exceeded ({cpu_seconds:g}s)"
+    except MemoryError:
+        error = f"Memory limit exceeded ({memory_bytes // (1024 * 1024)} MB)"
+    except Exception as e:
+        error = f"{type(e).__name__}: {str(e)}"
+    stderr = stderr_capture.getvalue()
+    return {
+        "stdout": _clip(stdout_capture.getvalue(), max_output),
+        "error": _clip("\n".join(part for part in (stderr, error) if part), max_output),
+        "cpu_seconds": round(_cpu_used() - cpu_start, 3),
+        "wall_seconds": round(time.monotonic() - started, 3),
+    }
+
+
+def serve(conn) -> None:
+    """Worker loop: one cell at a time until the pool sends None or goes away."""
+    signal.signal(signal.SIGXCPU, _cpu_exceeded)
+    # The API process handles Ctrl-C; workers are stopped by the pool
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    while True:
+        try:
+            job = conn.recv()
+        except (EOFError, OSError):
+            return
+        if job is None:
+            return
+        conn.send(run_cell(**job))
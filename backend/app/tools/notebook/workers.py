@@ -0,0 +1,182 @@
+import asyncio
+import multiprocessing
+import threading
+from typing import Any, Dict, List, Optional
+from starlette.concurrency import run_in_threadpool
+from app.core.config import settings
+from app.tools.notebook.sandbox import serve
+import logging
+
+logger = logging.getLogger("insighter")
+
+# Seconds a recycled worker gets to exit before it is killed
+_STOP_TIMEOUT = 2
+
+
+class PoolSaturated(Exception):
+    """More cells are outstanding than the pool accepts."""
+
+
+class WorkerLost(Exception):
+    """The worker timed out or died while running a cell; it has been killed."""
+
+
+class CellWorker:
+    """One worker process and its end of the pipe."""
+
+    def __init__(self, context):
+        self.conn, child = context.Pipe()
+        self.process = context.Process(target=serve, args=(child,), name="notebook-cell", daemon=True)
+        self.process.start()
+        child.close()
+        self.runs = 0
+
+    def run(self, job: Dict[str, Any], timeout: float) -> Dict[str, Any]:
+        self.runs += 1
+        try:
+            self.conn.send(job)
+            if not self.conn.poll(timeout):
+                raise WorkerLost(f"Execution timed out after {timeout:g}s")
+            return self.conn.recv()
+        except (EOFError, OSError):
+            raise WorkerLost(f"Worker exited with code {self.process.exitcode} (killed by a resource limit?)")
+
+    def stop(self, kill: bool = False) -> None:
+        if not kill:
+            try:
+                self.conn.send(None)
+            except OSError:
+                pass
+            self.process.join(_STOP_TIMEOUT)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+class CellWorkerPool:
+    """
+    Pre-started worker processes for NotebookTool run_cell. Each runs one
+    cell at a time with its output captured in the worker, so concurrent
+    cells neither interleave output nor block the event loop, and a cell
+    that exhausts its CPU or memory limit only takes down its own worker.
+
+    A cell that outlives `timeout` seconds (wall clock) gets its worker
+    killed and replaced; workers are also replaced after `max_runs` cells so
+    state leaked by user code does not accumulate. Admission is capped at
+    `workers + max_queue` outstanding cells, like the password hashing pool.
+    """
+
+    def __init__(self, workers: int, max_runs: int, max_queue: int, cpu_seconds: float,
+                 memory_bytes: int, timeout: float, max_output: int):
+        self.workers = max(1, workers)
+        self.max_runs = max(1, max_runs)
+        self.max_queue = max(0, max_queue)
+        self.cpu_seconds = cpu_seconds
+        self.memory_bytes = memory_bytes
+        self.timeout = timeout
+        self.max_output = max_output
+        # Spawned, not forked: the server process has running threads
+        self._context = multiprocessing.get_context("spawn")
+        self._idle: List[CellWorker] = []
+        self._lock = threading.Lock()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._started = False
+        self._outstanding = 0
+        self.completed = 0
+        self.rejected = 0
+        self.killed = 0
+        self.recycled = 0
+
+    def start(self) -> None:
+        """Start the workers ahead of the first cell."""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+            missing = self.workers - len(self._idle)
+        started = [CellWorker(self._context) for _ in range(missing)]
+        with self._lock:
+            self._idle.extend(started)
+
+    async def run(self, code: str) -> Dict[str, Any]:
+        with self._lock:
+            if self._outstanding >= self.workers + self.max_queue:
+                self.rejected += 1
+                raise PoolSaturated()
+            self._outstanding += 1
+        try:
+            if self._semaphore is None:
+                self._semaphore = asyncio.Semaphore(self.workers)
+            async with self._semaphore:
+                return await run_in_threadpool(self._run, code)
+        finally:
+            with self._lock:
+                self._outstanding -= 1
+                self.completed += 1
+
+    def _run(self, code: str) -> Dict[str, Any]:
+        self.start()
+        with self._lock:
+            worker = self._idle.pop() if self._idle else None
+        worker = worker or CellWorker(self._context)
+        job = {"code": code, "cpu_seconds": self.cpu_seconds, "memory_bytes": self.memory_bytes,
+               "max_output": self.max_output}
+        try:
+            result = worker.run(job, self.timeout)
+        except WorkerLost as e:
+            worker.stop(kill=True)
+            with self._lock:
+                self.killed += 1
+            self._replace()
+            return {"stdout": "", "error": str(e), "cpu_seconds": None, "wall_seconds": None}
+        if worker.runs >= self.max_runs:
+            worker.stop()
+            with self._lock:
+                self.recycled += 1
+            self._replace()
+        else:
+            with self._lock:
+                self._idle.append(worker)
+        return result
+
+    def _replace(self) -> None:
+        try:
+            worker = CellWorker(self._context)
+        except Exception as e:
+            # The next cell starts one on demand
+            logger.error(f"Could not start a notebook worker: {e}")
+            return
+        with self._lock:
+            self._idle.append(worker)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "idle": len(self._idle),
+                "max_queue": self.max_queue,
+                "outstanding": self._outstanding,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "killed": self.killed,
+                "recycled": self.recycled,
+            }
+
+    def shutdown(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+            self._started = False
+        for worker in idle:
+            worker.stop()
+
+
+cell_workers = CellWorkerPool(
+    workers=settings.NOTEBOOK_WORKERS,
+    max_runs=settings.NOTEBOOK_WORKER_MAX_RUNS,
+    max_queue=settings.NOTEBOOK_WORKER_MAX_QUEUE,
+    cpu_seconds=settings.NOTEBOOK_CELL_CPU_SECONDS,
+    memory_bytes=settings.NOTEBOOK_CELL_MEMORY_BYTES,
+    timeout=settings.NOTEBOOK_CELL_TIMEOUT_SECONDS,
+    max_output=settings.KERNEL_OUTPUT_MAX_BYTES,
+)
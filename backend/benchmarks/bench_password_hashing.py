@@ -0,0 +1,103 @@
+"""
+Event-loop latency during a login burst.
+
+A probe task sleeps for a fixed tick and records how late it wakes up, which is
+the delay every other request on the worker would see. While it runs, N
+concurrent "logins" each verify a bcrypt hash:
+
+* sync:  handlers call verify_password() directly (previous behaviour)
+* async: handlers await verify_password_async(), which runs on the bounded pool
+
+Logins rejected with 503 by the pool's back-pressure are counted separately.
+
+Usage:
+    python benchmarks/bench_password_hashing.py --logins 50 --rounds 12
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+async def probe_loop_lag(stop: asyncio.Event, tick: float, lags: list) -> None:
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(tick)
+        lags.append(time.perf_counter() - started - tick)
+
+
+async def burst(login, logins: int, tick: float):
+    from fastapi import HTTPException
+
+    lags = []
+    stop = asyncio.Event()
+    probe = asyncio.create_task(probe_loop_lag(stop, tick, lags))
+    await asyncio.sleep(tick * 2)
+
+    rejected = 0
+
+    async def one():
+        nonlocal rejected
+        try:
+            await login()
+        except HTTPException as e:
+            if e.status_code != 503:
+                raise
+            rejected += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(logins)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await probe
+    return elapsed, lags, rejected
+
+
+def summarize(name, elapsed, lags, rejected):
+    lags_ms = sorted(lag * 1000 for lag in lags) or [0.0]
+    p99 = lags_ms[min(len(lags_ms) - 1, int(len(lags_ms) * 0.99))]
+    print(
+        f"{name:<6} {elapsed:7.2f}s  loop lag p50 {statistics.median(lags_ms):8.1f}ms  "
+        f"p99 {p99:8.1f}ms  max {lags_ms[-1]:8.1f}ms  rejected {rejected}"
+    )
+
+
+async def main(args):
+    os.environ["PASSWORD_HASH_WORKERS"] = str(args.workers)
+    os.environ["PASSWORD_HASH_MAX_QUEUE"] = str(args.max_queue)
+
+    from passlib.context import CryptContext
+    from app.core import security
+    from app.core.security import verify_password, verify_password_async
+
+    security.pwd_context = CryptContext(schemes=["bcrypt"], bcrypt__rounds=args.rounds)
+    hashed = security.pwd_context.hash("correct horse battery staple")
+
+    async def sync_login():
+        verify_password("correct horse battery staple", hashed)
+
+    async def async_login():
+        await verify_password_async("correct horse battery staple", hashed)
+
+    print(
+        f"{args.logins} concurrent logins, bcrypt rounds {args.rounds}, "
+        f"pool {args.workers} workers + {args.max_queue} queued"
+    )
+    for name, login in (("sync", sync_login), ("async", async_login)):
+        summarize(name, *await burst(login, args.logins, args.tick_ms / 1000))
+
+    security.password_pool.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--logins", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=12)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--max-queue", type=int, default=64)
+    parser.add_argument("--tick-ms", type=float, default=5.0)
+    asyncio.run(main(parser.parse_args()))
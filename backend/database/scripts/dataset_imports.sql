@@ -0,0 +1,50 @@
+-- =============================================================================
+-- Database Update Script: Bulk Dataset Imports
+-- Description: Adds the 'dataset_imports' table holding the progress of bulk
+--              imports (/api/datasets/imports), so any API worker can report
+--              the status of an import running on another one.
+-- Date: 2026-10-17
+-- =============================================================================
+
+BEGIN;
+
+-- counts: files per state ({"pending", "importing", "stored", "done",
+-- "failed", "skipped"}), saved every few seconds while the import runs.
+-- files: per-file outcome, written once the import finished.
+CREATE TABLE IF NOT EXISTS public.dataset_imports (
+    id UUID PRIMARY KEY,
+    user_id UUID NOT NULL REFERENCES auth.users(id) ON DELETE CASCADE,
+    project_id UUID NOT NULL REFERENCES public.projects(id) ON DELETE CASCADE,
+    status TEXT DEFAULT 'running' NOT NULL CHECK (status IN ('running', 'completed', 'failed')),
+    total INT NOT NULL,
+    counts JSONB DEFAULT '{}'::jsonb NOT NULL,
+    bytes BIGINT DEFAULT 0 NOT NULL,
+    files JSONB,
+    created_at TIMESTAMPTZ DEFAULT NOW() NOT NULL,
+    updated_at TIMESTAMPTZ DEFAULT NOW() NOT NULL,
+    finished_at TIMESTAMPTZ
+);
+
+CREATE INDEX IF NOT EXISTS idx_dataset_imports_user ON public.dataset_imports(user_id, created_at DESC);
+
+ALTER TABLE public.dataset_imports ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Users can manage their own imports." ON public.dataset_imports;
+CREATE POLICY "Users can manage their own imports."
+ON public.dataset_imports
+FOR ALL
+USING (auth.uid() = user_id)
+WITH CHECK (auth.uid() = user_id);
+
+COMMIT;
+
+-- =============================================================================
+-- Rollback Plan
+-- =============================================================================
+/*
+BEGIN;
+
+DROP TABLE IF EXISTS public.dataset_imports;
+
+COMMIT;
+*/
@@ -0,0 +1,99 @@
+-- =============================================================================
+-- Database Update Script: Streaming & Resumable Dataset Uploads
+-- Description: Adds 'checksum' and 'metadata' columns to 'datasets' (filled in
+--              by the upload pipeline) and the 'dataset_uploads' /
+--              'dataset_upload_parts' tables backing the resumable upload
+--              endpoints (/api/datasets/uploads).
+-- Date: 2026-10-17
+-- =============================================================================
+
+BEGIN;
+
+-- -----------------------------------------------------------------------------
+-- 1. Dataset Columns
+-- -----------------------------------------------------------------------------
+
+-- checksum: sha256 over the sha256 of every uploaded part, suffixed with the
+-- part count ("<hex>-<parts>"). Identifies the stored bytes for caches and
+-- derived artifacts.
+-- metadata: pipeline-managed facts about the stored file (conversions, etc.).
+ALTER TABLE public.datasets
+ADD COLUMN IF NOT EXISTS checksum TEXT,
+ADD COLUMN IF NOT EXISTS metadata JSONB DEFAULT '{}'::jsonb NOT NULL;
+
+-- -----------------------------------------------------------------------------
+-- 2. Upload Sessions
+-- -----------------------------------------------------------------------------
+
+CREATE TABLE IF NOT EXISTS public.dataset_uploads (
+    id UUID DEFAULT gen_random_uuid() PRIMARY KEY,
+    user_id UUID NOT NULL REFERENCES auth.users(id) ON DELETE CASCADE,
+    project_id UUID REFERENCES public.projects(id) ON DELETE CASCADE,
+    filename TEXT NOT NULL,
+    storage_key TEXT NOT NULL,
+    -- S3 UploadId or TUS upload URL
+    storage_upload_id TEXT NOT NULL,
+    total_size BIGINT NOT NULL CHECK (total_size >= 0),
+    part_size BIGINT NOT NULL CHECK (part_size > 0),
+    status TEXT DEFAULT 'uploading' NOT NULL CHECK (status IN ('uploading', 'completed', 'aborted')),
+    dataset_id UUID REFERENCES public.datasets(id) ON DELETE SET NULL,
+    created_at TIMESTAMPTZ DEFAULT NOW() NOT NULL,
+    updated_at TIMESTAMPTZ DEFAULT NOW() NOT NULL
+);
+
+-- One row per received part. Parts are written concurrently by independent
+-- requests, so they are rows of their own rather than an array on the session.
+CREATE TABLE IF NOT EXISTS public.dataset_upload_parts (
+    upload_id UUID NOT NULL REFERENCES public.dataset_uploads(id) ON DELETE CASCADE,
+    part_number INT NOT NULL CHECK (part_number >= 1),
+    size BIGINT NOT NULL,
+    etag TEXT,
+    sha256 TEXT NOT NULL,
+    created_at TIMESTAMPTZ DEFAULT NOW() NOT NULL,
+    PRIMARY KEY (upload_id, part_number)
+);
+
+CREATE INDEX IF NOT EXISTS idx_dataset_uploads_user ON public.dataset_uploads(user_id, created_at DESC);
+
+-- -----------------------------------------------------------------------------
+-- 3. Row Level Security
+-- -----------------------------------------------------------------------------
+
+ALTER TABLE public.dataset_uploads ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.dataset_upload_parts ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Users can manage their own uploads." ON public.dataset_uploads;
+CREATE POLICY "Users can manage their own uploads."
+ON public.dataset_uploads
+FOR ALL
+USING (auth.uid() = user_id)
+WITH CHECK (auth.uid() = user_id);
+
+DROP POLICY IF EXISTS "Users can manage parts of their own uploads." ON public.dataset_upload_parts;
+CREATE POLICY "Users can manage parts of their own uploads."
+ON public.dataset_upload_parts
+FOR ALL
+USING (EXISTS (
+    SELECT 1 FROM public.dataset_uploads u
+    WHERE u.id = upload_id AND u.user_id = auth.uid()
+))
+WITH CHECK (EXISTS (
+    SELECT 1 FROM public.dataset_uploads u
+    WHERE u.id = upload_id AND u.user_id = auth.uid() AND u.status = 'uploading'
+));
+
+COMMIT;
+
+-- =============================================================================
+-- Rollback Plan
+-- =============================================================================
+/*
+BEGIN;
+
+DROP TABLE IF EXISTS public.dataset_upload_parts;
+DROP TABLE IF EXISTS public.dataset_uploads;
+ALTER TABLE public.datasets DROP COLUMN IF EXISTS metadata;
+ALTER TABLE public.datasets DROP COLUMN IF EXISTS checksum;
+
+COMMIT;
+*/
@@ -0,0 +1,28 @@
+-- =============================================================================
+-- Database Update Script: Value-mode Dataset Indexes
+-- Description: Partial index for the cursor-paginated value reads
+--              (GET /api/datasets/values: project, newest first), so listing a
+--              project's values never walks its file datasets or sorts them.
+--              JSONB containment filters use the existing GIN index
+--              idx_datasets_value_json.
+-- Date: 2026-10-17
+-- =============================================================================
+
+BEGIN;
+
+CREATE INDEX IF NOT EXISTS idx_datasets_values_project_created
+    ON public.datasets(project_id, created_at DESC, id DESC)
+    WHERE storage_mode = 'value';
+
+COMMIT;
+
+-- =============================================================================
+-- Rollback Plan
+-- =============================================================================
+/*
+BEGIN;
+
+DROP INDEX IF EXISTS idx_datasets_values_project_created;
+
+COMMIT;
+*/
@@ -0,0 +1,90 @@
+-- =============================================================================
+-- Database Update Script: Chunk-Deduplicated Dataset Versions
+-- Description: Adds 'dataset_chunks' (index of the content-defined chunks each
+--              user has stored under <user>/chunks/ in the datasets bucket)
+--              and 'dataset_versions' (one manifest of chunk digests per
+--              version), backing /api/datasets/{id}/versions.
+-- Date: 2026-10-17
+-- =============================================================================
+
+BEGIN;
+
+-- -----------------------------------------------------------------------------
+-- 1. Chunk Index
+-- -----------------------------------------------------------------------------
+
+-- A chunk is stored once per owner, whatever the number of versions (or
+-- datasets) that reference it.
+CREATE TABLE IF NOT EXISTS public.dataset_chunks (
+    owner_id UUID NOT NULL REFERENCES auth.users(id) ON DELETE CASCADE,
+    sha256 TEXT NOT NULL CHECK (sha256 ~ '^[0-9a-f]{64}$'),
+    size BIGINT NOT NULL CHECK (size > 0),
+    created_at TIMESTAMPTZ DEFAULT NOW() NOT NULL,
+    PRIMARY KEY (owner_id, sha256)
+);
+
+-- -----------------------------------------------------------------------------
+-- 2. Versions
+-- -----------------------------------------------------------------------------
+
+-- chunks: [[sha256, size], ...] in file order, read from the created_by
+-- user's chunk store. new_chunks / new_bytes: what this version added over
+-- the previous one.
+CREATE TABLE IF NOT EXISTS public.dataset_versions (
+    id UUID DEFAULT gen_random_uuid() PRIMARY KEY,
+    dataset_id UUID NOT NULL REFERENCES public.datasets(id) ON DELETE CASCADE,
+    version INT NOT NULL CHECK (version >= 1),
+    chunks JSONB NOT NULL,
+    chunk_count INT NOT NULL,
+    size_bytes BIGINT NOT NULL,
+    checksum TEXT NOT NULL,
+    new_chunks INT NOT NULL DEFAULT 0,
+    new_bytes BIGINT NOT NULL DEFAULT 0,
+    created_by UUID REFERENCES auth.users(id) ON DELETE SET NULL,
+    created_at TIMESTAMPTZ DEFAULT NOW() NOT NULL,
+    UNIQUE (dataset_id, version)
+);
+
+-- -----------------------------------------------------------------------------
+-- 3. Row Level Security
+-- -----------------------------------------------------------------------------
+
+ALTER TABLE public.dataset_chunks ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.dataset_versions ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Users can manage their own chunks." ON public.dataset_chunks;
+CREATE POLICY "Users can manage their own chunks."
+ON public.dataset_chunks
+FOR ALL
+USING (auth.uid() = owner_id)
+WITH CHECK (auth.uid() = owner_id);
+
+-- Versions follow their dataset (the datasets policies apply to the subquery)
+DROP POLICY IF EXISTS "View versions of visible datasets." ON public.dataset_versions;
+CREATE POLICY "View versions of visible datasets."
+ON public.dataset_versions
+FOR SELECT
+USING (EXISTS (SELECT 1 FROM public.datasets d WHERE d.id = dataset_id));
+
+DROP POLICY IF EXISTS "Users can add versions to their datasets." ON public.dataset_versions;
+CREATE POLICY "Users can add versions to their datasets."
+ON public.dataset_versions
+FOR INSERT
+WITH CHECK (
+    auth.uid() = created_by
+    AND EXISTS (SELECT 1 FROM public.datasets d WHERE d.id = dataset_id AND d.created_by = auth.uid())
+);
+
+COMMIT;
+
+-- =============================================================================
+-- Rollback Plan
+-- =============================================================================
+/*
+BEGIN;
+
+DROP TABLE IF EXISTS public.dataset_versions;
+DROP TABLE IF EXISTS public.dataset_chunks;
+
+COMMIT;
+*/
@@ -0,0 +1,43 @@
+-- =============================================================================
+-- Database Update Script: Keyset Pagination Indexes
+-- Description: Composite indexes matching the (filter, created_at DESC, id DESC)
+--              order used by the cursor-paginated list endpoints, so that each
+--              page is a bounded index range scan instead of a sort of every
+--              row the user owns.
+-- Date: 2026-10-17
+-- =============================================================================
+
+BEGIN;
+
+CREATE INDEX IF NOT EXISTS idx_projects_owner_created ON public.projects(owner_id, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_datasets_created_by_created ON public.datasets(created_by, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_notebooks_created_by_updated ON public.notebooks(created_by, updated_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_models_created_by_created ON public.models(created_by, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_notifications_user_created ON public.notifications(user_id, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_tasks_workflow_created ON public.tasks(workflow_id, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_tasks_created ON public.tasks(created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_workflows_project_created ON public.workflows(project_id, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_workflows_created ON public.workflows(created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_project_history_project_created ON public.project_history(project_id, created_at DESC, id DESC);
+
+COMMIT;
+
+-- =============================================================================
+-- Rollback Plan
+-- =============================================================================
+/*
+BEGIN;
+
+DROP INDEX IF EXISTS idx_projects_owner_created;
+DROP INDEX IF EXISTS idx_datasets_created_by_created;
+DROP INDEX IF EXISTS idx_notebooks_created_by_updated;
+DROP INDEX IF EXISTS idx_models_created_by_created;
+DROP INDEX IF EXISTS idx_notifications_user_created;
+DROP INDEX IF EXISTS idx_tasks_workflow_created;
+DROP INDEX IF EXISTS idx_tasks_created;
+DROP INDEX IF EXISTS idx_workflows_project_created;
+DROP INDEX IF EXISTS idx_workflows_created;
+DROP INDEX IF EXISTS idx_project_history_project_created;
+
+COMMIT;
+*/
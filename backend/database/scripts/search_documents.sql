@@ -0,0 +1,282 @@
+-- =============================================================================
+-- Database Update Script: Unified Full-Text Search Index
+-- Description: Adds a 'search_documents' table holding one row per project,
+--              dataset, notebook and model, kept in sync by triggers, with a
+--              tsvector (prefix matching, ranking) and pg_trgm indexes (fuzzy /
+--              substring matching). The 'search_workspace' RPC serves the
+--              unified /api/search endpoint in a single round-trip.
+-- Date: 2026-10-17
+-- =============================================================================
+
+BEGIN;
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- -----------------------------------------------------------------------------
+-- 1. Index Table
+-- -----------------------------------------------------------------------------
+
+-- owner_id mirrors the ownership rule of the old per-table search:
+-- projects.owner_id, and created_by for datasets, notebooks and models.
+-- The 'simple' configuration is used on purpose: names are mostly identifiers
+-- (churn_v2, xgb-baseline) that English stemming would mangle, and it keeps
+-- type-ahead prefix matching predictable.
+CREATE TABLE IF NOT EXISTS public.search_documents (
+    entity_type TEXT NOT NULL,
+    entity_id UUID NOT NULL,
+    owner_id UUID,
+    project_id UUID,
+    title TEXT NOT NULL,
+    body TEXT,
+    updated_at TIMESTAMPTZ DEFAULT NOW() NOT NULL,
+    document TSVECTOR GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(body, '')), 'B')
+    ) STORED,
+    PRIMARY KEY (entity_type, entity_id),
+    CONSTRAINT search_documents_entity_type_check CHECK (entity_type IN ('project', 'dataset', 'notebook', 'model'))
+);
+
+-- -----------------------------------------------------------------------------
+-- 2. Indexes
+-- -----------------------------------------------------------------------------
+
+-- Full-text matching (document @@ tsquery)
+CREATE INDEX IF NOT EXISTS idx_search_documents_document ON public.search_documents USING gin (document);
+
+-- Substring / fuzzy matching on names and descriptions (ILIKE '%q%', title % q)
+CREATE INDEX IF NOT EXISTS idx_search_documents_title_trgm ON public.search_documents USING gin (title gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_search_documents_body_trgm ON public.search_documents USING gin (body gin_trgm_ops);
+
+-- Per-owner scans
+CREATE INDEX IF NOT EXISTS idx_search_documents_owner ON public.search_documents(owner_id, updated_at DESC);
+
+-- -----------------------------------------------------------------------------
+-- 3. Sync Triggers
+-- -----------------------------------------------------------------------------
+
+-- One function serves all four tables. Columns are read through to_jsonb(NEW)
+-- because the tables do not share a shape (owner_id vs created_by, description
+-- vs version/framework).
+CREATE OR REPLACE FUNCTION public.sync_search_document()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    doc_type TEXT;
+    rec JSONB;
+BEGIN
+    doc_type := CASE TG_TABLE_NAME
+        WHEN 'projects' THEN 'project'
+        WHEN 'datasets' THEN 'dataset'
+        WHEN 'notebooks' THEN 'notebook'
+        WHEN 'models' THEN 'model'
+    END;
+
+    IF TG_OP = 'DELETE' THEN
+        DELETE FROM public.search_documents
+        WHERE entity_type = doc_type AND entity_id = OLD.id;
+        RETURN OLD;
+    END IF;
+
+    rec := to_jsonb(NEW);
+
+    -- Value-mode dataset rows are data points, not datasets to search for
+    IF doc_type = 'dataset' AND rec->>'storage_mode' = 'value' THEN
+        DELETE FROM public.search_documents
+        WHERE entity_type = doc_type AND entity_id = NEW.id;
+        RETURN NEW;
+    END IF;
+
+    INSERT INTO public.search_documents (entity_type, entity_id, owner_id, project_id, title, body, updated_at)
+    VALUES (
+        doc_type,
+        NEW.id,
+        coalesce(rec->>'owner_id', rec->>'created_by')::uuid,
+        CASE WHEN doc_type = 'project' THEN NEW.id ELSE (rec->>'project_id')::uuid END,
+        rec->>'name',
+        coalesce(rec->>'description', concat_ws(' ', rec->>'version', rec->>'framework')),
+        coalesce((rec->>'updated_at')::timestamptz, NOW())
+    )
+    ON CONFLICT (entity_type, entity_id) DO UPDATE SET
+        owner_id = EXCLUDED.owner_id,
+        project_id = EXCLUDED.project_id,
+        title = EXCLUDED.title,
+        body = EXCLUDED.body,
+        updated_at = EXCLUDED.updated_at;
+
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS sync_search_document ON public.projects;
+CREATE TRIGGER sync_search_document
+    AFTER INSERT OR UPDATE OR DELETE ON public.projects
+    FOR EACH ROW EXECUTE FUNCTION public.sync_search_document();
+
+DROP TRIGGER IF EXISTS sync_search_document ON public.datasets;
+CREATE TRIGGER sync_search_document
+    AFTER INSERT OR UPDATE OF name, description, created_by, project_id, storage_mode, updated_at OR DELETE ON public.datasets
+    FOR EACH ROW EXECUTE FUNCTION public.sync_search_document();
+
+DROP TRIGGER IF EXISTS sync_search_document ON public.notebooks;
+CREATE TRIGGER sync_search_document
+    AFTER INSERT OR UPDATE OF name, description, created_by, project_id, updated_at OR DELETE ON public.notebooks
+    FOR EACH ROW EXECUTE FUNCTION public.sync_search_document();
+
+DROP TRIGGER IF EXISTS sync_search_document ON public.models;
+CREATE TRIGGER sync_search_document
+    AFTER INSERT OR UPDATE OF name, version, framework, created_by, project_id, updated_at OR DELETE ON public.models
+    FOR EACH ROW EXECUTE FUNCTION public.sync_search_document();
+
+-- -----------------------------------------------------------------------------
+-- 4. Backfill
+-- -----------------------------------------------------------------------------
+
+INSERT INTO public.search_documents (entity_type, entity_id, owner_id, project_id, title, body, updated_at)
+SELECT 'project', id, owner_id, id, name, description, updated_at FROM public.projects
+UNION ALL
+SELECT 'dataset', id, created_by, project_id, name, description, updated_at FROM public.datasets WHERE storage_mode = 'file'
+UNION ALL
+SELECT 'notebook', id, created_by, project_id, name, description, updated_at FROM public.notebooks
+UNION ALL
+SELECT 'model', id, created_by, project_id, name, concat_ws(' ', version, framework), updated_at FROM public.models
+ON CONFLICT (entity_type, entity_id) DO NOTHING;
+
+-- Value rows indexed by an earlier version of this script
+DELETE FROM public.search_documents d
+USING public.datasets v
+WHERE d.entity_type = 'dataset' AND d.entity_id = v.id AND v.storage_mode = 'value';
+
+-- -----------------------------------------------------------------------------
+-- 5. Row Level Security
+-- -----------------------------------------------------------------------------
+
+ALTER TABLE public.search_documents ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Users can search their own documents." ON public.search_documents;
+CREATE POLICY "Users can search their own documents."
+ON public.search_documents
+FOR SELECT
+USING (auth.uid() = owner_id);
+
+-- -----------------------------------------------------------------------------
+-- 6. Search RPC
+-- -----------------------------------------------------------------------------
+
+-- Titles and bodies are user input; the highlights returned below are HTML
+-- (<mark> around matches), so the text is escaped before the markers go in.
+CREATE OR REPLACE FUNCTION public.search_escape_html(value TEXT)
+RETURNS TEXT
+LANGUAGE sql
+IMMUTABLE
+AS $$
+    SELECT replace(replace(replace(replace(value, '&', '&amp;'), '<', '&lt;'), '>', '&gt;'), '"', '&quot;');
+$$;
+
+-- Every term of the query is matched as a prefix (type-ahead), and documents
+-- whose title or body contains the raw query as a substring, or whose title is
+-- trigram-similar to it, are also returned. Results are ordered by
+-- rank DESC, entity_type DESC, entity_id DESC; the last row of a page is the
+-- keyset (after_rank, after_type, after_id) for the next one.
+CREATE OR REPLACE FUNCTION public.search_workspace(
+    search_query TEXT,
+    entity_types TEXT[] DEFAULT NULL,
+    result_limit INT DEFAULT 10,
+    after_rank REAL DEFAULT NULL,
+    after_type TEXT DEFAULT NULL,
+    after_id UUID DEFAULT NULL
+)
+RETURNS TABLE (
+    entity_type TEXT,
+    entity_id UUID,
+    project_id UUID,
+    title TEXT,
+    body TEXT,
+    updated_at TIMESTAMPTZ,
+    rank REAL,
+    title_highlight TEXT,
+    snippet TEXT,
+    total_count BIGINT
+)
+LANGUAGE sql
+STABLE
+SECURITY INVOKER
+SET search_path = public
+AS $$
+    WITH terms AS (
+        SELECT nullif(array_to_string(array(
+            SELECT quote_literal(term) || ':*'
+            FROM regexp_split_to_table(lower(trim(search_query)), '[^[:alnum:]_]+') AS term
+            WHERE term <> ''
+        ), ' & '), '') AS prefix_query
+    ),
+    query AS (
+        SELECT
+            CASE WHEN prefix_query IS NULL THEN NULL ELSE to_tsquery('simple', prefix_query) END AS tsq,
+            '%' || replace(replace(replace(search_query, '\', '\\'), '%', '\%'), '_', '\_') || '%' AS pattern
+        FROM terms
+    ),
+    matches AS (
+        SELECT
+            d.*,
+            q.tsq,
+            (coalesce(ts_rank_cd(d.document, q.tsq), 0) + similarity(d.title, search_query))::real AS rank
+        FROM public.search_documents d, query q
+        WHERE d.owner_id = auth.uid()
+          AND (entity_types IS NULL OR d.entity_type = ANY(entity_types))
+          AND (
+              (q.tsq IS NOT NULL AND d.document @@ q.tsq)
+              OR d.title ILIKE q.pattern
+              OR d.body ILIKE q.pattern
+              OR d.title % search_query
+          )
+    ),
+    counted AS (
+        SELECT m.*, count(*) OVER () AS total_count FROM matches m
+    )
+    SELECT
+        c.entity_type,
+        c.entity_id,
+        c.project_id,
+        c.title,
+        c.body,
+        c.updated_at,
+        c.rank,
+        CASE WHEN c.tsq IS NULL THEN search_escape_html(c.title)
+             ELSE ts_headline('simple', search_escape_html(c.title), c.tsq,
+                              'StartSel=<mark>, StopSel=</mark>, HighlightAll=true') END,
+        CASE WHEN c.tsq IS NULL OR c.body IS NULL THEN search_escape_html(c.body)
+             ELSE ts_headline('simple', search_escape_html(c.body), c.tsq,
+                              'StartSel=<mark>, StopSel=</mark>, MaxFragments=2, MaxWords=20, MinWords=5') END,
+        c.total_count
+    FROM counted c
+    WHERE after_rank IS NULL
+       OR (c.rank, c.entity_type, c.entity_id) < (after_rank, after_type, after_id)
+    ORDER BY c.rank DESC, c.entity_type DESC, c.entity_id DESC
+    LIMIT least(greatest(result_limit, 1), 100);
+$$;
+
+GRANT EXECUTE ON FUNCTION public.search_workspace(TEXT, TEXT[], INT, REAL, TEXT, UUID) TO authenticated;
+
+COMMIT;
+
+-- =============================================================================
+-- Rollback Plan
+-- =============================================================================
+/*
+BEGIN;
+
+DROP FUNCTION IF EXISTS public.search_workspace(TEXT, TEXT[], INT, REAL, TEXT, UUID);
+DROP FUNCTION IF EXISTS public.search_escape_html(TEXT);
+DROP TRIGGER IF EXISTS sync_search_document ON public.projects;
+DROP TRIGGER IF EXISTS sync_search_document ON public.datasets;
+DROP TRIGGER IF EXISTS sync_search_document ON public.notebooks;
+DROP TRIGGER IF EXISTS sync_search_document ON public.models;
+DROP FUNCTION IF EXISTS public.sync_search_document();
+DROP TABLE IF EXISTS public.search_documents;
+
+COMMIT;
+*/
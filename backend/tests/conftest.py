@@ -0,0 +1,84 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.storage import S3StorageBackend
+
+BUCKET = "insighter-test"
+
+
+class CountingBackend(S3StorageBackend):
+    """S3 backend that counts ranged reads, to check how much of an object a reader fetched."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.reads = 0
+        self.bytes_read = 0
+
+    def read_range(self, key, token, start, end):
+        data = super().read_range(key, token, start, end)
+        self.reads += 1
+        self.bytes_read += len(data)
+        return data
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    """Dataset storage on an empty bucket of a mocked S3 (needs boto3 and moto)."""
+    boto3 = pytest.importorskip("boto3")
+    moto = pytest.importorskip("moto")
+    for name in ("AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY"):
+        monkeypatch.setenv(name, "testing")
+    with moto.mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket=BUCKET)
+        backend = CountingBackend(BUCKET, part_size=S3StorageBackend.MIN_PART_SIZE)
+        backend._client = client
+        yield backend
+
+
+@pytest.fixture
+def statuses(monkeypatch):
+    """Status records written by background dataset jobs (Parquet conversion, profiling), kept instead of stored."""
+    from app.services.conversion import ParquetConverter
+    from app.services.profiling import DatasetProfiler
+
+    recorded = []
+
+    async def record(self, dataset_id, status):
+        recorded.append(dict(status))
+
+    monkeypatch.setattr(ParquetConverter, "_set_status", record)
+    monkeypatch.setattr(DatasetProfiler, "_set_status", record)
+    return recorded
+
+
+class _FakeQuery:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def select(self, *args, **kwargs):
+        return self
+
+    def eq(self, column, value):
+        return _FakeQuery([row for row in self.rows if row.get(column) == value])
+
+    async def execute(self):
+        return SimpleNamespace(data=list(self.rows))
+
+
+@pytest.fixture
+def project_tables(monkeypatch):
+    """
+    Rows served to user-authenticated PostgREST clients: project p1 is owned by
+    "owner" and shared with "member". Tests may add rows to the lists.
+    """
+    from app.db.supabase import SupabaseManager
+
+    tables = {
+        "projects": [{"id": "p1", "owner_id": "owner"}],
+        "collaborators": [{"id": "c1", "project_id": "p1", "user_id": "member", "role": "viewer"}],
+    }
+    client = SimpleNamespace(table=lambda name: _FakeQuery(tables.setdefault(name, [])))
+    monkeypatch.setattr(SupabaseManager, "get_async_authenticated_client", classmethod(lambda cls, token: client))
+    return tables
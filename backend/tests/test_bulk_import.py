@@ -0,0 +1,171 @@
+import asyncio
+import io
+import zipfile
+
+import httpcore
+import httpx
+import pytest
+
+pytest.importorskip("boto3")
+pytest.importorskip("moto")
+
+from app.services import bulk_import
+from app.services.bulk_import import BulkImporter, BulkImportError, ImportJob, ZipSource, check_public_url
+
+
+class FakeTable:
+    def __init__(self, db, name):
+        self.db, self.name, self.payload = db, name, None
+
+    def insert(self, rows, returning=None):
+        self.payload = ("insert", rows)
+        return self
+
+    def upsert(self, record, returning=None):
+        self.payload = ("upsert", record)
+        return self
+
+    async def execute(self):
+        kind, rows = self.payload
+        if kind == "insert" and self.db.fail_inserts:
+            raise RuntimeError("insert rejected")
+        self.db.calls.append((self.name, kind, rows))
+
+
+class FakeDatabase:
+    def __init__(self):
+        self.calls = []
+        self.fail_inserts = False
+
+    def table(self, name):
+        return FakeTable(self, name)
+
+    def inserts(self):
+        return [rows for table, kind, rows in self.calls if table == "datasets" and kind == "insert"]
+
+
+@pytest.fixture
+def db(monkeypatch):
+    database = FakeDatabase()
+    monkeypatch.setattr(bulk_import, "_client", lambda token: database)
+    return database
+
+
+def shard_archive(tmp_path, shards=25):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for i in range(shards):
+            rows = "".join(f"{i},{j},{j * 0.5}\n" for j in range(100))
+            archive.writestr(f"shards/part-{i:04d}.csv", "shard,row,value\n" + rows)
+        archive.writestr("shards/README.txt", "not a dataset")
+        archive.writestr("shards/", "")
+    path = tmp_path / "shards.zip"
+    path.write_bytes(buffer.getvalue())
+    return ZipSource(str(path))
+
+
+def run(importer, source, backend):
+    job = ImportJob("user-1", "project-1", source.entries)
+    return asyncio.run(importer.run(job, source, "token", backend=backend))
+
+
+def test_archive_is_imported_with_batched_inserts(tmp_path, backend, db):
+    source = shard_archive(tmp_path)
+    job = run(BulkImporter(concurrency=4, insert_batch=10), source, backend)
+
+    assert job.status == "completed"
+    assert job.counts()["done"] == 25 and job.counts()["skipped"] == 1
+    assert [len(rows) for rows in db.inserts()] == [10, 10, 5]
+    row = next(r for rows in db.inserts() for r in rows if r["name"] == "part-0003.csv")
+    assert row["project_id"] == "project-1" and row["created_by"] == "user-1"
+    assert row["row_count"] == 100 and row["size_bytes"] > 0
+    stored = backend.client.get_object(Bucket=backend.bucket, Key=row["file_path"])["Body"].read()
+    assert stored.startswith(b"shard,row,value\n3,0,0.0\n")
+    # Archive removed, final progress (with files) saved
+    assert not (tmp_path / "shards.zip").exists()
+    final = [rows for table, kind, rows in db.calls if table == "dataset_imports"][-1]
+    assert final["status"] == "completed" and len(final["files"]) == 26
+
+
+def test_workers_are_bounded(tmp_path, backend, db, monkeypatch):
+    source = shard_archive(tmp_path, shards=12)
+    active, peak = 0, 0
+    original = source.open
+
+    async def tracked(entry):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        try:
+            async for chunk in original(entry):
+                await asyncio.sleep(0.01)
+                yield chunk
+        finally:
+            active -= 1
+
+    monkeypatch.setattr(source, "open", tracked)
+    job = run(BulkImporter(concurrency=3, insert_batch=100), source, backend)
+    assert job.counts()["done"] == 12 and peak == 3
+
+
+def test_failed_insert_marks_files_and_removes_objects(tmp_path, backend, db):
+    db.fail_inserts = True
+    job = run(BulkImporter(concurrency=2, insert_batch=100), shard_archive(tmp_path, shards=3), backend)
+    assert job.status == "failed" and job.counts()["failed"] == 3
+    assert "Could not record dataset" in job.files[0]["error"]
+    assert backend.client.list_objects_v2(Bucket=backend.bucket).get("KeyCount", 0) == 0
+
+
+@pytest.mark.parametrize("url", ["file:///etc/passwd", "http://127.0.0.1:8000/x.csv", "http://[::1]/x.csv"])
+def test_private_and_non_http_urls_are_refused(url):
+    with pytest.raises(BulkImportError):
+        asyncio.run(check_public_url(url))
+
+
+class RecordingBackend:
+    """Network backend that records where connections go and refuses them all."""
+    connected = []
+
+    async def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+        self.connected.append((host, port))
+        raise httpcore.ConnectError("refused")
+
+
+def download(url):
+    async def fetch():
+        source = bulk_import.UrlSource([{"url": url}])
+        try:
+            async for _ in source.open(source.entries[0]):
+                pass
+        finally:
+            await source.close()
+    asyncio.run(fetch())
+
+
+@pytest.fixture
+def resolver(monkeypatch):
+    answers = []
+
+    async def resolve(host, port):
+        return answers.pop(0)
+
+    monkeypatch.setattr(bulk_import, "_resolve", resolve)
+    monkeypatch.setattr(bulk_import.httpcore, "AnyIOBackend", RecordingBackend)
+    RecordingBackend.connected = []
+    return answers
+
+
+def test_downloads_connect_to_the_vetted_address(resolver):
+    resolver.append(["93.184.216.34"])
+    with pytest.raises(httpx.ConnectError):
+        download("https://data.example.com/x.csv")
+    assert RecordingBackend.connected == [("93.184.216.34", 443)]
+
+
+def test_rebinding_host_is_refused_at_connect_time(resolver):
+    # Public for the up-front check, private when the connection is opened
+    resolver.extend([["93.184.216.34"], ["169.254.169.254"]])
+    asyncio.run(check_public_url("http://rebind.example.com/x.csv"))
+    with pytest.raises(BulkImportError):
+        download("http://rebind.example.com/x.csv")
+    assert RecordingBackend.connected == [] and resolver == []
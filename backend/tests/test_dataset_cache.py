@@ -0,0 +1,127 @@
+import io
+import os
+
+import numpy as np
+import pytest
+
+pytest.importorskip("boto3")
+pytest.importorskip("moto")
+
+from app.services.dataset_cache import DatasetCache
+
+
+def store(backend, name, body, checksum, schema=None):
+    key = f"u/1/{name}"
+    backend.client.put_object(Bucket=backend.bucket, Key=key, Body=body)
+    return {"id": name, "name": name, "file_path": key, "schema": schema, "checksum": checksum, "metadata": {}}
+
+
+def csv_dataset(backend, rows=1000, checksum="c-1", name="sales.csv"):
+    body = "id,city\n" + "".join(f"{i},city{i % 5}\n" for i in range(rows))
+    return store(backend, name, body.encode(), checksum, {"delimiter": ","})
+
+
+def test_csv_is_parsed_once_and_mapped(backend, tmp_path):
+    cache = DatasetCache(str(tmp_path), max_bytes=1 << 30)
+    dataset = csv_dataset(backend)
+
+    entry = cache.get(backend, dataset, "t")
+    reads = backend.reads
+    again = cache.get(backend, dataset, "t")
+
+    assert again.path == entry.path and entry.path.endswith(".arrow")
+    assert backend.reads == reads
+    assert (cache.hits, cache.misses) == (1, 1)
+    table = again.table()
+    assert table.num_rows == 1000 and table.column("city")[7].as_py() == "city2"
+
+
+def test_new_checksum_is_a_new_entry(backend, tmp_path):
+    cache = DatasetCache(str(tmp_path), max_bytes=1 << 30)
+    first = cache.get(backend, csv_dataset(backend, rows=10, checksum="c-1"), "t")
+    second = cache.get(backend, csv_dataset(backend, rows=20, checksum="c-2"), "t")
+    assert first.digest != second.digest
+    assert second.table().num_rows == 20
+
+
+def test_npy_is_copied_and_memory_mapped(backend, tmp_path):
+    cache = DatasetCache(str(tmp_path), max_bytes=1 << 30)
+    buffer = io.BytesIO()
+    np.save(buffer, np.arange(12.0).reshape(4, 3))
+    entry = cache.get(backend, store(backend, "m.npy", buffer.getvalue(), "n-1"), "t")
+    array = entry.array()
+    assert isinstance(array, np.memmap) and array[3, 2] == 11.0
+
+
+def test_lru_eviction_skips_pinned_entries(backend, tmp_path):
+    datasets = [csv_dataset(backend, rows=2000, checksum=f"c-{i}", name=f"d{i}.csv") for i in range(4)]
+    probe = DatasetCache(str(tmp_path / "probe"), max_bytes=1 << 30)
+    size = probe.get(backend, datasets[0], "t").size
+    cache = DatasetCache(str(tmp_path / "cache"), max_bytes=int(size * 2.5))
+
+    first = cache.get(backend, datasets[0], "t")
+    pin_id = cache.pin(first)
+    second = cache.get(backend, datasets[1], "t")
+    os.utime(second.path, (1, 1))  # least recently used
+    cache.get(backend, datasets[2], "t")
+
+    assert cache.lookup(datasets[1]) is None
+    assert cache.lookup(datasets[0]) is not None and cache.evictions == 1
+
+    cache.unpin(pin_id)
+    os.utime(first.path, (1, 1))
+    cache.get(backend, datasets[3], "t")
+    assert cache.lookup(datasets[0]) is None
+    assert cache.stats()["entries"] == 2
+
+
+def test_pins_of_dead_processes_are_dropped(backend, tmp_path):
+    cache = DatasetCache(str(tmp_path), max_bytes=0)
+    entry = cache.get(backend, csv_dataset(backend), "t")
+    os.makedirs(os.path.join(str(tmp_path), "pins"), exist_ok=True)
+    # A pid that cannot exist
+    open(os.path.join(str(tmp_path), "pins", f"{entry.digest}.999999999.x"), "w").close()
+    assert cache.stats()["pinned"] == 0
+    cache.evict()
+    assert cache.stats()["entries"] == 0
+
+
+def test_entries_are_pinned_before_eviction_can_see_them(backend, tmp_path):
+    cache = DatasetCache(str(tmp_path), max_bytes=0)
+    entry, pin_id = cache.get_pinned(backend, csv_dataset(backend), "t")
+    cache.evict()
+    assert os.path.exists(entry.path) and cache.stats()["pinned"] == 1
+    cache.unpin(pin_id)
+    cache.evict()
+    assert not os.path.exists(entry.path)
+
+
+def test_cache_directory_is_private(backend, tmp_path, monkeypatch):
+    root = tmp_path / "cache"
+    DatasetCache(str(root), max_bytes=1 << 30).get(backend, csv_dataset(backend), "t")
+    assert root.stat().st_mode & 0o777 == 0o700
+
+    os.chmod(root, 0o777)
+    DatasetCache(str(root), max_bytes=1 << 30).get(backend, csv_dataset(backend), "t")
+    assert root.stat().st_mode & 0o777 == 0o700
+
+    # A directory someone else created first (and may have filled) is not used
+    uid = os.geteuid()
+    monkeypatch.setattr(os, "geteuid", lambda: uid + 1)
+    with pytest.raises(PermissionError):
+        DatasetCache(str(root), max_bytes=1 << 30).get(backend, csv_dataset(backend), "t")
+
+
+def test_training_data_stays_pinned_for_the_job(backend, tmp_path, monkeypatch):
+    import asyncio
+    from app.api.routers import ml
+
+    cache = DatasetCache(str(tmp_path), max_bytes=0)
+    monkeypatch.setattr(ml, "dataset_cache", cache)
+    monkeypatch.setattr(ml, "get_storage_backend", lambda: backend)
+
+    asyncio.run(ml._stage_training_data("m1", csv_dataset(backend), "t"))
+    assert cache.stats()["pinned"] == 1 and cache.stats()["entries"] == 1
+    ml.release_training_data("m1")
+    cache.evict()
+    assert cache.stats()["pinned"] == 0 and cache.stats()["entries"] == 0
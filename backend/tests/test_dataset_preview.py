@@ -0,0 +1,105 @@
+import io
+import json
+
+import numpy as np
+import pytest
+
+pytest.importorskip("boto3")
+pytest.importorskip("moto")
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from app.services.dataset_reader import (
+    PreviewError, arrow_stream, ndjson_stream, parse_filters, preview_dataset,
+)
+
+
+def store(backend, key, body):
+    backend.client.put_object(Bucket=backend.bucket, Key=key, Body=body)
+    return {"id": "d", "name": key.rsplit("/", 1)[-1], "file_path": key, "schema": None, "metadata": {}}
+
+
+def rows(preview):
+    return [json.loads(line) for chunk in ndjson_stream(preview) for line in chunk.decode().splitlines()]
+
+
+@pytest.fixture
+def parquet_dataset(backend):
+    n = 200_000
+    table = pa.table({
+        "id": np.arange(n),
+        "value": np.random.default_rng(0).random(n),
+        "label": pa.array([f"label-{i % 7}" for i in range(n)]),
+        "payload": pa.array(["x" * 50] * n),
+    })
+    buffer = io.BytesIO()
+    pq.write_table(table, buffer, row_group_size=20_000)
+    return store(backend, "u/1/big.parquet", buffer.getvalue()), len(buffer.getvalue())
+
+
+def test_parquet_page_reads_only_needed_row_group_and_columns(backend, parquet_dataset):
+    dataset, size = parquet_dataset
+    preview = preview_dataset(backend, dataset, "t", ["id", "label"], [], offset=150_005, limit=3)
+    assert preview.schema.names == ["id", "label"]
+    assert rows(preview) == [{"id": 150_005 + i, "label": f"label-{(150_005 + i) % 7}"} for i in range(3)]
+    # Footer plus one row group's two columns, not the file
+    assert backend.bytes_read < size / 5
+
+
+def test_parquet_filters_prune_row_groups(backend, parquet_dataset):
+    dataset, size = parquet_dataset
+    preview = preview_dataset(backend, dataset, "t", ["id"], ["id.gte.190000", "label.eq.label-3"], 0, 5)
+    result = [r["id"] for r in rows(preview)]
+    assert result == [i for i in range(190_000, 200_000) if i % 7 == 3][:5]
+    assert backend.bytes_read < size / 5
+
+
+def test_arrow_stream_roundtrip(backend, parquet_dataset):
+    dataset, _ = parquet_dataset
+    preview = preview_dataset(backend, dataset, "t", ["id", "value"], ["id.in.(3,4,99)"], 1, 10)
+    table = pa.ipc.open_stream(b"".join(arrow_stream(preview))).read_all()
+    assert table.column("id").to_pylist() == [4, 99]
+
+
+def test_csv_scan_stops_after_the_page(backend):
+    header = "id,city,amount\n"
+    body = header + "".join(f"{i},city{i % 3},{i * 1.5}\n" for i in range(600_000))
+    dataset = store(backend, "u/1/sales.csv", body.encode())
+    dataset["schema"] = {"delimiter": ","}
+    preview = preview_dataset(backend, dataset, "t", ["amount"], ["city.eq.city2"], 10, 2)
+    # The 11th and 12th rows with i % 3 == 2
+    assert rows(preview) == [{"amount": 32 * 1.5}, {"amount": 35 * 1.5}]
+    # The reader's prefetch window, not the file
+    assert backend.bytes_read < 4 * 1024 * 1024 < len(body) / 3
+
+
+def test_json_lines_and_arrays(backend):
+    records = [{"id": i, "ok": i % 2 == 0} for i in range(100)]
+    lines = store(backend, "u/1/l.json", "\n".join(json.dumps(r) for r in records).encode())
+    lines["schema"] = {"layout": "lines"}
+    assert rows(preview_dataset(backend, lines, "t", None, ["ok.is.true"], 0, 3)) == \
+        [{"id": 0, "ok": True}, {"id": 2, "ok": True}, {"id": 4, "ok": True}]
+    array = store(backend, "u/1/a.json", json.dumps(records).encode())
+    assert [r["id"] for r in rows(preview_dataset(backend, array, "t", ["id"], [], 98, 10))] == [98, 99]
+
+
+def test_npy_pages_are_single_range_reads(backend):
+    buffer = io.BytesIO()
+    np.save(buffer, np.arange(300_000, dtype=np.int64).reshape(100_000, 3))
+    dataset = store(backend, "u/1/m.npy", buffer.getvalue())
+    preview = preview_dataset(backend, dataset, "t", ["0", "2"], [], 50_000, 2)
+    assert rows(preview) == [{"0": 150_000, "2": 150_002}, {"0": 150_003, "2": 150_005}]
+    assert backend.bytes_read < 200 * 1024
+
+
+def test_bad_requests_raise_preview_errors(backend, parquet_dataset):
+    dataset, _ = parquet_dataset
+    with pytest.raises(PreviewError):
+        preview_dataset(backend, dataset, "t", ["missing"], [], 0, 1)
+    with pytest.raises(PreviewError):
+        preview_dataset(backend, dataset, "t", None, ["id.gt.abc"], 0, 1)
+    with pytest.raises(PreviewError):
+        parse_filters(["nonsense"])
+    with pytest.raises(PreviewError):
+        preview_dataset(backend, {**dataset, "name": "book.xlsx"}, "t", None, [], 0, 1)
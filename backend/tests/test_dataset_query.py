@@ -0,0 +1,121 @@
+import io
+import json
+
+import numpy as np
+import pytest
+
+pytest.importorskip("boto3")
+pytest.importorskip("duckdb")
+pytest.importorskip("moto")
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from app.services.dataset_query import QueryError, QueryTimeout, dataset_views, run_query, view_name
+from app.services.dataset_reader import arrow_stream
+
+
+def store(backend, name, body, schema=None):
+    key = f"u/1/{name}"
+    backend.client.put_object(Bucket=backend.bucket, Key=key, Body=body)
+    return {"id": name, "name": name, "file_path": key, "schema": schema, "metadata": {}}
+
+
+@pytest.fixture
+def project(backend):
+    n = 200_000
+    events = pa.table({
+        "id": np.arange(n),
+        "customer": np.arange(n) % 100,
+        "amount": np.arange(n) * 0.5,
+        "payload": pa.array(["x" * 50] * n),
+    })
+    buffer = io.BytesIO()
+    pq.write_table(events, buffer, row_group_size=20_000)
+    customers = "id,region\n" + "".join(f"{i},{'north' if i % 2 else 'south'}\n" for i in range(100))
+    return [
+        store(backend, "Events 2024.parquet", buffer.getvalue()),
+        store(backend, "customers.csv", customers.encode(), {"delimiter": ","}),
+    ]
+
+
+def query(backend, datasets, sql, timeout=10):
+    return run_query(backend, datasets, "t", sql, memory_limit_mb=256, timeout_seconds=timeout, threads=2)
+
+
+def table(result):
+    return pa.ipc.open_stream(b"".join(arrow_stream(result))).read_all()
+
+
+def test_view_names():
+    assert view_name("Sales 2024.csv") == "sales_2024"
+    assert view_name("2024.parquet") == "_2024"
+    views = dataset_views([{"name": "a.csv", "created_at": "1"}, {"name": "A.json", "created_at": "2"}])
+    assert list(views) == ["a", "a_2"]
+
+
+def test_join_and_aggregate_across_formats(backend, project):
+    result = query(backend, project, """
+        SELECT c.region, count(*) AS orders, sum(e.amount) AS total
+        FROM events_2024 e JOIN customers c ON c.id = e.customer
+        GROUP BY c.region ORDER BY c.region
+    """)
+    assert sorted(result.views) == ["customers", "events_2024"]
+    rows = table(result).to_pylist()
+    assert [r["region"] for r in rows] == ["north", "south"]
+    assert sum(r["orders"] for r in rows) == 200_000
+    assert sum(r["total"] for r in rows) == pytest.approx(sum(i * 0.5 for i in range(200_000)))
+
+
+def test_projection_and_filters_reach_the_parquet_reader(backend, project):
+    size = backend.client.head_object(Bucket=backend.bucket, Key="u/1/Events 2024.parquet")["ContentLength"]
+    rows = table(query(backend, project, "SELECT sum(amount) AS s FROM events_2024 WHERE id >= 190000")).to_pylist()
+    assert rows == [{"s": sum(i * 0.5 for i in range(190_000, 200_000))}]
+    # Only the id/amount chunks of the matching row group, never the payload column
+    assert backend.bytes_read < size / 5
+
+
+def test_only_referenced_datasets_are_opened(backend, project):
+    result = query(backend, project, "SELECT count(*) AS n FROM customers")
+    assert result.views == ["customers"]
+    assert table(result).to_pylist() == [{"n": 100}]
+
+
+def test_json_and_npy_views(backend):
+    records = [{"id": i, "ok": i % 2 == 0} for i in range(1000)]
+    matrix = io.BytesIO()
+    np.save(matrix, np.arange(30_000, dtype=np.int64).reshape(10_000, 3))
+    datasets = [
+        store(backend, "lines.json", "\n".join(json.dumps(r) for r in records).encode(), {"layout": "lines"}),
+        store(backend, "records.json", json.dumps(records).encode(), {"layout": "array"}),
+        store(backend, "m.npy", matrix.getvalue()),
+    ]
+    result = query(backend, datasets, """
+        SELECT (SELECT count(*) FROM lines WHERE ok) AS a,
+               (SELECT count(*) FROM records WHERE NOT ok) AS b,
+               (SELECT sum("2") FROM m) AS c
+    """)
+    assert table(result).to_pylist() == [{"a": 500, "b": 500, "c": sum(range(2, 30_000, 3))}]
+
+
+@pytest.mark.parametrize("sql", [
+    "DELETE FROM customers",
+    "SELECT 1; SELECT 2",
+    "COPY (SELECT 1) TO '/tmp/out.csv'",
+    "SELECT * FROM read_csv('/etc/passwd')",
+    "SELECT * FROM missing_table",
+])
+def test_rejected_queries(backend, project, sql):
+    with pytest.raises(QueryError):
+        query(backend, project, sql)
+
+
+def test_configuration_is_locked(backend, project):
+    with pytest.raises(QueryError):
+        query(backend, project, "SELECT set_config('memory_limit', '100GB')")
+
+
+def test_timeout_interrupts_the_query(backend, project):
+    with pytest.raises(QueryTimeout):
+        result = query(backend, project, "SELECT count(*) FROM range(100000000000) a", timeout=0.2)
+        table(result)
@@ -0,0 +1,118 @@
+import asyncio
+import base64
+
+import httpx
+import pytest
+
+from app.db.supabase import SupabaseManager
+from app.services.dataset_values import (
+    VALUE_SELECT, ValueEncodingError, binary_stream, decode_bytea, decode_row, order_by_ids, value_row,
+)
+
+
+def item(value_type, value, name="v"):
+    return {"name": name, "value_type": value_type, "value": value}
+
+
+@pytest.mark.parametrize("value_type, value, column, stored, size", [
+    ("text", "héllo", "value_text", "héllo", 6),
+    ("numeric", 12.5, "value_numeric", "12.5", 4),
+    ("numeric", "123456789012345678901234.5", "value_numeric", "123456789012345678901234.5", 26),
+    ("boolean", False, "value_boolean", False, 1),
+    ("date", "2026-10-17T12:00:00", "value_date", "2026-10-17T12:00:00+00:00", 25),
+    ("json", {"tag": "a", "n": [1, 2]}, "value_json", {"tag": "a", "n": [1, 2]}, 21),
+    ("binary", base64.b64encode(b"\x00\xffab").decode(), "value_binary", "\\x00ff6162", 4),
+])
+def test_value_row_encodes_each_type(value_type, value, column, stored, size):
+    row = value_row("p1", "u1", item(value_type, value))
+    assert row[column] == stored and row["size_bytes"] == size
+    assert (row["storage_mode"], row["value_type"], row["project_id"], row["created_by"]) == ("value", value_type, "p1", "u1")
+
+
+def test_value_rows_get_distinct_ids():
+    ids = {value_row("p1", "u1", item("text", "x"))["id"] for _ in range(100)}
+    assert len(ids) == 100
+
+
+@pytest.mark.parametrize("value_type, value", [
+    ("text", 3), ("numeric", True), ("numeric", "abc"), ("numeric", "NaN"), ("boolean", "true"),
+    ("date", "yesterday"), ("json", float("nan")), ("binary", "not base64!"), ("vector", [1]),
+])
+def test_value_row_rejects_mismatched_values(value_type, value):
+    with pytest.raises(ValueEncodingError):
+        value_row("p1", "u1", item(value_type, value))
+
+
+def test_decode_row_never_carries_binary():
+    assert "value_binary" not in VALUE_SELECT
+    row = {"id": "1", "value_type": "binary", "value_binary": "\\x00", "size_bytes": 1}
+    assert decode_row(row)["value"] is None
+    assert decode_row({"id": "2", "value_type": "json", "value_json": {"a": 1}})["value"] == {"a": 1}
+
+
+def test_decode_bytea_and_order_by_ids():
+    assert decode_bytea("\\x00ff") == b"\x00\xff" and decode_bytea(None) == b""
+    rows = [{"id": "b"}, {"id": "a"}]
+    assert order_by_ids(rows, ["a", "missing", "b", "a"]) == [{"id": "a"}, {"id": "b"}]
+
+
+def _serve(monkeypatch, handler):
+    monkeypatch.setattr("app.core.config.settings.SUPABASE_URL", "http://postgrest.test")
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(SupabaseManager, "get_async_http_client", classmethod(lambda cls: client))
+
+
+async def _collect(stream):
+    return b"".join([chunk async for chunk in await stream])
+
+
+def test_binary_stream_relays_raw_body(monkeypatch):
+    payload = bytes(range(256)) * 1000
+    seen = {}
+
+    def handler(request):
+        seen.update(accept=request.headers["accept"], select=request.url.params["select"])
+        return httpx.Response(200, content=payload)
+
+    _serve(monkeypatch, handler)
+    assert asyncio.run(_collect(binary_stream("v1", "token", chunk_size=4096))) == payload
+    assert seen == {"accept": "application/octet-stream", "select": "value_binary"}
+
+
+def test_binary_stream_raises_before_streaming(monkeypatch):
+    from app.services.storage import StorageError
+
+    _serve(monkeypatch, lambda request: httpx.Response(401, json={"message": "JWT expired"}))
+    with pytest.raises(StorageError, match="401"):
+        asyncio.run(_collect(binary_stream("v1", "token")))
+
+
+def test_created_values_are_not_indexed_as_datasets(tmp_path, monkeypatch):
+    from types import SimpleNamespace
+    from fastapi.security import HTTPAuthorizationCredentials
+    from app.api.routers import datasets
+    from app.core.security import User
+    from app.services import search_index as search_index_module
+    from app.services.search_index import SearchIndex
+
+    inserted = []
+
+    class Table:
+        def insert(self, rows, returning=None):
+            inserted.extend(rows)
+            return self
+
+        async def execute(self):
+            return SimpleNamespace(data=[])
+
+    monkeypatch.setattr(datasets, "_authenticated_client", lambda credentials: SimpleNamespace(table=lambda name: Table()))
+    index = SearchIndex(max_bytes=1 << 20, snapshot_path=str(tmp_path / "index.json"))
+    monkeypatch.setattr(search_index_module, "search_index", index)
+    monkeypatch.setattr(search_index_module.settings, "SEARCH_BACKEND", "memory")
+
+    body = datasets.ValueBatchCreate(project_id="p1", items=[item("text", "hello", name="greeting")])
+    user = User(user_id="u1", username="u", role="authenticated")
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials="t")
+    result = asyncio.run(datasets.create_values(body, user, credentials))
+    assert result["created"] == 1 and len(inserted) == 1
+    assert index.stats()["documents"] == 0
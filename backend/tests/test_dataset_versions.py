@@ -0,0 +1,133 @@
+import asyncio
+import hashlib
+import random
+
+import pytest
+
+pytest.importorskip("boto3")
+pytest.importorskip("moto")
+
+from app.services.chunking import Chunker
+from app.services.dataset_versions import (
+    ChunkStore, VersionError, VersionWriter, negotiated_manifest, reconstruct,
+)
+
+KIB = 1024
+
+
+class MemoryIndexStore(ChunkStore):
+    """Chunk objects in (mocked) S3, chunk index in memory instead of dataset_chunks."""
+
+    def __init__(self, backend, owner_id="u1"):
+        super().__init__(backend, None, owner_id, "token", concurrency=4)
+        self.index = {}
+        self.lookups = 0
+
+    async def existing(self, digests):
+        self.lookups += 1
+        return {d: self.index[d] for d in digests if d in self.index}
+
+    async def _index(self, sizes):
+        self.index.update(sizes)
+
+
+@pytest.fixture
+def backend(backend, monkeypatch):
+    monkeypatch.setattr("app.core.config.settings.DATASET_CHUNK_MIN_BYTES", 8 * KIB)
+    monkeypatch.setattr("app.core.config.settings.DATASET_CHUNK_AVG_BYTES", 32 * KIB)
+    monkeypatch.setattr("app.core.config.settings.DATASET_CHUNK_MAX_BYTES", 128 * KIB)
+    monkeypatch.setattr("app.core.config.settings.DATASET_VERSION_BATCH_BYTES", 256 * KIB)
+    return backend
+
+
+def feature_table(rows, seed=0):
+    rng = random.Random(seed)
+    lines = ["id,feature_a,feature_b,label"]
+    lines += [f"{i},{rng.random():.6f},{rng.randint(0, 10_000)},{rng.choice('ab')}" for i in range(rows)]
+    return ("\n".join(lines) + "\n").encode()
+
+
+def chunk(data, pieces=1 << 14, sizes=(8 * KIB, 32 * KIB, 128 * KIB)):
+    chunker = Chunker(*sizes)
+    out = []
+    for start in range(0, len(data), pieces):
+        out += chunker.feed(data[start:start + pieces])
+    return out + chunker.finish()
+
+
+def test_chunks_do_not_depend_on_how_bytes_arrive():
+    data = feature_table(40_000)
+    small, large = chunk(data, pieces=1000), chunk(data, pieces=1 << 20)
+    assert b"".join(small) == data
+    assert [len(c) for c in small] == [len(c) for c in large]
+    assert all(8 * KIB <= len(c) <= 128 * KIB for c in small[:-1])
+
+
+def test_an_edit_only_changes_nearby_chunks():
+    data = feature_table(40_000)
+    edited = data[:500_000] + b"99999,0.5,1,b\n" + data[500_000:]
+    before = {hashlib.sha256(c).digest() for c in chunk(data)}
+    after = [hashlib.sha256(c).digest() for c in chunk(edited)]
+    assert len(after) > 20
+    assert sum(d not in before for d in after) <= 2
+
+
+async def _write(store, data, previous=None, piece=50_000):
+    writer = VersionWriter(store, previous)
+    for start in range(0, len(data), piece):
+        await writer.write(data[start:start + piece])
+    return await writer.finish(), writer
+
+
+async def _read(backend, manifest):
+    return b"".join([part async for part in reconstruct(backend, "u1", manifest["chunks"], "token", prefetch=3)])
+
+
+def test_new_version_uploads_only_changed_chunks(backend):
+    store = MemoryIndexStore(backend)
+    day1 = feature_table(40_000, seed=1)
+    day2 = day1[:300_000] + feature_table(200, seed=2)[40:] + day1[300_000:]
+
+    async def run():
+        v1, w1 = await _write(store, day1)
+        v2, w2 = await _write(store, day2, previous={d for d, _ in v1["chunks"]})
+        return v1, w1, v2, w2, await _read(backend, v1), await _read(backend, v2)
+
+    v1, w1, v2, w2, body1, body2 = asyncio.run(run())
+    assert (body1, body2) == (day1, day2)
+    assert w1.uploaded_bytes == len(day1) == v1["size_bytes"]
+    assert v2["size_bytes"] == len(day2)
+    assert w2.uploaded_bytes == v2["new_bytes"] and w2.uploaded_bytes < len(day2) / 5
+    assert v2["checksum"] != v1["checksum"] and v2["checksum"].endswith(f"-{v2['chunk_count']}")
+
+
+def test_identical_content_is_not_uploaded_again(backend):
+    store = MemoryIndexStore(backend)
+    data = feature_table(20_000)
+
+    async def run():
+        first, _ = await _write(store, data)
+        # Another dataset of the same owner: no previous manifest, found via the index
+        second, writer = await _write(store, data)
+        return first, second, writer
+
+    first, second, writer = asyncio.run(run())
+    assert writer.uploaded_bytes == 0 and second["checksum"] == first["checksum"]
+
+
+def test_negotiated_manifest_requires_uploaded_chunks(backend):
+    store = MemoryIndexStore(backend)
+    pieces = chunk(feature_table(10_000))
+    digests = [hashlib.sha256(c).hexdigest() for c in pieces]
+
+    async def run():
+        await store.store(list(zip(digests[:-1], pieces[:-1])))
+        with pytest.raises(VersionError, match="1 chunks"):
+            await negotiated_manifest(store, digests)
+        await store.store([(digests[-1], pieces[-1])])
+        manifest = await negotiated_manifest(store, digests, previous=set(digests[:-1]))
+        return manifest, await _read(backend, manifest)
+
+    manifest, body = asyncio.run(run())
+    assert body == b"".join(pieces)
+    assert manifest["new_chunks"] == 1 and manifest["new_bytes"] == len(pieces[-1])
@@ -0,0 +1,129 @@
+import io
+import json
+import zipfile
+
+import numpy as np
+import pytest
+
+from app.services.ingest import inspection_result, inspector_for
+
+
+def inspect(filename, payload, chunk_size=7):
+    inspector = inspector_for(filename)
+    for i in range(0, len(payload), chunk_size):
+        inspector.feed(payload[i:i + chunk_size])
+    inspector.finish()
+    return inspection_result(inspector)
+
+
+def types(schema):
+    return {c["name"]: c["type"] for c in schema["columns"]}
+
+
+def test_csv_counts_rows_and_infers_types():
+    payload = (
+        'id,price,active,created,notes\n'
+        '1,9.5,true,2024-01-02,plain\n'
+        '2,10,false,2024-01-03T10:00:00,"spans\nlines, and ""quotes"""\n'
+        '3,,true,2024-01-04,\n'
+    ).encode()
+    schema = inspect("sales.csv", payload)
+    assert schema["row_count"] == 3
+    assert types(schema) == {
+        "id": "integer", "price": "float", "active": "boolean", "created": "datetime", "notes": "string",
+    }
+    nullable = {c["name"]: c["nullable"] for c in schema["columns"]}
+    assert nullable["price"] and not nullable["id"]
+
+
+def test_csv_without_trailing_newline_and_semicolons():
+    schema = inspect("eu.csv", b"a;b\n1;x\n2;y", chunk_size=3)
+    assert schema["delimiter"] == ";"
+    assert schema["row_count"] == 2
+
+
+def test_json_array_and_lines():
+    records = [{"id": i, "score": i / 2, "tags": ["a"], "name": f"n{i}"} for i in range(50)]
+    records[3]["extra"] = None
+    array = inspect("data.json", json.dumps(records, indent=2).encode())
+    assert array["layout"] == "array" and array["row_count"] == 50
+    assert types(array) == {"id": "integer", "score": "float", "tags": "array", "name": "string", "extra": "null"}
+
+    lines = inspect("data.json", "\n".join(json.dumps(r) for r in records).encode(), chunk_size=13)
+    assert lines["layout"] == "lines" and lines["row_count"] == 50
+
+
+def test_parquet_reads_only_the_footer():
+    pa = pytest.importorskip("pyarrow")
+    pq = pytest.importorskip("pyarrow.parquet")
+    buffer = io.BytesIO()
+    pq.write_table(pa.table({"x": list(range(5000)), "y": ["v"] * 5000}), buffer, row_group_size=1000)
+    payload = buffer.getvalue()
+
+    inspector = inspector_for("t.parquet")
+    inspector.tail_bytes = 4096
+    for i in range(0, len(payload), 1000):
+        inspector.feed(payload[i:i + 1000])
+    assert inspector._tail_size < 4096 + 1000
+    schema = inspection_result(inspector)
+    assert schema["row_count"] == 5000 and schema["row_groups"] == 5
+    assert types(schema) == {"x": "integer", "y": "string"}
+
+
+def test_npy_header_only():
+    buffer = io.BytesIO()
+    np.save(buffer, np.zeros((1200, 3), dtype=np.float32))
+    schema = inspect("m.npy", buffer.getvalue(), chunk_size=64)
+    assert schema["row_count"] == 1200 and schema["shape"] == [1200, 3]
+    assert types(schema) == {"0": "float", "1": "float", "2": "float"}
+
+    buffer = io.BytesIO()
+    np.save(buffer, np.zeros(10, dtype=[("age", "i4"), ("label", "U5")]))
+    assert types(inspect("s.npy", buffer.getvalue())) == {"age": "integer", "label": "string"}
+
+
+NS = 'xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"'
+
+
+def _xlsx(rows, streamed):
+    strings = ["name", "qty", "when", "alpha", "beta"]
+    sheet = f'<worksheet {NS}><dimension ref="A1:C{len(rows) + 1}"/><sheetData>'
+    sheet += '<row r="1"><c r="A1" t="s"><v>0</v></c><c r="B1" t="s"><v>1</v></c><c r="C1" t="s"><v>2</v></c></row>'
+    for i, (name, qty, when) in enumerate(rows, start=2):
+        sheet += (f'<row r="{i}"><c r="A{i}" t="s"><v>{name}</v></c><c r="B{i}"><v>{qty}</v></c>'
+                  f'<c r="C{i}"><v>{when}</v></c></row>')
+    sheet += "</sheetData></worksheet>"
+    sst = f'<sst {NS}>' + "".join(f"<si><t>{s}</t></si>" for s in strings) + "</sst>"
+
+    class Unseekable(io.RawIOBase):
+        def __init__(self):
+            self.data = bytearray()
+
+        def writable(self):
+            return True
+
+        def write(self, b):
+            self.data += b
+            return len(b)
+
+    target = Unseekable() if streamed else io.BytesIO()
+    with zipfile.ZipFile(target, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("[Content_Types].xml", "<Types/>")
+        archive.writestr("xl/workbook.xml", f'<workbook {NS}><sheets><sheet name="Orders" sheetId="1"/></sheets></workbook>')
+        archive.writestr("xl/worksheets/sheet1.xml", sheet)
+        archive.writestr("xl/sharedStrings.xml", sst)
+    return bytes(target.data) if streamed else target.getvalue()
+
+
+@pytest.mark.parametrize("streamed", [False, True], ids=["sized", "data-descriptor"])
+def test_xlsx_streams_first_sheet(streamed):
+    rows = [(3 + i % 2, i, 45000.5) for i in range(2000)]
+    schema = inspect("orders.xlsx", _xlsx(rows, streamed), chunk_size=4096)
+    assert schema["sheet"] == "Orders"
+    assert schema["row_count"] == 2000
+    assert schema["sampled_rows"] == 1000
+    assert types(schema) == {"name": "string", "qty": "integer", "when": "float"}
+
+
+def test_unknown_extension_has_no_inspector():
+    assert inspector_for("notes.txt") is None
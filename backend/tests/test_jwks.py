@@ -0,0 +1,111 @@
+import asyncio
+import json
+import time
+from jose import jwk, jwt
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from app.core.jwks import JWKSCache
+from app.core import security
+
+
+def make_signing_key(kid):
+    private_key = ec.generate_private_key(ec.SECP256R1())
+    pem = private_key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    )
+    public_pem = private_key.public_key().public_bytes(
+        serialization.Encoding.PEM,
+        serialization.PublicFormat.SubjectPublicKeyInfo,
+    )
+    public_jwk = jwk.construct(public_pem, "ES256").to_dict()
+    public_jwk = {k: (v.decode() if isinstance(v, bytes) else v) for k, v in public_jwk.items()}
+    public_jwk.update({"kid": kid, "use": "sig"})
+    return pem, public_jwk
+
+
+def make_token(pem, kid):
+    claims = {"sub": "user-1", "email": "user@example.com", "aud": "authenticated", "exp": int(time.time()) + 60}
+    return jwt.encode(claims, pem, algorithm="ES256", headers={"kid": kid})
+
+
+def test_verifies_es256_token_from_disk_cache(tmp_path, monkeypatch):
+    pem, public_jwk = make_signing_key("key-1")
+    cache_file = tmp_path / "jwks.json"
+    cache_file.write_text(json.dumps({"keys": [public_jwk]}))
+    cache = JWKSCache(url="", cache_path=str(cache_file), refresh_interval=0)
+    monkeypatch.setattr(security, "jwks_cache", cache)
+
+    claims = asyncio.run(security.verify_token_locally(make_token(pem, "key-1")))
+    assert claims["sub"] == "user-1"
+
+
+def test_unknown_kid_triggers_refresh(tmp_path, monkeypatch):
+    old_pem, old_jwk = make_signing_key("old")
+    new_pem, new_jwk = make_signing_key("new")
+    cache_file = tmp_path / "jwks.json"
+    cache_file.write_text(json.dumps({"keys": [old_jwk]}))
+    cache = JWKSCache(url="http://jwks.invalid", cache_path=str(cache_file), refresh_interval=0)
+    cache._loaded = True
+    cache._load_from_disk()
+
+    refreshes = []
+
+    def fake_refresh(force=False):
+        refreshes.append(force)
+        cache._set_keys({"keys": [old_jwk, new_jwk]})
+        return True
+
+    monkeypatch.setattr(cache, "refresh", fake_refresh)
+    monkeypatch.setattr(security, "jwks_cache", cache)
+
+    claims = asyncio.run(security.verify_token_locally(make_token(new_pem, "new")))
+    assert claims["sub"] == "user-1"
+    assert len(refreshes) == 1
+
+
+def test_wrong_signature_is_rejected(tmp_path, monkeypatch):
+    pem, _ = make_signing_key("key-1")
+    _, other_jwk = make_signing_key("key-1")
+    cache_file = tmp_path / "jwks.json"
+    cache_file.write_text(json.dumps({"keys": [other_jwk]}))
+    cache = JWKSCache(url="", cache_path=str(cache_file), refresh_interval=0)
+    monkeypatch.setattr(security, "jwks_cache", cache)
+
+    assert asyncio.run(security.verify_token_locally(make_token(pem, "key-1"))) is None
+
+
+def test_disk_mirror_writable_by_others_is_ignored(tmp_path):
+    _, public_jwk = make_signing_key("planted")
+    cache_file = tmp_path / "jwks.json"
+    cache_file.write_text(json.dumps({"keys": [public_jwk]}))
+    cache_file.chmod(0o666)
+    cache = JWKSCache(url="", cache_path=str(cache_file), refresh_interval=0)
+    cache._load_from_disk()
+    assert cache._keys == {}
+
+    cache._save_to_disk({"keys": [public_jwk]})
+    assert cache_file.stat().st_mode & 0o777 == 0o600
+    cache._load_from_disk()
+    assert set(cache._keys) == {"planted"}
+
+
+def test_fetches_are_rate_limited_while_no_keys_are_loaded(tmp_path, monkeypatch):
+    import httpx
+    from app.core import jwks
+
+    fetches = []
+
+    def unreachable(url, **kwargs):
+        fetches.append(url)
+        raise httpx.ConnectError("down")
+
+    monkeypatch.setattr(jwks.httpx, "get", unreachable)
+    cache = JWKSCache(url="http://jwks.invalid", cache_path=str(tmp_path / "jwks.json"), refresh_interval=0)
+
+    async def requests():
+        return [await cache.get_key("key-1") for _ in range(5)]
+
+    assert asyncio.run(requests()) == [None] * 5
+    assert len(fetches) == 1
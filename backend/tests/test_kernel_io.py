@@ -0,0 +1,98 @@
+import asyncio
+import time
+
+import pytest
+
+pytest.importorskip("jupyter_client")
+
+from app.services.kernel_io import Execution, KernelIO, output_text, sse_events
+
+
+def message(parent, msg_type, **content):
+    return {"parent_header": {"msg_id": parent}, "msg_type": msg_type, "content": content}
+
+
+def routed(messages, max_bytes=1024 * 1024):
+    io = KernelIO()
+    execution = Execution("p1", "u1", "code", max_bytes=max_bytes)
+    io._executions["m1"] = (object(), execution)
+    for msg in messages:
+        io._route(msg)
+    return execution
+
+
+def test_outputs_are_collected_for_their_request_only():
+    execution = routed([
+        message("m1", "execute_input", code="code", execution_count=3),
+        message("m1", "stream", name="stdout", text="hello\n"),
+        message("other", "stream", name="stdout", text="not ours\n"),
+        message("m1", "display_data", data={"text/plain": "<Figure>", "image/png": "iVBO"}, metadata={}),
+        message("m1", "execute_result", data={"text/plain": "42"}, metadata={}, execution_count=3),
+        message("m1", "status", execution_state="idle"),
+    ])
+    assert execution.finished and execution.status == "ok" and execution.execution_count == 3
+    assert [o["output_type"] for o in execution.outputs] == ["stream", "display_data", "execute_result"]
+    assert output_text(execution.outputs) == "hello\n<Figure>\n42\n"
+
+
+def test_errors_set_the_status_and_large_outputs_are_truncated():
+    execution = routed([
+        message("m1", "stream", name="stdout", text="x" * 200),
+        message("m1", "stream", name="stdout", text="y" * 200),
+        message("m1", "error", ename="ValueError", evalue="bad", traceback=["..."]),
+        message("m1", "status", execution_state="idle"),
+    ], max_bytes=300)
+    assert execution.status == "error" and execution.truncated
+    assert len(execution.outputs) == 1
+
+
+def test_events_stream_outputs_as_they_arrive():
+    execution = Execution("p1", "u1", "code")
+
+    async def run():
+        async def produce():
+            for i in range(3):
+                await asyncio.sleep(0.01)
+                # Outputs come from the I/O thread
+                await asyncio.to_thread(execution.add_output, {"output_type": "stream", "name": "stdout", "text": f"{i}\n"})
+            await asyncio.to_thread(execution.finish)
+
+        producer = asyncio.create_task(produce())
+        events = [chunk async for chunk in sse_events(execution, heartbeat=0.005)]
+        await producer
+        return events
+
+    events = asyncio.run(run())
+    outputs = [e for e in events if e.startswith(b"event: output")]
+    assert len(outputs) == 3 and b'"0\\n"' in outputs[0]
+    assert events[-1].startswith(b"event: done") and b'"status": "ok"' in events[-1]
+    assert b": keepalive\n\n" in events
+
+
+def test_real_kernel_outputs():
+    pytest.importorskip("ipykernel")
+    from app.services.jupyter_manager import KernelManager
+
+    pool = KernelManager(max_kernels=2)
+    try:
+        started = time.monotonic()
+        first = pool.execute("p1", "import os\nprint(os.environ['API_KEY'])\n6 * 7",
+                             env={"API_KEY": "s3cret"}, user_id="u1", timeout=60)
+        assert first.status == "ok", first.summary()
+        assert output_text(first.outputs) == "s3cret\n42\n"
+
+        failed = pool.execute("p1", "1 / 0", user_id="u1", timeout=30)
+        assert failed.status == "error" and failed.outputs[-1]["ename"] == "ZeroDivisionError"
+        assert time.monotonic() - started < 60
+
+        # A runaway cell is interrupted and the cell queued behind it still runs
+        runaway = pool.run("p1", "import time\ntime.sleep(60)", user_id="u1")
+        queued = pool.run("p1", "print('next')", user_id="u1")
+        assert pool.queue_position(queued) == 1
+        time.sleep(0.5)
+        assert pool.cancel(runaway)
+        assert queued.wait(30) and runaway.status == "interrupted"
+        assert output_text(queued.outputs) == "next\n"
+        assert pool.stats()["busy"] == 0
+    finally:
+        pool.shutdown_all()
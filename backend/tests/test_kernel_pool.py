@@ -0,0 +1,236 @@
+import pytest
+
+pytest.importorskip("jupyter_client")
+
+from app.services.jupyter_manager import KernelManager, KernelPoolExhausted, KernelQueueFull, PooledKernel
+
+
+class FakeKernelManager:
+    def __init__(self):
+        self.alive = True
+        self.interrupts = 0
+
+    def interrupt_kernel(self):
+        self.interrupts += 1
+
+    def is_alive(self):
+        return self.alive
+
+    def shutdown_kernel(self, now=False):
+        self.alive = False
+
+
+class FakeClient:
+    def __init__(self):
+        self.executed = []
+
+    def stop_channels(self):
+        pass
+
+
+class FakeIO:
+    """Records the code sent to each kernel. Executions finish at once unless held."""
+
+    hold = False
+
+    def attach(self, kernel):
+        pass
+
+    def detach(self, kernel):
+        pass
+
+    def submit(self, kernel, code, silent=False, execution=None):
+        kernel.kc.executed.append(code)
+        if execution is not None and not self.hold:
+            execution.finish()
+        return str(len(kernel.kc.executed))
+
+    def stop(self):
+        pass
+
+
+class FakePool(KernelManager):
+    """Kernels are fakes and maintenance is driven by the test, not a thread."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.io = FakeIO()
+        self.started = []
+
+    def start(self):
+        pass
+
+    def _start_kernel(self):
+        kernel = PooledKernel(FakeKernelManager(), FakeClient())
+        self.started.append(kernel)
+        return kernel
+
+
+def test_warm_kernel_is_assigned_with_user_secrets():
+    pool = FakePool(warm=2, max_kernels=4)
+    pool._fill()
+    assert pool.stats()["warm"] == 2
+
+    pool.execute("p1", "print(1)", env={"API_KEY": "secret"}, user_id="u1")
+    kernel = pool.kernels["p1"]
+    assert kernel in pool.started and len(pool.started) == 2
+    assert "API_KEY" in kernel.kc.executed[0] and kernel.kc.executed[1] == "print(1)"
+    stats = pool.stats()
+    assert (stats["warm"], stats["assigned"], stats["warm_hits"], stats["cold_starts"]) == (1, 1, 1, 0)
+
+    # Refilled up to the target, within the global cap
+    pool._fill()
+    assert pool.stats()["warm"] == 2
+
+
+def test_per_user_cap_evicts_that_users_least_recently_used_kernel():
+    pool = FakePool(max_kernels=10, max_per_user=2)
+    pool.execute("p1", "1", user_id="u1")
+    pool.execute("p2", "2", user_id="u1")
+    pool.execute("other", "x", user_id="u2")
+    pool.execute("p1", "1", user_id="u1")
+    first_p2 = pool.kernels["p2"]
+    pool.execute("p3", "3", user_id="u1")
+
+    assert set(pool.kernels) == {"p1", "p3", "other"}
+    assert not first_p2.km.alive
+    assert pool.stats()["evicted_lru"] == 1
+
+
+def test_global_cap_evicts_idle_kernels_and_rejects_when_all_are_busy():
+    pool = FakePool(max_kernels=2, max_per_user=2)
+    pool.execute("p1", "1", user_id="u1")
+    pool.execute("p2", "2", user_id="u2")
+    pool.execute("p3", "3", user_id="u3")
+    assert list(pool.kernels) == ["p2", "p3"]
+
+    with pool._checkout("p2"), pool._checkout("p3"):
+        with pytest.raises(KernelPoolExhausted):
+            pool.execute("p4", "4", user_id="u4")
+    assert pool.stats()["rejected"] == 1
+    pool.execute("p4", "4", user_id="u4")
+    assert list(pool.kernels) == ["p3", "p4"]
+
+
+def test_idle_kernels_are_shut_down_after_the_ttl():
+    pool = FakePool(idle_ttl=60)
+    pool.execute("old", "1", user_id="u1")
+    pool.execute("recent", "2", user_id="u1")
+    old = pool.kernels["old"]
+    old.last_used -= 120
+    pool._reap()
+
+    assert list(pool.kernels) == ["recent"] and not old.km.alive
+    assert pool.stats()["evicted_idle"] == 1
+
+
+def test_running_executions_keep_their_kernel_busy():
+    pool = FakePool(max_kernels=1, idle_ttl=60)
+    pool.io.hold = True
+    execution = pool.run("p1", "long()", user_id="u1")
+    pool.kernels["p1"].last_used -= 120
+    pool._reap()
+    with pytest.raises(KernelPoolExhausted):
+        pool.execute("p2", "x", user_id="u2")
+
+    execution.finish()
+    pool.io.hold = False
+    assert pool.get_execution(execution.id) is execution
+    pool.execute("p2", "x", user_id="u2")
+    assert list(pool.kernels) == ["p2"]
+
+
+def test_executions_of_a_kernel_run_one_at_a_time_in_order():
+    pool = FakePool(max_queue=2)
+    pool.io.hold = True
+    first, second, third = (pool.run("p1", code, user_id="u1") for code in ("a", "b", "c"))
+    kernel = pool.kernels["p1"]
+    assert kernel.kc.executed == ["a"]
+    assert [pool.queue_position(e) for e in (first, second, third)] == [0, 1, 2]
+    assert (first.status, second.status) == ("running", "queued")
+    with pytest.raises(KernelQueueFull):
+        pool.run("p1", "d", user_id="u2")
+
+    assert pool.cancel(second) and second.status == "cancelled"
+    first.finish()
+    assert kernel.kc.executed == ["a", "c"] and pool.queue(project_id="p1") == [third]
+    assert pool.queue_position(first) is None and not pool.cancel(first)
+
+    # The running one is interrupted; the kernel reports it done afterwards
+    assert pool.cancel(third) and kernel.km.interrupts == 1
+    third.finish()
+    assert third.status == "interrupted" and kernel.busy == 0
+
+
+def test_queued_executions_are_aborted_with_their_kernel():
+    pool = FakePool()
+    pool.io.hold = True
+    running, waiting = pool.run("p1", "a"), pool.run("p1", "b")
+    pool.shutdown("p1")
+    running.finish("aborted")
+    assert waiting.status == "aborted" and pool.stats()["queued"] == 0
+
+
+def test_dead_warm_kernels_are_skipped():
+    pool = FakePool(warm=1)
+    pool._fill()
+    pool._warm[0].km.alive = False
+    pool.execute("p1", "1")
+    assert pool.stats()["cold_starts"] == 1 and pool.stats()["warm"] == 0
+
+
+def test_queue_is_only_shown_to_project_members(monkeypatch, project_tables):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from app.api.routers import notebooks
+    from app.core.security import User, get_current_user
+
+    pool = FakePool(warm=0, max_kernels=2, max_per_user=2, idle_ttl=60)
+    pool.io.hold = True
+    pool.run("p1", "x = 1", user_id="owner")
+    monkeypatch.setattr(notebooks, "kernel_service", pool)
+
+    app = FastAPI()
+    app.include_router(notebooks.router, prefix="/api/notebooks")
+    client = TestClient(app)
+
+    def queue(user_id, project_id="p1"):
+        app.dependency_overrides[get_current_user] = lambda: User(user_id=user_id, username=user_id, role="authenticated")
+        return client.get(f"/api/notebooks/kernels/{project_id}/queue", headers={"Authorization": "Bearer t"})
+
+    assert queue("owner").json()["executions"][0]["code"] == "x = 1"
+    shared = queue("member").json()["executions"][0]
+    assert shared["mine"] is False and "code" not in shared
+    assert queue("stranger").status_code == 404
+    assert queue("owner", project_id="p2").status_code == 404
+
+
+def test_only_project_members_can_queue_executions(monkeypatch, project_tables):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from app.api.routers import notebooks
+    from app.core.security import User, get_current_user
+
+    pool = FakePool(warm=0, max_kernels=2, max_per_user=2, idle_ttl=60)
+    pool.io.hold = True
+    monkeypatch.setattr(notebooks, "kernel_service", pool)
+    monkeypatch.setattr(notebooks.settings, "KERNEL_EXECUTE_WAIT_SECONDS", 0)
+
+    async def no_secrets(user_id):
+        return {}
+
+    monkeypatch.setattr(notebooks.settings_service, "get_user_secrets", no_secrets)
+
+    app = FastAPI()
+    app.include_router(notebooks.router, prefix="/api/notebooks")
+    client = TestClient(app)
+
+    def execute(user_id, path="/api/notebooks/execute"):
+        app.dependency_overrides[get_current_user] = lambda: User(user_id=user_id, username=user_id, role="authenticated")
+        return client.post(path, json={"code": "x = 1", "project_id": "p1"}, headers={"Authorization": "Bearer t"})
+
+    assert execute("stranger").status_code == 404
+    assert execute("stranger", "/api/notebooks/execute/stream").status_code == 404
+    assert pool.queue("p1") == []
+    assert execute("member").json()["status"] in ("queued", "running")
+    assert [e.user_id for e in pool.queue("p1")] == ["member"]
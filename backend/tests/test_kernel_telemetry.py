@@ -0,0 +1,129 @@
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+if not os.path.exists(f"/proc/{os.getpid()}/stat"):
+    pytest.skip("needs /proc", allow_module_level=True)
+
+from app.services.kernel_telemetry import KernelTelemetry, read_process
+from app.tools.base import ToolConfig
+from app.tools.notebook import service
+from app.tools.notebook.service import NotebookTool
+
+
+def burn(seconds):
+    deadline = time.process_time() + seconds
+    while time.process_time() < deadline:
+        pass
+
+
+def test_read_process():
+    ticks, rss, open_files, threads = read_process(os.getpid())
+    assert rss > 1024 * 1024 and threads >= 1 and open_files >= 3 and ticks >= 0
+    child = subprocess.Popen([sys.executable, "-c", "pass"])
+    child.wait()
+    assert read_process(child.pid) is None
+
+
+def test_samples_form_a_bounded_series_per_kernel():
+    pids = {"p1": os.getpid()}
+    telemetry = KernelTelemetry(lambda: dict(pids), interval=1, history=3)
+    telemetry.sample()
+    assert telemetry.latest("p1")["cpu_percent"] is None
+    burn(0.3)
+    telemetry.sample()
+    assert telemetry.latest("p1")["cpu_percent"] > 10
+
+    for _ in range(3):
+        telemetry.sample()
+    series = telemetry.series("p1")
+    assert len(series) == 3 and series[0]["timestamp"] <= series[-1]["timestamp"]
+    assert telemetry.series("p1", since=series[1]["timestamp"]) == series[2:]
+
+    # A replaced kernel starts a new series; a stopped one is dropped
+    pids["p1"] = os.getppid()
+    telemetry.sample()
+    assert len(telemetry.series("p1")) == 1 and telemetry.latest("p1")["pid"] == os.getppid()
+    del pids["p1"]
+    telemetry.sample()
+    assert telemetry.series("p1") == [] and telemetry.snapshot() == []
+
+
+def test_sampler_thread():
+    telemetry = KernelTelemetry(lambda: {"a": os.getpid(), "b": os.getppid()}, interval=0.1)
+    telemetry.start()
+    try:
+        time.sleep(0.35)
+    finally:
+        telemetry.stop()
+    snapshot = telemetry.snapshot()
+    assert {s["project_id"] for s in snapshot} == {"a", "b"}
+    assert snapshot[0]["rss_bytes"] >= snapshot[1]["rss_bytes"]
+    assert len(telemetry.series("a")) >= 2
+
+
+class FakeKernels:
+    def kernel_state(self, project_id):
+        if project_id != "p1":
+            return {"status": "stopped", "pid": None, "queued": 0}
+        return {"status": "idle", "pid": os.getpid(), "queued": 0, "idle_seconds": 1.0}
+
+
+def test_notebook_status_reports_the_kernel_process(monkeypatch):
+    monkeypatch.setattr(service, "kernel_service", FakeKernels())
+    monkeypatch.setattr(service, "kernel_telemetry", KernelTelemetry(lambda: {}))
+    tool = NotebookTool(ToolConfig(id="jupyter-notebook", name="Jupyter Notebook", version="1.0.0"))
+
+    status = asyncio.run(tool.get_status("p1"))
+    usage = status["resource_usage"]
+    assert status["status"] == "idle" and status["kernel"]["pid"] == os.getpid()
+    assert usage["rss_bytes"] > 0 and usage["cpu_percent"] is None
+    assert usage["memory"].endswith("MB") and usage["threads"] >= 1
+    assert asyncio.run(tool.get_status("other"))["resource_usage"] is None
+
+
+def test_telemetry_is_only_shown_to_project_members(monkeypatch, project_tables):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from app.api.routers import notebooks
+    from app.core.security import User, get_current_user
+
+    telemetry = KernelTelemetry(lambda: {"p1": os.getpid()})
+    telemetry.sample()
+    monkeypatch.setattr(notebooks, "kernel_service", FakeKernels())
+    monkeypatch.setattr(notebooks, "kernel_telemetry", telemetry)
+
+    app = FastAPI()
+    app.include_router(notebooks.router, prefix="/api/notebooks")
+    client = TestClient(app)
+
+    def series(user_id):
+        app.dependency_overrides[get_current_user] = lambda: User(user_id=user_id, username=user_id, role="authenticated")
+        return client.get("/api/notebooks/kernels/p1/telemetry", headers={"Authorization": "Bearer t"})
+
+    assert len(series("owner").json()["samples"]) == 1
+    assert series("member").json()["pid"] == os.getpid()
+    assert series("stranger").status_code == 404
+
+
+def test_cross_project_kernel_stats_are_admin_only():
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from app.api.routers import health
+    from app.core.security import User, get_current_user
+
+    app = FastAPI()
+    app.include_router(health.router)
+    client = TestClient(app)
+    paths = ("/health/kernel-pool", "/health/kernel-telemetry", "/health/notebook-workers")
+
+    app.dependency_overrides[get_current_user] = lambda: User(user_id="u1", username="u1", role="authenticated")
+    assert [client.get(path).status_code for path in paths] == [403, 403, 403]
+    app.dependency_overrides[get_current_user] = lambda: User(user_id="a1", username="a1", role="admin")
+    assert [client.get(path).status_code for path in paths] == [200, 200, 200]
+    del app.dependency_overrides[get_current_user]
+    assert client.get("/health/kernel-telemetry").status_code in (401, 403)
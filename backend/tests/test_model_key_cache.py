@@ -0,0 +1,103 @@
+import asyncio
+import hashlib
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from app.db.supabase import SupabaseManager
+from app.services.model_key_service import ModelKeyService
+
+RAW_KEY = "ins_model_test-key-material"
+
+
+class FakeQuery:
+    def __init__(self, db, table):
+        self.db = db
+        self.table = table
+        self.op = None
+        self.payload = None
+        self.filters = []
+
+    def select(self, *args, **kwargs):
+        self.op = "select"
+        return self
+
+    def update(self, payload):
+        self.op = "update"
+        self.payload = payload
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(("eq", column, value))
+        return self
+
+    def in_(self, column, values):
+        self.filters.append(("in", column, list(values)))
+        return self
+
+    async def execute(self):
+        self.db.calls.append((self.op, self.payload, self.filters))
+        if self.op == "select":
+            return SimpleNamespace(data=[dict(self.db.row)] if self.db.row["is_active"] else [])
+        if self.payload == {"is_active": False}:
+            self.db.row["is_active"] = False
+        return SimpleNamespace(data=[dict(self.db.row)])
+
+
+class FakeDB:
+    def __init__(self, expires_at=None):
+        self.calls = []
+        self.row = {
+            "id": "key-1",
+            "user_id": "user-1",
+            "key_hash": hashlib.sha256(RAW_KEY.encode()).hexdigest(),
+            "expires_at": expires_at,
+            "is_active": True,
+        }
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+    def count(self, op):
+        return sum(1 for call in self.calls if call[0] == op)
+
+
+def _service(monkeypatch, db):
+    monkeypatch.setattr(SupabaseManager, "get_async_client", classmethod(lambda cls: db))
+    return ModelKeyService()
+
+
+def test_validated_keys_are_served_from_cache(monkeypatch):
+    db = FakeDB()
+    service = _service(monkeypatch, db)
+
+    async def scenario():
+        for _ in range(5):
+            assert (await service.validate_key(RAW_KEY))[0]
+        await service.shutdown()
+
+    asyncio.run(scenario())
+    assert db.count("select") == 1
+    # Five uses collapse into a single last_used_at write
+    assert db.count("update") == 1
+    assert ("in", "id", ["key-1"]) in db.calls[-1][2]
+
+
+def test_expired_keys_are_rejected(monkeypatch):
+    expired = (datetime.now(timezone.utc) - timedelta(minutes=1)).isoformat()
+    service = _service(monkeypatch, FakeDB(expires_at=expired))
+    assert asyncio.run(service.validate_key(RAW_KEY)) == (False, None)
+
+
+def test_revocation_evicts_cached_key(monkeypatch):
+    db = FakeDB()
+    service = _service(monkeypatch, db)
+
+    async def scenario():
+        assert (await service.validate_key(RAW_KEY))[0]
+        assert await service.revoke_key("key-1", "user-1")
+        result = await service.validate_key(RAW_KEY)
+        await service.shutdown()
+        return result
+
+    assert asyncio.run(scenario()) == (False, None)
+    assert db.count("select") == 2
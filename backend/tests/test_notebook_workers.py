@@ -0,0 +1,109 @@
+import asyncio
+import time
+
+import pytest
+
+pytest.importorskip("resource")
+
+from app.tools.notebook.workers import CellWorkerPool
+
+MIB = 1024 * 1024
+
+
+def make_pool(**overrides):
+    options = dict(workers=2, max_runs=100, max_queue=4, cpu_seconds=5, memory_bytes=256 * MIB,
+                   timeout=20, max_output=MIB)
+    options.update(overrides)
+    return CellWorkerPool(**options)
+
+
+@pytest.fixture
+def pool():
+    pool = make_pool()
+    yield pool
+    pool.shutdown()
+
+
+def test_cells_run_in_workers_with_errors_captured(pool):
+    async def scenario():
+        return await asyncio.gather(pool.run("x = 6 * 7"), pool.run("1 / 0"), pool.run("def broken(:"))
+
+    ok, failed, syntax = asyncio.run(scenario())
+    assert ok["error"] == "" and ok["cpu_seconds"] is not None
+    assert failed["error"] == "ZeroDivisionError: division by zero"
+    assert syntax["error"].startswith("Syntax Error:")
+    assert pool.stats()["completed"] == 3
+
+
+def test_stdout_is_captured_with_the_restricted_builtins(pool):
+    async def scenario():
+        return await asyncio.gather(pool.run("print(42)"), pool.run("print(sum(range(len([1, 2, 3]))))"),
+                                    pool.run("open('/etc/passwd')"))
+
+    printed, computed, blocked = asyncio.run(scenario())
+    assert printed["stdout"] == "42\n" and printed["error"] == ""
+    assert computed["stdout"] == "3\n"
+    assert blocked["error"] == "NameError: name 'open' is not defined"
+
+
+def test_cpu_and_memory_limits_end_the_cell_not_the_worker():
+    pool = make_pool(workers=1, cpu_seconds=1)
+    try:
+        async def scenario():
+            spin = await pool.run("while True:\n    pass")
+            hog = await pool.run("block = [0] * (512 * 1024 * 1024)")
+            after = await pool.run("y = 1")
+            return spin, hog, after
+
+        spin, hog, after = asyncio.run(scenario())
+        assert spin["error"] == "CPU time limit exceeded (1s)"
+        assert hog["error"].startswith("Memory limit exceeded")
+        assert after["error"] == ""
+        assert pool.stats()["killed"] == 0
+    finally:
+        pool.shutdown()
+
+
+def test_runaway_cell_is_killed_without_blocking_the_event_loop():
+    pool = make_pool(workers=1, cpu_seconds=60, timeout=1)
+    try:
+        async def scenario():
+            ticks = 0
+
+            async def ticker():
+                nonlocal ticks
+                while True:
+                    await asyncio.sleep(0.01)
+                    ticks += 1
+
+            task = asyncio.create_task(ticker())
+            started = time.monotonic()
+            result = await pool.run("while True:\n    pass")
+            elapsed = time.monotonic() - started
+            task.cancel()
+            return result, ticks, elapsed, await pool.run("z = 2")
+
+        result, ticks, elapsed, after = asyncio.run(scenario())
+        assert result["error"] == "Execution timed out after 1s"
+        # The loop kept ticking while the worker spun
+        assert ticks >= elapsed / 0.01 * 0.5
+        assert after["error"] == ""
+        assert pool.stats()["killed"] == 1 and pool.stats()["idle"] == 1
+    finally:
+        pool.shutdown()
+
+
+def test_workers_are_recycled_after_max_runs():
+    pool = make_pool(workers=1, max_runs=2)
+    try:
+        async def scenario():
+            pool.start()
+            first = pool._idle[0].process.pid
+            for _ in range(3):
+                await pool.run("a = 1")
+            return first, pool._idle[0].process.pid
+
+        first, current = asyncio.run(scenario())
+        assert first != current and pool.stats()["recycled"] == 1
+    finally:
+        pool.shutdown()
@@ -0,0 +1,127 @@
+from types import SimpleNamespace
+from urllib.parse import unquote
+
+import pytest
+from fastapi import FastAPI, HTTPException, Response
+from fastapi.testclient import TestClient
+from postgrest import AsyncPostgrestClient
+
+from app.core.security import User, get_current_user
+from app.db.pagination import NEXT_CURSOR_HEADER, PageParams, decode_cursor, encode_cursor, finish_page, paginate
+from app.db.supabase import SupabaseManager
+
+
+def _params(builder):
+    return unquote(str(builder.request.params))
+
+
+def test_first_page_is_ordered_and_bounded():
+    builder = AsyncPostgrestClient("http://db").table("datasets").select("*").eq("created_by", "u1")
+    params = _params(paginate(builder, PageParams(limit=25)))
+    assert "order=created_at.desc,id.desc" in params
+    assert "limit=26" in params
+    assert "or=" not in params
+
+
+def test_cursor_resumes_after_last_row():
+    cursor = encode_cursor(["2024-01-01T00:00:00+00:00", "abc"])
+    builder = AsyncPostgrestClient("http://db").table("datasets").select("*")
+    params = _params(paginate(builder, PageParams(limit=10, cursor=cursor)))
+    assert ('or=(created_at.lt."2024-01-01T00:00:00+00:00",'
+            'and(created_at.eq."2024-01-01T00:00:00+00:00",id.lt."abc"))') in params
+
+
+def test_invalid_cursor_is_rejected():
+    builder = AsyncPostgrestClient("http://db").table("datasets").select("*")
+    with pytest.raises(HTTPException) as exc:
+        paginate(builder, PageParams(limit=10, cursor=encode_cursor({"not": "a keyset"})))
+    assert exc.value.status_code == 400
+    with pytest.raises(HTTPException):
+        decode_cursor("%%%")
+
+
+def test_finish_page_trims_look_ahead_row():
+    rows = [{"id": str(i), "created_at": f"2024-01-0{9 - i}"} for i in range(4)]
+    response = Response()
+    assert finish_page(rows, PageParams(limit=3), response) == rows[:3]
+    assert decode_cursor(response.headers[NEXT_CURSOR_HEADER]) == ["2024-01-07", "2"]
+
+    response = Response()
+    assert finish_page(rows[:2], PageParams(limit=3), response) == rows[:2]
+    assert NEXT_CURSOR_HEADER not in response.headers
+
+
+def test_list_endpoint_exposes_next_cursor(monkeypatch):
+    from app.api.routers import notifications
+
+    rows = [
+        {"id": f"n{i}", "user_id": "u1", "title": "t", "message": "m", "type": "info",
+         "read": False, "created_at": f"2024-01-{20 - i:02d}T00:00:00+00:00"}
+        for i in range(3)
+    ]
+    seen = {}
+
+    class FakeQuery:
+        def __init__(self):
+            self.builder = AsyncPostgrestClient("http://db").table("notifications").select("*")
+
+        def __getattr__(self, name):
+            def call(*args, **kwargs):
+                self.builder = getattr(self.builder, name)(*args, **kwargs)
+                return self
+            return call
+
+        async def execute(self):
+            seen["params"] = _params(self.builder)
+            return SimpleNamespace(data=rows)
+
+    fake = SimpleNamespace(table=lambda name: FakeQuery())
+    monkeypatch.setattr(SupabaseManager, "get_async_client", classmethod(lambda cls: fake))
+
+    app = FastAPI()
+    app.include_router(notifications.router, prefix="/api/notifications")
+    app.dependency_overrides[get_current_user] = lambda: User(user_id="u1", username="u", role="authenticated")
+
+    response = TestClient(app).get("/api/notifications/?limit=2")
+    assert response.status_code == 200
+    assert [n["id"] for n in response.json()] == ["n0", "n1"]
+    assert decode_cursor(response.headers[NEXT_CURSOR_HEADER]) == ["2024-01-19T00:00:00+00:00", "n1"]
+    assert "limit=3" in seen["params"]
+
+    assert TestClient(app).get("/api/notifications/?limit=100000").status_code == 422
+
+
+def test_requests_without_limit_or_cursor_get_the_whole_list():
+    from app.core.config import settings
+    from app.db.pagination import page_params
+
+    builder = AsyncPostgrestClient("http://db").table("projects").select("*")
+    page = page_params(limit=None, cursor=None)
+    params = _params(paginate(builder, page))
+    assert "order=created_at.desc,id.desc" in params and "limit=" not in params
+    rows = [{"id": str(i), "created_at": "2024-01-01"} for i in range(1000)]
+    response = Response()
+    assert finish_page(rows, page, response) == rows
+    assert NEXT_CURSOR_HEADER not in response.headers
+
+    cursor = encode_cursor(["2024-01-01", "9"])
+    assert page_params(limit=None, cursor=cursor).limit == settings.LIST_PAGE_DEFAULT_LIMIT
+
+
+def test_list_endpoint_rejects_invalid_cursor(monkeypatch):
+    from app.api.routers import tasks
+
+    queried = []
+    monkeypatch.setattr(SupabaseManager, "get_async_client",
+                        classmethod(lambda cls: SimpleNamespace(table=lambda name: queried.append(name))))
+
+    app = FastAPI()
+    app.include_router(tasks.router, prefix="/api/tasks")
+    app.dependency_overrides[get_current_user] = lambda: User(user_id="u1", username="u", role="authenticated")
+
+    client = TestClient(app)
+    for cursor in ("garbage", encode_cursor({"not": "a keyset"})):
+        response = client.get("/api/tasks/", params={"cursor": cursor})
+        assert response.status_code == 400
+        assert response.json() == {"detail": "Invalid cursor"}
+    assert queried == []
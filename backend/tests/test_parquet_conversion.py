@@ -0,0 +1,73 @@
+import asyncio
+import io
+import json
+
+import pytest
+
+pytest.importorskip("boto3")
+pytest.importorskip("moto")
+
+import pyarrow.parquet as pq
+
+from app.services.conversion import ParquetConverter, parquet_copy, parquet_key, write_parquet
+
+
+def _csv(rows):
+    lines = ["id,name,score"] + [f'{i},"name {i}\nsecond line",{i / 4}' for i in range(rows)]
+    return ("\n".join(lines) + "\n").encode()
+
+
+def test_write_parquet_splits_row_groups(tmp_path):
+    path = str(tmp_path / "out.parquet")
+    stats = write_parquet(io.BytesIO(_csv(2500)), ".csv", {"delimiter": ","}, path, 1000, "zstd")
+    metadata = pq.read_metadata(path)
+    assert stats == {"rows": 2500, "row_groups": 3}
+    assert [metadata.row_group(i).num_rows for i in range(3)] == [1000, 1000, 500]
+    assert metadata.row_group(0).column(0).compression == "ZSTD"
+    table = pq.read_table(path, columns=["name"])
+    assert table.column("name")[1].as_py() == "name 1\nsecond line"
+
+
+def test_write_parquet_json_layouts(tmp_path):
+    records = [{"id": i, "tags": ["a", "b"], "score": i * 1.5} for i in range(100)]
+    for layout, payload in (
+        ("array", json.dumps(records).encode()),
+        ("lines", "\n".join(json.dumps(r) for r in records).encode()),
+    ):
+        path = str(tmp_path / f"{layout}.parquet")
+        stats = write_parquet(io.BytesIO(payload), ".json", {"layout": layout}, path, 64, "snappy")
+        assert stats["rows"] == 100 and stats["row_groups"] == 2
+        assert pq.read_table(path).to_pylist() == records
+
+
+def test_convert_streams_from_storage_and_records_metadata(backend, statuses):
+    payload = _csv(5000)
+    backend.client.put_object(Bucket=backend.bucket, Key="u/1/sales.csv", Body=payload)
+    dataset = {
+        "id": "d1", "name": "sales.csv", "file_path": "u/1/sales.csv",
+        "schema": {"delimiter": ","}, "checksum": "abc-1",
+    }
+
+    copy = asyncio.run(ParquetConverter(workers=1).convert(dataset, "token", backend=backend))
+
+    assert [s["status"] for s in statuses] == ["converting", "ready"]
+    assert copy["path"] == parquet_key("u/1/sales.csv") == "u/1/sales.parquet"
+    assert copy["rows"] == 5000 and copy["source_checksum"] == "abc-1"
+    body = backend.client.get_object(Bucket=backend.bucket, Key=copy["path"])["Body"].read()
+    assert len(body) == copy["size_bytes"]
+    assert pq.read_table(io.BytesIO(body)).num_rows == 5000
+
+    assert parquet_copy({**dataset, "metadata": {"parquet": copy}}) == "u/1/sales.parquet"
+    # A copy made from different bytes is not used
+    assert parquet_copy({**dataset, "checksum": "other-1", "metadata": {"parquet": copy}}) is None
+
+
+def test_failed_conversion_is_recorded(backend, statuses):
+    backend.client.put_object(Bucket=backend.bucket, Key="u/1/bad.json", Body=b'{"not": "an array"')
+    dataset = {"id": "d2", "name": "bad.json", "file_path": "u/1/bad.json", "schema": {"layout": "array"}}
+
+    copy = asyncio.run(ParquetConverter(workers=1).convert(dataset, "token", backend=backend))
+
+    assert copy["status"] == "failed" and copy["error"]
+    assert statuses[-1]["status"] == "failed"
+    assert "Contents" not in backend.client.list_objects_v2(Bucket=backend.bucket, Prefix="u/1/bad.parquet")
@@ -0,0 +1,63 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.core.password_pool import PasswordHashPool, PoolSaturated
+
+
+def test_runs_jobs_off_the_event_loop():
+    pool = PasswordHashPool(workers=2, max_queue=2)
+    loop_thread = threading.get_ident()
+
+    async def scenario():
+        return await asyncio.gather(*(pool.run(threading.get_ident) for _ in range(3)))
+
+    assert all(ident != loop_thread for ident in asyncio.run(scenario()))
+    assert pool.stats()["completed"] == 3
+    pool.shutdown()
+
+
+def test_rejects_work_beyond_capacity():
+    pool = PasswordHashPool(workers=1, max_queue=1)
+    release = threading.Event()
+
+    async def scenario():
+        blocked = [asyncio.ensure_future(pool.run(release.wait)) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        with pytest.raises(PoolSaturated):
+            await pool.run(lambda: None)
+        release.set()
+        await asyncio.gather(*blocked)
+        # Capacity is released once outstanding jobs finish
+        assert await pool.run(lambda: 42) == 42
+
+    asyncio.run(scenario())
+    assert pool.stats()["rejected"] == 1
+    assert pool.stats()["outstanding"] == 0
+    pool.shutdown()
+
+
+def test_saturation_maps_to_503(monkeypatch):
+    from fastapi import HTTPException
+    from app.core import security
+
+    monkeypatch.setattr(security, "password_pool", PasswordHashPool(workers=1, max_queue=0))
+    release = threading.Event()
+
+    async def scenario():
+        blocked = asyncio.ensure_future(security.password_pool.run(release.wait))
+        await asyncio.sleep(0.05)
+        with pytest.raises(HTTPException) as exc:
+            await security.verify_password_async("secret", "$2b$12$invalid")
+        with pytest.raises(HTTPException) as again:
+            await security.get_password_hash_async("secret")
+        release.set()
+        await blocked
+        return exc.value, again.value
+
+    error, again = asyncio.run(scenario())
+    # Each rejection gets its own exception object
+    assert again is not error and again.status_code == 503
+    assert error.status_code == 503
+    assert error.headers["Retry-After"] == "1"
@@ -0,0 +1,103 @@
+import asyncio
+import io
+
+import numpy as np
+import pytest
+
+pytest.importorskip("boto3")
+pytest.importorskip("moto")
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from app.services.profiling import DatasetProfiler, current_profile
+from app.services.sketches import HyperLogLog, QuantileSketch, hash64
+
+
+@pytest.fixture(scope="module")
+def profiler():
+    profiler = DatasetProfiler(workers=2)
+    yield profiler
+    profiler.shutdown()
+
+
+@pytest.mark.parametrize("values", [
+    pa.array(np.arange(200_000) % 50_000),
+    pa.array(np.random.default_rng(0).random(50_000)),
+    pa.array([f"user-{i % 50_000}@example.com" for i in range(200_000)]),
+], ids=["int", "float", "string"])
+def test_hyperloglog_estimates_distinct_values(values):
+    hll = HyperLogLog()
+    hll.add(hash64(values, "string" if pa.types.is_string(values.type) else "numeric"))
+    assert hll.estimate() == pytest.approx(50_000, rel=0.03)
+
+
+def test_quantile_sketch_merges_chunks():
+    data = np.random.default_rng(1).normal(size=400_000)
+    sketch = QuantileSketch()
+    for chunk in np.array_split(data, 40):
+        part = QuantileSketch()
+        part.add(chunk)
+        sketch.merge(part)
+    expected = np.quantile(data, [0.05, 0.5, 0.95])
+    assert sketch.quantiles([0.05, 0.5, 0.95]) == pytest.approx(expected, abs=0.03)
+
+
+def _columns(profile):
+    return {c["name"]: c for c in profile["columns"]}
+
+
+def test_profile_csv_in_process_pool(backend, statuses, profiler, monkeypatch):
+    monkeypatch.setattr("app.core.config.settings.DATASET_PARQUET_ROW_GROUP_ROWS", 10_000)
+    rows = ["id,city,amount,note"] + [
+        f"{i},city{i % 40},{i % 1000},{'' if i % 10 == 0 else 'n'}" for i in range(100_000)
+    ]
+    backend.client.put_object(Bucket=backend.bucket, Key="u/1/sales.csv", Body=("\n".join(rows) + "\n").encode())
+    dataset = {"id": "d1", "name": "sales.csv", "file_path": "u/1/sales.csv",
+               "schema": {"delimiter": ","}, "checksum": "abc-1", "metadata": {}}
+
+    profile = asyncio.run(profiler.profile(dataset, "token", backend=backend))
+
+    assert [s["status"] for s in statuses] == ["running", "ready"]
+    assert profile["rows"] == 100_000 and profile["row_groups"] == 10
+    columns = _columns(profile)
+    amount = columns["amount"]
+    assert (amount["min"], amount["max"], amount["count"]) == (0, 999, 100_000)
+    assert amount["mean"] == pytest.approx(499.5)
+    assert amount["distinct_estimate"] == pytest.approx(1000, rel=0.03)
+    assert amount["quantiles"]["0.5"] == pytest.approx(500, abs=15)
+    # Bin edges come from the footer statistics, so the counts are exact
+    assert sum(amount["histogram"]["counts"]) == 100_000
+    assert "approximate" not in amount["histogram"]
+    assert columns["city"]["distinct_estimate"] == pytest.approx(40, abs=1)
+    assert columns["note"]["null_count"] == 10_000
+
+    # Reused while the checksum matches
+    stored = {**dataset, "schema": {"profile": profile}}
+    assert current_profile(stored) is profile
+    assert current_profile({**stored, "checksum": "changed-1"}) is None
+
+
+def test_profile_parquet_is_downloaded_as_is(backend, statuses, profiler):
+    table = pa.table({"x": pa.array([1.5, None, 3.5, 2.0] * 5000), "t": pa.array([None] * 20_000, pa.int64())})
+    buffer = io.BytesIO()
+    pq.write_table(table, buffer, row_group_size=3000)
+    backend.client.put_object(Bucket=backend.bucket, Key="u/1/x.parquet", Body=buffer.getvalue())
+    dataset = {"id": "d2", "name": "x.parquet", "file_path": "u/1/x.parquet", "schema": {}, "size_bytes": 1}
+
+    profile = asyncio.run(profiler.profile(dataset, "token", backend=backend))
+
+    assert profile["status"] == "ready" and profile["row_groups"] == 7
+    x, t = _columns(profile)["x"], _columns(profile)["t"]
+    assert (x["null_count"], x["distinct_estimate"], x["min"], x["max"]) == (5000, 3, 1.5, 3.5)
+    assert t["null_count"] == 20_000 and t["min"] is None and "histogram" not in t
+
+
+def test_unreadable_dataset_records_failure(backend, statuses, profiler):
+    backend.client.put_object(Bucket=backend.bucket, Key="u/1/bad.json", Body=b'{"not": "an array"')
+    dataset = {"id": "d3", "name": "bad.json", "file_path": "u/1/bad.json", "schema": {"layout": "array"}}
+
+    profile = asyncio.run(profiler.profile(dataset, "token", backend=backend))
+
+    assert profile["status"] == "failed" and profile["error"]
+    assert statuses[-1]["status"] == "failed"
@@ -0,0 +1,218 @@
+import time
+
+from app.services.search_index import SearchIndex, tokenize
+
+OWNER = "user-1"
+
+
+def _index(tmp_path, max_bytes=10_000_000):
+    return SearchIndex(max_bytes=max_bytes, snapshot_path=str(tmp_path / "index.json"))
+
+
+def _populate(index):
+    index.upsert("project", {"id": "p1", "name": "Churn analysis", "description": "Customer retention",
+                             "owner_id": OWNER, "updated_at": "2024-01-01T00:00:00+00:00"})
+    index.upsert("dataset", {"id": "d1", "name": "churn_v2.csv", "description": "Monthly extract",
+                             "created_by": OWNER, "project_id": "p1", "updated_at": "2024-01-02T00:00:00+00:00"})
+    index.upsert("model", {"id": "m1", "name": "xgb-baseline", "version": "1.0", "framework": "xgboost",
+                           "created_by": OWNER, "project_id": "p1", "updated_at": "2024-01-03T00:00:00+00:00"})
+    index.upsert("dataset", {"id": "d2", "name": "churn private", "created_by": "someone-else",
+                             "project_id": "p9", "updated_at": "2024-01-04T00:00:00+00:00"})
+
+
+def test_tokenize_splits_identifiers():
+    assert tokenize("churn_v2.csv") == ["churn_v2", "churn", "v2", "csv"]
+
+
+def test_prefix_search_scoped_to_owner(tmp_path):
+    index = _index(tmp_path)
+    _populate(index)
+
+    hits, total = index.search("chu", OWNER)
+    assert total == 2
+    assert [h["id"] for h in hits] == ["d1", "p1"]
+
+    hits, _ = index.search("xgboo", OWNER)
+    assert [h["id"] for h in hits] == ["m1"]
+    assert index.search("churn retent", OWNER)[1] == 1
+    assert index.search("churn", OWNER, entity_type="project")[0][0]["id"] == "p1"
+    assert index.search("nothing", OWNER) == ([], 0)
+
+
+def test_updates_and_removals_are_incremental(tmp_path):
+    index = _index(tmp_path)
+    _populate(index)
+    index.upsert("project", {"id": "p1", "name": "Retention study", "owner_id": OWNER,
+                             "updated_at": "2024-02-01T00:00:00+00:00"})
+    assert [h["id"] for h in index.search("churn", OWNER)[0]] == ["d1"]
+    index.remove("dataset", "d1")
+    assert index.search("churn", OWNER) == ([], 0)
+    assert index.search("churn_v", OWNER) == ([], 0)
+
+
+def test_memory_cap_evicts_least_recently_updated(tmp_path):
+    index = _index(tmp_path, max_bytes=2000)
+    for i in range(20):
+        index.upsert("dataset", {"id": f"d{i}", "name": f"table {i}", "created_by": OWNER,
+                                 "updated_at": f"2024-01-01T00:00:{i:02d}+00:00"})
+    stats = index.stats()
+    assert stats["estimated_bytes"] <= 2000
+    assert stats["evictions"] > 0
+    ids = {h["id"] for h in index.search("table", OWNER, limit=100)[0]}
+    assert "d19" in ids and "d0" not in ids
+
+
+def test_snapshot_round_trip(tmp_path):
+    index = _index(tmp_path)
+    _populate(index)
+    assert index.save_snapshot()
+    assert not index.save_snapshot()  # unchanged since the last write
+
+    restored = _index(tmp_path)
+    assert restored.load_snapshot()
+    assert restored.search("chu", OWNER) == index.search("chu", OWNER)
+
+
+def test_untrusted_or_oversized_snapshots_are_not_loaded(tmp_path):
+    index = _index(tmp_path)
+    _populate(index)
+    index.save_snapshot()
+    snapshot = tmp_path / "index.json"
+    assert snapshot.stat().st_mode & 0o777 == 0o600
+
+    snapshot.chmod(0o622)
+    assert not _index(tmp_path).load_snapshot()
+    snapshot.chmod(0o600)
+    assert not _index(tmp_path, max_bytes=100).load_snapshot()
+
+    # A snapshot larger than the memory cap keeps the most recently updated documents
+    capped = _index(tmp_path, max_bytes=1600)
+    assert capped.load_snapshot()
+    assert capped.stats()["estimated_bytes"] <= 1600 and capped.stats()["documents"] == 2
+    assert [h["id"] for h in capped.search("churn", "someone-else")[0]] == ["d2"]
+
+
+def test_prune_drops_deleted_rows(tmp_path, monkeypatch):
+    import asyncio
+    from types import SimpleNamespace
+    from app.services import search_index as search_index_module
+
+    class Query:
+        def __init__(self, table):
+            self.table, self.ids = table, []
+
+        def select(self, columns):
+            return self
+
+        def in_(self, column, ids):
+            self.ids = ids
+            return self
+
+        async def execute(self):
+            live = {"projects": {"p1"}, "datasets": {"d2"}, "models": {"m1"}}.get(self.table, set())
+            return SimpleNamespace(data=[{"id": i} for i in self.ids if i in live])
+
+    client = SimpleNamespace(table=Query)
+    monkeypatch.setattr(search_index_module.SupabaseManager, "get_async_service_client",
+                        classmethod(lambda cls: client))
+    index = _index(tmp_path)
+    _populate(index)
+
+    assert asyncio.run(index.prune()) == 1
+    assert index.search("churn_v2", OWNER) == ([], 0)
+    assert index.stats()["documents"] == 3
+
+
+def test_type_ahead_is_sub_millisecond(tmp_path):
+    index = _index(tmp_path, max_bytes=1 << 30)
+    for i in range(20_000):
+        index.upsert("dataset", {"id": f"d{i}", "name": f"sales_{i % 500} region {i % 37}",
+                                 "created_by": f"user-{i % 50}", "updated_at": f"{i:08d}"})
+    started = time.perf_counter()
+    for _ in range(100):
+        index.search("sales_42 reg", "user-7", limit=10)
+    assert (time.perf_counter() - started) / 100 < 0.001
+
+
+def test_search_endpoint_pages_from_memory_index(tmp_path, monkeypatch):
+    import asyncio
+    from app.api.routers import search as search_module
+    from app.core.security import User
+
+    index = _index(tmp_path)
+    _populate(index)
+    monkeypatch.setattr(search_module, "search_index", index)
+    monkeypatch.setattr(search_module.settings, "SEARCH_BACKEND", "memory")
+    user = User(user_id=OWNER, username="user", role="authenticated")
+
+    def page(cursor=None):
+        return asyncio.run(search_module.search(
+            q="churn", type=None, limit=1, offset=0, cursor=cursor, current_user=user, credentials=None
+        ))
+
+    first = page()
+    assert first.total == 2
+    assert first.results[0].highlights["title"] == "<mark>churn</mark>_v2.csv"
+    second = page(first.next_cursor)
+    assert [r.id for r in second.results] == ["p1"]
+    assert second.next_cursor is None
+
+
+def test_sync_pages_through_rows_sharing_a_timestamp(tmp_path, monkeypatch):
+    import asyncio
+    import re
+    from types import SimpleNamespace
+    from app.services import search_index as search_index_module
+
+    # One batched insert: every row has the same updated_at
+    stamp = "2024-03-01T00:00:00+00:00"
+    tables = {"datasets": [{"id": f"d{i:02d}", "name": f"part {i}", "created_by": OWNER, "project_id": "p1",
+                            "storage_mode": "file", "updated_at": stamp, "created_at": stamp} for i in range(7)]}
+
+    class Query:
+        def __init__(self, table):
+            self.rows, self.after, self.count = list(tables.get(table, [])), None, None
+
+        def select(self, columns):
+            return self
+
+        def order(self, column):
+            return self
+
+        def eq(self, column, value):
+            self.rows = [row for row in self.rows if row.get(column) == value]
+            return self
+
+        def or_(self, filters):
+            self.after = tuple(re.match(r'updated_at\.gt\."(.*?)",and\(updated_at\.eq\."(.*?)",id\.gt\."(.*?)"\)$',
+                                        filters).group(1, 3))
+            return self
+
+        def limit(self, count):
+            self.count = count
+            return self
+
+        async def execute(self):
+            rows = sorted(self.rows, key=lambda row: (row["updated_at"], row["id"]))
+            if self.after:
+                rows = [row for row in rows if (row["updated_at"], row["id"]) > self.after]
+            return SimpleNamespace(data=rows[:self.count])
+
+    client = SimpleNamespace(table=Query)
+    monkeypatch.setattr(search_index_module.SupabaseManager, "get_async_service_client",
+                        classmethod(lambda cls: client))
+    index = _index(tmp_path)
+
+    assert asyncio.run(index.sync(batch_size=3)) == 7
+    assert index.search("part", OWNER, limit=100)[1] == 7
+    assert index.stats()["high_water"]["datasets"] == [stamp, "d06"]
+    assert asyncio.run(index.sync(batch_size=3)) == 0
+
+
+def test_highlights_escape_the_text():
+    highlight = SearchIndex.highlight
+    assert highlight('<img src=x onerror="churn()">', "churn") == \
+        '&lt;img src=x onerror=&quot;<mark>churn</mark>()&quot;&gt;'
+    assert highlight("a & b <i>", "zzz") == "a &amp; b &lt;i&gt;"
+    assert highlight("Churn & co", "") == "Churn &amp; co"
+    assert highlight(None, "churn") is None
@@ -0,0 +1,202 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from fastapi.security import HTTPAuthorizationCredentials
+from postgrest.exceptions import APIError
+
+from app.api.routers import search as search_module
+from app.core.security import User
+from app.db.supabase import SupabaseManager
+
+USER = User(user_id="user-1", username="user", role="authenticated")
+BASE = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def _rows(table, count, start):
+    return [
+        {
+            "id": f"{table}-{i:03d}",
+            "name": f"{table} {i}",
+            "updated_at": (BASE + timedelta(minutes=start + 7 * i)).isoformat(),
+            "project_id": "p",
+        }
+        for i in range(count)
+    ]
+
+
+TABLES = {
+    "projects": _rows("projects", 7, 0),
+    "datasets": _rows("datasets", 12, 3),
+    "notebooks": _rows("notebooks", 0, 0),
+    "models": _rows("models", 5, 5),
+}
+
+
+def _install_fake_source(monkeypatch, delays=None):
+    calls = []
+
+    async def fake_query_source(supabase, table, columns, owner_column, q, user_id, position, fetch, count):
+        calls.append((table, position, fetch))
+        await asyncio.sleep((delays or {}).get(table, 0))
+        rows = sorted(TABLES[table], key=lambda r: (r["updated_at"], r["id"]), reverse=True)
+        if position:
+            rows = [r for r in rows if (r["updated_at"], r["id"]) < tuple(position)]
+        return SimpleNamespace(data=rows[:fetch], count=len(TABLES[table]) if count else None)
+
+    monkeypatch.setattr(search_module, "_query_source", fake_query_source)
+    monkeypatch.setattr(SupabaseManager, "get_async_client", classmethod(lambda cls: None))
+    return calls
+
+
+def _search(**kwargs):
+    params = {"q": "x", "type": None, "limit": 10, "offset": 0, "cursor": None, "credentials": None}
+    params.update(kwargs)
+    return asyncio.run(search_module.search(current_user=USER, **params))
+
+
+def _expected_order():
+    rows = [r for rows in TABLES.values() for r in rows]
+    return [r["id"] for r in sorted(rows, key=lambda r: (r["updated_at"], r["id"]), reverse=True)]
+
+
+def test_cursor_walks_merged_results_without_gaps(monkeypatch):
+    calls = _install_fake_source(monkeypatch)
+
+    seen, cursor, pages = [], None, 0
+    while True:
+        page = _search(limit=4, cursor=cursor)
+        assert page.total == 24
+        seen.extend(r.id for r in page.results)
+        pages += 1
+        cursor = page.next_cursor
+        if cursor is None:
+            break
+
+    assert seen == _expected_order()
+    assert pages == 6
+    # Every page fetches at most `limit` rows per source, however deep it is
+    assert all(fetch == 4 for _, _, fetch in calls)
+
+
+def test_legacy_offset_matches_cursor_paging(monkeypatch):
+    _install_fake_source(monkeypatch)
+    page = _search(limit=5, offset=10)
+    assert [r.id for r in page.results] == _expected_order()[10:15]
+    follow = _search(limit=5, cursor=page.next_cursor)
+    assert [r.id for r in follow.results] == _expected_order()[15:20]
+
+
+def test_sources_run_concurrently_and_slow_ones_time_out(monkeypatch):
+    _install_fake_source(monkeypatch, delays={"projects": 0.2, "datasets": 0.2, "models": 5})
+    monkeypatch.setattr(search_module.settings, "SEARCH_SOURCE_TIMEOUT_SECONDS", 0.5)
+
+    loop = asyncio.new_event_loop()
+    started = loop.time()
+    page = loop.run_until_complete(search_module.search(
+        q="x", type=None, limit=50, offset=0, cursor=None, current_user=USER, credentials=None
+    ))
+    elapsed = loop.time() - started
+    loop.close()
+
+    assert elapsed < 1.0
+    assert page.timed_out == ["model"]
+    assert {r.type for r in page.results} == {"project", "dataset"}
+
+
+class FakeRPC:
+    def __init__(self, rows=None, error=None):
+        self.rows = rows or []
+        self.error = error
+        self.calls = []
+
+    def rpc(self, name, params):
+        self.calls.append((name, params))
+        return self
+
+    async def execute(self):
+        if self.error:
+            raise APIError(self.error)
+        after = self.calls[-1][1]["after_id"]
+        rows = self.rows
+        if after:
+            rows = rows[[r["entity_id"] for r in rows].index(after) + 1:]
+        return SimpleNamespace(data=rows[:self.calls[-1][1]["result_limit"]])
+
+
+def _index_rows(count):
+    return [
+        {
+            "entity_type": "dataset",
+            "entity_id": f"d-{i}",
+            "project_id": "p",
+            "title": f"churn {i}",
+            "body": "monthly churn",
+            "updated_at": BASE.isoformat(),
+            "rank": 1.0 - i / 100,
+            "title_highlight": f"<mark>churn</mark> {i}",
+            "snippet": "monthly <mark>churn</mark>",
+            "total_count": count,
+        }
+        for i in range(count)
+    ]
+
+
+def test_index_backend_serves_ranked_pages_in_one_call(monkeypatch):
+    fake = FakeRPC(rows=_index_rows(5))
+    monkeypatch.setattr(SupabaseManager, "get_async_authenticated_client", classmethod(lambda cls, token: fake))
+    monkeypatch.setattr(search_module, "_search_index_available", True)
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials="jwt")
+
+    first = _search(q="churn", limit=3, credentials=credentials)
+    assert first.total == 5
+    assert [r.id for r in first.results] == ["d-0", "d-1", "d-2"]
+    assert first.results[0].highlights["title"] == "<mark>churn</mark> 0"
+
+    second = _search(q="churn", limit=3, cursor=first.next_cursor, credentials=credentials)
+    assert [r.id for r in second.results] == ["d-3", "d-4"]
+    assert second.total == 5
+    assert second.next_cursor is None
+    assert [name for name, _ in fake.calls] == ["search_workspace", "search_workspace"]
+    assert fake.calls[1][1]["after_id"] == "d-2"
+
+
+def test_missing_index_falls_back_to_table_search(monkeypatch):
+    fake = FakeRPC(error={"code": "PGRST202", "message": "Could not find the function"})
+    monkeypatch.setattr(SupabaseManager, "get_async_authenticated_client", classmethod(lambda cls, token: fake))
+    monkeypatch.setattr(search_module, "_search_index_available", True)
+    _install_fake_source(monkeypatch)
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials="jwt")
+
+    page = _search(limit=4, credentials=credentials)
+    assert [r.id for r in page.results] == _expected_order()[:4]
+    assert search_module._search_index_available is False
+
+    _search(limit=4, credentials=credentials)
+    assert len(fake.calls) == 1
+
+
+def test_table_search_skips_value_rows():
+    from urllib.parse import unquote
+    from postgrest import AsyncPostgrestClient
+
+    seen = {}
+
+    class Query:
+        def __init__(self, name):
+            self.name, self.builder = name, AsyncPostgrestClient("http://db").table(name)
+
+        def __getattr__(self, method):
+            def call(*args, **kwargs):
+                self.builder = getattr(self.builder, method)(*args, **kwargs)
+                return self
+            return call
+
+        async def execute(self):
+            seen[self.name] = unquote(str(self.builder.request.params))
+
+    client = SimpleNamespace(table=Query)
+    for table in ("datasets", "projects"):
+        asyncio.run(search_module._query_source(client, table, ("name",), "created_by", "q", "u1", None, 10, False))
+    assert "storage_mode=eq.file" in seen["datasets"]
+    assert "storage_mode" not in seen["projects"]
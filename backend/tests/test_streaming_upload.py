@@ -0,0 +1,161 @@
+import asyncio
+import hashlib
+import os
+
+import pytest
+
+pytest.importorskip("boto3")
+pytest.importorskip("moto")
+
+from app.services.storage import S3StorageBackend
+from app.services.uploads import (
+    StreamingUpload, UploadError, composite_checksum, expected_part_size, iter_multipart, part_count,
+)
+
+PART = S3StorageBackend.MIN_PART_SIZE
+
+
+class Recorder:
+    def __init__(self):
+        self.size = 0
+        self.finished = False
+
+    def feed(self, chunk):
+        self.size += len(chunk)
+
+    def finish(self):
+        self.finished = True
+
+
+class Broken:
+    def feed(self, chunk):
+        raise ValueError("boom")
+
+
+def _stream(payload, chunk_size):
+    async def gen():
+        for i in range(0, len(payload), chunk_size):
+            yield payload[i:i + chunk_size]
+    return gen()
+
+
+def test_streams_object_in_parts_with_bounded_buffer(backend):
+    payload = os.urandom(2 * PART + 12345)
+    recorder = Recorder()
+    upload = StreamingUpload(backend, "user/1/data.csv", "text/csv", "token", observers=[recorder, Broken()])
+    peak = 0
+
+    async def scenario():
+        nonlocal peak
+        await upload.start()
+        async for chunk in _stream(payload, 64 * 1024):
+            await upload.write(chunk)
+            peak = max(peak, len(upload._buffer))
+        return await upload.finish()
+
+    result = asyncio.run(scenario())
+
+    body = backend.client.get_object(Bucket=backend.bucket, Key="user/1/data.csv")["Body"].read()
+    assert body == payload
+    assert result["size"] == len(payload)
+    assert result["parts"] == 3
+    digests = [hashlib.sha256(payload[i:i + PART]).digest() for i in range(0, len(payload), PART)]
+    assert result["checksum"] == composite_checksum(digests)
+    # Never more than one part (plus the chunk being appended) is held in memory
+    assert peak <= PART + 64 * 1024
+    # The failing observer is dropped without affecting the upload or the others
+    assert recorder.size == len(payload) and recorder.finished
+    assert upload.observers == [recorder]
+
+
+def test_exact_multiple_and_empty_uploads(backend):
+    async def upload(key, payload):
+        stream = StreamingUpload(backend, key, "text/csv", "token")
+        await stream.start()
+        for i in range(0, len(payload), PART):
+            await stream.write(payload[i:i + PART])
+        return await stream.finish()
+
+    exact = os.urandom(PART)
+    assert asyncio.run(upload("exact.csv", exact))["parts"] == 1
+    assert backend.client.get_object(Bucket=backend.bucket, Key="exact.csv")["Body"].read() == exact
+
+    empty = asyncio.run(upload("empty.csv", b""))
+    assert empty["size"] == 0 and empty["parts"] == 1
+    assert backend.client.get_object(Bucket=backend.bucket, Key="empty.csv")["Body"].read() == b""
+
+
+def test_abort_discards_the_multipart_upload(backend):
+    async def scenario():
+        upload = StreamingUpload(backend, "aborted.csv", "text/csv", "token")
+        await upload.start()
+        await upload.write(os.urandom(PART + 1))
+        await upload.abort()
+
+    asyncio.run(scenario())
+    assert "Uploads" not in backend.client.list_multipart_uploads(Bucket=backend.bucket)
+    assert "Contents" not in backend.client.list_objects_v2(Bucket=backend.bucket)
+
+
+def test_resumed_parts_match_streamed_checksum(backend):
+    """Parts sent out of order by separate requests assemble the same object and checksum."""
+    payload = os.urandom(PART * 2 + 7)
+    total = part_count(len(payload), PART)
+    assert [expected_part_size(n, len(payload), PART) for n in range(1, total + 1)] == [PART, PART, 7]
+
+    async def scenario():
+        upload_id = await backend.create_upload("resumed.csv", "text/csv", len(payload), "token")
+        parts = {}
+        for n in (3, 1, 2, 1):  # out of order, with a retried part
+            data = payload[(n - 1) * PART:n * PART]
+            parts[n] = (await backend.upload_part("resumed.csv", upload_id, n, data, 0, "token"),
+                        hashlib.sha256(data).digest())
+        await backend.complete_upload("resumed.csv", upload_id, [p for p, _ in parts.values()], "token")
+        return composite_checksum([parts[n][1] for n in sorted(parts)])
+
+    checksum = asyncio.run(scenario())
+    assert backend.client.get_object(Bucket=backend.bucket, Key="resumed.csv")["Body"].read() == payload
+
+    async def streamed():
+        upload = StreamingUpload(backend, "streamed.csv", "text/csv", "token")
+        await upload.start()
+        await upload.write(payload)
+        return await upload.finish()
+
+    assert asyncio.run(streamed())["checksum"] == checksum
+
+
+def _form(boundary, parts):
+    body = b""
+    for headers, content in parts:
+        body += f"--{boundary}\r\n{headers}\r\n\r\n".encode() + content + b"\r\n"
+    return body + f"--{boundary}--\r\n".encode()
+
+
+def test_iter_multipart_streams_file_chunks():
+    boundary = "----insighter"
+    content = os.urandom(300_000)
+    body = _form(boundary, [
+        ('Content-Disposition: form-data; name="project_id"', b"p-1"),
+        ('Content-Disposition: form-data; name="file"; filename="sales.csv"\r\nContent-Type: text/csv', content),
+    ])
+
+    async def collect():
+        return [e async for e in iter_multipart(f"multipart/form-data; boundary={boundary}", _stream(body, 8192))]
+
+    events = asyncio.run(collect())
+    assert events[0] == ("field", "project_id", "p-1")
+    assert events[1] == ("file", "file", "sales.csv", "text/csv")
+    data = [e[1] for e in events if e[0] == "data"]
+    assert b"".join(data) == content
+    # Delivered incrementally, never as one buffered blob
+    assert max(len(d) for d in data) <= 8192
+    assert events[-1] == ("end",)
+
+
+def test_iter_multipart_rejects_other_content_types():
+    async def collect():
+        return [e async for e in iter_multipart("application/json", _stream(b"{}", 2))]
+
+    with pytest.raises(UploadError):
+        asyncio.run(collect())
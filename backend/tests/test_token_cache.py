@@ -0,0 +1,70 @@
+import time
+from app.core.token_cache import TokenCache
+
+
+def test_hit_until_token_expiry():
+    cache = TokenCache(max_entries=10, max_ttl=3600)
+    cache.set("token-a", "user-a", exp=time.time() + 60)
+
+    assert cache.get("token-a") == "user-a"
+    assert cache.get("token-b") is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+    assert cache.stats()["hit_rate"] == 0.5
+
+
+def test_expired_tokens_are_evicted():
+    cache = TokenCache(max_entries=10, max_ttl=3600)
+    cache.set("already-expired", "user", exp=time.time() - 1)
+    assert cache.get("already-expired") is None
+
+    cache.set("short-lived", "user", exp=time.time() + 0.05)
+    time.sleep(0.1)
+    assert cache.get("short-lived") is None
+    assert cache.stats()["expirations"] == 1
+    assert cache.stats()["size"] == 0
+
+
+def test_max_ttl_caps_long_lived_tokens():
+    cache = TokenCache(max_entries=10, max_ttl=0.05)
+    cache.set("long-lived", "user", exp=time.time() + 3600)
+    time.sleep(0.1)
+    assert cache.get("long-lived") is None
+
+
+def test_lru_eviction_keeps_recently_used_tokens():
+    cache = TokenCache(max_entries=2, max_ttl=3600)
+    cache.set("t1", "u1")
+    cache.set("t2", "u2")
+    cache.get("t1")
+    cache.set("t3", "u3")
+
+    assert cache.get("t1") == "u1"
+    assert cache.get("t2") is None
+    assert cache.get("t3") == "u3"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_raw_tokens_are_not_stored():
+    cache = TokenCache(max_entries=10, max_ttl=3600)
+    cache.set("secret-token", "user")
+    assert "secret-token" not in cache._entries
+
+
+def test_opaque_token_vouched_for_by_supabase_is_accepted_but_not_cached(monkeypatch):
+    import asyncio
+    from types import SimpleNamespace
+    from fastapi.security import HTTPAuthorizationCredentials
+    from app.core import security
+    from app.db.supabase import SupabaseManager
+
+    user = SimpleNamespace(id="u1", email="ada@example.com", role="authenticated")
+    client = SimpleNamespace(auth=SimpleNamespace(get_user=lambda token: SimpleNamespace(user=user)))
+    monkeypatch.setattr(SupabaseManager, "get_client", classmethod(lambda cls: client))
+    cache = TokenCache(max_entries=10, max_ttl=3600)
+    monkeypatch.setattr(security, "token_cache", cache)
+
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials="not-a-jwt")
+    current = asyncio.run(security.get_current_user(credentials))
+    assert current.user_id == "u1" and current.username == "ada"
+    assert cache.stats()["size"] == 0